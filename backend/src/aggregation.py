@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+DEFAULT_CONFIDENCE_BINS = 10
+DEFAULT_GRID_SIZE = 0.01   # ~1 km en latitude à Los Angeles
+DEFAULT_TOP_K = 5
+
+# ==========================================
+# AGRÉGATIONS (Dashboard)
+# ==========================================
+
+def class_distribution(labels):
+    """Nombre de prédictions par classe, triées par fréquence décroissante."""
+    counts = pd.Series(labels, dtype=object).value_counts()
+    return {str(label): int(count) for label, count in counts.items()}
+
+def confidence_histogram(confidences, n_bins=DEFAULT_CONFIDENCE_BINS):
+    """Histogramme des confiances sur [0, 1] (bornes fixes, donc comparables d'un lot à l'autre)."""
+    conf = np.asarray(confidences, dtype=float)
+    conf = conf[np.isfinite(conf)]
+    edges = np.linspace(0.0, 1.0, n_bins + 1)
+    counts, _ = np.histogram(conf, bins=edges)
+    return {
+        "mean": float(conf.mean()) if conf.size else None,
+        "edges": edges.round(6).tolist(),
+        "counts": counts.astype(int).tolist()
+    }
+
+def _class_counts(df, keys):
+    """{clé: {classe: lignes}} : effectifs par groupe, additionnables entre lots (fusion côté client)."""
+    counts = {}
+    for row in df.groupby(keys + ["label"]).size().reset_index(name="n").itertuples(index=False):
+        key = tuple(getattr(row, k) for k in keys)
+        counts.setdefault(key if len(keys) > 1 else key[0], {})[str(row.label)] = int(row.n)
+    return counts
+
+def area_breakdown(labels, confidences, areas):
+    """Par AREA : volume, classe majoritaire, confiance moyenne et effectifs par classe."""
+    df = pd.DataFrame({"area": areas, "label": labels, "confidence": confidences})
+    df = df.dropna(subset=["area"])
+    if df.empty:
+        return []
+
+    grouped = df.groupby("area")
+    counts = grouped.size()
+    mean_conf = grouped["confidence"].mean()
+    top_class = df.groupby(["area", "label"]).size().sort_values(ascending=False).reset_index()
+    top_class = top_class.drop_duplicates("area").set_index("area")["label"]
+    classes = _class_counts(df, ["area"])
+
+    return [
+        {
+            "area": int(area) if float(area).is_integer() else float(area),
+            "count": int(counts[area]),
+            "top_class": str(top_class[area]),
+            "mean_confidence": float(mean_conf[area]) if pd.notna(mean_conf[area]) else None,
+            "classes": classes[area]
+        }
+        for area in counts.sort_values(ascending=False).index
+    ]
+
+def geo_grid(lats, lons, labels, grid_size=DEFAULT_GRID_SIZE):
+    """
+    Regroupe les points LAT/LON dans une grille de pas `grid_size` (degrés).
+    Une cellule = son centre, le nombre d'incidents, la classe majoritaire et les effectifs par classe.
+    Les coordonnées (0, 0) du dataset LAPD correspondent à des positions inconnues et sont ignorées.
+    """
+    df = pd.DataFrame({
+        "lat": pd.to_numeric(pd.Series(lats), errors="coerce"),
+        "lon": pd.to_numeric(pd.Series(lons), errors="coerce"),
+        "label": labels
+    })
+    valid = df["lat"].between(-90, 90) & df["lon"].between(-180, 180) & ~((df["lat"] == 0) & (df["lon"] == 0))
+    df = df[valid]
+    if df.empty:
+        return []
+
+    df["cell_lat"] = np.floor(df["lat"] / grid_size).astype(np.int64)
+    df["cell_lon"] = np.floor(df["lon"] / grid_size).astype(np.int64)
+
+    cells = df.groupby(["cell_lat", "cell_lon"]).size().rename("n_points").reset_index()
+    top = df.groupby(["cell_lat", "cell_lon", "label"]).size().rename("n").reset_index()
+    top = top.sort_values("n", ascending=False).drop_duplicates(["cell_lat", "cell_lon"])
+    cells = cells.merge(top[["cell_lat", "cell_lon", "label"]], on=["cell_lat", "cell_lon"])
+    classes = _class_counts(df, ["cell_lat", "cell_lon"])
+
+    return [
+        {
+            "lat": round((row.cell_lat + 0.5) * grid_size, 6),
+            "lon": round((row.cell_lon + 0.5) * grid_size, 6),
+            "count": int(row.n_points),
+            "top_class": str(row.label),
+            "classes": classes[(row.cell_lat, row.cell_lon)]
+        }
+        for row in cells.sort_values("n_points", ascending=False).itertuples(index=False)
+    ]
+
+def summarize_predictions(labels, confidences, raw_df, grid_size=DEFAULT_GRID_SIZE,
+                          confidence_bins=DEFAULT_CONFIDENCE_BINS, top_k=DEFAULT_TOP_K):
+    """
+    Statistiques pré-agrégées pour le dashboard (le client ne reçoit plus chaque ligne).
+    Additionnables entre lots : le client peut envoyer un gros fichier en plusieurs requêtes et fusionner.
+    """
+    labels = np.asarray(labels, dtype=object)
+    distribution = class_distribution(labels)
+
+    summary = {
+        "total": len(labels),
+        "class_distribution": distribution,
+        "top_classes": dict(list(distribution.items())[:top_k]),
+        "confidence": confidence_histogram(confidences, n_bins=confidence_bins),
+        "by_area": [],
+        "geo_grid": []
+    }
+    if "AREA" in raw_df.columns:
+        summary["by_area"] = area_breakdown(labels, confidences, raw_df["AREA"].values)
+    if "LAT" in raw_df.columns and "LON" in raw_df.columns:
+        summary["geo_grid"] = geo_grid(raw_df["LAT"].values, raw_df["LON"].values, labels, grid_size=grid_size)
+    return summary
@@ -1,23 +1,44 @@
 import os
 import sys
-import shutil
+import json
+import hmac
 import pickle
+import shutil
+import time
+import threading
 import numpy as np
 from dotenv import load_dotenv
 import mlflow
 import dagshub
 import dagshub.auth
 import uvicorn
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field, ConfigDict
+import pandas as pd
+from fastapi import FastAPI, HTTPException, Query, Request, Depends, Header
+from fastapi.responses import Response, StreamingResponse, PlainTextResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from pydantic import BaseModel, Field, ConfigDict, model_validator
 from contextlib import asynccontextmanager
-from typing import Optional
+from typing import Optional, Dict, List, Any
 from mlflow.tracking import MlflowClient
+from mlflow.exceptions import MlflowException
 
 # Ensure we can import from backend/src
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from feature_store import CrimeFeatureStore
+import aggregation
+import wire_format
+import metrics
+import profiler
+import drift_profile
+import inference_log
+import shadow
+import model_pool
+import artifacts
+import readiness
+import warmup
+import worker_state
 
 load_dotenv()
 
@@ -35,12 +56,66 @@ REGISTERED_MODEL_NAME = "Crime_Prediction_Model"
 # Dossier temporaire pour garantir la fraîcheur des fichiers (Stateless Docker)
 LOCAL_ARTIFACTS_DIR = "/tmp/downloaded_processors"
 
+# Taille des micro-lots de /predict/stream (mémoire constante quelle que soit la taille du job)
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Monitoring du drift en service (histogrammes en mémoire vs reference_profile.json)
+DRIFT_MONITOR_ENABLED = os.getenv("DRIFT_MONITOR", "1") == "1"
+DRIFT_WINDOW_SECONDS = int(os.getenv("DRIFT_WINDOW_SECONDS", "300"))
+DRIFT_MIN_ROWS = int(os.getenv("DRIFT_MIN_ROWS", "200"))
+
+# Journal des prédictions servies (désactivé si INFERENCE_LOG_DIR n'est pas défini)
+INFERENCE_LOG_DIR = os.getenv("INFERENCE_LOG_DIR")
+INFERENCE_LOG_FORMATS = [f.strip() for f in os.getenv("INFERENCE_LOG_FORMATS", "jsonl").split(",") if f.strip()]
+INFERENCE_LOG_MAX_ROWS = int(os.getenv("INFERENCE_LOG_MAX_ROWS", str(inference_log.DEFAULT_MAX_ROWS)))
+
+# Shadow scoring : version candidate rejouée sur une fraction du trafic (désactivé si aucune n'est définie)
+# SHADOW_MODEL_VERSION (ex: "7") est prioritaire ; sinon dernière version au stage SHADOW_MODEL_STAGE (ex: "Staging")
+SHADOW_MODEL_VERSION = os.getenv("SHADOW_MODEL_VERSION")
+SHADOW_MODEL_STAGE = os.getenv("SHADOW_MODEL_STAGE")
+SHADOW_TRAFFIC_FRACTION = float(os.getenv("SHADOW_TRAFFIC_FRACTION", str(shadow.DEFAULT_FRACTION)))
+SHADOW_MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", str(shadow.DEFAULT_MAX_PENDING)))
+
+# Multi-modèles : versions supplémentaires chargées à la demande (?models=Staging,7), LRU borné
+MAX_LOADED_MODELS = int(os.getenv("MAX_LOADED_MODELS", str(model_pool.DEFAULT_MAX_LOADED)))
+# Budget mémoire du pool (0 = aucun), estimé par les octets des artefacts (modèle + processors) :
+# à dimensionner sous la limite mémoire du pod, moins le process et les workers
+MODEL_POOL_MAX_BYTES = int(float(os.getenv("MODEL_POOL_MAX_MB", "0")) * 2**20)
+MODEL_POOL_ARTIFACTS_DIR = "/tmp/model_pool"
+# Stages/alias résolus gardés ce délai (une promotion est suivie sans redémarrage), inconnus ce délai
+MODEL_ALIAS_TTL_SECONDS = float(os.getenv("MODEL_ALIAS_TTL_SECONDS", str(model_pool.DEFAULT_ALIAS_TTL_SECONDS)))
+MODEL_UNKNOWN_TTL_SECONDS = float(os.getenv("MODEL_UNKNOWN_TTL_SECONDS", str(model_pool.DEFAULT_UNKNOWN_TTL_SECONDS)))
+REGISTRY_STAGES = ("Production", "Staging", "Archived", "None")
+
+# Chargement du modèle en arrière-plan : tentatives espacées de MODEL_LOAD_BACKOFF_SECONDS x n° de tentative
+MODEL_LOAD_ATTEMPTS = int(os.getenv("MODEL_LOAD_ATTEMPTS", "3"))
+MODEL_LOAD_BACKOFF_SECONDS = float(os.getenv("MODEL_LOAD_BACKOFF_SECONDS", "20"))
+
+# Warmup avant /readyz = 200 : payloads enregistrés (WARMUP_DATA, CSV ou NDJSON ; sinon journal d'inférence)
+# + synthétiques, sur le chemin unitaire et des lots de WARMUP_BATCH_SIZES lignes, jusqu'à latence stable
+WARMUP_ENABLED = os.getenv("WARMUP", "1") == "1"
+WARMUP_DATA = os.getenv("WARMUP_DATA", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..",
+                                                     warmup.SAMPLE_FILENAME))
+WARMUP_BATCH_SIZES = [int(n) for n in os.getenv("WARMUP_BATCH_SIZES", "").split(",") if n.strip()] or \
+    list(warmup.DEFAULT_BATCH_SIZES)
+WARMUP_BUDGET_SECONDS = float(os.getenv("WARMUP_BUDGET_SECONDS", str(warmup.BUDGET_SECONDS)))
+
+# Endpoints /admin/* (profilage) : désactivés tant que ADMIN_TOKEN n'est pas défini
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
 # Global state
 ml_components = {
     "model": None, 
     "store": None, 
     "model_name": "Unknown",
-    "version": "Unknown"
+    "version": "Unknown",
+    "drift": None,
+    "inference_log": None,
+    "shadow": None,
+    "pool": None,
+    "status": readiness.LoadStatus(),  # progression du chargement (/livez, /readyz)
+    "warmup": None                     # rapport du dernier warmup
 }
 
 # ==========================================
@@ -68,11 +143,55 @@ class CrimeInput(BaseModel):
 
     model_config = ConfigDict(populate_by_name=True, extra="ignore")
 
+# Ordre fixe des champs bruts (alias) attendus par le Feature Store
+FIELD_ORDER = [field.alias for field in CrimeInput.model_fields.values()]
+# Type de chaque champ (int / float / str) : sert à typer les colonnes et au format binaire
+FIELD_KINDS = wire_format.field_kinds(CrimeInput)
+MANDATORY_FIELDS = ["DATE OCC", "TIME OCC", "AREA"]
+
 class PredictionOutput(BaseModel):
     prediction: str
     confidence: Optional[float]
     model_info: str
 
+class BatchInput(BaseModel):
+    """Lot au format colonnes : {"columns": {"DATE OCC": [...], "AREA": [...], ...}}"""
+    columns: Dict[str, List[Any]]
+
+    @model_validator(mode="after")
+    def check_schema(self):
+        missing = [c for c in MANDATORY_FIELDS if c not in self.columns]
+        if missing:
+            raise ValueError(f"Colonnes obligatoires manquantes : {missing}")
+        lengths = {len(values) for values in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("Toutes les colonnes doivent avoir la même longueur.")
+        return self
+
+    def to_frame(self):
+        return wire_format.columns_to_frame(self.columns, FIELD_KINDS)
+
+class ModelPredictions(BaseModel):
+    predictions: List[str]
+    confidences: List[Optional[float]]
+
+class BatchPredictionOutput(BaseModel):
+    predictions: List[str]
+    confidences: List[Optional[float]]
+    model_info: str
+    by_model: Optional[Dict[str, ModelPredictions]] = None
+
+class SummaryOutput(BaseModel):
+    total: int
+    class_distribution: Dict[str, int]
+    top_classes: Dict[str, int]
+    confidence: Dict[str, Any]
+    by_area: List[Dict[str, Any]]
+    geo_grid: List[Dict[str, Any]]
+    model_info: str
+    predictions: Optional[List[str]] = None
+    confidences: Optional[List[Optional[float]]] = None
+
 # ==========================================
 # HELPER FUNCTIONS (MLflow Registry)
 # ==========================================
@@ -135,36 +254,7 @@ def download_model_from_registry():
         else:
             print(f"✅ Modèle trouvé en 'Production' : Version {target_version.version}")
 
-        run_id = target_version.run_id
-        model_version = target_version.version
-        
-        # 2. Télécharger le Modèle
-        print(f"📥 Téléchargement du Modèle V{model_version}...")
-        model_uri = f"models:/{REGISTERED_MODEL_NAME}/{model_version}"
-        # On utilise pyfunc pour charger de manière générique (XGBoost, Sklearn, Catboost...)
-        model = mlflow.pyfunc.load_model(model_uri)
-
-        # 3. Télécharger les Processors (Synchronisation Drift)
-        print(f"📥 Téléchargement des Processors associés (Run {run_id})...")
-        
-        # Nettoyage du dossier temporaire
-        if os.path.exists(LOCAL_ARTIFACTS_DIR):
-            shutil.rmtree(LOCAL_ARTIFACTS_DIR)
-        
-        mlflow.artifacts.download_artifacts(
-            run_id=run_id, 
-            artifact_path="processors", 
-            dst_path=LOCAL_ARTIFACTS_DIR
-        )
-        
-        # Gestion de la structure de dossier (parfois artifacts/processors/processors...)
-        final_processors_path = os.path.join(LOCAL_ARTIFACTS_DIR, "processors")
-        if not os.path.exists(os.path.join(final_processors_path, "robust_scaler.pkl")):
-            # Si les fichiers sont directement à la racine du téléchargement
-            final_processors_path = LOCAL_ARTIFACTS_DIR
-
-        print(f"✅ Synchronisation réussie : Modèle V{model_version} + Processors.")
-        return model, f"{REGISTERED_MODEL_NAME}_v{model_version}", final_processors_path
+        return load_model_version(target_version, LOCAL_ARTIFACTS_DIR)
 
     except Exception as e:
         print(f"❌ Erreur lors du chargement MLflow : {e}")
@@ -172,52 +262,610 @@ def download_model_from_registry():
         traceback.print_exc()
         return None, None, None
 
+def load_model_version(target_version, artifacts_dir):
+    """
+    Télécharge une version du Registry ET les processors de son run. Retourne (modèle, nom, chemin processors).
+    L'appelant tient artifacts.download_lock(artifacts_dir) jusqu'à la lecture des processors : les workers
+    de serve.py partagent ce dossier, que fetch_artifacts élague (voire vide, run sans manifeste).
+    """
+    run_id = target_version.run_id
+    model_version = target_version.version
+
+    # 2. Télécharger le Modèle
+    print(f"📥 Téléchargement du Modèle V{model_version}...")
+    model_uri = f"models:/{REGISTERED_MODEL_NAME}/{model_version}"
+    # On utilise pyfunc pour charger de manière générique (XGBoost, Sklearn, Catboost...)
+    # Dans un dossier connu (à côté des processors) : sa taille sert d'estimation au budget du pool
+    model_dir = model_download_dir(artifacts_dir)
+    shutil.rmtree(model_dir, ignore_errors=True)
+    os.makedirs(model_dir)
+    model = mlflow.pyfunc.load_model(model_uri, dst_path=model_dir)
+
+    # 3. Télécharger les Processors (Synchronisation Drift)
+    # Uniquement les fichiers "serving" du manifeste (jamais preprocessed_data.pkl), en parallèle,
+    # sans retélécharger ceux déjà présents et intègres
+    print(f"📥 Téléchargement des Processors associés (Run {run_id})...")
+    final_processors_path = artifacts.fetch_artifacts(run_id, artifacts_dir, roles=("serving",))
+    
+    # Gestion de la structure de dossier (parfois artifacts/processors/processors...)
+    # (features_config.pkl : présent dans les deux modes de features, robust_scaler.pkl absent en mode natif)
+    if not os.path.exists(os.path.join(final_processors_path, "features_config.pkl")):
+        # Si les fichiers sont directement à la racine du téléchargement
+        final_processors_path = artifacts_dir
+
+    print(f"✅ Synchronisation réussie : Modèle V{model_version} + Processors.")
+    return model, f"{REGISTERED_MODEL_NAME}_v{model_version}", final_processors_path
+
+def model_download_dir(artifacts_dir):
+    # Hors de artifacts_dir : fetch_artifacts peut vider ce dossier (run sans manifeste)
+    return os.path.normpath(artifacts_dir) + "_model"
+
+def artifact_bytes(artifacts_dir, processors_path):
+    """Taille sur disque d'une version (modèle + processors) : estimation de sa place en mémoire."""
+    return model_pool.directory_bytes(model_download_dir(artifacts_dir), processors_path)
+
+def resolve_model_ref(ref):
+    """Référence du pool -> nom de version : numéro ("7"), stage ("Staging") ou alias MLflow ("champion")."""
+    client = MlflowClient()
+    try:
+        if ref.isdigit():
+            target_version = client.get_model_version(REGISTERED_MODEL_NAME, ref)
+        elif ref in REGISTRY_STAGES:
+            versions = client.get_latest_versions(REGISTERED_MODEL_NAME, stages=[ref])
+            if not versions:
+                raise LookupError(f"Aucune version en stage '{ref}'.")
+            target_version = versions[0]
+        else:
+            target_version = client.get_model_version_by_alias(REGISTERED_MODEL_NAME, ref)
+    except MlflowException as e:
+        raise LookupError(f"Modèle inconnu : {ref} ({e.message})")
+    return f"{REGISTERED_MODEL_NAME}_v{target_version.version}"
+
+def load_registered_model(name):
+    """Loader du pool : une version (et ses processors) dans son propre dossier. Retourne (modèle, chemin)."""
+    target_version = MlflowClient().get_model_version(REGISTERED_MODEL_NAME, name.rsplit("_v", 1)[-1])
+    model, _, processors_path = load_model_version(target_version, pool_artifacts_dir(name))
+    return model, processors_path
+
+def pool_download_lock(name):
+    """Garde du pool : verrou du dossier d'une version, tenu du téléchargement à la lecture des processors."""
+    return artifacts.download_lock(pool_artifacts_dir(name))
+
+def pool_artifacts_dir(name):
+    return os.path.join(MODEL_POOL_ARTIFACTS_DIR, f"v{name.rsplit('_v', 1)[-1]}")
+
+def pool_model_bytes(name, model, processors_path):
+    """Sizer du pool : octets sur disque de la version chargée par load_registered_model."""
+    return artifact_bytes(pool_artifacts_dir(name), processors_path)
+
+ml_components["pool"] = model_pool.ModelPool(resolve_model_ref, load_registered_model, max_loaded=MAX_LOADED_MODELS,
+                                             max_bytes=MODEL_POOL_MAX_BYTES, sizer=pool_model_bytes,
+                                             guard=pool_download_lock, alias_ttl=MODEL_ALIAS_TTL_SECONDS,
+                                             unknown_ttl=MODEL_UNKNOWN_TTL_SECONDS)
+
+# ==========================================
+# HELPER FUNCTIONS (Scoring)
+# ==========================================
+
+def unwrap_model(model):
+    """Retourne l'objet natif (Sklearn/XGBoost...) caché derrière le wrapper PyFunc."""
+    raw_model = model
+
+    # Si c'est un wrapper PyFunc générique
+    if hasattr(model, "unwrap_python_model"):
+        try:
+            raw_model = model.unwrap_python_model()
+        except Exception:
+            pass # Ce n'était pas un PythonModel, on continue
+
+    # Si c'est un wrapper Flavor natif (XGBoost/Sklearn)
+    if hasattr(model, "_model_impl"):
+        raw_model = model._model_impl
+    return raw_model
+
+def score_matrix(model, X_input, timings=None):
+    """
+    Prédit les classes ET la confiance (probabilité max) pour une matrice de features.
+    Retourne deux tableaux numpy de même longueur.
+    timings (dict optionnel) : reçoit la durée de predict seul, en secondes.
+    """
+    start = time.perf_counter()
+    with metrics.stage("predict"):
+        prediction_result = model.predict(X_input)
+    if timings is not None:
+        timings["predict"] = time.perf_counter() - start
+    pred_indices = np.asarray(prediction_result).reshape(-1)
+
+    confidences = np.zeros(len(pred_indices))
+    try:
+        raw_model = unwrap_model(model)
+        if hasattr(raw_model, "predict_proba"):
+            with metrics.stage("predict_proba"):
+                confidences = np.max(raw_model.predict_proba(X_input), axis=1)
+        else:
+            # Certains modèles XGBoost natifs n'ont pas predict_proba
+            print("⚠️ Pas de méthode predict_proba trouvée sur le modèle interne.")
+    except Exception as e:
+        print(f"⚠️ Erreur calcul confiance : {e}")
+    return pred_indices, confidences
+
+def featurize(raw_df, timings=None):
+    """
+    Features non scalées -> moniteur de drift -> matrice scalée pour le modèle. Retourne (features, X).
+    timings (dict optionnel) : reçoit la durée des features seules (hors moniteur de drift), en secondes.
+    """
+    store = ml_components["store"]
+    start = time.perf_counter()
+    features = store.build_feature_frame(raw_df)
+    built = time.perf_counter()
+    monitor = ml_components["drift"]
+    if monitor is not None:
+        with metrics.stage("drift_update"):
+            monitor.update(features)
+    scale_start = time.perf_counter()
+    X_input = store.scale_features(features)
+    if timings is not None:
+        timings["features"] = (built - start) + (time.perf_counter() - scale_start)
+    return features, X_input
+
+def featurize_row(record, timings=None):
+    """Comme featurize, pour une seule ligne : exécuteur ligne du Feature Store (FeaturePlan.run_row)."""
+    store = ml_components["store"]
+    start = time.perf_counter()
+    features = store.build_feature_row(record)
+    built = time.perf_counter()
+    monitor = ml_components["drift"]
+    if monitor is not None:
+        with metrics.stage("drift_update"):
+            monitor.update(features)
+    scale_start = time.perf_counter()
+    X_input = store.scale_features(features)
+    if timings is not None:
+        timings["features"] = (built - start) + (time.perf_counter() - scale_start)
+    return features, X_input
+
+def score_frame(raw_df, endpoint="batch", row=None):
+    """
+    Features + prédiction + décodage. Retourne (labels, confiances).
+    raw_df : lot brut (exécuteur vectorisé) ; row : une seule ligne (dict, /predict) passée à l'exécuteur
+    ligne, le lot brut d'une ligne n'étant construit que pour le journal d'inférence et le shadow.
+    """
+    metrics.BATCH_SIZE.labels(endpoint=endpoint).observe(1 if row is not None else len(raw_df))
+    store = ml_components["store"]
+    timings = {}
+    start = time.perf_counter()
+    with profiler.request_profile():
+        if row is not None:
+            features, X_input = featurize_row(row, timings)
+        else:
+            features, X_input = featurize(raw_df, timings)
+        pred_indices, confidences = score_matrix(ml_components["model"], X_input, timings)
+        decode_start = time.perf_counter()
+        with metrics.stage("decode_target"):
+            labels = [str(label) for label in store.decode_targets(pred_indices)]
+        timings["decode"] = time.perf_counter() - decode_start
+    confidences = confidences.astype(float)
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    logger = ml_components["inference_log"]
+    scorer = ml_components["shadow"]
+    if raw_df is None and (logger is not None or scorer is not None):
+        raw_df = pd.DataFrame([row])
+    if logger is not None:
+        logger.log(endpoint, ml_components["model_name"], ml_components["version"],
+                   latency_ms, raw_df, features, labels, confidences)
+
+    if scorer is not None:
+        # Mêmes étapes que le candidat (features + predict + décodage) : sans predict_proba ni drift
+        scorer.maybe_submit(raw_df, labels, sum(timings.values()) * 1000)
+    return labels, confidences
+
+def score_with_models(raw_df, refs, endpoint="batch"):
+    """
+    Score un lot avec plusieurs modèles du pool ; une seule featurisation par fingerprint de processors.
+    Le Feature Store principal passe par featurize() (moniteur de drift). Retourne {nom: (labels, confiances)}.
+    """
+    served = [ml_components["pool"].get(ref) for ref in refs]
+    metrics.BATCH_SIZE.labels(endpoint=endpoint).observe(len(raw_df))
+    computed = {}
+    results = {}
+    with profiler.request_profile():
+        for entry in served:
+            if entry.fingerprint not in computed:
+                if entry.store is ml_components["store"]:
+                    computed[entry.fingerprint] = featurize(raw_df)
+                else:
+                    features = entry.store.build_feature_frame(raw_df)
+                    computed[entry.fingerprint] = (features, entry.store.scale_features(features))
+            features, X_input = computed[entry.fingerprint]
+            start = time.perf_counter()
+            pred_indices, confidences = score_matrix(entry.model, X_input)
+            with metrics.stage("decode_target"):
+                labels = [str(label) for label in entry.store.decode_targets(pred_indices)]
+            results[entry.name] = (labels, confidences.astype(float))
+
+            logger = ml_components["inference_log"]
+            if logger is not None:
+                logger.log(endpoint, entry.name, entry.version, (time.perf_counter() - start) * 1000,
+                           raw_df, features, labels, results[entry.name][1])
+    return results
+
+def register_components(model, model_name, store):
+    """Publie le modèle et le Feature Store dans l'état global (+ instrumentation)."""
+    ml_components["model"] = model
+    ml_components["model_name"] = model_name or "Unknown"
+    ml_components["version"] = model_name.rsplit("_v", 1)[-1] if model_name and "_v" in model_name else "Unknown"
+    if store is not None:
+        attach_store(store)
+        ml_components["pool"].set_primary(ml_components["model_name"], model, store,
+                                          size_bytes=artifact_bytes(LOCAL_ARTIFACTS_DIR, store.processors_path))
+    metrics.set_model_info(ml_components["model_name"], ml_components["version"])
+
+def attach_store(store):
+    """Branche l'instrumentation sur le Feature Store et démarre le moniteur de drift (si profil présent)."""
+    store.observer = metrics.FEATURE_STORE_OBSERVER
+    ml_components["store"] = store
+    profile = store.artifacts.get("reference_profile")
+    ml_components["drift"] = None
+    if DRIFT_MONITOR_ENABLED and profile is not None:
+        ml_components["drift"] = drift_profile.DriftMonitor(
+            profile, window_seconds=DRIFT_WINDOW_SECONDS, min_rows=DRIFT_MIN_ROWS,
+            on_evaluate=metrics.set_drift_scores
+        )
+
+def start_shadow(ref):
+    """Épingle le candidat dans le pool et démarre le shadow scoring (même version que la Production : ignoré)."""
+    entry = ml_components["pool"].pin(ref)
+    if entry.name == ml_components["model_name"]:
+        entry.pinned = False
+        print(f"⚠️ Shadow : {entry.name} est déjà servi en Production, shadow désactivé.")
+        return
+    ml_components["shadow"] = shadow.ShadowScorer(
+        entry.model, entry.store, entry.name, fraction=SHADOW_TRAFFIC_FRACTION, max_pending=SHADOW_MAX_PENDING
+    )
+    print(f"👥 Shadow : {entry.name} sur {SHADOW_TRAFFIC_FRACTION:.0%} du trafic.")
+
+# ==========================================
+# NÉGOCIATION DE CONTENU (JSON / msgpack)
+# ==========================================
+
+async def read_batch_frame(request: Request):
+    """
+    Dépendance FastAPI : lit le corps d'un lot et le convertit en DataFrame typé.
+    - application/json (défaut) : {"columns": {...}} validé par BatchInput
+    - application/x-msgpack : colonnes dans l'ordre FIELD_ORDER, décodées directement en tableaux NumPy
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", wire_format.JSON_MEDIA_TYPE)
+    try:
+        with metrics.stage("validation"):
+            return _decode_batch_body(body, content_type)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+def _decode_batch_body(body, content_type):
+    if wire_format.is_msgpack(content_type):
+        if wire_format.msgpack is None:
+            raise HTTPException(status_code=415, detail="msgpack non disponible sur ce serveur.")
+        raw_df = wire_format.decode_msgpack_columns(body, FIELD_KINDS)
+        missing = [c for c in MANDATORY_FIELDS if c not in raw_df.columns]
+        if missing:
+            raise ValueError(f"Colonnes obligatoires manquantes : {missing}")
+        return raw_df
+    return BatchInput.model_validate_json(body).to_frame()
+
+def batch_response(request, labels, confidences, model_info=None, by_model=None):
+    """
+    Réponse /predict/batch au format demandé par l'en-tête Accept (JSON par défaut).
+    by_model : {version: (labels, confiances)} pour ?models=.
+    """
+    model_info = model_info or ml_components["model_name"]
+    if wire_format.wants_msgpack(request.headers.get("accept")) and wire_format.msgpack is not None:
+        body = wire_format.encode_msgpack_predictions(labels, confidences, model_info, by_model)
+        return Response(content=body, media_type=wire_format.MSGPACK_MEDIA_TYPE)
+    response = {
+        "predictions": list(labels),
+        "confidences": np.asarray(confidences, dtype=float).tolist(),
+        "model_info": model_info
+    }
+    if by_model is not None:
+        response["by_model"] = {
+            name: {"predictions": list(model_labels), "confidences": np.asarray(model_confidences, dtype=float).tolist()}
+            for name, (model_labels, model_confidences) in by_model.items()
+        }
+    return response
+
+# ==========================================
+# STREAMING NDJSON
+# ==========================================
+
+async def iter_ndjson_lines(request):
+    """Découpe le flux du corps de requête en lignes, au fil de l'arrivée des chunks."""
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if pending.strip():
+        yield pending
+
+def score_records(items):
+    """
+    Score un micro-lot [(numéro de ligne, record)] et renvoie les lignes NDJSON de sortie.
+    Si le lot échoue (ex: une valeur invalide), on rescore ligne par ligne pour isoler l'erreur.
+    """
+    def result_line(line_no, record, payload):
+        payload = {"line": line_no, **payload}
+        if "id" in record:
+            payload["id"] = record["id"]
+        return json.dumps(payload, ensure_ascii=False)
+
+    try:
+        columns = {alias: [record.get(alias) for _, record in items] for alias in FIELD_ORDER}
+        labels, confidences = score_frame(wire_format.columns_to_frame(columns, FIELD_KINDS), endpoint="stream")
+        return [
+            result_line(line_no, record, {"prediction": label, "confidence": float(conf)})
+            for (line_no, record), label, conf in zip(items, labels, confidences)
+        ]
+    except Exception as e:
+        if len(items) == 1:
+            line_no, record = items[0]
+            return [result_line(line_no, record, {"error": str(e)})]
+        return [line for item in items for line in score_records([item])]
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse qui lit le corps de la requête PENDANT l'envoi de la réponse.
+    La version Starlette écoute la déconnexion sur le même canal `receive` que request.stream(),
+    ce qui bloque la lecture du corps ; ici la déconnexion remonte via request.stream() (ClientDisconnect).
+    """
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+async def stream_predictions(request):
+    """Générateur de la réponse : chaque micro-lot est renvoyé dès qu'il est scoré."""
+    batch = []
+    line_no = 0
+    async for line in iter_ndjson_lines(request):
+        line_no += 1
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("chaque ligne doit être un objet JSON")
+            missing = [c for c in MANDATORY_FIELDS if record.get(c) is None]
+            if missing:
+                raise ValueError(f"champs obligatoires manquants : {missing}")
+        except ValueError as e:
+            yield json.dumps({"line": line_no, "error": f"Ligne invalide : {e}"}, ensure_ascii=False) + "\n"
+            continue
+
+        batch.append((line_no, record))
+        if len(batch) >= STREAM_BATCH_SIZE:
+            lines = await run_in_threadpool(score_records, batch)
+            batch = []
+            yield "\n".join(lines) + "\n"
+
+    if batch:
+        lines = await run_in_threadpool(score_records, batch)
+        yield "\n".join(lines) + "\n"
+
 # ==========================================
 # LIFECYCLE MANAGER (STARTUP)
 # ==========================================
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    print("⚙️ Démarrage de l'API...")
-    
+def load_components():
+    """
+    Chargement lourd : modèle du Registry, Feature Store, candidat shadow (épinglé dans le pool).
+    Exécuté en arrière-plan par le lifespan (l'API répond à /livez pendant ce temps), ou une seule fois par
+    le process maître de serve.py avant le fork des workers (qui partagent alors ces objets en copy-on-write).
+    Chaque étape est publiée dans ml_components["status"] ; retourne True si le modèle est chargé
+    (état WARMING : le warmup, qui prédit, se fait ensuite dans chaque worker, jamais avant un fork).
+    """
+    status = ml_components["status"]
+    status.enter(readiness.CONNECTING)
     setup_mlflow()
     
     # CHARGEMENT DYNAMIQUE DEPUIS LE REGISTRY
-    model, name, processors_path = download_model_from_registry()
-    
+    # Verrou du dossier partagé (workers qui rechargent après un échec du maître) : téléchargement ET lecture
+    with artifacts.download_lock(LOCAL_ARTIFACTS_DIR):
+        status.enter(readiness.DOWNLOADING, REGISTERED_MODEL_NAME)
+        model, name, processors_path = download_model_from_registry()
+
+        if model and processors_path:
+            register_components(model, name, None)
+
+            print(f"📦 Initialisation du Feature Store avec les processors téléchargés...")
+            status.enter(readiness.LOADING_FEATURES, name)
+            try:
+                store = CrimeFeatureStore(processors_path=processors_path)
+                store.load_artifacts()
+                register_components(model, name, store)
+                print("🚀 API PRÊTE et SYNCHRONISÉE.")
+            except Exception as e:
+                print(f"❌ Erreur critique Feature Store : {e}")
+                status.fail(f"Feature Store : {e}")
+                return False
+
     if model and processors_path:
-        ml_components["model"] = model
-        ml_components["model_name"] = name
-        
-        print(f"📦 Initialisation du Feature Store avec les processors téléchargés...")
+        if SHADOW_MODEL_VERSION or SHADOW_MODEL_STAGE:
+            try:
+                ml_components["pool"].pin(SHADOW_MODEL_VERSION or SHADOW_MODEL_STAGE)
+            except Exception as e:
+                print(f"⚠️ Shadow : chargement du candidat impossible ({e})")
+        status.enter(readiness.WARMING, name)
+        return True
+
+    print("⚠️ ECHEC MLFLOW : Tentative de fallback sur fichiers locaux...")
+    # Fallback local (si internet coupé ou erreur DagsHub) : le drift reste suivi, mais sans modèle l'API n'est pas prête
+    if os.path.exists("processors"):
+         print("⚠️ Utilisation des processors locaux (Risque de version mismatch).")
+         store = CrimeFeatureStore(processors_path="processors")
+         store.load_artifacts()
+         attach_store(store)
+    else:
+        print("❌ Aucun processeur disponible. L'API ne pourra pas prédire.")
+    status.fail("Aucun modèle chargé depuis le Registry")
+    return False
+
+def start_configured_shadow():
+    if SHADOW_MODEL_VERSION or SHADOW_MODEL_STAGE:
+        try:
+            start_shadow(SHADOW_MODEL_VERSION or SHADOW_MODEL_STAGE)
+        except Exception as e:
+            print(f"⚠️ Shadow : chargement du candidat impossible ({e})")
+
+def load_with_retries():
+    """
+    MODEL_LOAD_ATTEMPTS tentatives espacées (Registry indisponible au démarrage du pod).
+    Appelé par le maître de serve.py AVANT le fork : les workers ne retéléchargent que s'il a tout épuisé.
+    Retourne True si le modèle est chargé (état WARMING).
+    """
+    status = ml_components["status"]
+    for attempt in range(1, MODEL_LOAD_ATTEMPTS + 1):
+        status.attempts = attempt
+        try:
+            if load_components():
+                return True
+        except Exception as e:
+            print(f"❌ Chargement du modèle (tentative {attempt}/{MODEL_LOAD_ATTEMPTS}) : {e}")
+            status.fail(e)
+        if attempt < MODEL_LOAD_ATTEMPTS:
+            time.sleep(MODEL_LOAD_BACKOFF_SECONDS * attempt)
+    print(f"❌ Modèle non chargé après {MODEL_LOAD_ATTEMPTS} tentatives : /readyz restera en 503.")
+    return False
+
+def load_in_background():
+    """Thread de chargement : tentatives de chargement (sauf préchargement par le maître) puis warmup."""
+    # WARMING dès le départ : modèle préchargé par le maître de serve.py
+    if ml_components["status"].state == readiness.WARMING or load_with_retries():
+        warm_up()
+        start_configured_shadow()
+
+def score_quietly(raw_df):
+    """Chemin de scoring complet, sans drift, journal ni shadow : le warmup ne pollue pas la télémétrie."""
+    store = ml_components["store"]
+    X_input = store.scale_features(store.build_feature_frame(raw_df))
+    pred_indices, _ = score_matrix(ml_components["model"], X_input)
+    return store.decode_targets(pred_indices)
+
+def warmup_single(record):
+    """Comme /predict : validation Pydantic puis exécuteur ligne du Feature Store."""
+    store = ml_components["store"]
+    X_input = store.get_online_features(CrimeInput.model_validate(record).model_dump(by_alias=True))
+    pred_indices, _ = score_matrix(ml_components["model"], X_input)
+    return store.decode_targets(pred_indices)
+
+def warmup_batch(records):
+    """Comme /predict/batch : format colonnes validé puis DataFrame typé."""
+    columns = {field: [record.get(field) for record in records] for field in FIELD_ORDER}
+    return score_quietly(BatchInput(columns=columns).to_frame())
+
+def warm_up():
+    """
+    Warmup jusqu'à latence stable puis READY (un warmup en échec n'empêche pas de servir : il est signalé).
+    Sous serve.py, fait dans chaque worker après le fork (prédire dans le maître n'est pas fork-safe) :
+    le rapport est publié avec l'état READY, et le /readyz du pod attend le warmup de tous les workers.
+    """
+    status = ml_components["status"]
+    if WARMUP_ENABLED:
+        if status.state != readiness.WARMING:
+            status.enter(readiness.WARMING, ml_components["model_name"])
+        token = metrics.STAGES_MUTED.set(True)
         try:
-            store = CrimeFeatureStore(processors_path=processors_path)
-            store.load_artifacts()
-            ml_components["store"] = store
-            print("🚀 API PRÊTE et SYNCHRONISÉE.")
+            recorded, source = warmup.recorded_records(FIELD_ORDER, WARMUP_DATA, INFERENCE_LOG_DIR)
+            synthetic = max(warmup.SYNTHETIC_RECORDS, warmup.DEFAULT_RECORDS - len(recorded))
+            records = recorded + warmup.synthetic_records(synthetic)
+            report = warmup.run_warmup(warmup_single, warmup_batch, records, batch_sizes=WARMUP_BATCH_SIZES,
+                                       budget_seconds=WARMUP_BUDGET_SECONDS)
+            report.update(recorded=len(recorded), synthetic=len(records) - len(recorded), source=source)
+            metrics.set_warmup_report(report)
+            print(f"🔥 Warmup : {report['rounds']} tours en {report['seconds']}s "
+                  f"({'latence stable' if report['steady'] else 'budget atteint'}) ; "
+                  f"single {report['cold_ms']['single']:.1f} -> {report['steady_ms']['single']:.1f} ms")
         except Exception as e:
-            print(f"❌ Erreur critique Feature Store : {e}")
+            print(f"⚠️ Warmup en échec ({e}) : API servie sans warmup.")
+            report = {"steady": False, "error": str(e)}
+        finally:
+            metrics.STAGES_MUTED.reset(token)
+        ml_components["warmup"] = report
+    status.enter(readiness.READY, ml_components["model_name"])
+
+def worker_readiness():
+    """État de chargement du process courant (warmup compris), tel que publié pour le /readyz agrégé."""
+    status = ml_components["status"]
+    return dict(status.snapshot(), ready=status.ready and ml_components["model"] is not None,
+                model=ml_components["model_name"], warmup=ml_components["warmup"])
+
+def publish_readiness():
+    """Worker de serve.py : son état rejoint le dossier partagé, lu par le /readyz de n'importe quel worker."""
+    if worker_state.enabled():
+        worker_state.publish_status(worker_readiness())
+
+def publish_worker_views():
+    """Worker de serve.py : fenêtre de drift et compteurs shadow publiés pour /drift et /shadow du pod."""
+    if not worker_state.enabled():
+        return
+    if ml_components["drift"] is not None:
+        worker_state.publish_view("drift", ml_components["drift"].snapshot())
+    if ml_components["shadow"] is not None:
+        worker_state.publish_view("shadow", ml_components["shadow"].snapshot())
+
+def ensure_ready():
+    """503 + Retry-After tant que le modèle n'est pas chargé (le load balancer réessaie sur un autre pod)."""
+    status = ml_components["status"]
+    if not status.ready or ml_components["model"] is None:
+        raise HTTPException(
+            status_code=503, detail=f"Model not ready ({status.state}).",
+            headers={"Retry-After": str(readiness.RETRY_AFTER_SECONDS)}
+        )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print(f"⚙️ Démarrage de l'API (pid {os.getpid()})...")
+
+    # Threads (journal, shadow, vues du worker) : propres à chaque process, jamais créés avant un fork
+    views_publisher = worker_state.start_publisher(publish_worker_views)
+    if INFERENCE_LOG_DIR:
+        ml_components["inference_log"] = inference_log.InferenceLogger(
+            INFERENCE_LOG_DIR, FIELD_KINDS, formats=INFERENCE_LOG_FORMATS, max_rows=INFERENCE_LOG_MAX_ROWS
+        ).start()
+        print(f"📝 Journal d'inférence : {INFERENCE_LOG_DIR} ({', '.join(INFERENCE_LOG_FORMATS)})")
+
+    # Chaque étape (et l'état hérité du maître) est publiée pour le /readyz du pod
+    ml_components["status"].on_change = publish_readiness
+    publish_readiness()
+    if ml_components["status"].ready:
+        # Préchargé par le maître de serve.py : seul le shadow (thread) reste à démarrer
+        start_configured_shadow()
     else:
-        print("⚠️ ECHEC MLFLOW : Tentative de fallback sur fichiers locaux...")
-        # Fallback local (si internet coupé ou erreur DagsHub)
-        if os.path.exists("processors"):
-             print("⚠️ Utilisation des processors locaux (Risque de version mismatch).")
-             store = CrimeFeatureStore(processors_path="processors")
-             store.load_artifacts()
-             ml_components["store"] = store
-        else:
-            print("❌ Aucun processeur disponible. L'API ne pourra pas prédire.")
+        threading.Thread(target=load_in_background, name="model-loader", daemon=True).start()
 
     yield
+    if ml_components["inference_log"] is not None:
+        ml_components["inference_log"].close()
+    if ml_components["shadow"] is not None:
+        ml_components["shadow"].close()
+    if views_publisher is not None:
+        views_publisher.set()
     print("🛑 Arrêt de l'API.")
 
 # ==========================================
 # FASTAPI APP
 # ==========================================
 app = FastAPI(title="Crime API", lifespan=lifespan)
+app.add_middleware(metrics.PrometheusMiddleware)
+app.add_middleware(profiler.ServerTimingMiddleware)
 
 @app.get("/")
 def root():
-    status = "Ready" if ml_components["model"] else "Not Ready"
+    status = "Ready" if ml_components["status"].ready else "Not Ready"
     return {
         "message": "Crime Prediction API", 
         "status": status, 
@@ -230,64 +878,55 @@ def health():
         return {"status": "unhealthy", "reason": "Model not loaded"}
     return {"status": "healthy", "model": ml_components["model_name"]}
 
+@app.get("/livez")
+def livez():
+    """Liveness : le process répond (même pendant le chargement du modèle, qui se fait en arrière-plan)."""
+    return {"status": "alive", "state": ml_components["status"].state}
+
+@app.get("/readyz")
+def readyz():
+    """
+    Readiness : 200 une fois le modèle et le Feature Store chargés, sinon 503 + progression du chargement.
+    Sous serve.py : 200 seulement si TOUS les workers vivants sont prêts (la sonde n'atteint qu'un worker).
+    """
+    snapshot = ml_components["status"].snapshot()
+    ready = ml_components["status"].ready and ml_components["model"] is not None
+    if worker_state.enabled():
+        publish_readiness()
+        workers = worker_state.worker_statuses()
+        # Liste vide : le maître n'a pas encore publié ses workers, le pod n'est pas prêt
+        ready = ready and bool(workers) and all(w is not None and w["ready"] for w in workers.values())
+        snapshot["workers"] = {str(pid): w or {"state": readiness.STARTING, "ready": False}
+                               for pid, w in workers.items()}
+    if ready:
+        return dict(snapshot, model=ml_components["model_name"], warmup=ml_components["warmup"])
+    return JSONResponse(snapshot, status_code=503, headers={"Retry-After": str(readiness.RETRY_AFTER_SECONDS)})
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """
+    Métriques au format texte Prometheus (latences par étape, requêtes, tailles de lot, caches, modèle).
+    Sous serve.py : agrégées sur tous les workers du pod, quel que soit celui qui répond au scrape.
+    """
+    return PlainTextResponse(metrics.render(), media_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
 @app.post("/predict", response_model=PredictionOutput)
-def predict(payload: CrimeInput):
-    if not ml_components["model"]:
-        raise HTTPException(status_code=503, detail="Model not initialized.")
+def predict(payload: CrimeInput, request: Request):
+    # Depuis l'entrée du middleware : lecture du corps + validation Pydantic
+    start_time = getattr(request.state, "start_time", None)
+    if start_time is not None:
+        metrics.observe_stage("validation", time.perf_counter() - start_time)
+
+    ensure_ready()
     
     try:
-        # 1. Préparation
-        data = payload.model_dump(by_alias=True)
-        store = ml_components["store"]
-        X_input = store.get_online_features(data)
-        
-        # 2. Prédiction (Classe)
-        model = ml_components["model"]
-        prediction_result = model.predict(X_input)
-        
-        if isinstance(prediction_result, (list, np.ndarray)):
-            pred_idx = prediction_result[0]
-        else:
-            pred_idx = prediction_result
+        # Exécuteur ligne du Feature Store (pas de DataFrame brut), puis mêmes étapes que les lots
+        # (drift, prédiction + confiance, décodage, journal, shadow)
+        labels, confidences = score_frame(None, endpoint="single", row=payload.model_dump(by_alias=True))
 
-        # 3. Décodage
-        pred_label = store.decode_target(pred_idx)
-        
-        # 4. Confiance (Probabilité) - VERSION ROBUSTE
-        confidence = 0.0
-        try:
-            # On tente d'accéder à l'objet sous-jacent (Sklearn/XGBoost natif)
-            raw_model = model
-            
-            # Si c'est un wrapper PyFunc générique
-            if hasattr(model, "unwrap_python_model"):
-                try:
-                    raw_model = model.unwrap_python_model()
-                except:
-                    pass # Ce n'était pas un PythonModel, on continue
-            
-            # Si c'est un wrapper Flavor natif (XGBoost/Sklearn)
-            if hasattr(model, "_model_impl"):
-                raw_model = model._model_impl
-            
-            # Maintenant on cherche predict_proba sur le vrai objet
-            if hasattr(raw_model, "predict_proba"):
-                probs = raw_model.predict_proba(X_input)[0]
-                confidence = float(np.max(probs))
-            else:
-                # Fallback : certains modèles XGBoost natifs n'ont pas predict_proba mais predict renvoie des probas
-                # si l'objectif était multi:softprob. Mais ici on a déjà la classe en résultat, 
-                # donc on suppose que predict_proba est la voie.
-                print("⚠️ Pas de méthode predict_proba trouvée sur le modèle interne.")
-                confidence = 0.0
-                
-        except Exception as e:
-            print(f"⚠️ Erreur calcul confiance : {e}")
-            confidence = 0.0
-            
         return {
-            "prediction": str(pred_label),
-            "confidence": confidence,
+            "prediction": labels[0],
+            "confidence": float(confidences[0]),
             "model_info": ml_components["model_name"]
         }
 
@@ -296,6 +935,149 @@ def predict(payload: CrimeInput):
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
-    
+
+@app.post("/predict/batch", response_model=BatchPredictionOutput, response_model_exclude_none=True)
+def predict_batch(request: Request, raw_df: pd.DataFrame = Depends(read_batch_frame),
+                  models: Optional[str] = Query(None, description="Versions à scorer, ex: Production,Staging,7")):
+    """
+    Prédictions en masse : un seul passage vectorisé dans le Feature Store et le modèle.
+    `models` : le lot est scoré par chaque version (features partagées si processors identiques) ;
+    la réponse principale est celle de la première, le détail par version est dans `by_model`.
+    """
+    ensure_ready()
+
+    refs = [ref.strip() for ref in models.split(",") if ref.strip()] if models else []
+    try:
+        if raw_df.empty:
+            return batch_response(request, [], [])
+        if not refs:
+            labels, confidences = score_frame(raw_df, endpoint="batch")
+            return batch_response(request, labels, confidences)
+
+        results = score_with_models(raw_df, refs, endpoint="batch")
+        first = next(iter(results))
+        return batch_response(request, *results[first], model_info=first, by_model=results)
+
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    except Exception as e:
+        print(f"Batch Prediction Error: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/predict/summary", response_model=SummaryOutput, response_model_exclude_none=True)
+def predict_summary(request: Request,
+                    raw_df: pd.DataFrame = Depends(read_batch_frame),
+                    grid_size: float = Query(aggregation.DEFAULT_GRID_SIZE, gt=0),
+                    confidence_bins: int = Query(aggregation.DEFAULT_CONFIDENCE_BINS, ge=1, le=100),
+                    include_predictions: bool = False):
+    """
+    Score un lot et renvoie directement les statistiques du dashboard
+    (distribution des classes, histogramme de confiance, détail par AREA, grille LAT/LON).
+    """
+    ensure_ready()
+
+    try:
+        labels, confidences = score_frame(raw_df, endpoint="summary") if not raw_df.empty else ([], np.array([]))
+
+        summary = aggregation.summarize_predictions(
+            labels, confidences, raw_df, grid_size=grid_size, confidence_bins=confidence_bins
+        )
+        summary["model_info"] = ml_components["model_name"]
+        if include_predictions:
+            summary["predictions"] = labels
+            summary["confidences"] = confidences.tolist()
+        if wire_format.wants_msgpack(request.headers.get("accept")) and wire_format.msgpack is not None:
+            return Response(content=wire_format.encode_msgpack(summary), media_type=wire_format.MSGPACK_MEDIA_TYPE)
+        return summary
+
+    except Exception as e:
+        print(f"Summary Error: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request):
+    """
+    Prédictions en flux : le corps est un NDJSON (un incident par ligne, même format que /predict).
+    Les lignes sont scorées par micro-lots de STREAM_BATCH_SIZE et renvoyées en NDJSON au fur et à mesure :
+    {"line": 1, "prediction": "...", "confidence": 0.93} ou {"line": 2, "error": "..."}.
+    """
+    ensure_ready()
+    return BodyStreamingResponse(stream_predictions(request), media_type=NDJSON_MEDIA_TYPE)
+
+@app.get("/drift")
+def drift_status(evaluate: bool = False):
+    """
+    Drift des features servies vs le profil de référence de l'entraînement (PSI / KS par feature).
+    `evaluate=true` score immédiatement la fenêtre en cours (sans la remettre à zéro).
+    Sous serve.py : fenêtres courantes de tous les workers additionnées et scorées ensemble.
+    """
+    monitor = ml_components["drift"]
+    if monitor is None:
+        return {"enabled": False, "reason": "Drift monitor disabled or reference_profile.json missing."}
+    if evaluate:
+        monitor.evaluate()
+    if worker_state.enabled():
+        publish_worker_views()
+        views = worker_state.worker_views("drift")
+        views.setdefault(os.getpid(), monitor.snapshot())   # pas encore dans la liste du maître
+        return dict(monitor.pod_status(views), enabled=True)
+    return dict(monitor.status(), enabled=True)
+
+@app.get("/models")
+def loaded_models():
+    """Versions chargées dans le pool (ordre LRU, plus récente d'abord), Feature Stores partagés, alias résolus."""
+    return ml_components["pool"].status()
+
+@app.get("/shadow")
+def shadow_status():
+    """
+    Modèle candidat rejoué en shadow : taux d'accord avec la Production, latences (p50/p95/p99), désaccords.
+    Sous serve.py : compteurs de tous les workers vivants additionnés (`workers` : nombre agrégé).
+    """
+    scorer = ml_components["shadow"]
+    if scorer is None:
+        return {"enabled": False, "reason": "No shadow model configured (SHADOW_MODEL_VERSION / SHADOW_MODEL_STAGE)."}
+    if worker_state.enabled():
+        publish_worker_views()
+        views = worker_state.worker_views("shadow")
+        views.setdefault(os.getpid(), scorer.snapshot())
+        snapshots = list(views.values())
+        return dict(shadow.status_from_snapshots(snapshots), enabled=True, production=ml_components["model_name"],
+                    workers=len(snapshots))
+    return dict(scorer.status(), enabled=True, production=ml_components["model_name"])
+
+# ==========================================
+# ADMIN : PROFILAGE À LA DEMANDE
+# ==========================================
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints disabled (ADMIN_TOKEN not set).")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def admin_profile(seconds: float = Query(10.0, gt=0, le=profiler.MAX_PROFILE_SECONDS),
+                        interval_ms: float = Query(profiler.DEFAULT_INTERVAL * 1000, ge=1, le=1000)):
+    """
+    Échantillonne tous les threads du worker pendant `seconds` secondes (trafic réel).
+    Sortie au format "collapsed" : `flamegraph.pl profile.txt > flame.svg` ou import dans speedscope.
+    """
+    counts, samples = await run_in_threadpool(profiler.profile_process, seconds, interval_ms / 1000)
+    return PlainTextResponse(profiler.format_collapsed(counts), headers={"X-Profile-Samples": str(samples)})
+
+@app.get("/admin/profile/requests", dependencies=[Depends(require_admin)])
+def admin_request_profile(reset: bool = False):
+    """Profil cumulé des requêtes échantillonnées (une sur PROFILE_EVERY_N), au format "collapsed"."""
+    body = profiler.format_collapsed(profiler.REQUEST_PROFILE)
+    if reset:
+        profiler.REQUEST_PROFILE.clear()
+    return PlainTextResponse(body)
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=5000)
\ No newline at end of file
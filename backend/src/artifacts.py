@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou (un seul process API en développement)
+    fcntl = None
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+ARTIFACT_PATH = "processors"
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 2
+
+# Rôle de chaque fichier du dossier processors/ :
+# - serving : ce que le Feature Store charge (+ profil de drift, ordre des features)
+# - data    : matrices train/test pré-traitées (entraînement, monitoring Evidently)
+# - training: le reste (ne sert ni à l'API ni au monitoring)
+FILE_ROLES = {
+    "feature_label_encoders.pkl": "serving",
+    "robust_scaler.pkl": "serving",
+    "target_label_encoder.pkl": "serving",
+    "features_config.pkl": "serving",
+    "reference_profile.json": "serving",
+    "preprocessed_data.pkl": "data",
+    "processors.json": "serving",
+    "scaler.npz": "serving",
+}
+DEFAULT_ROLE = "training"
+
+def file_role(name):
+    if name.startswith("vocab_"):  # vocabulaires du format compact (compact_processors)
+        return "serving"
+    return FILE_ROLES.get(name, DEFAULT_ROLE)
+
+# ==========================================
+# MANIFESTE (écrit à l'entraînement)
+# ==========================================
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def build_manifest(directory):
+    """Rôle, taille et SHA-256 de chaque fichier du dossier (hors manifeste)."""
+    files = {}
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name == MANIFEST_FILENAME or not os.path.isfile(path):
+            continue
+        files[name] = {"role": file_role(name), "size": os.path.getsize(path),
+                       "sha256": file_sha256(path)}
+    return {"version": MANIFEST_VERSION, "created_at": time.time(), "files": files}
+
+def write_manifest(directory):
+    manifest = build_manifest(directory)
+    path = os.path.join(directory, MANIFEST_FILENAME)
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def is_valid(path, entry):
+    """Fichier local déjà complet et intègre (taille puis SHA-256) : inutile de le retélécharger."""
+    return (os.path.isfile(path) and os.path.getsize(path) == entry["size"]
+            and file_sha256(path) == entry["sha256"])
+
+# ==========================================
+# TÉLÉCHARGEMENT SÉLECTIF (API, monitoring)
+# ==========================================
+
+@contextmanager
+def download_lock(dst_path):
+    """
+    Verrou exclusif entre process sur un dossier de téléchargement (fichier <dst_path>.lock) :
+    deux workers de serve.py ne téléchargent jamais en même temps dans le même dossier
+    (fetch_artifacts supprime les fichiers hors sélection, voire tout le dossier sans manifeste).
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(dst_path)), exist_ok=True)
+    with open(os.path.normpath(dst_path) + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _mlflow_download(run_id, artifact_path, dst_path):
+    import mlflow
+    return mlflow.artifacts.download_artifacts(run_id=run_id, artifact_path=artifact_path, dst_path=dst_path)
+
+def fetch_artifacts(run_id, dst_path, roles=("serving",), artifact_path=ARTIFACT_PATH,
+                    workers=DEFAULT_WORKERS, retries=DEFAULT_RETRIES, download=_mlflow_download):
+    """
+    Télécharge uniquement les fichiers des `roles` demandés, d'après le manifeste du run :
+    - en parallèle (`workers` fichiers à la fois)
+    - reprise : un fichier local déjà conforme au manifeste (taille + SHA-256) n'est pas retéléchargé,
+      un fichier incomplet ou corrompu est retéléchargé (jusqu'à `retries` nouvelles tentatives)
+    - les fichiers locaux hors sélection sont supprimés (pas de reste d'une autre version)
+    Run antérieur sans manifeste : téléchargement complet du dossier, comme avant.
+    Retourne le dossier local des processors.
+    """
+    local_dir = os.path.join(dst_path, artifact_path)
+    try:
+        manifest_path = download(run_id, f"{artifact_path}/{MANIFEST_FILENAME}", dst_path)
+    except Exception:
+        manifest_path = None
+    if not manifest_path or not os.path.exists(manifest_path):
+        print(f"⚠️ Pas de {MANIFEST_FILENAME} dans le run {run_id} : téléchargement complet de {artifact_path}/")
+        if os.path.exists(dst_path):
+            shutil.rmtree(dst_path)
+        download(run_id, artifact_path, dst_path)
+        return local_dir
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    selected = {name: entry for name, entry in manifest["files"].items() if entry["role"] in roles}
+
+    for name in os.listdir(local_dir):
+        if name != MANIFEST_FILENAME and name not in selected:
+            path = os.path.join(local_dir, name)
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def fetch_one(name):
+        path = os.path.join(local_dir, name)
+        entry = selected[name]
+        if is_valid(path, entry):
+            return name, 0
+        for _ in range(retries + 1):
+            download(run_id, f"{artifact_path}/{name}", dst_path)
+            if is_valid(path, entry):
+                return name, entry["size"]
+        raise IOError(f"{name} : somme de contrôle invalide après {retries + 1} tentatives")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(selected) or 1))) as pool:
+        downloaded = dict(pool.map(fetch_one, selected))
+    fetched = sum(1 for size in downloaded.values() if size)
+    skipped = sorted(name for name, entry in manifest["files"].items() if name not in selected)
+    print(f"📥 {fetched}/{len(selected)} fichiers téléchargés ({sum(downloaded.values()) / 2**20:.1f} Mo, "
+          f"{time.perf_counter() - start:.1f}s, rôles {', '.join(roles)}) ; ignorés : {skipped or 'aucun'}")
+    return local_dir
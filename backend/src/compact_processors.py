@@ -0,0 +1,224 @@
+import json
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+FORMAT_NAME = "crime-processors"
+FORMAT_VERSION = 3   # v2 : scaler optionnel (mode natif) ; v3 : listes de codes en multi-hot ; sinon v1
+HEADER_FILENAME = "processors.json"
+SCALER_FILENAME = "scaler.npz"
+VOCAB_PREFIX = "vocab_"
+SORT_BLOCK_ROWS = 65536   # index trié reconstruit par blocs de lignes (processors écrits sans .sorted.npy)
+
+# Format compact des processors (sans pickle, sans sklearn au chargement) :
+#   processors.json            en-tête : format, version, ordre, paramètres et mode des features,
+#                              colonnes multi-hot, fichiers
+#   scaler.npz                 center / scale du RobustScaler (absent en mode natif)
+#   vocab_<col>.bytes.npy      classes triées du LabelEncoder, UTF-8 concaténé (uint8) ; codes pour le multi-hot
+#   vocab_<col>.offsets.npy    début de chaque classe dans le buffer (int64, n + 1 valeurs)
+#   vocab_<col>.sorted.npy     mêmes classes en octets à largeur fixe (dtype S) : index de lookup(), précalculé
+# Les .npy sont mappés en mémoire : le chargement ne lit que l'en-tête.
+
+# ==========================================
+# ÉCRITURE (preprocessing, mode train)
+# ==========================================
+
+def _save_vocabulary(directory, name, classes):
+    encoded = [str(c).encode("utf-8") for c in classes]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    files = {"bytes": f"{VOCAB_PREFIX}{name}.bytes.npy", "offsets": f"{VOCAB_PREFIX}{name}.offsets.npy",
+             "sorted": f"{VOCAB_PREFIX}{name}.sorted.npy"}
+    width = max([len(b) for b in encoded] + [1])
+    np.save(os.path.join(directory, files["bytes"]), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    np.save(os.path.join(directory, files["offsets"]), offsets)
+    np.save(os.path.join(directory, files["sorted"]), np.array(encoded, dtype=f"S{width}"))
+    return dict(files, size=len(encoded))
+
+def _save_scaler(directory, scaler):
+    n_features = len(scaler.scale_) if scaler.scale_ is not None else len(scaler.center_)
+    np.savez(os.path.join(directory, SCALER_FILENAME),
+             center=scaler.center_ if scaler.center_ is not None else np.zeros(n_features),
+             scale=scaler.scale_ if scaler.scale_ is not None else np.ones(n_features))
+    feature_names = getattr(scaler, "feature_names_in_", None)
+    return {"file": SCALER_FILENAME, "n_features": int(n_features),
+            "feature_names": [str(n) for n in feature_names] if feature_names is not None else None}
+
+def save_processors(directory, feature_encoders, scaler, target_encoder=None, feature_order=None, feature_params=None,
+                    feature_mode=None, multi_hot=None):
+    """
+    Écrit encodeurs (LabelEncoder) et scaler (RobustScaler) ajustés au format compact,
+    avec les paramètres appris des définitions de features (feature_defs.fit_params).
+    scaler=None : mode natif (catégories pour les arbres), pas de scaling en service.
+    multi_hot : colonnes listes de codes encodées en multi-hot (leur encodeur = vocabulaire des codes).
+    """
+    multi_hot = list(multi_hot or [])
+    os.makedirs(directory, exist_ok=True)
+    if scaler is None and os.path.exists(os.path.join(directory, SCALER_FILENAME)):
+        os.remove(os.path.join(directory, SCALER_FILENAME))   # scaler périmé d'un run précédent
+    header = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION if multi_hot else (1 if scaler is not None else 2),
+        "feature_order": list(feature_order) if feature_order is not None else None,
+        "feature_params": feature_params,
+        "feature_mode": feature_mode or ("scaled" if scaler is not None else "native"),
+        "multi_hot": multi_hot,
+        "scaler": _save_scaler(directory, scaler) if scaler is not None else None,
+        "vocabularies": {col: _save_vocabulary(directory, col, enc.classes_) for col, enc in feature_encoders.items()},
+        "target": _save_vocabulary(directory, "target", target_encoder.classes_) if target_encoder is not None else None
+    }
+    with open(os.path.join(directory, HEADER_FILENAME), "w") as f:
+        json.dump(header, f, indent=2)
+    return header
+
+# ==========================================
+# LECTURE (Feature Store)
+# ==========================================
+
+def _map(path):
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:  # tableau vide : rien à mapper
+        return np.load(path)
+
+class Vocabulary:
+    """
+    Classes triées d'un LabelEncoder (code = position), lues depuis un buffer mappé.
+    - lookup() : codes vectorisés par recherche dichotomique sur les octets UTF-8 (même ordre que
+      les chaînes triées), -1 si inconnue ; l'index trié est le .sorted.npy mappé (partagé entre
+      workers via le cache de pages), reconstruit par blocs au premier appel pour les anciens processors
+    - classes_ / inverse_transform : comme le LabelEncoder d'origine (décodage au premier accès)
+    """
+
+    def __init__(self, buffer, offsets, sorted_bytes=None):
+        self.buffer = buffer
+        self.offsets = offsets
+        self._classes = None
+        self._sorted = sorted_bytes
+
+    @property
+    def sorted_bytes(self):
+        """Tableau d'octets à largeur fixe (dtype S) ; sans fichier précalculé, rempli par blocs de lignes."""
+        if self._sorted is None:
+            offsets = np.asarray(self.offsets)
+            lengths = np.diff(offsets)
+            width = max(int(lengths.max()) if lengths.size else 1, 1)
+            padded = np.concatenate([np.asarray(self.buffer), np.zeros(width, dtype=np.uint8)])
+            columns = np.arange(width)
+            matrix = np.zeros((len(lengths), width), dtype=np.uint8)
+            for start in range(0, len(lengths), SORT_BLOCK_ROWS):
+                block = slice(start, start + SORT_BLOCK_ROWS)
+                rows = padded[offsets[:-1][block][:, None] + columns[None, :]]
+                rows[columns[None, :] >= lengths[block][:, None]] = 0
+                matrix[block] = rows
+            self._sorted = matrix.view(f"S{width}").reshape(len(lengths))
+        return self._sorted
+
+    def lookup(self, values):
+        """Codes des valeurs (chaînes) : position dans le vocabulaire, -1 si absente."""
+        vocabulary = self.sorted_bytes
+        if not len(vocabulary):
+            return np.full(len(values), -1, dtype=np.int64)
+        queries = np.char.encode(np.asarray(values).astype(str), "utf-8")
+        positions = np.minimum(np.searchsorted(vocabulary, queries), len(vocabulary) - 1)
+        return np.where(vocabulary[positions] == queries, positions, -1)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, code):
+        return bytes(self.buffer[self.offsets[code]:self.offsets[code + 1]]).decode("utf-8")
+
+    @property
+    def classes_(self):
+        if self._classes is None:
+            raw = self.buffer.tobytes()
+            bounds = self.offsets.tolist()
+            self._classes = np.array([raw[a:b].decode("utf-8") for a, b in zip(bounds[:-1], bounds[1:])], dtype=object)
+        return self._classes
+
+    def inverse_transform(self, codes):
+        return self.classes_[np.asarray(codes, dtype=int)]
+
+class CompactRobustScaler:
+    """RobustScaler.transform sans sklearn : (X - center) / scale, mêmes opérations, mêmes flottants."""
+
+    def __init__(self, center, scale, feature_names=None):
+        self.center_ = center
+        self.scale_ = scale
+        self.feature_names = feature_names
+
+    def transform(self, X):
+        if self.feature_names is not None and hasattr(X, "columns") and list(X.columns) != self.feature_names:
+            raise ValueError(f"Features inattendues pour le scaler : {list(X.columns)} (attendu : {self.feature_names})")
+        X = np.array(X, dtype=float)
+        X -= self.center_
+        X /= self.scale_
+        return X
+
+def _load_vocabulary(directory, spec):
+    sorted_bytes = _map(os.path.join(directory, spec["sorted"])) if spec.get("sorted") else None
+    return Vocabulary(_map(os.path.join(directory, spec["bytes"])), _map(os.path.join(directory, spec["offsets"])),
+                      sorted_bytes)
+
+def load_processors(directory):
+    """Artefacts du Feature Store depuis le format compact ; None si absent (processors pickle uniquement)."""
+    path = os.path.join(directory, HEADER_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        header = json.load(f)
+    if header.get("format") != FORMAT_NAME or header.get("version", 0) > FORMAT_VERSION:
+        raise ValueError(f"{HEADER_FILENAME} : format non supporté ({header.get('format')} v{header.get('version')})")
+
+    artifacts = {
+        "feature_encoders": {col: _load_vocabulary(directory, spec) for col, spec in header["vocabularies"].items()},
+        "feature_mode": header.get("feature_mode", "scaled"),
+        "multi_hot": header.get("multi_hot") or []
+    }
+    if header.get("scaler"):
+        with np.load(os.path.join(directory, header["scaler"]["file"])) as scaler:
+            center, scale = scaler["center"], scaler["scale"]
+        artifacts["scaler"] = CompactRobustScaler(center, scale, header["scaler"]["feature_names"])
+    if header.get("feature_params"):
+        artifacts["feature_params"] = header["feature_params"]
+    if header.get("target"):
+        artifacts["target_encoder"] = _load_vocabulary(directory, header["target"])
+    return artifacts
+
+# ==========================================
+# CONVERSION DE PROCESSORS EXISTANTS
+# ==========================================
+
+def convert_pickles(directory):
+    """Ajoute le format compact à un dossier de processors pickle (anciens runs)."""
+    with open(os.path.join(directory, "feature_label_encoders.pkl"), "rb") as f:
+        feature_encoders = pickle.load(f)
+    scaler = None   # mode natif : pas de scaler
+    if os.path.exists(os.path.join(directory, "robust_scaler.pkl")):
+        with open(os.path.join(directory, "robust_scaler.pkl"), "rb") as f:
+            scaler = pickle.load(f)
+    target_encoder = None
+    if os.path.exists(os.path.join(directory, "target_label_encoder.pkl")):
+        with open(os.path.join(directory, "target_label_encoder.pkl"), "rb") as f:
+            target_encoder = pickle.load(f)
+    config = {}
+    if os.path.exists(os.path.join(directory, "features_config.pkl")):
+        with open(os.path.join(directory, "features_config.pkl"), "rb") as f:
+            config = pickle.load(f)
+    return save_processors(directory, feature_encoders, scaler, target_encoder,
+                           feature_order=config.get("final_feature_order"), feature_params=config.get("feature_params"),
+                           feature_mode=config.get("feature_mode"), multi_hot=config.get("multi_hot"))
+
+if __name__ == "__main__":
+    target_dir = sys.argv[1] if len(sys.argv) > 1 else "processors"
+    convert_pickles(target_dir)
+    start = time.perf_counter()
+    load_processors(target_dir)
+    print(f"✅ Format compact écrit dans {target_dir}/ (chargement : {(time.perf_counter() - start) * 1000:.1f} ms)")
@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Données pré-traitées en fichiers (entraînement hors mémoire) : chaque split est découpé en shards
+# .npy float32 (features scalées) + int32 (labels), lus en memmap. Accès aléatoire aux lignes sans
+# chargement (échantillonnage des bins LightGBM), passes séquentielles pour XGBoost et CatBoost.
+# Hors de processors/ : ces fichiers ne sont pas loggués dans MLflow.
+SHARDS_PATH = "preprocessed_shards"
+INDEX_FILENAME = "shards.json"
+SHARD_ROWS = int(os.getenv("SHARD_ROWS", "500000"))
+RESCALE_ROWS = 65536
+
+# ==========================================
+# ÉCRITURE
+# ==========================================
+
+class ShardWriter:
+    """
+    Écrit les splits en shards, bloc par bloc, puis l'index (features, fichiers et lignes par split, classes).
+    categorical : {feature: nombre de codes} des features catégorielles natives (mode natif), sinon None.
+    """
+
+    def __init__(self, directory=SHARDS_PATH, features=None, rows_per_shard=None, categorical=None):
+        self.directory = directory
+        self.features = list(features) if features is not None else []
+        self.categorical = dict(categorical or {})
+        self.rows_per_shard = rows_per_shard or SHARD_ROWS
+        self.splits = {}
+        self.classes = set()
+        self._pending = {}   # split -> blocs (X float32, y int32) pas encore écrits
+        shutil.rmtree(directory, ignore_errors=True)   # pas de shards périmés d'un run précédent
+        os.makedirs(directory)
+
+    def append(self, split, X, y):
+        """Ajoute un bloc de lignes (matrice de features, labels) ; écrit chaque shard dès qu'il est plein."""
+        self.splits.setdefault(split, [])
+        pending = self._pending.setdefault(split, [])
+        pending.append((np.asarray(X, dtype=np.float32), np.asarray(y).astype(np.int32)))
+        if sum(len(labels) for _, labels in pending) >= self.rows_per_shard:
+            self._write(split, full_only=True)
+
+    def _write(self, split, full_only=False):
+        pending = self._pending.pop(split, [])
+        if not pending:
+            return
+        X = np.concatenate([values for values, _ in pending])
+        y = np.concatenate([labels for _, labels in pending])
+        shards = self.splits.setdefault(split, [])
+        start = 0
+        while len(y) - start >= self.rows_per_shard or (not full_only and start < len(y)):
+            stop = start + self.rows_per_shard
+            name = f"{split}-{len(shards):05d}"
+            np.save(os.path.join(self.directory, f"{name}.X.npy"), np.ascontiguousarray(X[start:stop]))
+            np.save(os.path.join(self.directory, f"{name}.y.npy"), y[start:stop])
+            shards.append({"X": f"{name}.X.npy", "y": f"{name}.y.npy", "rows": len(y[start:stop])})
+            self.classes.update(np.unique(y[start:stop]).tolist())
+            start = stop
+        if start < len(y):
+            self._pending[split] = [(X[start:], y[start:])]
+
+    def flush(self):
+        """Écrit les derniers shards (incomplets) de chaque split."""
+        for split in list(self._pending):
+            self._write(split)
+
+    def rescale(self, center, scale):
+        """(X - center) / scale, sur place dans chaque shard (memmap, par blocs de lignes)."""
+        for shards in self.splits.values():
+            for shard in shards:
+                values = np.load(os.path.join(self.directory, shard["X"]), mmap_mode="r+")
+                for start in range(0, len(values), RESCALE_ROWS):
+                    block = values[start:start + RESCALE_ROWS]
+                    block[:] = (block.astype(np.float64) - center) / scale
+                values.flush()
+                del values
+
+    def close(self):
+        self.flush()
+        for split, shards in self.splits.items():
+            print(f"💾 {split} : {sum(s['rows'] for s in shards)} lignes en {len(shards)} shard(s) dans {self.directory}/")
+        index = {"features": self.features, "categorical": self.categorical,
+                 "classes": sorted(int(c) for c in self.classes), "splits": self.splits}
+        with open(os.path.join(self.directory, INDEX_FILENAME), "w") as f:
+            json.dump(index, f, indent=2)
+        return index
+
+# ==========================================
+# LECTURE
+# ==========================================
+
+def read_index(directory=SHARDS_PATH):
+    path = os.path.join(directory, INDEX_FILENAME)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"❌ Index des shards introuvable : {path} (preprocessing en sortie 'shards' requis)")
+    with open(path) as f:
+        return json.load(f)
+
+class ShardedSplit:
+    """Un split sur disque : shards en memmap (lecture paresseuse), labels concaténés à la demande."""
+
+    def __init__(self, directory, split):
+        index = read_index(directory)
+        if split not in index["splits"]:
+            raise KeyError(f"Split inconnu : {split} (disponibles : {', '.join(index['splits'])})")
+        self.directory = directory
+        self.features = index["features"]
+        self.categorical = index.get("categorical") or {}
+        self.classes = index["classes"]
+        self.shards = index["splits"][split]
+        self.rows = sum(shard["rows"] for shard in self.shards)
+
+    def __len__(self):
+        return len(self.shards)
+
+    def features_of(self, i):
+        return np.load(os.path.join(self.directory, self.shards[i]["X"]), mmap_mode="r")
+
+    def labels_of(self, i):
+        return np.load(os.path.join(self.directory, self.shards[i]["y"]))
+
+    def sample(self, size=None, seed=42):
+        """`size` lignes tirées sans remise (toutes si None), lues shard par shard dans les memmaps."""
+        if size and size < self.rows:
+            rows = np.sort(np.random.default_rng(seed).choice(self.rows, size=size, replace=False))
+        else:
+            rows = np.arange(self.rows)
+        bounds = np.cumsum([0] + [shard["rows"] for shard in self.shards])
+        parts = []
+        for i in range(len(self.shards)):
+            local = rows[(rows >= bounds[i]) & (rows < bounds[i + 1])] - bounds[i]
+            if len(local):
+                parts.append(np.asarray(self.features_of(i)[local]))
+        return np.concatenate(parts) if parts else np.empty((0, len(self.features)), dtype=np.float32)
+
+    def chunks(self):
+        """(X, y) shard par shard, X en memmap float32."""
+        for i in range(len(self.shards)):
+            yield self.features_of(i), self.labels_of(i)
+
+    def labels(self):
+        return np.concatenate([self.labels_of(i) for i in range(len(self.shards))]) if self.shards else \
+            np.empty(0, dtype=np.int32)
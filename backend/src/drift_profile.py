@@ -0,0 +1,368 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+PROFILE_FILENAME = "reference_profile.json"
+PROFILE_VERSION = 2
+
+DEFAULT_NUMERIC_BINS = 10      # bornes = quantiles de la référence (bins ~équi-peuplés)
+DEFAULT_TOP_CATEGORIES = 50    # au-delà : bucket "autres" (mocodes, location...)
+
+PSI_THRESHOLD = 0.2            # PSI > 0.2 : feature considérée en drift
+DRIFT_SHARE_THRESHOLD = 0.3    # même seuil que TestShareOfDriftedColumns(lt=0.3) de check_drift.py
+PSI_EPSILON = 1e-4
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+MISSING_RATE_TOLERANCE = 0.1   # hausse absolue tolérée du taux de valeurs manquantes
+
+# ==========================================
+# PROFIL DE RÉFÉRENCE (entraînement)
+# ==========================================
+
+def _numeric(values):
+    return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float)
+
+class ValueCounts:
+    """
+    Effectifs exacts des valeurs d'une feature, cumulés bloc par bloc (fichier lu par morceaux).
+    Les features du modèle sont discrètes (codes, entiers) : quelques milliers de valeurs distinctes
+    au plus, et des quantiles identiques à np.quantile sur la colonne complète.
+    """
+
+    def __init__(self):
+        self.values = np.empty(0)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.missing = 0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        finite = np.isfinite(values)
+        self.missing += int((~finite).sum())
+        new_values, new_counts = np.unique(values[finite], return_counts=True)
+        merged, inverse = np.unique(np.concatenate([self.values, new_values]), return_inverse=True)
+        self.counts = np.bincount(inverse, weights=np.concatenate([self.counts, new_counts]),
+                                  minlength=merged.size).astype(np.int64)
+        self.values = merged
+        return self
+
+    @property
+    def size(self):
+        return int(self.counts.sum())
+
+    def quantile(self, q):
+        """np.quantile (méthode linéaire) de la colonne que décrivent les effectifs."""
+        q = np.asarray(q, dtype=float)
+        n = self.size
+        virtual = (n - 1) * q   # même calcul d'index que NumPy
+        below = np.floor(virtual)
+        gamma = virtual - below
+        ends = np.cumsum(self.counts)
+        at = lambda i: self.values[np.searchsorted(ends, np.clip(i, 0, n - 1), side="right")]
+        a, b = at(below.astype(np.int64)), at(below.astype(np.int64) + 1)
+        diff = b - a
+        return np.where(gamma >= 0.5, b - diff * (1 - gamma), a + diff * gamma)
+
+def _quantiles(counts):
+    if not counts.size:
+        return {}
+    return {f"p{int(q * 100):02d}": float(v) for q, v in zip(QUANTILES, counts.quantile(QUANTILES))}
+
+def build_profile(df, categorical_features=(), n_bins=DEFAULT_NUMERIC_BINS, top_k=DEFAULT_TOP_CATEGORIES,
+                  raw_missing_rates=None):
+    """
+    Profil compact d'un DataFrame de features (non scalées) :
+    - numérique : bornes internes (quantiles) + effectifs par bin + quantiles de référence
+    - catégoriel : top_k catégories + effectifs (dernier effectif = "autres")
+    - toutes : nombre de valeurs manquantes ; `raw_missing_rates` = taux avant imputation (colonnes brutes)
+    La taille du profil ne dépend pas du nombre de lignes.
+    """
+    counts = {col: ValueCounts().update(_numeric(df[col])) for col in df.columns}
+    return build_profile_from_counts(counts, len(df), categorical_features, n_bins, top_k, raw_missing_rates)
+
+def build_profile_from_counts(counts, n_rows, categorical_features=(), n_bins=DEFAULT_NUMERIC_BINS,
+                              top_k=DEFAULT_TOP_CATEGORIES, raw_missing_rates=None):
+    """build_profile à partir d'effectifs cumulés ({feature: ValueCounts}) : données lues par blocs."""
+    features = {}
+    for col, value_counts in counts.items():
+        if col in categorical_features:
+            cats, cat_counts = value_counts.values, value_counts.counts
+            order = np.argsort(-cat_counts, kind="stable")[:top_k]
+            other = int(cat_counts.sum() - cat_counts[order].sum())
+            features[col] = {
+                "kind": "categorical",
+                "categories": cats[order].tolist(),
+                "counts": cat_counts[order].astype(int).tolist() + [other],
+                "n_unique": int(cats.size)
+            }
+        else:
+            quantiles = value_counts.quantile(np.linspace(0, 1, n_bins + 1)[1:-1]) if value_counts.size else []
+            edges = np.unique(quantiles)
+            slots = np.searchsorted(edges, value_counts.values, side="right")
+            features[col] = {
+                "kind": "numeric",
+                "edges": edges.tolist(),
+                "counts": np.bincount(slots, weights=value_counts.counts,
+                                      minlength=len(edges) + 1).astype(int).tolist(),
+                "quantiles": _quantiles(value_counts)
+            }
+        features[col]["missing"] = value_counts.missing
+
+    profile = {"version": PROFILE_VERSION, "n_rows": int(n_rows), "features": features}
+    if raw_missing_rates is not None:
+        profile["missing_rates"] = {col: round(float(rate), 6) for col, rate in raw_missing_rates.items()}
+    return profile
+
+def save_profile(profile, directory):
+    path = os.path.join(directory, PROFILE_FILENAME)
+    with open(path, "w") as f:
+        json.dump(profile, f)
+    return path
+
+def load_profile(directory):
+    path = os.path.join(directory, PROFILE_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+# ==========================================
+# SCORES DE DRIFT (sur effectifs binnés)
+# ==========================================
+
+def psi(reference_counts, current_counts, eps=PSI_EPSILON):
+    """Population Stability Index entre deux histogrammes aux mêmes bins."""
+    p = np.asarray(reference_counts, dtype=float)
+    q = np.asarray(current_counts, dtype=float)
+    if p.sum() == 0 or q.sum() == 0:
+        return 0.0
+    p = np.clip(p / p.sum(), eps, None)
+    q = np.clip(q / q.sum(), eps, None)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+def ks_statistic(reference_counts, current_counts):
+    """Statistique KS approchée : écart max entre les CDF binnées."""
+    p = np.asarray(reference_counts, dtype=float)
+    q = np.asarray(current_counts, dtype=float)
+    if p.sum() == 0 or q.sum() == 0:
+        return 0.0
+    return float(np.max(np.abs(np.cumsum(p) / p.sum() - np.cumsum(q) / q.sum())))
+
+def score_counts(profile, counts, psi_threshold=PSI_THRESHOLD, share_threshold=DRIFT_SHARE_THRESHOLD):
+    """Scores par feature + décision globale, à partir d'effectifs courants binnés comme le profil."""
+    features = {}
+    for name, spec in profile["features"].items():
+        current = counts.get(name)
+        if current is None:
+            continue
+        score = {"psi": round(psi(spec["counts"], current), 6)}
+        if spec["kind"] == "numeric":
+            score["ks"] = round(ks_statistic(spec["counts"], current), 6)
+        score["drift"] = score["psi"] > psi_threshold
+        features[name] = score
+
+    drifted = [name for name, score in features.items() if score["drift"]]
+    share = len(drifted) / len(features) if features else 0.0
+    return {
+        "features": features,
+        "drifted_features": drifted,
+        "drift_share": round(share, 4),
+        "drift_detected": share >= share_threshold
+    }
+
+def compare_sample(profile, feature_df, raw_df=None, missing_tolerance=MISSING_RATE_TOLERANCE):
+    """
+    Compare un échantillon courant (features non scalées) au profil, sans données de référence brutes :
+    scores PSI/KS, écarts de quantiles, taux de valeurs manquantes (colonnes brutes si `raw_df`).
+    """
+    matrix = to_float_matrix(feature_df)
+    counts, quantile_shift = {}, {}
+    for i, name in enumerate(feature_df.columns):
+        spec = profile["features"].get(name)
+        if spec is None:
+            continue
+        values = matrix[:, i]
+        counts[name] = FeatureBinner(spec).count(values).tolist()
+        if spec.get("quantiles"):
+            current = _quantiles(ValueCounts().update(values))
+            quantile_shift[name] = {q: round(current[q] - ref, 6) for q, ref in spec["quantiles"].items() if q in current}
+
+    result = score_counts(profile, counts)
+    result["quantile_shift"] = quantile_shift
+
+    current_rates = {}
+    if raw_df is not None and len(raw_df):
+        current_rates = {col: float(raw_df[col].isna().mean())
+                         for col in profile.get("missing_rates", {}) if col in raw_df.columns}
+    result.update(missing_rate_report(profile, current_rates, missing_tolerance))
+    result["rows"] = int(len(feature_df))
+    return result
+
+def missing_rate_report(profile, current_rates, missing_tolerance=MISSING_RATE_TOLERANCE):
+    """Taux de valeurs manquantes courants vs référence (colonnes brutes) + colonnes en alerte."""
+    missing = {}
+    for col, ref_rate in profile.get("missing_rates", {}).items():
+        if col in current_rates:
+            rate = current_rates[col]
+            missing[col] = {"reference": ref_rate, "current": round(rate, 6),
+                            "increase": rate - ref_rate > missing_tolerance}
+    return {"missing_rates": missing, "missing_rate_alerts": [col for col, m in missing.items() if m["increase"]]}
+
+# ==========================================
+# ÉCHANTILLONNAGE (évaluation Evidently sur gros volumes)
+# ==========================================
+Z_SCORES = {0.9: 1.645, 0.95: 1.96, 0.99: 2.576, 0.999: 3.291}
+
+def cochran_sample_size(population, confidence=0.99, margin=0.01, proportion=0.5):
+    """
+    Taille d'échantillon de Cochran (proportion estimée à ±margin), avec correction de population finie.
+    Ex : confiance 99 %, marge 1 % -> ~16 560 lignes, quelle que soit la taille du dataset.
+    """
+    if confidence not in Z_SCORES:
+        raise ValueError(f"Niveau de confiance non supporté : {confidence} (attendu : {sorted(Z_SCORES)})")
+    n0 = Z_SCORES[confidence] ** 2 * proportion * (1 - proportion) / margin ** 2
+    return int(min(population, np.ceil(n0 / (1 + (n0 - 1) / population)))) if population else 0
+
+def stratified_sample(df, n_rows, strata="target", seed=42):
+    """Échantillon de n_rows lignes, proportionnel par strate (classe cible) : les classes rares restent représentées."""
+    if n_rows >= len(df):
+        return df
+    if strata not in df.columns:
+        return df.sample(n=n_rows, random_state=seed)
+    frac = n_rows / len(df)
+    return df.groupby(strata, group_keys=False).sample(frac=frac, random_state=seed)
+
+# ==========================================
+# ACCUMULATEUR EN SERVICE (fenêtres successives)
+# ==========================================
+
+class FeatureBinner:
+    """Projette un lot de valeurs sur les bins du profil (NumPy pur : searchsorted + bincount)."""
+
+    def __init__(self, spec):
+        self.kind = spec["kind"]
+        self.n_slots = len(spec["counts"])
+        if self.kind == "numeric":
+            self.edges = np.asarray(spec["edges"], dtype=float)
+        else:
+            categories = np.asarray(spec["categories"], dtype=float)
+            order = np.argsort(categories)
+            self.sorted_categories = categories[order]
+            self.slot_of_sorted = order
+
+    def slots(self, values):
+        values = values[np.isfinite(values)]
+        if self.kind == "numeric":
+            return np.searchsorted(self.edges, values, side="right")
+        other = self.n_slots - 1  # catégorie hors top_k -> "autres"
+        if not self.sorted_categories.size:
+            return np.full(len(values), other)
+        pos = np.minimum(np.searchsorted(self.sorted_categories, values), self.sorted_categories.size - 1)
+        return np.where(self.sorted_categories[pos] == values, self.slot_of_sorted[pos], other)
+
+    def count(self, values):
+        return np.bincount(self.slots(values), minlength=self.n_slots)
+
+def to_float_matrix(frame):
+    """DataFrame -> matrice float (une seule conversion par lot ; repli sur to_numeric si texte)."""
+    try:
+        return frame.to_numpy(dtype=float)
+    except (TypeError, ValueError):
+        return np.column_stack([_numeric(frame[col]) for col in frame.columns])
+
+class DriftMonitor:
+    """
+    Accumule les features servies dans des histogrammes alignés sur le profil de référence
+    (coût par requête : un bincount par feature, aucune donnée brute conservée).
+    Toutes les `window_seconds`, la fenêtre courante est scorée (PSI / KS) puis remise à zéro.
+    """
+
+    def __init__(self, profile, window_seconds=300, min_rows=200, on_evaluate=None):
+        self.profile = profile
+        self.window_seconds = window_seconds
+        self.min_rows = min_rows
+        self.on_evaluate = on_evaluate
+        self.binners = {name: FeatureBinner(spec) for name, spec in profile["features"].items()}
+        self._lock = threading.Lock()
+        self.last_result = None
+        self._reset()
+
+    def _reset(self):
+        self.counts = {name: np.zeros(b.n_slots, dtype=np.int64) for name, b in self.binners.items()}
+        self.rows = 0
+        self.window_start = time.time()
+
+    def update(self, frame):
+        """Ajoute un lot (DataFrame de features non scalées) à la fenêtre courante."""
+        matrix = to_float_matrix(frame)
+        partial = {name: self.binners[name].count(matrix[:, i])
+                   for i, name in enumerate(frame.columns) if name in self.binners}
+        with self._lock:
+            for name, counts in partial.items():
+                self.counts[name] += counts
+            self.rows += len(frame)
+        self.maybe_evaluate()
+
+    def evaluate(self, reset=False):
+        """Score la fenêtre courante ; None s'il n'y a pas encore assez de lignes."""
+        with self._lock:
+            if self.rows < self.min_rows:
+                return None
+            counts = {name: c.tolist() for name, c in self.counts.items()}
+            result = score_counts(self.profile, counts)
+            result.update({"rows": self.rows, "window_start": self.window_start, "evaluated_at": time.time()})
+            self.last_result = result
+            if reset:
+                self._reset()
+        if self.on_evaluate is not None:
+            self.on_evaluate(result)
+        return result
+
+    def maybe_evaluate(self):
+        """Fenêtre échue : score + remise à zéro (sinon, elle s'étend jusqu'à min_rows lignes)."""
+        if time.time() - self.window_start >= self.window_seconds:
+            self.evaluate(reset=True)
+
+    def status(self):
+        return {
+            "window": {"rows": self.rows, "started_at": self.window_start,
+                       "seconds": self.window_seconds, "min_rows": self.min_rows},
+            "last_evaluation": self.last_result
+        }
+
+    # ---------- Agrégation multi-workers (serve.py) ----------
+    def snapshot(self):
+        """État publiable d'un worker : effectifs de sa fenêtre courante et sa dernière évaluation."""
+        with self._lock:
+            return {"counts": {name: c.tolist() for name, c in self.counts.items()}, "rows": self.rows,
+                    "window_start": self.window_start, "last_evaluation": self.last_result}
+
+    def pod_status(self, snapshots):
+        """
+        /drift du pod : fenêtres courantes de tous les workers additionnées (mêmes bins, celles du profil)
+        et scorées ensemble dès min_rows lignes ; dernières évaluations propres à chaque worker en détail.
+        snapshots : {pid: snapshot()}.
+        """
+        counts = {name: np.zeros(b.n_slots, dtype=np.int64) for name, b in self.binners.items()}
+        rows = 0
+        for snapshot in snapshots.values():
+            for name, values in snapshot["counts"].items():
+                if name in counts:
+                    counts[name] += np.asarray(values, dtype=np.int64)
+            rows += snapshot["rows"]
+        evaluation = None
+        if rows >= self.min_rows:
+            evaluation = score_counts(self.profile, {name: c.tolist() for name, c in counts.items()})
+            evaluation.update({"rows": rows, "evaluated_at": time.time()})
+        return {
+            "window": {"rows": rows, "started_at": min((s["window_start"] for s in snapshots.values()), default=None),
+                       "seconds": self.window_seconds, "min_rows": self.min_rows},
+            "last_evaluation": evaluation,
+            "workers": {str(pid): {"rows": s["rows"], "last_evaluation": s["last_evaluation"]}
+                        for pid, s in snapshots.items()}
+        }
@@ -0,0 +1,430 @@
+import collections
+import datetime
+import functools
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_float_dtype
+from scipy import sparse
+
+try:
+    import polars as pl
+except ImportError:  # Optional: only the Polars executor (run_lazy) needs it
+    pl = None
+
+# ==========================================
+# SCHEMA
+# ==========================================
+# Single definition of the model features, shared by the offline pipeline (preprocessing2)
+# and the online Feature Store. Each feature is declared once with a vectorized (batch) and a
+# scalar (row) implementation, plus a Polars expression for the lazy offline engine;
+# compile_plan() keeps only what the requested features depend on.
+
+# Features the model expects, in order
+MODEL_FEATURES = [
+    'mocodes', 'premis_cd', 'location', 'weapon_used_cd', 'vict_age',
+    'day', 'area', 'crm_risk', 'month', 'vict_descent', 'status',
+    'weekday', 'hour_bin', 'year', 'vict_sex_f', 'vict_sex_m', 'vict_sex_x'
+]
+
+# Raw inputs (CSV header / API aliases) -> cleaned column name (offline frames after clean_column_names)
+SOURCES = {
+    "DATE OCC": "date_occ",
+    "TIME OCC": "time_occ",
+    "AREA": "area",
+    "Part 1-2": "crm_risk",
+    "Mocodes": "mocodes",
+    "Vict Age": "vict_age",
+    "Vict Sex": "vict_sex",
+    "Vict Descent": "vict_descent",
+    "Premis Cd": "premis_cd",
+    "Weapon Used Cd": "weapon_used_cd",
+    "Status": "status",
+    "LOCATION": "location",
+}
+
+# Parameters fitted on the training data (fit_params) and shipped with the processors.
+# The defaults only apply to processors trained before they were persisted.
+DEFAULT_PARAMS = {"vict_age_fill": 30.0}
+# Raw sources fit_params() reads
+PARAM_SOURCES = ["Vict Age"]
+
+DATE_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+MISSING_DATE = datetime.datetime(1900, 1, 1)
+HOUR_LABELS = ['Night', 'Morning', 'Afternoon', 'Evening']   # [0, 6), [6, 12), [12, 18), [18, 24)
+
+# ==========================================
+# VALUE HELPERS
+# ==========================================
+
+def _missing(value):
+    return value is None or value != value   # None, NaN, NaT
+
+def _number(value):
+    if _missing(value):
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _numbers(series):
+    return pd.to_numeric(series, errors="coerce")
+
+def category_string(value):
+    """Scalar -> string fed to the label encoders (missing -> 'nan', 1.0 -> '1')."""
+    if _missing(value):
+        return "nan"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def category_strings(series):
+    """Vectorized category_string."""
+    if is_float_dtype(series):
+        strings = series.astype(str)
+        integral = series.notna() & (series % 1 == 0)
+        strings[integral] = series[integral].astype(np.int64).astype(str)
+        return strings
+    return series.astype(str).where(series.notna(), "nan")
+
+def category_strings_expr(expr, dtype):
+    """Polars version of category_strings (`dtype`: dtype of `expr`)."""
+    if dtype.is_float():
+        return (pl.when(expr.is_null() | expr.is_nan()).then(pl.lit("nan"))
+                .when(expr % 1 == 0).then(expr.cast(pl.Int64).cast(pl.String))
+                .otherwise(expr.cast(pl.String)))
+    return expr.cast(pl.String).fill_null("nan")
+
+# ==========================================
+# FEATURE DEFINITIONS
+# ==========================================
+
+class Feature:
+    """
+    One node of the feature DAG. `inputs` are raw sources (SOURCES keys) or other features.
+    batch(params, *series) -> Series ; row(params, *values) -> scalar ;
+    lazy(params, *exprs) -> Polars expression. All three must agree value for value.
+    """
+
+    def __init__(self, name, inputs, batch, row, lazy, categorical=False):
+        self.name = name
+        self.inputs = list(inputs)
+        self.batch = batch
+        self.row = row
+        self.lazy = lazy
+        self.categorical = categorical
+
+FEATURES = {}
+
+def feature(name, inputs, batch, row, lazy, categorical=False):
+    FEATURES[name] = Feature(name, inputs, batch, row, lazy, categorical)
+
+def _parse_dates(p, dates):
+    if not is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format=DATE_FORMAT, errors="coerce")
+    return dates.fillna(pd.Timestamp(MISSING_DATE))
+
+def _parse_date(p, date):
+    if isinstance(date, datetime.datetime):
+        return MISSING_DATE if _missing(date) else date
+    try:
+        return datetime.datetime.strptime(str(date), DATE_FORMAT)
+    except ValueError:
+        return MISSING_DATE
+
+def _hour_bins(p, hours):
+    valid = ((hours >= 0) & (hours < 24)).to_numpy()
+    codes = np.where(valid, np.floor_divide(hours.fillna(0).to_numpy(), 6), len(HOUR_LABELS)).astype(int)
+    return pd.Series(np.array(HOUR_LABELS + ["nan"], dtype=object)[codes], index=hours.index)
+
+def _hour_bin(p, hour):
+    return HOUR_LABELS[int(hour // 6)] if 0 <= hour < 24 else "nan"
+
+def _hour_bins_expr(p, hours):
+    expr = pl
+    for i, label in enumerate(HOUR_LABELS):
+        expr = expr.when((hours >= 6 * i) & (hours < 6 * (i + 1))).then(pl.lit(label))
+    return expr.otherwise(pl.lit("nan"))
+
+def _ages_expr(p, ages):
+    ages = ages.cast(pl.Float64, strict=False)
+    return pl.when((ages >= 0) & (ages <= 100)).then(ages).otherwise(None).fill_null(p["vict_age_fill"])
+
+def _ages(p, ages):
+    ages = _numbers(ages)
+    return ages.where((ages >= 0) & (ages <= 100)).fillna(p["vict_age_fill"])
+
+def _age(p, age):
+    age = _number(age)
+    return age if 0 <= age <= 100 else p["vict_age_fill"]
+
+def _sexes(p, sexes):
+    return sexes.fillna("X").astype(str).str.upper().replace({"H": "X", "-": "X"})
+
+def _sex(p, sex):
+    sex = "X" if _missing(sex) else str(sex).upper()
+    return "X" if sex in ("H", "-") else sex
+
+def _sexes_expr(p, sexes):
+    return sexes.cast(pl.String).fill_null("X").str.to_uppercase().replace({"H": "X", "-": "X"})
+
+def _filled(default, replace=None):
+    """(batch, row, lazy): fill missing values with `default`, then map the `replace` values to it."""
+    def batch(p, values):
+        values = values.fillna(default)
+        return values.replace({v: default for v in replace}) if replace else values
+
+    def row(p, value):
+        return default if _missing(value) or (replace and value in replace) else value
+
+    def lazy(p, values):
+        values = values.fill_null(default)
+        return values.replace({v: default for v in replace}) if replace else values
+    return batch, row, lazy
+
+def _filled_number(default):
+    return (lambda p, values: _numbers(values).fillna(default),
+            lambda p, value: default if _missing(_number(value)) else _number(value),
+            lambda p, values: values.cast(pl.Float64, strict=False).fill_nan(None).fill_null(default))
+
+_identity = (lambda p, values: values, lambda p, value: value, lambda p, values: values)
+
+# Intermediate nodes (not model features, computed only when something depends on them)
+feature("date", ["DATE OCC"], _parse_dates, _parse_date,
+        lambda p, d: d.str.strptime(pl.Datetime, DATE_FORMAT, strict=False).fill_null(MISSING_DATE))
+feature("hour", ["TIME OCC"], lambda p, t: _numbers(t) // 100, lambda p, t: _number(t) // 100,
+        lambda p, t: t.cast(pl.Float64, strict=False) // 100)
+feature("sex", ["Vict Sex"], _sexes, _sex, _sexes_expr)
+
+# Temporal
+feature("year", ["date"], lambda p, d: d.dt.year, lambda p, d: d.year, lambda p, d: d.dt.year())
+feature("month", ["date"], lambda p, d: d.dt.month, lambda p, d: d.month, lambda p, d: d.dt.month())
+feature("day", ["date"], lambda p, d: d.dt.day, lambda p, d: d.day, lambda p, d: d.dt.day())
+feature("weekday", ["date"], lambda p, d: d.dt.weekday, lambda p, d: d.weekday(),
+        lambda p, d: d.dt.weekday() - 1)   # Polars: Monday = 1
+feature("hour_bin", ["hour"], _hour_bins, _hour_bin, _hour_bins_expr, categorical=True)
+
+# Victim
+feature("vict_age", ["Vict Age"], _ages, _age, _ages_expr)
+feature("vict_descent", ["Vict Descent"], *_filled("UNKNOWN", replace=("-",)), categorical=True)
+feature("vict_sex_f", ["sex"], lambda p, s: (s == "F").astype(int), lambda p, s: int(s == "F"),
+        lambda p, s: (s == "F").cast(pl.Int64))
+feature("vict_sex_m", ["sex"], lambda p, s: (s == "M").astype(int), lambda p, s: int(s == "M"),
+        lambda p, s: (s == "M").cast(pl.Int64))
+feature("vict_sex_x", ["sex"], lambda p, s: (~s.isin(["F", "M"])).astype(int), lambda p, s: int(s not in ("F", "M")),
+        lambda p, s: (~s.is_in(["F", "M"])).cast(pl.Int64))
+
+# Incident
+feature("mocodes", ["Mocodes"], *_filled("0"), categorical=True)
+feature("status", ["Status"], *_filled("0"), categorical=True)
+feature("premis_cd", ["Premis Cd"], *_filled_number(0.0))
+feature("weapon_used_cd", ["Weapon Used Cd"], *_filled_number(0.0))
+feature("location", ["LOCATION"], *_identity, categorical=True)
+feature("crm_risk", ["Part 1-2"], *_identity, categorical=True)
+feature("area", ["AREA"], *_identity)
+
+def categorical_features(names=MODEL_FEATURES):
+    """Label-encoded features among `names`, in order."""
+    return [name for name in names if FEATURES[name].categorical]
+
+# ==========================================
+# TREE-NATIVE CATEGORIES
+# ==========================================
+# "native" feature mode: categorical codes go to the tree models as categories (no scaling).
+# Vocabularies are capped by frequency; rare and unseen values share the OTHER_CATEGORY code.
+OTHER_CATEGORY = "__other__"
+
+def capped_vocabulary(counts, max_categories=None, min_count=1):
+    """
+    Values kept in a capped vocabulary: seen at least `min_count` times, the `max_categories` most
+    frequent (ties broken by value, so every engine keeps the same set), plus OTHER_CATEGORY.
+    `counts`: value -> number of occurrences.
+    """
+    kept = sorted((item for item in counts.items() if item[1] >= min_count), key=lambda item: (-item[1], item[0]))
+    if max_categories is not None:
+        kept = kept[:max_categories]
+    return [value for value, _ in kept] + [OTHER_CATEGORY]
+
+@functools.lru_cache(maxsize=None)
+def _category_dtype(size):
+    return pd.CategoricalDtype(pd.RangeIndex(size))
+
+def native_frame(frame, cardinalities):
+    """
+    Model input of the native mode, identical at training and serving time: encoded columns as
+    category dtype over their whole code range, every other column as float64.
+    """
+    columns = {}
+    for col in frame.columns:
+        if col in cardinalities:
+            codes = np.asarray(frame[col], dtype=np.int64)
+            columns[col] = pd.Categorical.from_codes(codes, dtype=_category_dtype(cardinalities[col]))
+        else:
+            columns[col] = np.asarray(frame[col], dtype=np.float64)
+    return pd.DataFrame(columns, index=frame.index, copy=False)
+
+# ==========================================
+# MULTI-HOT CODE LISTS
+# ==========================================
+# Features holding a list of codes ("1822 1402 0344") can be tokenized instead of label-encoded as
+# one opaque string: a capped vocabulary of codes, and a sparse 0/1 block (one column per code) in
+# the model input. Rare and unseen codes share the OTHER_CATEGORY column.
+CODE_LIST_FEATURES = ["mocodes"]
+CODE_PATTERN = r"\S+"   # codes are separated by whitespace (same tokens as str.split(), for Polars)
+
+def code_list(value):
+    """Scalar -> its codes, read from the same string the label encoders see (category_string)."""
+    return category_string(value).split()
+
+def code_lists(series):
+    """Vectorized code_list, in CSR layout: (row offsets, flat array of the codes)."""
+    strings = category_strings(series)
+    indptr = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, map(str.split, strings)), dtype=np.int64, count=len(strings)), out=indptr[1:])
+    # One split of the joined lists: the flat codes without a Python loop over rows
+    codes = np.array(" ".join(strings).split(), dtype=object)
+    return indptr, codes
+
+def code_counts(series):
+    """Occurrences of each code over all the lists (vocabulary fitting), tokenizing each distinct list once."""
+    counts = collections.Counter()
+    for codes, n in category_strings(series).value_counts(sort=False).items():
+        for code in codes.split():
+            counts[code] += n
+    return counts
+
+def multi_hot(indptr, columns, n_columns):
+    """CSR 0/1 matrix: row i has ones at columns[indptr[i]:indptr[i + 1]] (repeated codes count once)."""
+    matrix = sparse.csr_matrix((np.ones(len(columns)), np.asarray(columns, dtype=np.int64), indptr),
+                               shape=(len(indptr) - 1, n_columns))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1.0
+    return matrix
+
+def with_multi_hot(dense, blocks):
+    """
+    Model input of the multi-hot encoding: CSR matrix, the dense features first (stored explicitly,
+    zeros included: XGBoost reads absent entries as missing, and the scaled median is exactly 0),
+    then the multi-hot blocks. Built in one pass, without a sparse copy of the dense part.
+    """
+    dense = np.asarray(dense, dtype=np.float64)
+    block = blocks[0] if len(blocks) == 1 else sparse.hstack(blocks, format="csr")
+    n_rows, n_dense = dense.shape
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(n_dense + np.diff(block.indptr), out=indptr[1:])
+
+    # Slot of each block entry: after the n_dense values of its row
+    rows = np.repeat(np.arange(n_rows), np.diff(block.indptr))
+    slots = indptr[rows] + n_dense + np.arange(block.nnz) - block.indptr[rows]
+    is_dense = np.ones(indptr[-1], dtype=bool)
+    is_dense[slots] = False
+
+    data, indices = np.empty(indptr[-1]), np.empty(indptr[-1], dtype=np.int32)   # scipy's index dtype
+    data[is_dense], indices[is_dense] = dense.ravel(), np.tile(np.arange(n_dense), n_rows)
+    data[slots], indices[slots] = block.data, block.indices + n_dense
+    return sparse.csr_matrix((data, indices, indptr), shape=(n_rows, n_dense + block.shape[1]))
+
+# ==========================================
+# TARGET
+# ==========================================
+
+def categorize_crime(crime):
+    if not isinstance(crime, str): return 'جرائم متنوعة / Miscellaneous Crimes'
+    crime = crime.upper()
+    if any(x in crime for x in ['CREDIT CARDS', 'EMBEZZLEMENT', 'FORGERY']): return 'الاحتيال والتزوير / Fraud and Forgery'
+    elif any(x in crime for x in ['ASSAULT', 'BATTERY', 'ROBBERY', 'HOMICIDE']): return 'العنف والاعتداء / Violence and Assault'
+    elif any(x in crime for x in ['VANDALISM', 'ARSON', 'DAMAGE']): return 'التخريب والتدمير / Vandalism and Destruction'
+    elif any(x in crime for x in ['VEHICLE - STOLEN', 'BURGLARY', 'THEFT']): return 'السرقة والسطو / Theft and Burglary'
+    elif any(x in crime for x in ['COURT', 'WEAPON', 'TRESPASSING']): return 'المخالفات القانونية والجرائم المتعلقة بالأسلحة / Legal Offences & Weapons'
+    elif any(x in crime for x in ['RAPE', 'SEX', 'TRAFFICKING']): return 'الجرائم الجنسية والاتجار / Sexual Crimes & Exploitation'
+    return 'جرائم متنوعة / Miscellaneous Crimes'
+
+# ==========================================
+# PARAMETERS & EXECUTION PLANS
+# ==========================================
+
+def read_source(frame, source):
+    """Raw column of `frame`, by raw or cleaned name (all-missing Series when absent)."""
+    for column in (source, SOURCES[source]):
+        if column in frame.columns:
+            return frame[column]
+    return pd.Series(np.nan, index=frame.index)
+
+def _fit_ages(frame):
+    ages = _numbers(read_source(frame, "Vict Age"))
+    return ages.where((ages >= 0) & (ages <= 100))
+
+def fit_params(frame):
+    """Training-time parameters of the feature definitions (JSON-serializable)."""
+    ages = _fit_ages(frame)
+    return {"vict_age_fill": float(ages.mean()) if ages.notna().any() else DEFAULT_PARAMS["vict_age_fill"]}
+
+def param_stats(frame):
+    """Sufficient statistics of fit_params for one chunk of a file (summed across chunks)."""
+    ages = _fit_ages(frame)
+    return {"vict_age_sum": float(ages.sum()), "vict_age_count": int(ages.count())}
+
+def params_from_stats(stats):
+    """fit_params of a file read in chunks, from the summed param_stats of its chunks."""
+    count = stats.get("vict_age_count", 0)
+    return {"vict_age_fill": stats["vict_age_sum"] / count if count else DEFAULT_PARAMS["vict_age_fill"]}
+
+class FeaturePlan:
+    """
+    Compiled subset of the DAG: the `targets` and their dependencies, in topological order.
+    run_batch(frame) -> DataFrame of the targets ; run_row(record) -> dict of the targets ;
+    run_lazy(lazy_frame) -> Polars LazyFrame of the targets.
+    """
+
+    def __init__(self, targets, params=None):
+        self.targets = list(targets)
+        self.params = dict(DEFAULT_PARAMS, **(params or {}))
+        self.steps = []
+        visiting = set()
+
+        def visit(name):
+            if name in SOURCES or name in (step.name for step in self.steps):
+                return
+            if name not in FEATURES:
+                raise ValueError(f"Unknown feature: {name}")
+            if name in visiting:
+                raise ValueError(f"Cyclic feature definition: {name}")
+            visiting.add(name)
+            for dependency in FEATURES[name].inputs:
+                visit(dependency)
+            self.steps.append(FEATURES[name])
+
+        for target in self.targets:
+            visit(target)
+        self.sources = sorted({i for step in self.steps for i in step.inputs if i in SOURCES})
+        self.categorical = categorical_features(self.targets)
+
+    def run_batch(self, frame):
+        values = {source: read_source(frame, source) for source in self.sources}
+        for step in self.steps:
+            values[step.name] = step.batch(self.params, *(values[i] for i in step.inputs))
+        return pd.DataFrame({name: values[name] for name in self.targets}, index=frame.index)
+
+    def run_row(self, record):
+        values = {source: record.get(source, record.get(SOURCES[source])) for source in self.sources}
+        for step in self.steps:
+            values[step.name] = step.row(self.params, *(values[i] for i in step.inputs))
+        return {name: values[name] for name in self.targets}
+
+    def run_lazy(self, frame, keep=()):
+        """
+        One Polars query (shared sub-expressions such as the parsed date are evaluated once by the
+        optimizer). `keep`: frame columns passed through after the targets.
+        """
+        columns = set(frame.collect_schema().names())
+        exprs = {}
+        for source in self.sources:
+            column = next((c for c in (source, SOURCES[source]) if c in columns), None)
+            exprs[source] = pl.col(column) if column is not None else pl.lit(None, dtype=pl.String)
+        for step in self.steps:
+            exprs[step.name] = step.lazy(self.params, *(exprs[i] for i in step.inputs))
+        return frame.select([exprs[name].alias(name) for name in self.targets] + [pl.col(c) for c in keep])
+
+def compile_plan(targets=MODEL_FEATURES, params=None):
+    return FeaturePlan(targets, params)
@@ -1,167 +1,263 @@
 import pandas as pd
 import numpy as np
+import hashlib
 import os
 import pickle
-import re
-from sklearn.preprocessing import LabelEncoder, RobustScaler
+import time
+
+import compact_processors
+import drift_profile
+import feature_defs
+
+# Pickled files that drive feature computation and target decoding (see processors_fingerprint)
+SERVING_ARTIFACTS = (
+    "feature_label_encoders.pkl", "robust_scaler.pkl", "target_label_encoder.pkl", "features_config.pkl"
+)
+
+def _is_serving_artifact(name):
+    return (name in SERVING_ARTIFACTS or name in (compact_processors.HEADER_FILENAME, compact_processors.SCALER_FILENAME)
+            or name.startswith(compact_processors.VOCAB_PREFIX))
+
+def processors_fingerprint(processors_path):
+    """Content hash of the serving artifacts: models with equal fingerprints can share one feature computation."""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(processors_path)):
+        path = os.path.join(processors_path, name)
+        if _is_serving_artifact(name) and os.path.isfile(path):
+            digest.update(name.encode())
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()[:16]
 
 class CrimeFeatureStore:
     def __init__(self, processors_path="processors"):
         self.processors_path = processors_path
         self.artifacts = {}
         self.is_loaded = False
+        # Optional instrumentation hook: object with observe_stage(stage, seconds)
+        # and observe_lookups(column, hits, misses). None = no overhead.
+        self.observer = None
         
-        # Define features that the model actually expects (The Schema)
-        self.required_features = [
-            'mocodes', 'premis_cd', 'location', 'weapon_used_cd', 'vict_age',
-            'day', 'area', 'crm_risk', 'month', 'vict_descent', 'status',
-            'weekday', 'hour_bin', 'year', 'vict_sex_f', 'vict_sex_m', 'vict_sex_x'
-        ]
-        
-        self.categorical_cols = [
-            'crm_risk', 'mocodes', 'vict_descent', 
-            'status', 'status_desc', 'location', 'hour_bin'
-        ]
+        # Define features that the model actually expects (The Schema, see feature_defs)
+        self.required_features = list(feature_defs.MODEL_FEATURES)
+        self.categorical_cols = feature_defs.categorical_features(self.required_features)
+        # Compiled once the training parameters are known (load_artifacts)
+        self.plan = None
+        # "scaled" (RobustScaler) or "native" (category dtype for tree models, no scaling), from the processors
+        self.feature_mode = "scaled"
+        self.cardinalities = {}
+        # Code-list features (Mocodes) sent as a sparse multi-hot block instead of one label, from the processors
+        self.multi_hot = []
 
     def load_artifacts(self):
-        """Loads Scalers and Encoders from disk."""
+        """
+        Loads Scalers and Encoders from disk.
+        The compact format (processors.json, memory-mapped vocabularies) is preferred over the pickles:
+        no sklearn import, no full deserialization of large vocabularies.
+        """
         if self.is_loaded: return
         
         try:
-            with open(os.path.join(self.processors_path, "feature_label_encoders.pkl"), "rb") as f:
-                self.artifacts["feature_encoders"] = pickle.load(f)
-            with open(os.path.join(self.processors_path, "robust_scaler.pkl"), "rb") as f:
-                self.artifacts["scaler"] = pickle.load(f)
-            # Try loading target encoder (preferred)
-            if os.path.exists(os.path.join(self.processors_path, "target_label_encoder.pkl")):
-                with open(os.path.join(self.processors_path, "target_label_encoder.pkl"), "rb") as f:
-                    self.artifacts["target_encoder"] = pickle.load(f)
+            compact = compact_processors.load_processors(self.processors_path)
+            if compact is not None:
+                self.artifacts.update(compact)
+            else:
+                self._load_pickles()
+            # Reference feature profile for in-service drift monitoring (optional)
+            profile = drift_profile.load_profile(self.processors_path)
+            if profile is not None:
+                self.artifacts["reference_profile"] = profile
+            # Only the features the model needs (and their inputs) are computed
+            self.plan = feature_defs.compile_plan(self.required_features, self.artifacts.get("feature_params"))
+            self.feature_mode = self.artifacts.get("feature_mode") or "scaled"
+            if self.feature_mode == "native":
+                self.cardinalities = {col: self._vocabulary_size(col) for col in self.artifacts["feature_encoders"]}
+            self.multi_hot = list(self.artifacts.get("multi_hot") or [])
             
             self.is_loaded = True
-            print("✅ Feature Store: Artifacts loaded.")
+            print(f"✅ Feature Store: Artifacts loaded ({'compact' if compact is not None else 'pickle'}).")
         except FileNotFoundError:
             print("⚠️ Feature Store: Artifacts not found. Run training first.")
 
+    def _load_pickles(self):
+        """Internal: legacy processors (sklearn LabelEncoder / RobustScaler pickles)."""
+        with open(os.path.join(self.processors_path, "feature_label_encoders.pkl"), "rb") as f:
+            self.artifacts["feature_encoders"] = pickle.load(f)
+        # No scaler in native feature mode
+        if os.path.exists(os.path.join(self.processors_path, "robust_scaler.pkl")):
+            with open(os.path.join(self.processors_path, "robust_scaler.pkl"), "rb") as f:
+                self.artifacts["scaler"] = pickle.load(f)
+        # Try loading target encoder (preferred)
+        if os.path.exists(os.path.join(self.processors_path, "target_label_encoder.pkl")):
+            with open(os.path.join(self.processors_path, "target_label_encoder.pkl"), "rb") as f:
+                self.artifacts["target_encoder"] = pickle.load(f)
+        # Fitted feature parameters (absent from older runs: feature_defs defaults)
+        if os.path.exists(os.path.join(self.processors_path, "features_config.pkl")):
+            with open(os.path.join(self.processors_path, "features_config.pkl"), "rb") as f:
+                config = pickle.load(f)
+            self.artifacts["feature_params"] = config.get("feature_params")
+            self.artifacts["feature_mode"] = config.get("feature_mode")
+            self.artifacts["multi_hot"] = config.get("multi_hot")
+
     def categorize_crime(self, crime):
-        if not isinstance(crime, str):
-            return 'جرائم متنوعة / Miscellaneous Crimes'
-        crime = crime.upper()
-        if any(x in crime for x in ['CREDIT CARDS', 'EMBEZZLEMENT', 'DEFRAUDING', 'FORGERY', 'IDENTITY']):
-            return 'الاحتيال والتزوير / Fraud and Forgery'
-        elif any(x in crime for x in ['ASSAULT', 'BATTERY', 'ROBBERY', 'HOMICIDE', 'KIDNAPPING', 'STALKING']):
-            return 'العنف والاعتداء / Violence and Assault'
-        elif any(x in crime for x in ['VANDALISM', 'ARSON', 'SHOTS FIRED', 'THROWING OBJECT', 'DAMAGE']):
-            return 'التخريب والتدمير / Vandalism and Destruction'
-        elif any(x in crime for x in ['VEHICLE - STOLEN', 'BURGLARY', 'THEFT', 'BUNCO', 'PICKPOCKET']):
-            return 'السرقة والسطو / Theft and Burglary'
-        elif any(x in crime for x in ['COURT', 'CONTEMPT', 'VIOLATION', 'TRESPASSING', 'WEAPON', 'FIREARM']):
-            return 'المخالفات القانونية والجرائم المتعلقة بالأسلحة / Legal Offences & Weapons'
-        elif any(x in crime for x in ['RAPE', 'SEX', 'LEWD', 'PIMPING', 'TRAFFICKING', 'INCEST']):
-            return 'الجرائم الجنسية والاتجار / Sexual Crimes & Exploitation'
-        return 'جرائم متنوعة / Miscellaneous Crimes'
-
-    def _clean_column_names(self, df):
-        """Internal: Standardize names"""
-        df.columns = (
-            df.columns
-            .str.lower()
-            .str.replace(' ', '_')
-            .str.replace('-', '_')
-            .str.replace('/', '_')
-            .str.replace(r'[^a-z0-9_]', '', regex=True)
-        )
-        if "part_1_2" in df.columns:
-            df = df.rename(columns={"part_1_2": "crm_risk"})
-        return df
+        """Same classes as the training labels (single definition in feature_defs)."""
+        return feature_defs.categorize_crime(crime)
 
-    def _engineer_features(self, df):
-        """Internal: Create derived features (Time, Date)"""
-        # Ensure date format
-        if 'date_occ' in df.columns and 'time_occ' in df.columns:
-            df['date_occ'] = pd.to_datetime(df['date_occ'], format="%m/%d/%Y %I:%M:%S %p", errors='coerce')
-            
-            if df['date_occ'].isnull().any():
-                df['date_occ'] = df['date_occ'].fillna(pd.Timestamp("1900-01-01"))
+    def _lap(self, stage, start):
+        """Internal: report a sub-step duration to the observer, return the new start time."""
+        now = time.perf_counter()
+        if self.observer is not None:
+            self.observer.observe_stage(stage, now - start)
+        return now
 
-            df['year'] = df['date_occ'].dt.year
-            df['month'] = df['date_occ'].dt.month
-            df['day'] = df['date_occ'].dt.day
-            df['weekday'] = df['date_occ'].dt.weekday
-            
-            df['hour'] = df['time_occ'] // 100
-            df['minute'] = df['time_occ'] % 100 
-            
-            bins = [0, 6, 12, 18, 24]
-            labels = ['Night', 'Morning', 'Afternoon', 'Evening']
-            df['hour_bin'] = pd.cut(df['hour'], bins=bins, labels=labels, right=False).astype(str)
-        return df
+    def _encoder_mapping(self, col):
+        """Internal: class -> code dictionary for a LabelEncoder (built once, then cached)"""
+        mappings = self.artifacts.setdefault("encoder_mappings", {})
+        if col not in mappings:
+            le = self.artifacts["feature_encoders"][col]
+            mappings[col] = {cls: idx for idx, cls in enumerate(le.classes_)}
+        return mappings[col]
 
-    def _clean_text_and_fill(self, df):
-        """Internal: Impute missing values"""
-        if 'premis_desc' in df.columns:
-            df['premis_desc'] = df['premis_desc'].str.title().str.replace(r'\(.*?\)', '', regex=True).str.strip()
-        
-        if 'vict_sex' in df.columns:
-            df['vict_sex'] = df['vict_sex'].fillna('X').replace({'H': 'X', '-': 'X'})
-        if 'vict_descent' in df.columns:
-            df['vict_descent'] = df['vict_descent'].fillna('UNKNOWN')
-
-        if 'vict_age' in df.columns:
-            df.loc[(df['vict_age'] < 0) | (df['vict_age'] > 100), 'vict_age'] = np.nan
-            df['vict_age'] = df['vict_age'].fillna(30) 
-
-        defaults = {'mocodes': '0', 'premis_cd': 0, 'weapon_used_cd': 0, 'status': 'IC'}
-        for col, val in defaults.items():
-            if col in df.columns:
-                df[col] = df[col].fillna(val)
-        
-        return df
+    def _vocabulary_size(self, col):
+        encoder = self.artifacts["feature_encoders"][col]
+        return len(encoder) if hasattr(encoder, "lookup") else len(encoder.classes_)
+
+    def _unknown_code(self, col):
+        """Internal: code of unseen classes - OTHER_CATEGORY in capped (native) vocabularies, else 0"""
+        codes = self.artifacts.setdefault("unknown_codes", {})
+        if col not in codes:
+            encoder = self.artifacts["feature_encoders"][col]
+            if hasattr(encoder, "lookup"):
+                code = int(encoder.lookup([feature_defs.OTHER_CATEGORY])[0])
+            else:
+                code = self._encoder_mapping(col).get(feature_defs.OTHER_CATEGORY, -1)
+            codes[col] = code if code >= 0 else 0
+        return codes[col]
+
+    def _observe_lookups(self, col, codes):
+        if self.observer is not None:
+            misses = int(codes.isna().sum())
+            self.observer.observe_lookups(col, len(codes) - misses, misses)
+
+    def _multi_hot(self, col, values):
+        """Internal: code lists -> CSR multi-hot block over the code vocabulary (rare/unseen codes -> OTHER_CATEGORY)"""
+        indptr, codes = feature_defs.code_lists(values)
+        # Small code vocabulary: hash index built once (faster than a binary search per code)
+        indexes = self.artifacts.setdefault("code_indexes", {})
+        if col not in indexes:
+            indexes[col] = pd.Index(self.artifacts["feature_encoders"][col].classes_)
+        positions = indexes[col].get_indexer(codes)
+        known = positions >= 0
+        if self.observer is not None:
+            self.observer.observe_lookups(col, int(known.sum()), int((~known).sum()))
+        positions = np.where(known, positions, self._unknown_code(col))
+        return feature_defs.multi_hot(indptr, positions, self._vocabulary_size(col))
 
     def get_online_features(self, input_dict):
         """
         PUBLIC API: Transforms a single dictionary of raw inputs into model-ready vector.
+        Scalar path of the same feature definitions (no DataFrame round-trip before scaling).
+        """
+        return self.scale_features(self.build_feature_row(input_dict))
+
+    def build_feature_row(self, input_dict):
+        """
+        PUBLIC API: Row executor version of build_feature_frame.
+        One dictionary of raw inputs -> one-row unscaled feature frame (drift monitoring, inference log).
         """
         if not self.is_loaded: self.load_artifacts()
 
-        # 1. To DataFrame
-        df = pd.DataFrame([input_dict])
-        
-        # 2. Transformations
-        df = self._clean_column_names(df)
-        df = self._engineer_features(df)
-        df = self._clean_text_and_fill(df)
-        
-        # 3. Encoding (One-Hot Manually)
-        # We handle this manually because get_dummies might miss columns on a single row
-        sex = str(input_dict.get('Vict Sex', 'X')).upper()
-        df['vict_sex_f'] = 1 if sex == 'F' else 0
-        df['vict_sex_m'] = 1 if sex == 'M' else 0
-        df['vict_sex_x'] = 1 if sex not in ['F', 'M'] else 0
-        
-        # 4. Encoding (Label)
-        for col, le in self.artifacts["feature_encoders"].items():
-            col_lower = col.lower()
-            if col_lower in df.columns:
-                val = str(df[col_lower].iloc[0])
-                if val in le.classes_:
-                    df[col_lower] = le.transform([val])[0]
-                else:
-                    df[col_lower] = 0 # Handle unknown classes
-        
-        # 5. Selection & Ordering (Strict)
-        final_df = pd.DataFrame()
-        for feat in self.required_features:
-            if feat in df.columns:
-                final_df[feat] = df[feat]
+        start = time.perf_counter()
+        row = self.plan.run_row(input_dict)
+        start = self._lap("engineer", start)
+
+        # Label encoding - unknown classes -> OTHER_CATEGORY code (native) or 0
+        for col in self.plan.categorical:
+            encoder = self.artifacts["feature_encoders"].get(col)
+            if encoder is None:
+                continue
+            value = feature_defs.category_string(row[col])
+            if col in self.multi_hot:
+                row[col] = value   # code list, multi-hot encoded with the model input (scale_features)
+                continue
+            if hasattr(encoder, "lookup"):
+                code = int(encoder.lookup([value])[0])
+                code = code if code >= 0 else None
             else:
-                final_df[feat] = 0
-        
-        # 6. Scaling
-        X_scaled = self.artifacts["scaler"].transform(final_df)
-        
+                code = self._encoder_mapping(col).get(value)
+            if self.observer is not None:
+                self.observer.observe_lookups(col, int(code is not None), int(code is None))
+            row[col] = code if code is not None else self._unknown_code(col)
+        self._lap("encode", start)
+
+        return pd.DataFrame([row], columns=self.required_features)
+
+    def get_batch_features(self, raw_df):
+        """
+        PUBLIC API: Vectorized version of get_online_features.
+        Transforms a DataFrame of raw inputs (one row per incident) into a model-ready matrix.
+        """
+        return self.scale_features(self.build_feature_frame(raw_df))
+
+    def build_feature_frame(self, raw_df):
+        """
+        PUBLIC API: Raw inputs -> encoded, unscaled features in `required_features` order.
+        This is the space the training reference profile is computed in (drift monitoring).
+        Multi-hot code lists stay as strings here (outside the profile).
+        """
+        if not self.is_loaded: self.load_artifacts()
+
+        # 1. Feature definitions (batch executor, the raw frame is left untouched)
+        start = time.perf_counter()
+        df = self.plan.run_batch(raw_df)
+        start = self._lap("engineer", start)
+
+        # 2. Encoding (Label) - dictionary lookup, unknown classes -> OTHER_CATEGORY code (native) or 0
+        for col in self.plan.categorical:
+            encoder = self.artifacts["feature_encoders"].get(col)
+            if encoder is None:
+                continue
+            values = feature_defs.category_strings(df[col])
+            if col in self.multi_hot:
+                df[col] = values
+                continue
+            if hasattr(encoder, "lookup"):
+                # Compact vocabulary: vectorized binary search, -1 = unknown class
+                codes = pd.Series(encoder.lookup(values.to_numpy()), index=df.index)
+                codes = codes.where(codes >= 0)
+            else:
+                codes = values.map(self._encoder_mapping(col))
+            self._observe_lookups(col, codes)
+            df[col] = codes.fillna(self._unknown_code(col)).astype(int)
+        self._lap("encode", start)
+
+        return df
+
+    def scale_features(self, feature_df):
+        """
+        PUBLIC API: Unscaled feature frame -> model-ready matrix.
+        Native feature mode: no scaling, categorical codes become category dtype columns (same as training).
+        Multi-hot code lists: CSR matrix, scaled dense features then one column per vocabulary code.
+        """
+        start = time.perf_counter()
+        if self.feature_mode == "native":
+            X_scaled = feature_defs.native_frame(feature_df, self.cardinalities)
+        elif self.multi_hot:
+            X_scaled = feature_defs.with_multi_hot(self.artifacts["scaler"].transform(feature_df.drop(columns=self.multi_hot)),
+                                                   [self._multi_hot(col, feature_df[col]) for col in self.multi_hot])
+        else:
+            X_scaled = self.artifacts["scaler"].transform(feature_df)
+        self._lap("scale", start)
         return X_scaled
 
     def decode_target(self, pred_idx):
         if "target_encoder" in self.artifacts:
             return self.artifacts["target_encoder"].inverse_transform([pred_idx])[0]
-        return str(pred_idx)
\ No newline at end of file
+        return str(pred_idx)
+
+    def decode_targets(self, pred_indices):
+        """Vectorized version of decode_target."""
+        if "target_encoder" in self.artifacts:
+            return self.artifacts["target_encoder"].inverse_transform(np.asarray(pred_indices).astype(int))
+        return np.asarray(pred_indices).astype(str)
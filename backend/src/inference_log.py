@@ -0,0 +1,269 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Dépendance optionnelle : sans elle, seul le JSONL est écrit
+    pa = pq = None
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+DEFAULT_MAX_ROWS = 100_000        # lignes en attente au maximum (au-delà : rejetées et comptées)
+DEFAULT_BATCH_ROWS = 1000         # flush dès que ce volume est atteint...
+DEFAULT_FLUSH_SECONDS = 2.0       # ...ou après ce délai
+DEFAULT_ROTATE_BYTES = 64 * 2**20 # nouveau fichier au-delà de cette taille...
+DEFAULT_ROTATE_SECONDS = 3600     # ...ou de cet âge
+
+# ==========================================
+# FICHIERS ROTATIFS
+# ==========================================
+
+class _RotatingJsonl:
+    extension = "jsonl"
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "a", encoding="utf-8")
+
+    def write(self, entries):
+        for entry in entries:
+            for record in entry.records():
+                self._f.write(json.dumps(record, ensure_ascii=False, default=_json_default))
+                self._f.write("\n")
+        self._f.flush()
+
+    def size(self):
+        return self._f.tell()
+
+    def close(self):
+        self._f.close()
+
+class _RotatingParquet:
+    extension = "parquet"
+
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+        self._bytes = 0
+
+    def write(self, entries):
+        frame = pd.concat([e.flat_frame() for e in entries], ignore_index=True)
+        if self._writer is None:
+            # Schéma explicite (types des champs, pas ceux du premier lot) : une colonne entièrement vide
+            # dans le premier lot ne devient pas de type null, ce qui rejetterait tous les lots suivants
+            features = [c[len("feature."):] for c in frame.columns if c.startswith("feature.")]
+            self._writer = pq.ParquetWriter(self.path, parquet_schema(entries[0].logger.field_kinds, features))
+        schema = self._writer.schema
+        table = pa.Table.from_pandas(frame.reindex(columns=schema.names), schema=schema, preserve_index=False)
+        self._writer.write_table(table)
+        self._bytes += table.nbytes
+
+    def size(self):
+        return self._bytes
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+def parquet_schema(field_kinds, feature_names):
+    """Colonnes de LogEntry.flat_frame : entrées en string ou float64 selon leur type déclaré, features en float64."""
+    fields = [("ts", pa.float64()), ("request_id", pa.string()), ("row", pa.int64()), ("endpoint", pa.string()),
+              ("model", pa.string()), ("version", pa.string()), ("latency_ms", pa.float64()),
+              ("prediction", pa.string()), ("confidence", pa.float64())]
+    fields += [(f"input.{field}", pa.string() if kind is str else pa.float64()) for field, kind in field_kinds.items()]
+    fields += [(f"feature.{name}", pa.float64()) for name in feature_names]
+    return pa.schema(fields)
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+# ==========================================
+# ENTRÉE DE LOG (une requête = un lot de lignes)
+# ==========================================
+
+class LogEntry:
+    """
+    Références vers ce qui a déjà été calculé pour la requête (aucune copie, aucune sérialisation) :
+    la mise en forme est faite par le thread d'écriture.
+    """
+    __slots__ = ("ts", "request_id", "endpoint", "model", "version", "latency_ms",
+                 "inputs", "features", "labels", "confidences", "logger")
+
+    def __init__(self, logger, endpoint, model, version, latency_ms, inputs, features, labels, confidences):
+        self.ts = time.time()
+        self.request_id = uuid.uuid4().hex
+        self.endpoint, self.model, self.version, self.latency_ms = endpoint, model, version, latency_ms
+        self.inputs, self.features, self.labels, self.confidences = inputs, features, labels, confidences
+        self.logger = logger
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _inputs(self):
+        return self.inputs.reindex(columns=self.logger.input_fields)
+
+    def records(self):
+        inputs = self._inputs()
+        inputs = inputs.astype(object).where(inputs.notna(), None).to_dict("records")
+        features = self.features.to_dict("records") if self.features is not None else [None] * len(self)
+        for row, (raw, feat, label, conf) in enumerate(zip(inputs, features, self.labels, self.confidences)):
+            yield {
+                "ts": self.ts, "request_id": self.request_id, "row": row, "endpoint": self.endpoint,
+                "model": self.model, "version": self.version, "latency_ms": self.latency_ms,
+                "input": raw, "features": feat, "prediction": label, "confidence": float(conf)
+            }
+
+    def flat_frame(self):
+        """Colonnes à plat et à types fixes (schéma Parquet stable d'un lot à l'autre)."""
+        n = len(self)
+        frame = pd.DataFrame({
+            "ts": np.full(n, self.ts), "request_id": [self.request_id] * n, "row": np.arange(n),
+            "endpoint": [self.endpoint] * n, "model": [self.model] * n, "version": [str(self.version)] * n,
+            "latency_ms": np.full(n, float(self.latency_ms)),
+            "prediction": np.asarray(self.labels, dtype=object).astype(str),
+            "confidence": np.asarray(self.confidences, dtype=float)
+        })
+        inputs = self._inputs().reset_index(drop=True)
+        for field in self.logger.input_fields:
+            col = inputs[field]
+            if self.logger.field_kinds.get(field) is str:
+                frame[f"input.{field}"] = col.astype(object).where(col.notna(), None)
+            else:
+                frame[f"input.{field}"] = pd.to_numeric(col, errors="coerce").astype(float)
+        if self.features is not None:
+            for name in self.features.columns:
+                frame[f"feature.{name}"] = pd.to_numeric(self.features[name], errors="coerce").astype(float).values
+        return frame
+
+# ==========================================
+# LOGGER ASYNCHRONE
+# ==========================================
+
+class InferenceLogger:
+    """
+    Journal des prédictions servies, écrit hors du chemin de requête :
+    - log() ajoute une référence dans un buffer borné (en lignes) : O(1), jamais bloquant
+    - un thread regroupe les entrées et les écrit par lots dans des fichiers rotatifs (JSONL, Parquet)
+    - buffer plein : l'entrée est rejetée et comptée (crime_api_inference_log_rows_total{result="dropped"})
+    """
+
+    def __init__(self, directory, field_kinds, formats=("jsonl",), max_rows=DEFAULT_MAX_ROWS,
+                 batch_rows=DEFAULT_BATCH_ROWS, flush_seconds=DEFAULT_FLUSH_SECONDS,
+                 rotate_bytes=DEFAULT_ROTATE_BYTES, rotate_seconds=DEFAULT_ROTATE_SECONDS):
+        self.directory = directory
+        self.field_kinds = dict(field_kinds)
+        self.input_fields = list(field_kinds)
+        self.formats = [f for f in formats if f == "jsonl" or (f == "parquet" and pq is not None)]
+        if "parquet" in formats and pq is None:
+            print("⚠️ pyarrow absent : journal d'inférence en JSONL uniquement.")
+        self.max_rows = max_rows
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+
+        self._pending = deque()
+        self._pending_rows = 0
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._writers = {}
+        self._opened_at = 0.0
+        self._sequence = 0
+
+    # ---------- Chemin de requête ----------
+    def log(self, endpoint, model, version, latency_ms, inputs, features, labels, confidences):
+        entry = LogEntry(self, endpoint, model, version, latency_ms, inputs, features, labels, confidences)
+        n = len(entry)
+        with self._cond:
+            if self._stopping or self._pending_rows + n > self.max_rows:
+                for fmt in self.formats:
+                    metrics.INFERENCE_LOG_ROWS.labels(result="dropped", format=fmt).inc(n)
+                return False
+            self._pending.append(entry)
+            self._pending_rows += n
+            metrics.INFERENCE_LOG_QUEUE.set(self._pending_rows)
+            if self._pending_rows >= self.batch_rows:
+                self._cond.notify()
+        return True
+
+    # ---------- Thread d'écriture ----------
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="inference-log-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def _take(self):
+        with self._cond:
+            if self._pending_rows < self.batch_rows and not self._stopping:
+                self._cond.wait(self.flush_seconds)
+            entries = list(self._pending)
+            self._pending.clear()
+            self._pending_rows = 0
+            metrics.INFERENCE_LOG_QUEUE.set(0)
+            return entries
+
+    def _run(self):
+        while True:
+            entries = self._take()
+            if entries:
+                self._write(entries)
+            if self._stopping and not self._pending:
+                break
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+    def _write(self, entries):
+        """Chaque format est écrit et compté séparément : un Parquet en échec n'invalide pas le JSONL."""
+        rows = sum(len(e) for e in entries)
+        try:
+            self._rotate_if_needed()
+        except Exception as e:
+            print(f"⚠️ Journal d'inférence : rotation impossible ({e})")
+            for fmt in self.formats:
+                metrics.INFERENCE_LOG_ROWS.labels(result="failed", format=fmt).inc(rows)
+            return
+        for fmt, writer in self._writers.items():
+            try:
+                writer.write(entries)
+                metrics.INFERENCE_LOG_ROWS.labels(result="written", format=fmt).inc(rows)
+            except Exception as e:
+                print(f"⚠️ Journal d'inférence ({fmt}) : échec d'écriture ({e})")
+                metrics.INFERENCE_LOG_ROWS.labels(result="failed", format=fmt).inc(rows)
+
+    def _rotate_if_needed(self):
+        expired = time.time() - self._opened_at >= self.rotate_seconds
+        too_big = any(w.size() >= self.rotate_bytes for w in self._writers.values())
+        if self._writers and not (expired or too_big):
+            return
+        for writer in self._writers.values():
+            writer.close()
+        self._sequence += 1
+        stem = f"inference-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._sequence:04d}"
+        classes = {"jsonl": _RotatingJsonl, "parquet": _RotatingParquet}
+        self._writers = {fmt: classes[fmt](os.path.join(self.directory, f"{stem}.{classes[fmt].extension}"))
+                         for fmt in self.formats}
+        self._opened_at = time.time()
+
+    def close(self, timeout=10):
+        """Vide le buffer puis ferme les fichiers (arrêt de l'API)."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,236 @@
+import glob
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import drift_profile
+from preprocessing2 import clean_column_names
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+STATE_FILENAME = "log_drift_state.json"
+STATE_VERSION = 1
+
+DEFAULT_WINDOW_SECONDS = 3600     # fenêtres horaires
+DEFAULT_LATENESS_SECONDS = 300    # une fenêtre n'est close qu'une fois ce délai dépassé (flush des pods)
+DEFAULT_MIN_ROWS = 500            # en dessous : fenêtre rapportée mais non scorée
+DEFAULT_CHUNK_LINES = 50_000      # lignes featurisées par appel au Feature Store
+HISTORY_WINDOWS = 168             # résultats conservés dans l'état (une semaine de fenêtres horaires)
+LOG_PATTERN = "*.jsonl"
+
+# ==========================================
+# LECTURE INCRÉMENTALE DES JOURNAUX
+# ==========================================
+
+def read_new_lines(path, offset, chunk_lines=DEFAULT_CHUNK_LINES):
+    """
+    Lignes complètes ajoutées depuis `offset`, par paquets : yield (lignes, nouvel offset).
+    Une dernière ligne sans saut de ligne est en cours d'écriture : elle sera lue au prochain passage.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        lines = []
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            if line.strip():
+                lines.append(line)
+            if len(lines) >= chunk_lines:
+                yield lines, offset
+                lines = []
+        yield lines, offset
+
+def parse_records(lines, default_ts):
+    """
+    Journal d'inférence ({"ts", "input": {...}, ...}) ou NDJSON de requêtes brutes (une requête par ligne).
+    Les lignes illisibles (JSON invalide, pas un objet, ts non numérique) sont ignorées et comptées.
+    Retourne (DataFrame brut aux noms de l'API, timestamps, lignes ignorées).
+    """
+    inputs, ts = [], []
+    bad = 0
+    for line in lines:
+        try:
+            record = json.loads(line)
+            stamp = float(record.get("ts", default_ts))
+        except (ValueError, TypeError, AttributeError):
+            bad += 1
+            continue
+        inputs.append(record.get("input", record))
+        ts.append(stamp)
+    return pd.DataFrame(inputs), np.asarray(ts, dtype=float), bad
+
+def profile_fingerprint(profile):
+    return hashlib.sha1(json.dumps(profile["features"], sort_keys=True).encode()).hexdigest()[:16]
+
+# ==========================================
+# AGRÉGATION PAR FENÊTRE (histogrammes fusionnables)
+# ==========================================
+
+class LogWindowDrift:
+    """
+    Drift de production par fenêtres de temps, calculé sur le journal d'inférence :
+    - seules les lignes ajoutées depuis le dernier passage sont lues (offset par fichier dans l'état)
+    - featurisation vectorisée par le Feature Store (build_feature_frame, espace du profil)
+    - chaque fenêtre ne garde que des effectifs binnés comme le profil + des compteurs de manquants :
+      l'état ne dépend pas du volume et les passages successifs s'additionnent
+    - une fenêtre close (filigrane > fin + retard toléré) est scorée une fois, puis retirée de l'état
+    """
+
+    def __init__(self, profile, store, state=None, window_seconds=DEFAULT_WINDOW_SECONDS,
+                 lateness_seconds=DEFAULT_LATENESS_SECONDS, min_rows=DEFAULT_MIN_ROWS,
+                 chunk_lines=DEFAULT_CHUNK_LINES):
+        self.profile = profile
+        self.store = store
+        self.window_seconds = window_seconds
+        self.lateness_seconds = lateness_seconds
+        self.min_rows = min_rows
+        self.chunk_lines = chunk_lines
+        self.binners = {name: drift_profile.FeatureBinner(spec) for name, spec in profile["features"].items()}
+        self.missing_columns = list(profile.get("missing_rates", {}))
+        self.state = self._restore(state or {})
+
+    def _restore(self, state):
+        fresh = {"version": STATE_VERSION, "profile": profile_fingerprint(self.profile),
+                 "window_seconds": self.window_seconds, "offsets": state.get("offsets", {}),
+                 "windows": {}, "watermark": state.get("watermark", 0.0), "closed_until": 0.0,
+                 "late_rows": 0, "bad_lines": 0, "history": []}
+        if (state.get("version") != STATE_VERSION or state.get("profile") != fresh["profile"]
+                or state.get("window_seconds") != self.window_seconds):
+            if state.get("windows"):
+                print("⚠️ Profil ou taille de fenêtre modifiés : fenêtres ouvertes réinitialisées")
+            return fresh
+        state.setdefault("bad_lines", 0)  # état écrit avant le comptage des lignes illisibles
+        return state
+
+    # ---------- Ingestion ----------
+    def scan(self, log_dir, pattern=LOG_PATTERN):
+        """Lit les segments nouveaux de tous les journaux du répertoire ; retourne le nombre de lignes ajoutées."""
+        offsets = self.state["offsets"]
+        paths = sorted(glob.glob(os.path.join(log_dir, pattern)))
+        names = {os.path.basename(p) for p in paths}
+        for name in list(offsets):
+            if name not in names:
+                del offsets[name]  # fichier purgé par la rétention
+
+        added = 0
+        for path in paths:
+            name = os.path.basename(path)
+            offset = offsets.get(name, 0)
+            if os.path.getsize(path) < offset:
+                offset = 0  # fichier tronqué / recréé sous le même nom
+            for lines, offset in read_new_lines(path, offset, self.chunk_lines):
+                if lines:
+                    raw, ts, bad = parse_records(lines, default_ts=os.path.getmtime(path))
+                    if bad:
+                        print(f"⚠️ {name} : {bad} ligne(s) illisible(s) ignorée(s)")
+                        self.state["bad_lines"] += bad
+                    self.add(raw, ts)
+                    added += len(lines) - bad
+                offsets[name] = offset
+        return added
+
+    def add(self, raw_df, ts):
+        """Ajoute un lot de requêtes brutes (timestamps en secondes) aux fenêtres correspondantes."""
+        ts = np.asarray(ts, dtype=float)
+        late = ts < self.state["closed_until"]
+        if late.any():
+            self.state["late_rows"] += int(late.sum())
+            raw_df, ts = raw_df[~late].reset_index(drop=True), ts[~late]
+        if not len(raw_df):
+            return
+
+        features = self.store.build_feature_frame(raw_df)
+        matrix = drift_profile.to_float_matrix(features)
+        columns = [(i, name) for i, name in enumerate(features.columns) if name in self.binners]
+        raw_clean = clean_column_names(raw_df.copy()).rename(columns={"part_1_2": "crm_risk"})
+        missing = {col: raw_clean[col].isna().to_numpy() for col in self.missing_columns if col in raw_clean.columns}
+
+        starts = np.floor(ts / self.window_seconds) * self.window_seconds
+        for start in np.unique(starts):
+            rows = starts == start
+            window = self._window(start)
+            window["rows"] += int(rows.sum())
+            for i, name in columns:
+                counts = self.binners[name].count(matrix[rows, i])
+                window["counts"][name] = (np.asarray(window["counts"][name]) + counts).tolist()
+            for col, is_missing in missing.items():
+                window["missing"][col] = window["missing"].get(col, 0) + int(is_missing[rows].sum())
+        self.state["watermark"] = max(self.state["watermark"], float(ts.max()))
+
+    def _window(self, start):
+        key = str(int(start))
+        if key not in self.state["windows"]:
+            self.state["windows"][key] = {
+                "rows": 0, "missing": {},
+                "counts": {name: [0] * b.n_slots for name, b in self.binners.items()}
+            }
+        return self.state["windows"][key]
+
+    # ---------- Scoring ----------
+    def score_window(self, start, window):
+        result = {"window_start": start, "window_end": start + self.window_seconds, "rows": window["rows"]}
+        if window["rows"] < self.min_rows:
+            result.update({"scored": False, "drift_detected": False, "missing_rate_alerts": []})
+            return result
+        result.update(drift_profile.score_counts(self.profile, window["counts"]))
+        rates = {col: n / window["rows"] for col, n in window["missing"].items()}
+        result.update(drift_profile.missing_rate_report(self.profile, rates))
+        result["scored"] = True
+        return result
+
+    def close_windows(self, force=False):
+        """Score et retire les fenêtres closes (toutes si `force`) ; retourne leurs résultats dans l'ordre."""
+        horizon = self.state["watermark"] - self.lateness_seconds
+        closed = []
+        for key in sorted(self.state["windows"], key=int):
+            start = int(key)
+            if not force and start + self.window_seconds > horizon:
+                continue
+            closed.append(self.score_window(start, self.state["windows"].pop(key)))
+            self.state["closed_until"] = max(self.state["closed_until"], start + self.window_seconds)
+        self.state["history"] = (self.state["history"] + closed)[-HISTORY_WINDOWS:]
+        return closed
+
+    def open_windows(self):
+        return [{"window_start": int(k), "rows": w["rows"]} for k, w in sorted(self.state["windows"].items())]
+
+# ==========================================
+# ÉTAT PERSISTANT
+# ==========================================
+
+def load_state(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_state(state, path):
+    """Écriture atomique : un passage interrompu ne laisse jamais un état à moitié écrit."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+    return path
+
+def run_log_windows(profile, store, log_dir, state_path, force=False, **kwargs):
+    """Un passage complet : état -> segments nouveaux -> fenêtres closes scorées -> état."""
+    start = time.perf_counter()
+    windows = LogWindowDrift(profile, store, state=load_state(state_path), **kwargs)
+    added = windows.scan(log_dir)
+    closed = windows.close_windows(force=force)
+    save_state(windows.state, state_path)
+    return {
+        "new_rows": added,
+        "closed_windows": closed,
+        "open_windows": windows.open_windows(),
+        "late_rows": windows.state["late_rows"],
+        "bad_lines": windows.state["bad_lines"],
+        "drift_detected": any(w["drift_detected"] or w["missing_rate_alerts"] for w in closed),
+        "duration_seconds": round(time.perf_counter() - start, 4)
+    }
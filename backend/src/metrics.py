@@ -0,0 +1,225 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+import prometheus_client
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+
+import worker_state
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+PROMETHEUS_CONTENT_TYPE = prometheus_client.CONTENT_TYPE_LATEST
+
+# Mode multiprocess de prometheus_client (serve.py) : chaque process écrit ses valeurs dans des fichiers mmap
+# du dossier PROMETHEUS_MULTIPROC_DIR (posé par worker_state.enable), agrégés par /metrics. prometheus_client
+# le choisit à l'import : worker_state.enable doit précéder le premier import de ce module.
+MULTIPROCESS = bool(os.environ.get(worker_state.MULTIPROC_DIR_ENV))
+
+# Secondes : de 0.25 ms (lookup) à 10 s (gros lots)
+LATENCY_BUCKETS = (0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+
+prometheus_client.disable_created_metrics()   # pas de séries *_created (absentes en mode multiprocess)
+
+# ==========================================
+# MÉTRIQUES DE L'API
+# ==========================================
+REGISTRY = CollectorRegistry()
+_GAUGES = {}   # nom -> jauge (recopiées du maître dans chaque worker forké, voir inherit_gauges)
+
+def _gauge(name, documentation, labelnames=()):
+    """Jauge de l'état d'un process : en mode multiprocess, une série par worker vivant (label `pid`)."""
+    gauge = Gauge(name, documentation, labelnames, registry=REGISTRY, multiprocess_mode="liveall")
+    _GAUGES[name] = gauge
+    return gauge
+
+REQUESTS = Counter(
+    "crime_api_requests_total", "Requêtes HTTP traitées, par route et code de statut.",
+    ("endpoint", "method", "status"), registry=REGISTRY)
+REQUEST_LATENCY = Histogram(
+    "crime_api_request_duration_seconds", "Durée totale des requêtes HTTP.", ("endpoint",),
+    registry=REGISTRY, buckets=LATENCY_BUCKETS)
+STAGE_LATENCY = Histogram(
+    "crime_api_stage_duration_seconds",
+    "Durée par étape du chemin de prédiction (validation, features.*, predict, predict_proba, decode_target).",
+    ("stage",), registry=REGISTRY, buckets=LATENCY_BUCKETS)
+BATCH_SIZE = Histogram(
+    "crime_api_batch_size", "Nombre de lignes scorées par appel au modèle.", ("endpoint",),
+    registry=REGISTRY, buckets=BATCH_SIZE_BUCKETS)
+CACHE_LOOKUPS = Counter(
+    "crime_api_cache_lookups_total", "Lookups dans les caches/vocabulaires (hit = valeur connue).",
+    ("cache", "result"), registry=REGISTRY)
+MODEL_INFO = _gauge(
+    "crime_api_model_info", "Modèle servi (valeur 1 pour le modèle chargé).", ("model", "version"))
+
+FEATURE_DRIFT_PSI = _gauge(
+    "crime_api_feature_drift_psi", "PSI par feature sur la dernière fenêtre (vs profil d'entraînement).", ("feature",))
+FEATURE_DRIFT_KS = _gauge(
+    "crime_api_feature_drift_ks", "Statistique KS approchée par feature numérique (dernière fenêtre).", ("feature",))
+DRIFT_SHARE = _gauge(
+    "crime_api_drift_share", "Part des features en drift sur la dernière fenêtre.")
+DRIFT_DETECTED = _gauge(
+    "crime_api_drift_detected", "1 si la dernière fenêtre dépasse le seuil de drift.")
+DRIFT_WINDOW_ROWS = _gauge(
+    "crime_api_drift_window_rows", "Lignes scorées dans la dernière fenêtre évaluée.")
+INFERENCE_LOG_ROWS = Counter(
+    "crime_api_inference_log_rows_total",
+    "Lignes du journal d'inférence par format (written, dropped = buffer plein, failed).",
+    ("result", "format"), registry=REGISTRY)
+INFERENCE_LOG_QUEUE = _gauge(
+    "crime_api_inference_log_queue_rows", "Lignes en attente d'écriture dans le journal d'inférence.")
+MODEL_POOL_LOADED = _gauge(
+    "crime_api_model_pool_loaded", "Modèles actuellement chargés dans le pool (LRU borné par MAX_LOADED_MODELS).")
+MODEL_POOL_BYTES = _gauge(
+    "crime_api_model_pool_bytes", "Taille estimée des modèles du pool (artefacts sur disque, borne MODEL_POOL_MAX_MB).")
+SHADOW_REQUESTS = Counter(
+    "crime_api_shadow_requests_total", "Requêtes rejouées sur le modèle candidat (scored, dropped, failed).",
+    ("result",), registry=REGISTRY)
+SHADOW_ROWS = Counter(
+    "crime_api_shadow_rows_total", "Lignes scorées en shadow : accord (agree) ou non (disagree) avec la Production.",
+    ("result",), registry=REGISTRY)
+SHADOW_AGREEMENT = _gauge(
+    "crime_api_shadow_agreement_ratio", "Taux d'accord cumulé entre le candidat et la Production.")
+SHADOW_LATENCY = Histogram(
+    "crime_api_shadow_scoring_duration_seconds",
+    "Durée de scoring des requêtes rejouées, pour la Production et le candidat.", ("model",),
+    registry=REGISTRY, buckets=LATENCY_BUCKETS)
+WARMUP_LATENCY = _gauge(
+    "crime_api_warmup_latency_seconds", "Latence du warmup par chemin (single, batch_N) : premier appel (cold) et une fois stable.",
+    ("path", "phase"))
+
+# Durées par étape de la requête en cours (lues par profiler.ServerTimingMiddleware).
+# Le dict est partagé avec le threadpool de FastAPI, qui copie le contexte.
+REQUEST_TIMINGS = contextvars.ContextVar("request_timings", default=None)
+# True pendant le warmup : ses étapes et lookups ne sont pas publiés (pas de fausses latences dans /metrics)
+STAGES_MUTED = contextvars.ContextVar("stages_muted", default=False)
+
+def observe_stage(stage, seconds):
+    if STAGES_MUTED.get():
+        return
+    STAGE_LATENCY.labels(stage=stage).observe(seconds)
+    timings = REQUEST_TIMINGS.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+@contextmanager
+def stage(name):
+    """Chronomètre une étape du chemin de prédiction."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+def observe_lookups(cache, hits, misses):
+    if STAGES_MUTED.get():
+        return
+    if hits:
+        CACHE_LOOKUPS.labels(cache=cache, result="hit").inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache=cache, result="miss").inc(misses)
+
+_model_labels = []   # (model, version) servi par ce process
+
+def set_model_info(model_name, version):
+    """Modèle servi à 1 ; le précédent passe à 0 (en mode multiprocess, sa série reste dans le fichier du process)."""
+    for labels in _model_labels:
+        MODEL_INFO.labels(*labels).set(0)
+        MODEL_INFO.remove(*labels)
+    _model_labels[:] = [(str(model_name), str(version))]
+    MODEL_INFO.labels(*_model_labels[0]).set(1)
+
+def set_warmup_report(report):
+    for phase in ("cold", "steady"):
+        for path, ms in report[f"{phase}_ms"].items():
+            WARMUP_LATENCY.labels(path=path, phase=phase).set(ms / 1000)
+
+# ==========================================
+# EXPOSITION MULTI-WORKERS (serve.py)
+# ==========================================
+
+def render():
+    """Texte Prometheus : tout le pod (fichiers de tous les workers de serve.py, arrêtés compris) ou le process courant."""
+    if not MULTIPROCESS:
+        return prometheus_client.generate_latest(REGISTRY).decode()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return prometheus_client.generate_latest(registry).decode()
+
+def gauge_values():
+    """Maître de serve.py, avant le fork : valeurs courantes des jauges (modèle servi, pool...)."""
+    values = []
+    for family in REGISTRY.collect():
+        if family.type == "gauge":
+            values.extend((family.name, sample.labels, sample.value) for sample in family.samples)
+    return values
+
+def inherit_gauges(values):
+    """
+    Worker fraîchement forké : prometheus_client relit chaque valeur dans les fichiers du nouveau pid
+    (compteurs à zéro : ceux du maître restent dans ses fichiers, comptés une seule fois) ;
+    les jauges du maître (gauge_values) y sont recopiées.
+    """
+    for name, labels, value in values:
+        gauge = _GAUGES[name]
+        (gauge.labels(**labels) if labels else gauge).set(value)
+
+def mark_process_dead(pid):
+    """Maître : jauges d'un process arrêté retirées de /metrics ; ses compteurs et histogrammes restent cumulés."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
+
+def set_drift_scores(result):
+    """Publie le résultat d'une fenêtre du DriftMonitor."""
+    for feature, score in result["features"].items():
+        FEATURE_DRIFT_PSI.labels(feature=feature).set(score["psi"])
+        if "ks" in score:
+            FEATURE_DRIFT_KS.labels(feature=feature).set(score["ks"])
+    DRIFT_SHARE.set(result["drift_share"])
+    DRIFT_DETECTED.set(int(result["drift_detected"]))
+    DRIFT_WINDOW_ROWS.set(result["rows"])
+
+class PrometheusMiddleware:
+    """
+    Middleware ASGI : compte les requêtes par route/statut et mesure leur durée.
+    Le label `endpoint` est le chemin de la route FastAPI (jamais l'URL brute : cardinalité bornée).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        scope.setdefault("state", {})["start_time"] = start
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            REQUESTS.labels(endpoint=endpoint, method=scope.get("method", ""), status=status["code"]).inc()
+            REQUEST_LATENCY.labels(endpoint=endpoint).observe(time.perf_counter() - start)
+
+class FeatureStoreObserver:
+    """Branché sur CrimeFeatureStore.observer : reçoit les durées des sous-étapes et les lookups d'encodeurs."""
+
+    def observe_stage(self, stage, seconds):
+        observe_stage(f"features.{stage}", seconds)
+
+    def observe_lookups(self, column, hits, misses):
+        observe_lookups(f"encoder.{column}", hits, misses)
+
+FEATURE_STORE_OBSERVER = FeatureStoreObserver()
@@ -0,0 +1,220 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+
+import metrics
+from feature_store import CrimeFeatureStore, processors_fingerprint
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+DEFAULT_MAX_LOADED = 3   # modèles en mémoire (Production + candidat + 1 à la demande) : pods < 1 Gi
+# Budget en octets (0 = aucun) : estimé par la taille des artefacts sur disque (modèle + processors),
+# un proxy de la mémoire d'un modèle désérialisé ; un gros booster compte plus qu'un petit modèle
+DEFAULT_MAX_BYTES = 0
+# Résolutions mobiles (stage, alias MLflow) : re-demandées au Registry après ce délai, une promotion
+# est donc suivie sans redémarrage ; les numéros de version sont immuables et gardés sans limite
+DEFAULT_ALIAS_TTL_SECONDS = 60
+# Références inconnues : l'erreur est gardée ce délai (pas un appel au Registry par requête invalide)
+DEFAULT_UNKNOWN_TTL_SECONDS = 30
+
+def directory_bytes(*paths):
+    """Taille totale des fichiers sous les dossiers donnés (dossiers absents ignorés)."""
+    total = 0
+    for path in paths:
+        for root, _, files in os.walk(path or ""):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+    return total
+
+# ==========================================
+# POOL DE MODÈLES (LRU)
+# ==========================================
+
+class ServedModel:
+    __slots__ = ("name", "model", "store", "fingerprint", "pinned", "size_bytes")
+
+    def __init__(self, name, model, store, fingerprint, pinned=False, size_bytes=0):
+        self.name = name
+        self.model = model
+        self.store = store
+        self.fingerprint = fingerprint
+        self.pinned = pinned
+        self.size_bytes = size_bytes
+
+    @property
+    def version(self):
+        return self.name.rsplit("_v", 1)[-1] if "_v" in self.name else "Unknown"
+
+class ModelPool:
+    """
+    Plusieurs versions du Registry servies par le même process :
+    - une référence ("Staging", "7", alias MLflow) est résolue en nom de version hors des verrous de chargement :
+      numéros gardés sans limite, stages/alias pendant `alias_ttl` secondes, inconnues pendant `unknown_ttl`
+      (les références données à add/set_primary, dont "Production", restent celles de l'appelant)
+    - les modèles dont les processors ont le même fingerprint partagent un seul CrimeFeatureStore
+      (et donc une seule featurisation par requête, voir api.score_with_models)
+    - au-delà de `max_loaded` modèles OU de `max_bytes` octets estimés, le moins récemment utilisé
+      est déchargé ; les modèles épinglés (Production, candidat shadow) ne le sont jamais, mais
+      comptent dans le budget (un modèle trop gros pour le reste du budget sert sa requête puis sort)
+    `resolver(ref) -> nom` et `loader(nom) -> (modèle, chemin des processors)` isolent l'accès au Registry ;
+    `sizer(nom, modèle, chemin des processors) -> octets` estime la taille d'un modèle chargé ;
+    `guard(nom)` est un contexte tenu du chargement à la lecture des processors (verrou entre workers).
+    """
+
+    def __init__(self, resolver=None, loader=None, max_loaded=DEFAULT_MAX_LOADED, max_bytes=DEFAULT_MAX_BYTES,
+                 sizer=None, guard=None, alias_ttl=DEFAULT_ALIAS_TTL_SECONDS,
+                 unknown_ttl=DEFAULT_UNKNOWN_TTL_SECONDS):
+        self.resolver = resolver
+        self.loader = loader
+        self.max_loaded = max_loaded
+        self.max_bytes = max_bytes
+        self.sizer = sizer
+        self.guard = guard
+        self.alias_ttl = alias_ttl
+        self.unknown_ttl = unknown_ttl
+        self._entries = OrderedDict()   # nom -> ServedModel, du moins au plus récemment utilisé
+        self._aliases = {}              # référence -> (nom, expiration monotonic ou None)
+        self._unknown = {}              # référence inconnue -> (expiration monotonic, message)
+        self._stores = {}               # fingerprint -> CrimeFeatureStore
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.primary = None
+
+    # ---------- Enregistrement ----------
+    def add(self, name, model, store, refs=(), pinned=False, size_bytes=0):
+        """Ajoute un modèle déjà chargé ; son Feature Store devient celui de son fingerprint."""
+        fingerprint = processors_fingerprint(store.processors_path)
+        entry = ServedModel(name, model, store, fingerprint, pinned, size_bytes)
+        with self._lock:
+            self._stores[fingerprint] = store
+            self._entries[name] = entry
+            self._entries.move_to_end(name)
+            for ref in (name,) + tuple(refs):
+                self._aliases[ref] = (name, None)
+                self._unknown.pop(ref, None)
+            self._evict()
+        return entry
+
+    def set_primary(self, name, model, store, size_bytes=0):
+        """Modèle servi par défaut (épinglé, référencé aussi par "Production")."""
+        if self.primary is not None and self.primary.name != name:
+            self.primary.pinned = False
+        self.primary = self.add(name, model, store, refs=("Production",), pinned=True, size_bytes=size_bytes)
+        return self.primary
+
+    def pin(self, ref):
+        entry = self.get(ref)
+        entry.pinned = True
+        return entry
+
+    # ---------- Lecture ----------
+    def get(self, ref):
+        """Modèle pour une référence : depuis la mémoire, sinon chargé via loader (LookupError si inconnue)."""
+        with self._lock:
+            entry = self._lookup(ref)
+        if entry is not None:
+            metrics.observe_lookups("model_pool", 1, 0)
+            return entry
+        metrics.observe_lookups("model_pool", 0, 1)
+        if self.resolver is None or self.loader is None:
+            raise LookupError(f"Modèle inconnu : {ref}")
+
+        name = self._resolve(ref)  # appel au Registry sans bloquer les chargements en cours
+        with self._load_lock:  # un seul chargement à la fois (et jamais deux fois le même modèle)
+            with self._lock:
+                entry = self._lookup(name)
+            if entry is not None:
+                return entry
+            with self.guard(name) if self.guard is not None else nullcontext():
+                model, processors_path = self.loader(name)
+                size_bytes = self.sizer(name, model, processors_path) if self.sizer is not None else 0
+                fingerprint = processors_fingerprint(processors_path)
+                store = self._stores.get(fingerprint)
+                print(f"📦 Pool : {name} chargé ({'processors partagés' if store is not None else 'nouveaux processors'}).")
+                if store is None:
+                    store = CrimeFeatureStore(processors_path=processors_path)
+                    store.load_artifacts()
+            entry = ServedModel(name, model, store, fingerprint, size_bytes=size_bytes)
+            with self._lock:
+                self._stores[fingerprint] = store
+                self._entries[name] = entry
+                self._evict()
+            return entry
+
+    def _resolve(self, ref):
+        """Nom de version d'une référence, depuis le cache tant qu'il est valide, sinon via resolver."""
+        now = time.monotonic()
+        with self._lock:
+            name = self._alias(ref, now)
+            unknown = self._unknown.get(ref)
+        if name is not None:
+            return name
+        if unknown is not None and unknown[0] > now:
+            raise LookupError(unknown[1])
+        try:
+            name = self.resolver(ref)
+        except LookupError as e:
+            with self._lock:
+                self._unknown[ref] = (now + self.unknown_ttl, str(e))
+            raise
+        expires = None if ref.isdigit() or ref == name else now + self.alias_ttl
+        with self._lock:
+            self._unknown.pop(ref, None)
+            self._aliases[ref] = (name, expires)
+        return name
+
+    def _alias(self, ref, now=None):
+        cached = self._aliases.get(ref)
+        if cached is None:
+            return None
+        name, expires = cached
+        if expires is not None and expires <= (time.monotonic() if now is None else now):
+            del self._aliases[ref]
+            return None
+        return name
+
+    def _lookup(self, ref):
+        name = self._alias(ref) or ref
+        entry = self._entries.get(name)
+        if entry is not None:
+            self._entries.move_to_end(name)
+        return entry
+
+    def loaded_bytes(self):
+        return sum(e.size_bytes for e in self._entries.values())
+
+    def _over_budget(self):
+        return len(self._entries) > self.max_loaded or (self.max_bytes and self.loaded_bytes() > self.max_bytes)
+
+    def _evict(self):
+        while self._over_budget():
+            victim = next((e for e in self._entries.values() if not e.pinned), None)
+            if victim is None:
+                break
+            del self._entries[victim.name]
+            if not any(e.fingerprint == victim.fingerprint for e in self._entries.values()):
+                del self._stores[victim.fingerprint]
+            budget = f" / {self.max_bytes / 2**20:.0f} Mo estimés" if self.max_bytes else ""
+            print(f"♻️ Pool : {victim.name} déchargé (LRU, max {self.max_loaded} modèles{budget}).")
+        if self.max_bytes and self.loaded_bytes() > self.max_bytes:
+            print(f"⚠️ Pool : modèles épinglés au-delà du budget ({self.loaded_bytes() / 2**20:.0f} Mo estimés).")
+        metrics.MODEL_POOL_LOADED.set(len(self._entries))
+        metrics.MODEL_POOL_BYTES.set(self.loaded_bytes())
+
+    def status(self):
+        with self._lock:
+            return {
+                "max_loaded": self.max_loaded,
+                "max_bytes": self.max_bytes,
+                "loaded_bytes": self.loaded_bytes(),
+                "models": [{"name": e.name, "pinned": e.pinned, "processors": e.fingerprint, "bytes": e.size_bytes}
+                           for e in reversed(self._entries.values())],
+                "feature_stores": len(self._stores),
+                "aliases": {ref: name for ref, (name, _) in self._aliases.items()}
+            }
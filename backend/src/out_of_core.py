@@ -0,0 +1,193 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import data_shards
+import feature_defs
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Entraînement hors mémoire (TRAINING_MODE=external) à partir des shards de data_shards : aucune
+# matrice dense complète en RAM. Chaque framework lit les shards par son mécanisme natif :
+#   - XGBoost  : itérateur externe -> ExtMemQuantileDMatrix (pages quantifiées en cache disque)
+#   - LightGBM : Dataset construit depuis des lgb.Sequence (memmap, bins par échantillonnage)
+#   - CatBoost : pool quantifié directement depuis un fichier TSV (catboost.utils.quantize)
+# Les modèles rendus gardent l'interface scikit-learn (predict / predict_proba) attendue par l'API.
+# Shards du mode natif (index "categorical") : features catégorielles déclarées à chaque framework.
+CACHE_DIRNAME = "cache"
+SUPPORTED_ALGOS = ("xgboost", "lightgbm", "catboost")
+
+# Paramètres du wrapper scikit-learn LightGBM sans équivalent natif
+LIGHTGBM_SKLEARN_ONLY = ("n_estimators", "class_weight", "importance_type")
+
+def _cache_dir(shards_dir):
+    path = os.path.join(shards_dir, CACHE_DIRNAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+# ==========================================
+# XGBOOST
+# ==========================================
+
+def _xgboost_iterator(split, cache_prefix):
+    import xgboost as xgb
+
+    feature_types = ["c" if name in split.categorical else "q" for name in split.features]
+
+    class ShardIterator(xgb.DataIter):
+        """Un shard par appel à next() : XGBoost quantifie page par page et les garde en cache disque."""
+
+        def __init__(self):
+            self._i = 0
+            super().__init__(cache_prefix=cache_prefix)
+
+        def next(self, input_data):
+            if self._i == len(split):
+                return False
+            input_data(data=np.asarray(split.features_of(self._i)), label=split.labels_of(self._i),
+                       feature_names=split.features, feature_types=feature_types)
+            self._i += 1
+            return True
+
+        def reset(self):
+            self._i = 0
+
+    return ShardIterator()
+
+def train_xgboost(model, split, shards_dir):
+    """Paramètres du XGBClassifier, entraînement natif sur ExtMemQuantileDMatrix, booster rechargé dans `model`."""
+    import xgboost as xgb
+
+    params = model.get_xgb_params()
+    cache = _cache_dir(shards_dir)
+    dtrain = xgb.ExtMemQuantileDMatrix(_xgboost_iterator(split, os.path.join(cache, "xgb")),
+                                       max_bin=params.get("max_bin") or 256, enable_categorical=bool(split.categorical))
+    booster = xgb.train(params, dtrain, num_boost_round=model.n_estimators or 100)
+
+    path = os.path.join(cache, "xgboost_model.json")
+    booster.save_model(path)
+    model.load_model(path)
+    return model
+
+# ==========================================
+# LIGHTGBM
+# ==========================================
+
+class BoosterClassifier:
+    """Booster LightGBM natif derrière l'interface scikit-learn utilisée par l'API (classes = codes 0..n-1)."""
+
+    def __init__(self, booster, classes):
+        self.booster_ = booster
+        self.classes_ = np.asarray(classes)
+
+    def predict_proba(self, X):
+        proba = self.booster_.predict(np.asarray(X, dtype=np.float32))
+        return proba if proba.ndim == 2 else np.column_stack([1 - proba, proba])
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+def _lightgbm_params(model, classes):
+    params = {k: v for k, v in model.get_params().items() if v is not None and k not in LIGHTGBM_SKLEARN_ONLY}
+    if "random_state" in params:
+        params["seed"] = params.pop("random_state")
+    if "n_jobs" in params:
+        params["num_threads"] = params.pop("n_jobs")
+    if len(classes) > 2:
+        params.setdefault("objective", "multiclass")
+        params["num_class"] = len(classes)
+    else:
+        params.setdefault("objective", "binary")
+    return params
+
+def train_lightgbm(model, split):
+    """Paramètres du LGBMClassifier, Dataset LightGBM construit shard par shard depuis les memmaps."""
+    import lightgbm as lgb
+
+    class ShardSequence(lgb.Sequence):
+        def __init__(self, i):
+            self.data = split.features_of(i)
+
+        def __getitem__(self, idx):   # LightGBM lit des float64, par lots de batch_size lignes
+            return np.asarray(self.data[idx], dtype=np.float64)
+
+        def __len__(self):
+            return len(self.data)
+
+    params = _lightgbm_params(model, split.classes)
+    dataset = lgb.Dataset([ShardSequence(i) for i in range(len(split))], label=split.labels(),
+                          feature_name=split.features, categorical_feature=list(split.categorical) or "auto",
+                          params={"verbosity": params.get("verbose", -1)})
+    booster = lgb.train(params, dataset, num_boost_round=model.n_estimators)
+    return BoosterClassifier(booster, split.classes)
+
+# ==========================================
+# CATBOOST
+# ==========================================
+
+def _catboost_files(split, shards_dir):
+    """Shards -> un TSV (en-tête, label en 1re colonne) + description des colonnes, écrits bloc par bloc."""
+    cache = _cache_dir(shards_dir)
+    data_path, cd_path = os.path.join(cache, "catboost_train.tsv"), os.path.join(cache, "catboost_train.cd")
+    with open(data_path, "w") as f:
+        f.write("\t".join(["label"] + split.features) + "\n")
+        for X, y in split.chunks():
+            np.savetxt(f, np.column_stack([y, X]), fmt="%.9g", delimiter="\t")
+    with open(cd_path, "w") as f:
+        f.write("0\tLabel\n")
+        for i, name in enumerate(split.features):
+            if name in split.categorical:   # codes écrits en entiers ("%.9g") : mêmes chaînes qu'en service
+                f.write(f"{i + 1}\tCateg\n")
+    return data_path, cd_path
+
+def train_catboost(model, split, shards_dir):
+    """
+    Pool quantifié depuis le fichier sans charger les valeurs brutes, puis fit du CatBoostClassifier.
+    Features catégorielles (mode natif) : la quantification par blocs ne les supporte pas, le pool est
+    chargé depuis le fichier puis quantifié (valeurs brutes en mémoire le temps de la quantification).
+    """
+    from catboost import Pool
+    from catboost.utils import quantize
+
+    data_path, cd_path = _catboost_files(split, shards_dir)
+    params = model.get_params()
+    model.set_params(class_names=split.classes)   # labels lus en texte : classes entières comme en mémoire
+    options = {"border_count": params.get("border_count"), "thread_count": params.get("thread_count") or -1}
+    if split.categorical:
+        print("⚠️ CatBoost : features catégorielles, pool chargé puis quantifié (pas de quantification par blocs).")
+        pool = Pool(data_path, column_description=cd_path, has_header=True, thread_count=options["thread_count"])
+        pool.quantize(border_count=options["border_count"])
+    else:
+        pool = quantize(data_path, column_description=cd_path, has_header=True, **options)
+    model.fit(pool)
+    return model
+
+# ==========================================
+# API
+# ==========================================
+
+def fit(algo_type, model, shards_dir=data_shards.SHARDS_PATH):
+    """Entraîne `model` (instancié par trainning.instantiate_model) sur le split train des shards."""
+    if algo_type not in SUPPORTED_ALGOS:
+        raise ValueError(f"❌ {algo_type} n'a pas de mode hors mémoire (supportés : {', '.join(SUPPORTED_ALGOS)})")
+    split = data_shards.ShardedSplit(shards_dir, "train")
+    print(f"🗄️ Entraînement hors mémoire ({algo_type}) : {split.rows} lignes, {len(split)} shard(s)")
+    if algo_type == "xgboost":
+        return train_xgboost(model, split, shards_dir)
+    if algo_type == "lightgbm":
+        return train_lightgbm(model, split)
+    return train_catboost(model, split, shards_dir)
+
+def predict(model, shards_dir=data_shards.SHARDS_PATH, split="test"):
+    """Prédictions shard par shard, entrées au format du Feature Store en service. Retourne (y_true, y_pred)."""
+    shards = data_shards.ShardedSplit(shards_dir, split)
+    y_true, y_pred = [], []
+    for X, y in shards.chunks():
+        X = np.asarray(X)
+        if shards.categorical:
+            X = feature_defs.native_frame(pd.DataFrame(X, columns=shards.features), shards.categorical)
+        y_true.append(y)
+        y_pred.append(np.asarray(model.predict(X)).reshape(-1).astype(np.int64))
+    return np.concatenate(y_true), np.concatenate(y_pred)
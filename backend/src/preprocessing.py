@@ -6,6 +6,10 @@ import pickle
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder, RobustScaler
 
+import compact_processors
+import feature_defs
+from feature_defs import categorize_crime
+
 # ==========================================
 # CONFIGURATION
 # ==========================================
@@ -19,112 +23,19 @@ REQUIRED_ARTIFACTS = [
     "features_config.pkl"
 ]
 
-DEFAULT_SELECTED_FEATURES = [
-    'mocodes', 'premis_cd', 'location', 'weapon_used_cd', 'vict_age',
-    'day', 'area', 'crm_risk', 'month', 'vict_descent', 'status',
-    'weekday', 'hour_bin', 'year', 'vict_sex_F', 'vict_sex_M', 'vict_sex_X'
-]
+# Feature definitions shared with preprocessing2 and the Feature Store (feature_defs)
+DEFAULT_SELECTED_FEATURES = feature_defs.MODEL_FEATURES
 
-CATEGORICAL_COLS_TO_ENCODE = [
-    'crm_risk', 'mocodes', 'vict_descent', 
-    'status', 'status_desc', 'location', 'hour_bin'
-]
+CATEGORICAL_COLS_TO_ENCODE = feature_defs.categorical_features(DEFAULT_SELECTED_FEATURES)
+
+TEMPORAL_FEATURES = ['year', 'month', 'day', 'weekday', 'hour_bin']
+IMPUTED_FEATURES = ['vict_descent', 'mocodes', 'premis_cd', 'status', 'weapon_used_cd', 'vict_age']
+ONE_HOT_FEATURES = ['vict_sex_f', 'vict_sex_m', 'vict_sex_x']
 
 # ==========================================
 # HELPER FUNCTIONS
 # ==========================================
 
-def categorize_crime(crime):
-    """
-    Categorizes a crime description into one of several predefined classes.
-    The function is case-insensitive and handles non-string inputs.
-    """
-    # 1. Vérification de robustesse : Gérer les entrées qui ne sont pas du texte (ex: NaN)
-    if not isinstance(crime, str):
-        return 'جرائم متنوعة / Miscellaneous Crimes'
-    
-    # 2. Normalisation : Mettre en majuscules pour une comparaison insensible à la casse
-    crime = crime.upper()
-
-    # 3. Logique de classification, du plus spécifique au plus général
-
-    # Catégorie : الاحتيال والتزوير / Fraud and Forgery
-    # (Vérifiée en premier car certains mots-clés pourraient aussi être dans "Theft")
-    if any(x in crime for x in [
-        'CREDIT CARDS', 'EMBEZZLEMENT', 'DEFRAUDING', 'THEFT OF SERVICES',
-        'DOCUMENT WORTHLESS', 'GRAND THEFT / INSURANCE FRAUD', 'THEFT OF IDENTITY',
-        'FORGERY', 'DOCUMENT FORGERY', 'COUNTERFEIT'
-    ]):
-        return 'الاحتيال والتزوير / Fraud and Forgery'
-
-    # Catégorie : السرقة والسطو / Theft and Burglary
-    elif any(x in crime for x in [
-        'VEHICLE - STOLEN', 'BURGLARY FROM VEHICLE', 'BIKE - STOLEN',
-        'SHOPLIFTING-GRAND THEFT', 'BURGLARY', 'THEFT-GRAND', 'BUNCO, GRAND THEFT',
-        'THEFT PLAIN', 'THEFT FROM MOTOR VEHICLE', 'TILL TAP', 'BOAT - STOLEN',
-        'DISHONEST EMPLOYEE', 'PURSE SNATCHING', 'PETTY THEFT - AUTO REPAIR',
-        'SHOPLIFTING - PETTY THEFT', 'THEFT FROM PERSON', 'BUNCO, PETTY THEFT',
-        'THEFT, PERSON', 'THEFT, COIN MACHINE', 'GRAND THEFT / AUTO REPAIR',
-        'BIKE - ATTEMPTED STOLEN', 'VEHICLE - ATTEMPT STOLEN',
-        'VEHICLE, STOLEN - OTHER', 'PICKPOCKET', 'SHOPLIFTING - ATTEMPT',
-        'BUNCO, ATTEMPT', 'PICKPOCKET, ATTEMPT'
-    ]):
-        return 'السرقة والسطو / Theft and Burglary'
-
-    # Catégorie : العنف والاعتداء / Violence and Assault
-    elif any(x in crime for x in [
-        'ASSAULT', 'BATTERY', 'ROBBERY', 'KIDNAPPING', 'CRIMINAL HOMICIDE',
-        'MANSLAUGHTER', 'ATTEMPTED ROBBERY', 'INTIMATE PARTNER - SIMPLE ASSAULT',
-        'INTIMATE PARTNER - AGGRAVATED ASSAULT', 'OTHER ASSAULT',
-        'BATTERY POLICE', 'BATTERY ON A FIREFIGHTER',
-        'EXTORTION', 'FALSE IMPRISONMENT', 'STALKING',
-        'CHILD', 'CHILD ABUSE', 'CHILD NEGLECT', 'CHILD ANNOYING',
-        'CHILD STEALING', 'DISRUPT SCHOOL', 'DRUGS, TO A MINOR',
-        'CRM AGNST CHLD', 'CONTRIBUTING', 'TRAIN WRECKING',
-        'FAILURE TO DISPERSE', 'BLOCKING DOOR INDUCTION CENTER', 'THREATS'
-    ]):
-        return 'العنف والاعتداء / Violence and Assault'
-
-    # Catégorie : التخريب والتدمير / Vandalism and Destruction
-    elif any(x in crime for x in [
-        'VANDALISM', 'ARSON', 'SHOTS FIRED', 'THROWING OBJECT', 'DAMAGE',
-        'BOMB SCARE', 'DISTURBING THE PEACE'
-    ]):
-        return 'التخريب والتدمير / Vandalism and Destruction'
-
-    # Catégorie : المخالفات القانونية والجرائم المتعلقة بالأسلحة / Legal Offences & Weapons
-    elif any(x in crime for x in [
-        'COURT ORDER', 'VIOLATION OF COURT', 'CONTEMPT', 'FALSE POLICE REPORT',
-        'BRIBERY', 'CONSPIRACY', 'THREATENING PHONE CALLS', 'VIOLATION',
-        'VIOLATION OF RESTRAINING ORDER', 'VIOLATION OF TEMPORARY RESTRAINING ORDER',
-        'TRESPASSING', 'RESISTING ARREST', 'UNAUTHORIZED COMPUTER ACCESS',
-        'WEAPON', 'FIREARM', 'BRANDISH', 'DISCHARGE', 'REPLICA FIREARMS',
-        'FIREARMS RESTRAINING ORDER'
-    ]):
-        return 'المخالفات القانونية والجرائم المتعلقة بالأسلحة / Legal Offences & Weapons'
-
-    # Catégorie : الجرائم الجنسية والاتجار / Sexual Crimes & Exploitation
-    elif any(x in crime for x in [
-        'RAPE', 'SEX', 'INDECENT', 'LEWD', 'SODOMY', 'ORAL COPULATION',
-        'SEXUAL PENETRATION', 'CHILD PORNOGRAPHY', 'HUMAN TRAFFICKING',
-        'BATTERY WITH SEXUAL CONTACT', 'BEASTIALITY', 'INCEST', 'PEEPING TOM',
-        'BIGAMY', 'TRAFFICKING', 'PIMPING', 'PANDERING'
-    ]):
-        return 'الجرائم الجنسية والاتجار / Sexual Crimes & Exploitation'
-
-    # Catégorie : جرائم متنوعة / Miscellaneous Crimes
-    # (Cette catégorie peut être fusionnée avec le défaut, mais la garder séparée
-    # permet de capturer des cas spécifiques avant de tomber dans le "tout-venant")
-    elif any(x in crime for x in [
-        'OTHER MISCELLANEOUS CRIME', 'ANIMAL', 'CRUELTY', 'ILLEGAL DUMPING',
-        'LYNCHING', 'INCITING', 'THREAT', 'PROWLER', 'INCITING A RIOT',
-        'DRIVING', 'RECKLESS', 'FAILURE TO YIELD', 'DRUNK'
-    ]):
-        return 'جرائم متنوعة / Miscellaneous Crimes'
-
-    # 4. Catégorie par défaut pour tout ce qui n'a pas été capturé
-    return 'جرائم متنوعة / Miscellaneous Crimes'
-
 def clean_column_names(df):
     df.columns = (
         df.columns
@@ -158,48 +69,18 @@ def load_and_clean_initial(filepath):
 
 def feature_engineering_temporal(df):
     print("Engineering temporal features...")
-    df['date_occ'] = pd.to_datetime(df['date_occ'], format="%m/%d/%Y %I:%M:%S %p", errors='coerce')
-    
-    # Lowercase column names to match the clean_column_names standard
-    df['year'] = df['date_occ'].dt.year
-    df['month'] = df['date_occ'].dt.month
-    df['day'] = df['date_occ'].dt.day
-    df['weekday'] = df['date_occ'].dt.weekday
-    
-    df['hour'] = df['time_occ'] // 100
-    df['minute'] = df['time_occ'] % 100 
-    
-    bins = [0, 6, 12, 18, 24]
-    labels = ['Night', 'Morning', 'Afternoon', 'Evening']
-    df['hour_bin'] = pd.cut(df['hour'], bins=bins, labels=labels, right=False).astype(str)
-    
+    df[TEMPORAL_FEATURES] = feature_defs.compile_plan(TEMPORAL_FEATURES).run_batch(df)
     df = df.drop(columns=['time_occ', 'date_rptd', 'date_occ'], errors='ignore')
     return df
 
-def handle_missing_values_and_text(df):
+def handle_missing_values_and_text(df, params=None):
+    """Imputation from feature_defs; `params`: learned parameters (fitted on `df` by default)."""
     print("Handling missing values...")
+    params = params if params is not None else feature_defs.fit_params(df)
+    imputed = feature_defs.compile_plan(IMPUTED_FEATURES + ONE_HOT_FEATURES, params).run_batch(df)
+    df[IMPUTED_FEATURES + ONE_HOT_FEATURES] = imputed
     
-    df['vict_descent'] = df['vict_descent'].fillna('UNKNOWN').replace({'-': 'UNKNOWN'})
-    df['vict_sex'] = df['vict_sex'].fillna('X').replace({'H': 'X', '-': 'X'})
-    
-    # Only fill modes if columns exist
-    for col in ['mocodes', 'premis_cd', 'premis_desc', 'status']:
-        if col in df.columns:
-            mode_val = df[col].mode()
-            if not mode_val.empty:
-                df[col] = df[col].fillna(mode_val[0])
-
-    df['weapon_desc'] = df['weapon_desc'].fillna('NO WEAPON')
-    df['weapon_used_cd'] = df['weapon_used_cd'].fillna(0.0)
-    
-    df.loc[(df['vict_age'] < 0) | (df['vict_age'] > 100), 'vict_age'] = np.nan
-    mean_age = df['vict_age'].mean()
-    df['vict_age'] = df['vict_age'].fillna(mean_age)
-
-    if 'premis_desc' in df.columns:
-        df['premis_desc'] = df['premis_desc'].str.title().str.replace(r'\(.*?\)', '', regex=True).str.strip()
-    
-    cols_to_drop = ['crm_cd_1', 'crm_cd_2', 'crm_cd_3', 'crm_cd_4', 'cross_street']
+    cols_to_drop = ['vict_sex', 'crm_cd_1', 'crm_cd_2', 'crm_cd_3', 'crm_cd_4', 'cross_street']
     df.drop(columns=[c for c in cols_to_drop if c in df.columns], inplace=True)
     
     return df
@@ -222,31 +103,20 @@ def process_target(df, encoder=None):
 def encode_features(df, encoders=None):
     print("Encoding features...")
     
-    # One-Hot Encoding for Sex
-    df = pd.get_dummies(df, columns=['vict_sex'], prefix='vict_sex', dtype=int)
-    
     if encoders:
         print(f"Using {len(encoders)} loaded Feature Encoders.")
         for col, le in encoders.items():
             if col in df.columns:
-                # Handle unseen labels by mapping them to -1
-                # Convert to string to match training type
-                try:
-                    df[col] = le.transform(df[col].astype(str))
-                except ValueError as e:
-                    # Handle unseen labels by mapping them to 0
-                    print(f"Warning: Unseen labels in {col}, mapping to -1. Error: {str(e)}")
-                    # Create a mask for known vs unknown labels
-                    known_mask = df[col].astype(str).isin(le.classes_)
-                    df.loc[known_mask, col] = le.transform(df.loc[known_mask, col].astype(str))
-                    df.loc[~known_mask, col] = 0 # Default value for unseen labels
+                # Same strings as the Feature Store (feature_defs.category_strings); unseen labels -> 0
+                mapping = {cls: idx for idx, cls in enumerate(le.classes_)}
+                df[col] = feature_defs.category_strings(df[col]).map(mapping).fillna(0).astype(int)
     else:
         print("Fitting new Feature Encoders.")
         encoders = {}
         for col in CATEGORICAL_COLS_TO_ENCODE:
             if col in df.columns:
                 le = LabelEncoder()
-                df[col] = le.fit_transform(df[col].astype(str))
+                df[col] = le.fit_transform(feature_defs.category_strings(df[col]))
                 encoders[col] = le
             
     return df, encoders
@@ -268,9 +138,8 @@ def run_preprocessing_pipeline():
     # 1. Load & Clean
     df = load_and_clean_initial(DATA_PATH)
     
-    # 2. Engineer & Impute
+    # 2. Engineer
     df = feature_engineering_temporal(df)
-    df = handle_missing_values_and_text(df)
     
     # 3. Determine Mode (Load vs Fit)
     artifacts_exist = check_artifacts_exist()
@@ -290,9 +159,14 @@ def run_preprocessing_pipeline():
         with open(os.path.join(ARTIFACTS_PATH, "features_config.pkl"), "rb") as f:
             config = pickle.load(f)
             selected_features = [f.lower() for f in config.get("final_feature_order", DEFAULT_SELECTED_FEATURES)]
+            feature_params = config.get("feature_params")  # None (older processors): feature_defs defaults
     else:
         print("\n[INFO] Artifacts not found. Starting Training Mode (Fitting processors)...")
         os.makedirs(ARTIFACTS_PATH, exist_ok=True)
+        feature_params = feature_defs.fit_params(df)  # learned before imputation, shipped with the processors
+
+    # Impute with the same definitions and parameters as the Feature Store
+    df = handle_missing_values_and_text(df, params=feature_params or feature_defs.DEFAULT_PARAMS)
 
     # 4. Process Target & Encode
     df, target_encoder = process_target(df, encoder=target_encoder)
@@ -363,9 +237,13 @@ def run_preprocessing_pipeline():
         with open(os.path.join(ARTIFACTS_PATH, "target_mapping.pkl"), "wb") as f:
             pickle.dump(target_mapping, f)
             
-        feature_config = {"final_feature_order": selected_features}
+        feature_config = {"final_feature_order": selected_features, "feature_params": feature_params}
         with open(os.path.join(ARTIFACTS_PATH, "features_config.pkl"), "wb") as f:
             pickle.dump(feature_config, f)
+
+        # Same processors in the compact format (loaded by the Feature Store without pickle/sklearn)
+        compact_processors.save_processors(ARTIFACTS_PATH, relevant_encoders, scaler, target_encoder,
+                                           feature_order=selected_features, feature_params=feature_params)
         
         print(f"✓ New processors saved to '{ARTIFACTS_PATH}/'")
     else:
@@ -1,13 +1,20 @@
 import pandas as pd
 import numpy as np
-import re
 import os
 import pickle
 import sys
 import argparse
+from collections import Counter
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder, RobustScaler
 
+import compact_processors
+import data_shards
+import drift_profile
+import feature_defs
+import preprocessing_polars
+from feature_defs import categorize_crime
+
 # ==========================================
 # CONFIGURATION
 # ==========================================
@@ -18,6 +25,42 @@ ARTIFACTS_PATH = "processors"
 ENV_DATA_PATH = os.getenv("DATA_PATH")
 DEFAULT_LOCAL_PATH = "../../data/crime_v1.csv" # Pour le dev local dans backend/src
 
+# Moteur d'exécution : pandas (défaut) ou polars (lazy, multi-threadé ; dépendance optionnelle)
+ENGINES = ("pandas", "polars")
+PREPROCESSING_ENGINE = os.getenv("PREPROCESSING_ENGINE", "pandas")
+
+# Sortie des données : pickle dense (défaut) ou shards float32 sur disque (entraînement hors mémoire)
+OUTPUTS = ("pickle", "shards")
+PREPROCESSED_OUTPUT = os.getenv("PREPROCESSED_OUTPUT", "pickle")
+# Sortie "shards" : CSV lu par blocs de CSV_CHUNK_ROWS lignes (jamais en entier en mémoire)
+CSV_CHUNK_ROWS = int(os.getenv("CSV_CHUNK_ROWS", "50000"))
+
+# Split train/test (mêmes lignes de test quelle que soit la sortie)
+TEST_SIZE = 0.2
+SPLIT_SEED = 42
+
+# Représentation des features pour le modèle :
+#   "scaled" (défaut) : label encoding + RobustScaler
+#   "native" : codes passés en catégories natives aux modèles d'arbres (XGBoost/LightGBM/CatBoost),
+#              vocabulaires plafonnés par fréquence, aucun scaling (ni à l'entraînement, ni en service)
+FEATURE_MODES = ("scaled", "native")
+FEATURE_MODE = os.getenv("FEATURE_MODE", "scaled")
+CATEGORY_CAPS = {
+    "max_categories": int(os.getenv("MAX_CATEGORIES", "1000")),
+    "min_count": int(os.getenv("MIN_CATEGORY_COUNT", "10"))
+}
+
+# Encodage des Mocodes (listes de codes "1822 1402 0344") :
+#   "label" (défaut) : une classe par liste distincte (vocabulaire énorme, presque tout inconnu en service)
+#   "multihot" : vocabulaire plafonné des codes, bloc multi-hot creux (CSR) ajouté aux features scalées
+#                pour les modèles qui acceptent une entrée creuse (mode "scaled" et sortie "pickle")
+MOCODES_ENCODINGS = ("label", "multihot")
+MOCODES_ENCODING = os.getenv("MOCODES_ENCODING", "label")
+MOCODE_CAPS = {
+    "max_categories": int(os.getenv("MAX_MOCODES", "1000")),
+    "min_count": int(os.getenv("MIN_MOCODE_COUNT", "10"))
+}
+
 REQUIRED_ARTIFACTS = [
     "robust_scaler.pkl",
     "target_label_encoder.pkl",
@@ -25,32 +68,23 @@ REQUIRED_ARTIFACTS = [
     "features_config.pkl"
 ]
 
-DEFAULT_SELECTED_FEATURES = [
-    'mocodes', 'premis_cd', 'location', 'weapon_used_cd', 'vict_age',
-    'day', 'area', 'crm_risk', 'month', 'vict_descent', 'status',
-    'weekday', 'hour_bin', 'year', 'vict_sex_f', 'vict_sex_m', 'vict_sex_x'
-]
+# Définitions des features partagées avec le Feature Store (feature_defs) : une seule source de vérité
+DEFAULT_SELECTED_FEATURES = feature_defs.MODEL_FEATURES
 
-CATEGORICAL_COLS_TO_ENCODE = [
-    'crm_risk', 'mocodes', 'vict_descent', 
-    'status', 'location', 'hour_bin'
-]
+CATEGORICAL_COLS_TO_ENCODE = feature_defs.categorical_features(DEFAULT_SELECTED_FEATURES)
+
+# Vues par étape des mêmes définitions (fonctions ci-dessous)
+TEMPORAL_FEATURES = ['year', 'month', 'day', 'weekday', 'hour_bin']
+IMPUTED_FEATURES = ['vict_descent', 'mocodes', 'premis_cd', 'status', 'weapon_used_cd', 'vict_age']
+ONE_HOT_FEATURES = ['vict_sex_f', 'vict_sex_m', 'vict_sex_x']
+
+# Features traitées comme des catégories (codes) dans le profil de référence du drift
+PROFILE_CATEGORICAL_FEATURES = CATEGORICAL_COLS_TO_ENCODE + ['area', 'vict_sex_f', 'vict_sex_m', 'vict_sex_x']
 
 # ==========================================
 # HELPER FUNCTIONS
 # ==========================================
 
-def categorize_crime(crime):
-    if not isinstance(crime, str): return 'جرائم متنوعة / Miscellaneous Crimes'
-    crime = crime.upper()
-    if any(x in crime for x in ['CREDIT CARDS', 'EMBEZZLEMENT', 'FORGERY']): return 'الاحتيال والتزوير / Fraud and Forgery'
-    elif any(x in crime for x in ['ASSAULT', 'BATTERY', 'ROBBERY', 'HOMICIDE']): return 'العنف والاعتداء / Violence and Assault'
-    elif any(x in crime for x in ['VANDALISM', 'ARSON', 'DAMAGE']): return 'التخريب والتدمير / Vandalism and Destruction'
-    elif any(x in crime for x in ['VEHICLE - STOLEN', 'BURGLARY', 'THEFT']): return 'السرقة والسطو / Theft and Burglary'
-    elif any(x in crime for x in ['COURT', 'WEAPON', 'TRESPASSING']): return 'المخالفات القانونية والجرائم المتعلقة بالأسلحة / Legal Offences & Weapons'
-    elif any(x in crime for x in ['RAPE', 'SEX', 'TRAFFICKING']): return 'الجرائم الجنسية والاتجار / Sexual Crimes & Exploitation'
-    return 'جرائم متنوعة / Miscellaneous Crimes'
-
 def clean_column_names(df):
     df.columns = (
         df.columns
@@ -103,27 +137,17 @@ def load_and_clean_initial(filepath):
 
 def feature_engineering_temporal(df):
     print("🛠️ Feature Engineering...")
-    df['date_occ'] = pd.to_datetime(df['date_occ'], format="%m/%d/%Y %I:%M:%S %p", errors='coerce')
-    df['year'] = df['date_occ'].dt.year
-    df['month'] = df['date_occ'].dt.month
-    df['day'] = df['date_occ'].dt.day
-    df['weekday'] = df['date_occ'].dt.weekday
-    df['hour'] = df['time_occ'] // 100
-    bins = [0, 6, 12, 18, 24]
-    labels = ['Night', 'Morning', 'Afternoon', 'Evening']
-    df['hour_bin'] = pd.cut(df['hour'], bins=bins, labels=labels, right=False).astype(str)
+    df[TEMPORAL_FEATURES] = feature_defs.compile_plan(TEMPORAL_FEATURES).run_batch(df)
     df = df.drop(columns=['time_occ', 'date_rptd', 'date_occ'], errors='ignore')
     return df
 
-def handle_missing_values_and_text(df):
+def handle_missing_values_and_text(df, params=None):
+    """Imputation selon feature_defs ; `params` : paramètres appris (par défaut, ajustés sur `df`)."""
     print("🛠️ Gestion des valeurs manquantes...")
-    df['vict_descent'] = df['vict_descent'].fillna('UNKNOWN').replace({'-': 'UNKNOWN'})
-    df['vict_sex'] = df['vict_sex'].fillna('X').replace({'H': 'X', '-': 'X'})
-    for col in ['mocodes', 'premis_cd', 'status']:
-        if col in df.columns: df[col] = df[col].fillna('0')
-    df['weapon_used_cd'] = df['weapon_used_cd'].fillna(0.0)
-    df.loc[(df['vict_age'] < 0) | (df['vict_age'] > 100), 'vict_age'] = np.nan
-    df['vict_age'] = df['vict_age'].fillna(df['vict_age'].mean() if not df['vict_age'].isnull().all() else 30)
+    params = params if params is not None else feature_defs.fit_params(df)
+    imputed = feature_defs.compile_plan(IMPUTED_FEATURES + ['sex'], params).run_batch(df)
+    df[IMPUTED_FEATURES] = imputed[IMPUTED_FEATURES]
+    df['vict_sex'] = imputed['sex']
     return df
 
 def process_target(df, encoder=None):
@@ -135,100 +159,342 @@ def process_target(df, encoder=None):
         df['target_enc'] = encoder.fit_transform(df['crime_class'])
     return df, encoder
 
-def encode_features(df, encoders=None):
-    # One-Hot Encoding manuel pour garantir les colonnes
-    df['vict_sex'] = df['vict_sex'].str.lower()
-    df['vict_sex_f'] = (df['vict_sex'] == 'f').astype(int)
-    df['vict_sex_m'] = (df['vict_sex'] == 'm').astype(int)
-    df['vict_sex_x'] = (~df['vict_sex'].isin(['f', 'm'])).astype(int)
+def encode_features(df, encoders=None, caps=None, code_caps=None):
+    """
+    Label encoding des features catégorielles.
+    caps : None (vocabulaire complet) ou {"max_categories", "min_count"} (mode natif) : vocabulaires
+    plafonnés par fréquence, valeurs rares et inconnues -> feature_defs.OTHER_CATEGORY.
+    code_caps : None, ou plafonds du vocabulaire des codes des listes (feature_defs.CODE_LIST_FEATURES) ;
+    ces colonnes restent alors en texte, encodées en multi-hot par encode_code_lists.
+    """
+    code_lists = feature_defs.CODE_LIST_FEATURES if code_caps is not None else []
+    # One-Hot (colonnes garanties même si une catégorie est absente), si pas déjà calculé
+    missing = [col for col in ONE_HOT_FEATURES if col not in df.columns]
+    if missing:
+        df[missing] = feature_defs.compile_plan(missing).run_batch(df)
     
     if encoders:
-        # Mode Transform : Utilise les mappings existants
+        # Mode Transform : Utilise les mappings existants (classe inconnue -> OTHER_CATEGORY si présente, sinon 0)
         for col, le in encoders.items():
-            if col in df.columns:
-                # Map unknown to 0/First Class safely
-                df[col] = df[col].astype(str).apply(lambda x: le.transform([x])[0] if x in le.classes_ else 0)
+            if col in code_lists:
+                df[col] = feature_defs.category_strings(df[col])
+            elif col in df.columns:
+                mapping = {cls: idx for idx, cls in enumerate(le.classes_)}
+                unknown = mapping.get(feature_defs.OTHER_CATEGORY, 0)
+                df[col] = feature_defs.category_strings(df[col]).map(mapping).fillna(unknown).astype(int)
     else:
         # Mode Train : Apprend les mappings
         encoders = {}
         for col in CATEGORICAL_COLS_TO_ENCODE:
             if col in df.columns:
+                values = feature_defs.category_strings(df[col])
                 le = LabelEncoder()
-                df[col] = le.fit_transform(df[col].astype(str))
+                if col in code_lists:
+                    # Vocabulaire des codes, et non des listes (OTHER_CATEGORY : codes rares et inconnus)
+                    counts = feature_defs.code_counts(values)
+                    le.fit(np.array(feature_defs.capped_vocabulary(counts, **code_caps), dtype=object))
+                    df[col] = values
+                elif caps is not None:
+                    # OTHER_CATEGORY toujours dans les classes : code des valeurs inconnues en service
+                    vocabulary = feature_defs.capped_vocabulary(values.value_counts().to_dict(), **caps)
+                    le.fit(np.array(vocabulary, dtype=object))
+                    df[col] = le.transform(values.where(values.isin(vocabulary), feature_defs.OTHER_CATEGORY))
+                else:
+                    df[col] = le.fit_transform(values)
                 encoders[col] = le
     return df, encoders
 
+def encode_code_lists(X, encoders, columns):
+    """Colonnes listes de codes -> blocs multi-hot CSR, une colonne par code du vocabulaire appris."""
+    blocks = []
+    for col in columns:
+        mapping = {cls: idx for idx, cls in enumerate(encoders[col].classes_)}
+        indptr, codes = feature_defs.code_lists(X[col])
+        positions = pd.Series(codes, dtype=object).map(mapping).fillna(mapping[feature_defs.OTHER_CATEGORY])
+        blocks.append(feature_defs.multi_hot(indptr, positions.to_numpy(dtype=np.int64), len(mapping)))
+    return blocks
+
+# ==========================================
+# SORTIE SHARDS (CSV LU PAR BLOCS)
+# ==========================================
+
+def _clean_chunk(chunk):
+    if "Unnamed: 0" in chunk.columns: chunk = chunk.drop(columns="Unnamed: 0")
+    chunk = clean_column_names(chunk)
+    if "dr_no" in chunk.columns: chunk = chunk.drop(columns="dr_no")
+    return chunk.rename(columns={"part_1_2": "crm_risk"})
+
+def read_clean_chunks(filepath, chunk_rows=None):
+    """
+    load_and_clean_initial bloc par bloc : doublons retirés sur tout le fichier grâce aux empreintes
+    64 bits des lignes déjà vues (valeurs normalisées en texte : 12 et 12.0 d'un bloc à l'autre sont égaux).
+    """
+    seen = np.empty(0, dtype=np.uint64)
+    for chunk in pd.read_csv(filepath, chunksize=chunk_rows or CSV_CHUNK_ROWS):
+        chunk = _clean_chunk(chunk)
+        hashes = np.zeros(len(chunk), dtype=np.uint64)
+        for col in chunk.columns:   # une colonne texte à la fois : pas de copie texte du bloc entier
+            hashes = hashes * np.uint64(1000003) ^ pd.util.hash_array(feature_defs.category_strings(chunk[col]).to_numpy())
+        keep = ~pd.Series(hashes).duplicated().to_numpy()
+        if seen.size:
+            pos = np.minimum(np.searchsorted(seen, hashes), seen.size - 1)
+            keep &= seen[pos] != hashes
+        seen = np.union1d(seen, hashes[keep])
+        yield chunk[keep].copy()
+
+def split_mask(n_rows, test_size=TEST_SIZE, seed=SPLIT_SEED):
+    """Masque des lignes de test : les mêmes que train_test_split(test_size, random_state=seed)."""
+    is_test = np.zeros(n_rows, dtype=bool)
+    is_test[np.random.RandomState(seed).permutation(n_rows)[:int(np.ceil(test_size * n_rows))]] = True
+    return is_test
+
+def fit_chunks(filepath, caps=None, fit=True):
+    """
+    1re passe : nombre de lignes (après dédoublonnage), taux de manquants bruts et, si `fit`,
+    paramètres des features, vocabulaires des encodeurs et classes de la cible, cumulés bloc par bloc.
+    Retourne (n_rows, raw_missing_rates, target_encoder, feature_encoders, feature_params).
+    """
+    print(f"📂 Lecture par blocs de {CSV_CHUNK_ROWS} lignes : {os.path.abspath(filepath)}")
+    n_rows, missing, stats, vocabularies, classes = 0, None, Counter(), {}, set()
+    plan = feature_defs.compile_plan(CATEGORICAL_COLS_TO_ENCODE)
+    for chunk in read_clean_chunks(filepath):
+        n_rows += len(chunk)
+        missing = chunk.isna().sum() if missing is None else missing + chunk.isna().sum()
+        if fit:
+            stats.update(feature_defs.param_stats(chunk))
+            categories = plan.run_batch(chunk)
+            for col in CATEGORICAL_COLS_TO_ENCODE:
+                vocabularies.setdefault(col, Counter()).update(
+                    feature_defs.category_strings(categories[col]).value_counts().to_dict())
+            classes.update(chunk['crm_cd_desc'].apply(categorize_crime).unique())
+    if not n_rows:
+        raise ValueError(f"❌ Aucune ligne de données dans {filepath}")
+    if not fit:
+        return n_rows, missing / n_rows, None, None, None
+
+    feature_encoders = {}
+    for col, counts in vocabularies.items():
+        # Même vocabulaire que encode_features sur le fichier complet (plafonné en mode natif)
+        vocabulary = feature_defs.capped_vocabulary(counts, **caps) if caps is not None else sorted(counts)
+        feature_encoders[col] = LabelEncoder().fit(np.array(vocabulary, dtype=object))
+    target_encoder = LabelEncoder().fit(np.array(sorted(classes), dtype=object))
+    return n_rows, missing / n_rows, target_encoder, feature_encoders, feature_defs.params_from_stats(stats)
+
+def robust_scaler_from_counts(counts):
+    """RobustScaler (réglages par défaut) : médiane et IQR exacts, calculés sur les effectifs du train."""
+    q25, q50, q75 = np.array([counts[col].quantile([0.25, 0.5, 0.75]) for col in DEFAULT_SELECTED_FEATURES]).T
+    scale = q75 - q25
+    scaler = RobustScaler()
+    scaler.center_ = q50
+    scaler.scale_ = np.where(scale < 10 * np.finfo(scale.dtype).eps, 1.0, scale)   # IQR nul -> 1, comme sklearn
+    scaler.n_features_in_ = len(DEFAULT_SELECTED_FEATURES)
+    scaler.feature_names_in_ = np.array(DEFAULT_SELECTED_FEATURES, dtype=object)
+    return scaler
+
+def write_shards(filepath, n_rows, target_encoder, feature_encoders, feature_params, scaler=None,
+                 fit_scaler=False, categorical=None):
+    """
+    2e passe : features, encodage et split bloc par bloc, shards float32 non scalés ; puis scaling
+    shard par shard (scaler appris sur les effectifs du train si `fit_scaler`).
+    Retourne (scaler, {feature: ValueCounts du train}, lignes de train).
+    """
+    plan = feature_defs.compile_plan(DEFAULT_SELECTED_FEATURES, feature_params)
+    is_test = split_mask(n_rows)
+    train_counts = {col: drift_profile.ValueCounts() for col in DEFAULT_SELECTED_FEATURES}
+    writer = data_shards.ShardWriter(data_shards.SHARDS_PATH, DEFAULT_SELECTED_FEATURES, categorical=categorical)
+    print("💾 Écriture des shards...")
+    start = 0
+    for chunk in read_clean_chunks(filepath):
+        X, _ = encode_features(plan.run_batch(chunk), encoders=feature_encoders)
+        chunk, _ = process_target(chunk, encoder=target_encoder)
+        values = X[DEFAULT_SELECTED_FEATURES].to_numpy(dtype=float)
+        labels = chunk['target_enc'].to_numpy()
+        test = is_test[start:start + len(chunk)]
+        start += len(chunk)
+        for i, col in enumerate(DEFAULT_SELECTED_FEATURES):
+            train_counts[col].update(values[~test, i])
+        writer.append("train", values[~test], labels[~test])
+        writer.append("test", values[test], labels[test])
+    writer.flush()
+
+    if fit_scaler:
+        print("⚖️ Scaling (Fit sur les effectifs du train)...")
+        scaler = robust_scaler_from_counts(train_counts)
+    if scaler is not None:
+        print("⚖️ Scaling des shards...")
+        writer.rescale(scaler.center_, scaler.scale_)
+    writer.close()
+    return scaler, train_counts, int((~is_test).sum())
+
 # ==========================================
 # MAIN PIPELINE
 # ==========================================
 
-def run_preprocessing_pipeline(data_path=None, mode="train"):
+def run_preprocessing_pipeline(data_path=None, mode="train", engine=None, output=None, feature_mode=None,
+                               mocodes_encoding=None):
     """
     Pipeline principal.
     mode='train' -> Apprend Scalers/Encoders et les sauvegarde (Pour Retraining/Drift).
     mode='transform' -> Utilise les Scalers/Encoders existants (Pour Test/Validation).
+    engine='pandas' | 'polars' -> moteur du chargement, des features et de l'encodage (sorties identiques).
+    output='pickle' | 'shards' -> processors/preprocessed_data.pkl ou shards float32 dans preprocessed_shards/.
+    feature_mode='scaled' | 'native' -> voir FEATURE_MODES (en mode transform : celui des processors).
+    mocodes_encoding='label' | 'multihot' -> voir MOCODES_ENCODINGS (en mode transform : celui des processors).
     """
+    engine = engine or PREPROCESSING_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Moteur inconnu : {engine} (attendu : {', '.join(ENGINES)})")
+    output = output or PREPROCESSED_OUTPUT
+    if output not in OUTPUTS:
+        raise ValueError(f"Sortie inconnue : {output} (attendu : {', '.join(OUTPUTS)})")
+    feature_mode = feature_mode or FEATURE_MODE
+    if feature_mode not in FEATURE_MODES:
+        raise ValueError(f"Mode de features inconnu : {feature_mode} (attendu : {', '.join(FEATURE_MODES)})")
+    mocodes_encoding = mocodes_encoding or MOCODES_ENCODING
+    if mocodes_encoding not in MOCODES_ENCODINGS:
+        raise ValueError(f"Encodage des Mocodes inconnu : {mocodes_encoding} (attendu : {', '.join(MOCODES_ENCODINGS)})")
+    if engine == "polars" and not preprocessing_polars.available():
+        print("⚠️ polars absent : moteur pandas.")
+        engine = "pandas"
     
     # 1. Résolution intelligente du chemin
     # Si data_path est None, on regarde ENV_DATA_PATH, sinon DEFAULT_LOCAL_PATH
     target_path = data_path if data_path else ENV_DATA_PATH
     final_path = find_data_file(target_path)
     
-    # 2. Chargement & Nettoyage
-    df = load_and_clean_initial(final_path)
-    df = feature_engineering_temporal(df)
-    df = handle_missing_values_and_text(df)
-    
-    # 3. Gestion des Artefacts selon le mode
-    target_encoder, feature_encoders, scaler = None, None, None
+    # 2. Gestion des Artefacts selon le mode
+    target_encoder, feature_encoders, scaler, feature_params = None, None, None, None
     
     if mode == "transform":
         if os.path.exists(os.path.join(ARTIFACTS_PATH, "target_label_encoder.pkl")):
             print("[INFO] Mode Transform: Chargement des processeurs existants...")
             with open(os.path.join(ARTIFACTS_PATH, "target_label_encoder.pkl"), "rb") as f: target_encoder = pickle.load(f)
             with open(os.path.join(ARTIFACTS_PATH, "feature_label_encoders.pkl"), "rb") as f: feature_encoders = pickle.load(f)
-            with open(os.path.join(ARTIFACTS_PATH, "robust_scaler.pkl"), "rb") as f: scaler = pickle.load(f)
+            if os.path.exists(os.path.join(ARTIFACTS_PATH, "features_config.pkl")):
+                with open(os.path.join(ARTIFACTS_PATH, "features_config.pkl"), "rb") as f:
+                    config = pickle.load(f)
+                feature_params = config.get("feature_params")
+                feature_mode = config.get("feature_mode", "scaled")
+                mocodes_encoding = "multihot" if config.get("multi_hot") else "label"
+            if feature_mode == "scaled":
+                with open(os.path.join(ARTIFACTS_PATH, "robust_scaler.pkl"), "rb") as f: scaler = pickle.load(f)
         else:
             raise FileNotFoundError("❌ Mode 'transform' demandé mais aucun processeur trouvé dans processors/")
     else:
         print("[INFO] Mode Train: Initialisation de nouveaux processeurs...")
         os.makedirs(ARTIFACTS_PATH, exist_ok=True)
+    native = feature_mode == "native"
+    caps = CATEGORY_CAPS if native else None
+    # Multi-hot : colonnes listes de codes hors de la matrice dense, ajoutées en bloc creux après le scaling
+    multi_hot = feature_defs.CODE_LIST_FEATURES if mocodes_encoding == "multihot" else []
+    code_caps = MOCODE_CAPS if multi_hot else None
+    if multi_hot and (native or output == "shards"):
+        raise ValueError("❌ MOCODES_ENCODING=multihot : mode 'scaled' et sortie 'pickle' uniquement "
+                         "(catégories natives et shards sont des matrices denses)")
 
-    # 4. Encodage
-    df, target_encoder = process_target(df, encoder=target_encoder)
-    df, feature_encoders = encode_features(df, encoders=feature_encoders)
-    
-    # 5. Sélection Features
-    for col in DEFAULT_SELECTED_FEATURES:
-        if col not in df.columns: df[col] = 0
-            
-    X = df[DEFAULT_SELECTED_FEATURES]
-    y = df['target_enc']
-    
-    # 6. Split & Scale
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    if scaler:
-        print("⚖️ Scaling (Transform)...")
-        X_train_scaled = scaler.transform(X_train)
-        X_test_scaled = scaler.transform(X_test)
+    if output == "shards":
+        # 3-7. Deux passes sur le CSV lu par blocs : ni DataFrame ni matrice complets en mémoire
+        if engine == "polars":
+            print("ℹ️ Sortie shards : CSV lu par blocs avec pandas (moteur polars non utilisé).")
+        n_rows, raw_missing_rates, *fitted = fit_chunks(final_path, caps=caps, fit=mode == "train")
+        if mode == "train":
+            target_encoder, feature_encoders, feature_params = fitted
+        # Mode natif : nombre de codes par feature catégorielle (catégories 0..n-1 du modèle)
+        cardinalities = {col: len(le.classes_) for col, le in feature_encoders.items()} if native else None
+        if native:
+            print("🌳 Mode natif : codes catégoriels non scalés dans les shards...")
+        scaler, train_counts, n_train = write_shards(final_path, n_rows, target_encoder, feature_encoders, feature_params,
+                                                     scaler=scaler, fit_scaler=not native and scaler is None,
+                                                     categorical=cardinalities)
+        # Pas de pickle périmé d'un run précédent loggué avec les processors
+        if os.path.exists(os.path.join(ARTIFACTS_PATH, "preprocessed_data.pkl")):
+            os.remove(os.path.join(ARTIFACTS_PATH, "preprocessed_data.pkl"))
     else:
-        print("⚖️ Scaling (Fit & Transform)...")
-        scaler = RobustScaler()
-        X_train_scaled = scaler.fit_transform(X_train)
-        X_test_scaled = scaler.transform(X_test)
-    
-    # 7. Sauvegarde Données
-    print("💾 Sauvegarde preprocessed_data.pkl...")
-    data_package = {"X_train_scaled": X_train_scaled, "X_test_scaled": X_test_scaled, "y_train": y_train.values, "y_test": y_test.values}
-    with open(os.path.join(ARTIFACTS_PATH, "preprocessed_data.pkl"), "wb") as f: pickle.dump(data_package, f)
+        if engine == "polars":
+            # 3-5. Chargement, features et encodage en requêtes Polars lazy
+            X, y, raw_missing_rates, target_encoder, feature_encoders, feature_params = \
+                preprocessing_polars.build_training_frame(final_path, DEFAULT_SELECTED_FEATURES, clean_column_names,
+                                                          target_encoder, feature_encoders, feature_params,
+                                                          fit=mode == "train", caps=caps, code_caps=code_caps)
+        else:
+            # 3. Chargement & Nettoyage
+            df = load_and_clean_initial(final_path)
+            # Taux de valeurs manquantes avant imputation (profil de référence du drift)
+            raw_missing_rates = df.isna().mean()
+            if mode == "train":
+                feature_params = feature_defs.fit_params(df)
+
+            # 4. Features (mêmes définitions que le Feature Store, seules les features du modèle sont calculées)
+            print("🛠️ Feature Engineering...")
+            X = feature_defs.compile_plan(DEFAULT_SELECTED_FEATURES, feature_params).run_batch(df)
+
+            # 5. Encodage
+            df, target_encoder = process_target(df, encoder=target_encoder)
+            X, feature_encoders = encode_features(X, encoders=feature_encoders, caps=caps, code_caps=code_caps)
+            y = df['target_enc']
+
+        # 6. Split & Scale
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=SPLIT_SEED)
+        # Mode natif : nombre de codes par feature catégorielle (catégories 0..n-1 du modèle)
+        cardinalities = {col: len(le.classes_) for col, le in feature_encoders.items()} if native else None
+
+        if native:
+            # Pas de scaling : les arbres n'en tirent rien ; catégories déclarées via le dtype
+            print("🌳 Mode natif : catégories pour les modèles d'arbres (pas de scaling)...")
+            # (index remis à zéro : positions, comme les matrices du mode scaled)
+            X_train_scaled = feature_defs.native_frame(X_train.reset_index(drop=True), cardinalities)
+            X_test_scaled = feature_defs.native_frame(X_test.reset_index(drop=True), cardinalities)
+        else:
+            # Multi-hot : le scaler ne voit que les colonnes denses
+            dense_train, dense_test = (X_train.drop(columns=multi_hot), X_test.drop(columns=multi_hot)) if multi_hot \
+                else (X_train, X_test)
+            if scaler:
+                print("⚖️ Scaling (Transform)...")
+                X_train_scaled = scaler.transform(dense_train)
+                X_test_scaled = scaler.transform(dense_test)
+            else:
+                print("⚖️ Scaling (Fit & Transform)...")
+                scaler = RobustScaler()
+                X_train_scaled = scaler.fit_transform(dense_train)
+                X_test_scaled = scaler.transform(dense_test)
+            if multi_hot:
+                # Matrices CSR : features scalées puis une colonne par code du vocabulaire
+                print("🧩 Multi-hot creux des listes de codes...")
+                X_train_scaled = feature_defs.with_multi_hot(X_train_scaled, encode_code_lists(X_train, feature_encoders, multi_hot))
+                X_test_scaled = feature_defs.with_multi_hot(X_test_scaled, encode_code_lists(X_test, feature_encoders, multi_hot))
+
+        # 7. Sauvegarde Données (X_*_scaled : entrées du modèle, non scalées en mode natif)
+        print("💾 Sauvegarde preprocessed_data.pkl...")
+        data_package = {"X_train_scaled": X_train_scaled, "X_test_scaled": X_test_scaled, "y_train": y_train.values, "y_test": y_test.values,
+                        "feature_mode": feature_mode}
+        with open(os.path.join(ARTIFACTS_PATH, "preprocessed_data.pkl"), "wb") as f: pickle.dump(data_package, f)
 
     # 8. Sauvegarde Processors (Seulement en mode Train)
     if mode == "train":
         with open(os.path.join(ARTIFACTS_PATH, "target_label_encoder.pkl"), "wb") as f: pickle.dump(target_encoder, f)
         with open(os.path.join(ARTIFACTS_PATH, "feature_label_encoders.pkl"), "wb") as f: pickle.dump(feature_encoders, f)
-        with open(os.path.join(ARTIFACTS_PATH, "robust_scaler.pkl"), "wb") as f: pickle.dump(scaler, f)
-        with open(os.path.join(ARTIFACTS_PATH, "features_config.pkl"), "wb") as f: pickle.dump({"final_feature_order": DEFAULT_SELECTED_FEATURES}, f)
+        if native:
+            # Pas de scaler en mode natif (ni scaler périmé d'un run précédent)
+            if os.path.exists(os.path.join(ARTIFACTS_PATH, "robust_scaler.pkl")):
+                os.remove(os.path.join(ARTIFACTS_PATH, "robust_scaler.pkl"))
+        else:
+            with open(os.path.join(ARTIFACTS_PATH, "robust_scaler.pkl"), "wb") as f: pickle.dump(scaler, f)
+        with open(os.path.join(ARTIFACTS_PATH, "features_config.pkl"), "wb") as f:
+            pickle.dump({"final_feature_order": DEFAULT_SELECTED_FEATURES, "feature_params": feature_params,
+                         "feature_mode": feature_mode, "multi_hot": multi_hot}, f)
+        # Même contenu au format compact (chargé par le Feature Store sans pickle ni sklearn)
+        compact_processors.save_processors(ARTIFACTS_PATH, feature_encoders, scaler, target_encoder,
+                                           feature_order=DEFAULT_SELECTED_FEATURES, feature_params=feature_params,
+                                           feature_mode=feature_mode, multi_hot=multi_hot)
+        # Profil compact du train (non scalé) : référence du monitoring de drift en service
+        # (listes de codes exclues en multi-hot : texte, hors de l'espace numérique du profil)
+        if output == "shards":
+            profile = drift_profile.build_profile_from_counts(train_counts, n_train, PROFILE_CATEGORICAL_FEATURES,
+                                                              raw_missing_rates=raw_missing_rates)
+        else:
+            profile = drift_profile.build_profile(X_train.drop(columns=multi_hot), categorical_features=PROFILE_CATEGORICAL_FEATURES,
+                                                  raw_missing_rates=raw_missing_rates)
+        drift_profile.save_profile(profile, ARTIFACTS_PATH)
         print(f"✅ Nouveaux processeurs sauvegardés dans {ARTIFACTS_PATH}/")
 
     print(f"✨ Preprocessing terminé avec succès.")
@@ -237,6 +503,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--data_path", type=str, default=None, help="Chemin du CSV")
     parser.add_argument("--mode", type=str, default="train", choices=["train", "transform"], help="Mode d'exécution")
+    parser.add_argument("--engine", type=str, default=PREPROCESSING_ENGINE, choices=ENGINES, help="Moteur d'exécution")
+    parser.add_argument("--output", type=str, default=PREPROCESSED_OUTPUT, choices=OUTPUTS, help="Format des données pré-traitées")
+    parser.add_argument("--feature_mode", type=str, default=FEATURE_MODE, choices=FEATURE_MODES, help="Représentation des features")
+    parser.add_argument("--mocodes_encoding", type=str, default=MOCODES_ENCODING, choices=MOCODES_ENCODINGS, help="Encodage des Mocodes")
     args = parser.parse_args()
     
-    run_preprocessing_pipeline(data_path=args.data_path, mode=args.mode)
\ No newline at end of file
+    run_preprocessing_pipeline(data_path=args.data_path, mode=args.mode, engine=args.engine, output=args.output,
+                               feature_mode=args.feature_mode, mocodes_encoding=args.mocodes_encoding)
\ No newline at end of file
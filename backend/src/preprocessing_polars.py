@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+import feature_defs
+
+try:
+    import polars as pl
+except ImportError:  # Dépendance optionnelle : sans elle, le moteur pandas est utilisé
+    pl = None
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Moteur Polars (lazy) du preprocessing : chargement -> nettoyage -> features temporelles -> imputation
+# -> encodage, en requêtes optimisées et multi-threadées. Mêmes définitions de features (feature_defs),
+# mêmes encodeurs et mêmes paramètres que le moteur pandas : sorties identiques.
+
+# Valeurs lues comme manquantes par pandas.read_csv (na_values par défaut), pour un parsing identique
+PANDAS_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"
+]
+# Types inférés sur les premières lignes ; tout le fichier si une valeur plus loin les contredit
+INFER_SCHEMA_ROWS = 10000
+# Colonne d'index sans en-tête ("Unnamed: 0" pour pandas), retirée comme dans preprocessing2.load_and_clean_initial
+INDEX_COLUMNS = ("", "Unnamed: 0")
+
+def available():
+    return pl is not None
+
+# ==========================================
+# ÉTAPES
+# ==========================================
+
+def load_and_clean_initial(filepath, clean_column_names):
+    """
+    Scan CSV paresseux, noms normalisés, dédoublonnage (ordre conservé). Le dédoublonnage porte sur
+    toutes les colonnes restantes : seules DR_NO et l'index sont écartées dès le scan.
+    `clean_column_names` : la fonction de nettoyage des noms du moteur pandas.
+    """
+    print(f"📂 Chargement (Polars) depuis : {filepath}")
+    try:
+        return _scan(filepath, clean_column_names, INFER_SCHEMA_ROWS).collect()
+    except pl.exceptions.ComputeError:
+        print("⚠️ Types contredits après les premières lignes : inférence sur tout le fichier.")
+        return _scan(filepath, clean_column_names, None).collect()
+
+def _scan(filepath, clean_column_names, infer_schema_length):
+    lazy = pl.scan_csv(filepath, infer_schema_length=infer_schema_length, null_values=PANDAS_NA_VALUES)
+    names = [name for name in lazy.collect_schema().names() if name not in INDEX_COLUMNS]
+    cleaned = list(clean_column_names(pd.DataFrame(columns=names)).columns)
+    lazy = lazy.select(names).rename(dict(zip(names, cleaned)))
+    if "dr_no" in cleaned:
+        lazy = lazy.drop("dr_no")
+    lazy = lazy.rename({"part_1_2": "crm_risk"}, strict=False)
+    return lazy.unique(keep="first", maintain_order=True)
+
+def missing_rates(df):
+    """Équivalent de df.isna().mean() (pandas) : taux de valeurs manquantes par colonne."""
+    counts = df.null_count().row(0)
+    return pd.Series([c / df.height if df.height else np.nan for c in counts], index=df.columns, dtype=float)
+
+def fit_params(df):
+    """feature_defs.fit_params sur les seules colonnes dont il a besoin."""
+    columns = [feature_defs.SOURCES[s] for s in feature_defs.PARAM_SOURCES if feature_defs.SOURCES[s] in df.columns]
+    return feature_defs.fit_params(df.select(columns).to_pandas())
+
+def _codes(series, mapping, default=None):
+    return series.replace_strict(mapping, default=default, return_dtype=pl.Int64)
+
+def process_target(descriptions, encoder=None):
+    """Classes de crime (feature_defs.categorize_crime, une fois par description distincte) -> codes."""
+    unique = [d for d in descriptions.unique().to_list() if d is not None]
+    crime_class = descriptions.replace_strict({d: feature_defs.categorize_crime(d) for d in unique},
+                                              default=feature_defs.categorize_crime(None), return_dtype=pl.String)
+    distinct = crime_class.unique().to_numpy().astype(object)
+    if encoder is None:
+        encoder = LabelEncoder().fit(distinct)
+    codes = dict(zip(distinct.tolist(), encoder.transform(distinct).tolist()))
+    return _codes(crime_class, codes).to_numpy(), encoder
+
+def encode_features(df, encoders=None, caps=None, code_caps=None):
+    """
+    Label encoding des features catégorielles (mêmes classes que LabelEncoder, inconnues -> OTHER_CATEGORY
+    si présente, sinon 0). caps / code_caps : vocabulaires plafonnés et listes de codes laissées en texte
+    (vocabulaire des codes), comme preprocessing2.encode_features.
+    """
+    schema = df.schema
+    strings = df.select([feature_defs.category_strings_expr(pl.col(col), schema[col]) for col in
+                         feature_defs.categorical_features(df.columns)])
+    code_lists = [col for col in feature_defs.CODE_LIST_FEATURES if col in strings.columns] if code_caps is not None else []
+    codes = [strings[col] for col in code_lists]
+    if encoders:
+        for col, le in encoders.items():
+            if col in strings.columns and col not in code_lists:
+                mapping = {cls: i for i, cls in enumerate(le.classes_)}
+                codes.append(_codes(strings[col], mapping, default=mapping.get(feature_defs.OTHER_CATEGORY, 0)).alias(col))
+    else:
+        encoders = {}
+        for col in strings.columns:
+            if col in code_lists:
+                # Vocabulaire des codes, et non des listes
+                counts = strings[col].str.extract_all(feature_defs.CODE_PATTERN).explode().drop_nulls().value_counts()
+                vocabulary = feature_defs.capped_vocabulary(dict(zip(*counts.get_columns())), **code_caps)
+                encoders[col] = LabelEncoder().fit(np.array(vocabulary, dtype=object))
+                continue
+            if caps is not None:
+                counts = strings[col].value_counts()
+                vocabulary = feature_defs.capped_vocabulary(dict(zip(*counts.get_columns())), **caps)
+                le = LabelEncoder().fit(np.array(vocabulary, dtype=object))
+                mapping = {cls: i for i, cls in enumerate(le.classes_)}
+                codes.append(_codes(strings[col], mapping, default=mapping[feature_defs.OTHER_CATEGORY]).alias(col))
+            else:
+                le = LabelEncoder().fit(strings[col].unique().to_numpy().astype(object))
+                codes.append(_codes(strings[col], {cls: i for i, cls in enumerate(le.classes_)}).alias(col))
+            encoders[col] = le
+    return df.with_columns(codes), encoders
+
+# ==========================================
+# PIPELINE
+# ==========================================
+
+def build_training_frame(filepath, features, clean_column_names, target_encoder=None, feature_encoders=None,
+                         feature_params=None, fit=False, caps=None, code_caps=None):
+    """
+    Équivalent Polars du chargement, des features et de l'encodage de preprocessing2.run_preprocessing_pipeline.
+    Retourne (X pandas dans l'ordre de `features`, y, taux de manquants bruts, target_encoder,
+    feature_encoders, feature_params) ; encodeurs non fournis appris (plafonnés selon `caps`),
+    paramètres appris si `fit`. code_caps : listes de codes en multi-hot (colonnes laissées en texte).
+    """
+    df = load_and_clean_initial(filepath, clean_column_names)
+    raw_missing_rates = missing_rates(df)
+    if fit:
+        feature_params = fit_params(df)
+
+    print("🛠️ Feature Engineering (Polars lazy)...")
+    plan = feature_defs.compile_plan(features, feature_params)
+    frame = plan.run_lazy(df.lazy(), keep=["crm_cd_desc"]).collect()
+    y, target_encoder = process_target(frame["crm_cd_desc"], target_encoder)
+    frame, feature_encoders = encode_features(frame.drop("crm_cd_desc"), feature_encoders, caps, code_caps)
+    X = frame.select(features).to_pandas()
+    return X, pd.Series(y, name="target_enc"), raw_missing_rates, target_encoder, feature_encoders, feature_params
@@ -0,0 +1,163 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import metrics
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Profil d'une requête sur N (0 = désactivé : un simple test d'entier par requête)
+PROFILE_EVERY_N = int(os.getenv("PROFILE_EVERY_N", "0"))
+DEFAULT_INTERVAL = 0.005   # 5 ms entre deux échantillons
+MAX_PROFILE_SECONDS = 60
+MAX_DISTINCT_STACKS = 5000  # borne mémoire du profil cumulé des requêtes
+SERVER_TIMING_ENABLED = os.getenv("ENABLE_SERVER_TIMING", "1") == "1"
+
+# ==========================================
+# ÉCHANTILLONNEUR (pile Python de chaque thread)
+# ==========================================
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def collapse_stack(frame):
+    """Pile d'appels au format "collapsed" (racine;...;feuille) lu par flamegraph.pl / speedscope."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+def format_collapsed(counts):
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common()) + "\n"
+
+class SamplingProfiler:
+    """
+    Profileur par échantillonnage : un thread lit sys._current_frames() toutes les `interval` secondes.
+    Aucun coût quand il n'est pas démarré ; il n'instrumente pas le code profilé.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, thread_ids=None):
+        self.interval = interval
+        self.thread_ids = set(thread_ids) if thread_ids else None
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.is_set():
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_ids and thread_id not in self.thread_ids):
+                    continue
+                self.counts[collapse_stack(frame)] += 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.counts
+
+def profile_process(seconds, interval=DEFAULT_INTERVAL):
+    """Profil de tous les threads du worker pendant `seconds` secondes (bloquant)."""
+    profiler = SamplingProfiler(interval=interval).start()
+    time.sleep(min(seconds, MAX_PROFILE_SECONDS))
+    return profiler.stop(), profiler.samples
+
+# ==========================================
+# PROFIL D'UNE REQUÊTE SUR N
+# ==========================================
+_request_counter = 0
+_request_lock = threading.Lock()
+REQUEST_PROFILE = Counter()
+
+def should_profile_request():
+    global _request_counter
+    if PROFILE_EVERY_N <= 0:
+        return False
+    with _request_lock:
+        _request_counter += 1
+        return _request_counter % PROFILE_EVERY_N == 0
+
+def merge_request_profile(counts):
+    with _request_lock:
+        for stack, count in counts.items():
+            if stack in REQUEST_PROFILE or len(REQUEST_PROFILE) < MAX_DISTINCT_STACKS:
+                REQUEST_PROFILE[stack] += count
+
+class request_profile:
+    """
+    Context manager pour le chemin de prédiction : échantillonne uniquement le thread courant,
+    une requête sur PROFILE_EVERY_N. Sinon, ne fait rien.
+    """
+
+    def __enter__(self):
+        self.profiler = None
+        if should_profile_request():
+            self.profiler = SamplingProfiler(thread_ids=[threading.get_ident()]).start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            merge_request_profile(self.profiler.stop())
+        return False
+
+# ==========================================
+# SERVER-TIMING (décomposition par requête)
+# ==========================================
+# Étapes de metrics.observe_stage regroupées en entrées Server-Timing
+SERVER_TIMING_GROUPS = {
+    "validation": ("validation",),
+    "features": ("features.",),
+    "model": ("predict", "predict_proba"),
+    "decode": ("decode_target",),
+}
+
+def server_timing_header(timings, total_seconds):
+    entries = []
+    for name, prefixes in SERVER_TIMING_GROUPS.items():
+        seconds = sum(v for stage, v in timings.items()
+                      if stage in prefixes or any(p.endswith(".") and stage.startswith(p) for p in prefixes))
+        if seconds:
+            entries.append(f"{name};dur={seconds * 1000:.3f}")
+    entries.append(f"app;dur={total_seconds * 1000:.3f}")
+    return ", ".join(entries)
+
+class ServerTimingMiddleware:
+    """Ajoute l'en-tête Server-Timing (features, modèle, ...) calculé à partir des étapes chronométrées."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SERVER_TIMING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings = {}
+        token = metrics.REQUEST_TIMINGS.set(timings)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                header = server_timing_header(timings, time.perf_counter() - start)
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.REQUEST_TIMINGS.reset(token)
@@ -0,0 +1,68 @@
+import threading
+import time
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Étapes du chargement du modèle, dans l'ordre (FAILED : tentative échouée, une autre peut suivre)
+STARTING = "starting"
+CONNECTING = "connecting"            # login MLflow / DagsHub
+DOWNLOADING = "downloading"          # requête au Registry + modèle + processors
+LOADING_FEATURES = "loading_features"
+WARMING = "warming"                  # modèle chargé, warmup jusqu'à latence stable (warmup.py)
+READY = "ready"
+FAILED = "failed"
+
+RETRY_AFTER_SECONDS = 10             # en-tête Retry-After des 503 tant que le modèle n'est pas prêt
+
+# ==========================================
+# ÉTAT DU CHARGEMENT
+# ==========================================
+
+class LoadStatus:
+    """
+    Progression du chargement en arrière-plan, lue par /livez, /readyz et les endpoints de prédiction :
+    étape courante, durée de chaque étape terminée, nombre de tentatives, dernière erreur.
+    """
+
+    def __init__(self):
+        self.state = STARTING
+        self.detail = None
+        self.error = None
+        self.attempts = 0
+        self.stages = {}                     # étape -> durée cumulée (s)
+        self._started = time.perf_counter()
+        self._stage_started = self._started
+        self._lock = threading.Lock()
+        self.on_change = None                # rappel après chaque étape (api : publication pour le /readyz du pod)
+
+    def enter(self, state, detail=None):
+        with self._lock:
+            now = time.perf_counter()
+            self.stages[self.state] = round(self.stages.get(self.state, 0.0) + now - self._stage_started, 3)
+            self.state = state
+            self.detail = detail
+            self._stage_started = now
+        if state != READY:
+            print(f"⏳ Chargement : {state}{f' ({detail})' if detail else ''}")
+        if self.on_change is not None:
+            self.on_change()
+
+    def fail(self, error):
+        self.error = str(error)
+        self.enter(FAILED, self.error)
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "detail": self.detail,
+                "attempts": self.attempts,
+                "elapsed_seconds": round(time.perf_counter() - self._started, 3),
+                "stages": dict(self.stages),
+                "error": self.error
+            }
@@ -0,0 +1,250 @@
+import argparse
+import gc
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import uvicorn
+
+import readiness
+import worker_state
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Serveur multi-workers "preload" : le process maître charge le modèle et le Feature Store UNE fois,
+# gèle son tas (gc.freeze) puis forke les workers uvicorn, qui partagent ces pages en copy-on-write
+# (et les vocabulaires mmap du format compact via le page cache). `uvicorn --workers` ne convient pas :
+# ses workers sont démarrés en "spawn" et rechargent chacun tout le modèle.
+HOST = os.getenv("API_HOST", "0.0.0.0")
+PORT = int(os.getenv("API_PORT", "5000"))
+API_WORKERS = os.getenv("API_WORKERS")          # défaut : CPU disponibles pour le process
+SHUTDOWN_TIMEOUT = float(os.getenv("API_SHUTDOWN_TIMEOUT", "30"))
+RESTART_BACKOFF_SECONDS = 1.0
+MEMORY_REPORT_DELAY = 15.0                      # secondes après le démarrage des workers
+POLL_INTERVAL = 0.2
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS
+        return os.cpu_count() or 1
+
+def bind_socket(host=HOST, port=PORT, backlog=2048):
+    """Socket d'écoute ouvert par le maître et hérité par tous les workers (le noyau répartit les connexions)."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+# ==========================================
+# PRÉCHARGEMENT (process maître)
+# ==========================================
+
+def preload():
+    """
+    Charge l'API et ses composants lourds dans le maître. Aucune prédiction ici : OpenMP n'est pas fork-safe.
+    Les tentatives (MODEL_LOAD_ATTEMPTS) se font ici, avant le fork, pendant que les sondes sont servies :
+    les workers ne retentent le chargement (api.load_in_background) que si le maître a tout épuisé,
+    et leurs téléchargements sont alors sérialisés par artifacts.download_lock.
+    """
+    import api
+    api.load_with_retries()
+    return api.app
+
+class _ProbeHandler(BaseHTTPRequestHandler):
+    """Réponses du maître pendant le préchargement : /livez 200, tout le reste 503 + Retry-After."""
+
+    def do_GET(self):
+        api = sys.modules.get("api")
+        state = api.ml_components["status"].state if api is not None else readiness.STARTING
+        alive = self.path.split("?")[0] == "/livez"
+        body = json.dumps({"status": "alive" if alive else "preloading", "state": state}).encode()
+        self.send_response(200 if alive else 503)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if not alive:
+            self.send_header("Retry-After", str(readiness.RETRY_AFTER_SECONDS))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+def answer_probes(sock):
+    """Sert les sondes Kubernetes sur le socket d'écoute pendant le préchargement (thread arrêté avant le fork)."""
+    server = HTTPServer(sock.getsockname(), _ProbeHandler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = sock
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.2},
+                              name="preload-probes", daemon=True)
+    thread.start()
+    return server, thread
+
+def stop_probes(server, thread):
+    server.shutdown()
+    thread.join()
+
+def freeze_heap():
+    """
+    Sort les objets préchargés du GC cyclique : sans cela, chaque collection d'un worker réécrit
+    les en-têtes GC de tous ces objets et duplique leurs pages (le partage copy-on-write disparaît).
+    """
+    gc.collect()
+    gc.freeze()
+    print(f"🧊 Tas du maître gelé : {gc.get_freeze_count()} objets partagés avec les workers.")
+
+def memory_usage(pid):
+    """RSS / PSS / mémoire partagée d'un process en Mo (Linux, /proc/<pid>/smaps_rollup ; {} sinon)."""
+    fields = {"Rss": "rss", "Pss": "pss", "Shared_Clean": "shared", "Shared_Dirty": "shared"}
+    usage = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    name = fields[key]
+                    usage[name] = usage.get(name, 0.0) + int(value.split()[0]) / 1024
+    except OSError:
+        return {}
+    return usage
+
+def memory_report(pids):
+    lines = []
+    total_pss = 0.0
+    for pid in sorted(pids):
+        usage = memory_usage(pid)
+        if usage:
+            total_pss += usage["pss"]
+            lines.append(f"   pid {pid} : RSS {usage['rss']:.0f} Mo, PSS {usage['pss']:.0f} Mo, "
+                         f"partagé {usage['shared']:.0f} Mo")
+    if lines:
+        print(f"📊 Mémoire des {len(lines)} workers (PSS total {total_pss:.0f} Mo) :\n" + "\n".join(lines))
+
+# ==========================================
+# WORKERS (process forkés)
+# ==========================================
+
+def run_worker(app, sock, log_level="info"):
+    """Corps d'un worker : un serveur uvicorn sur le socket hérité (lifespan : threads propres au worker)."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(app, lifespan="on", log_level=log_level, timeout_graceful_shutdown=SHUTDOWN_TIMEOUT)
+    uvicorn.Server(config).run(sockets=[sock])
+
+def spawn_worker(app, sock, log_level="info", gauges=()):
+    """gauges : jauges du maître (metrics.gauge_values), recopiées dans les fichiers Prometheus du worker."""
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            import metrics
+            metrics.inherit_gauges(gauges)
+            run_worker(app, sock, log_level)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            os._exit(code)
+    return pid
+
+# ==========================================
+# SUPERVISION (process maître)
+# ==========================================
+
+def serve(app, sock, workers, log_level="info"):
+    """
+    Forke `workers` workers et les supervise : un worker mort est relancé (depuis le tas préchargé,
+    donc sans retéléchargement) ; SIGTERM/SIGINT arrête proprement tous les workers (SIGKILL après
+    SHUTDOWN_TIMEOUT). Retourne quand tous les workers sont arrêtés.
+    Les métriques de tous les process sont dans le dossier partagé (worker_state.enable, appelé avant le
+    préchargement) : /metrics agrège le pod en mode multiprocess de prometheus_client.
+    """
+    import metrics
+    if not metrics.MULTIPROCESS:
+        raise RuntimeError("metrics importé avant worker_state.enable : /metrics ne couvrirait qu'un worker")
+    children = set()
+    state = {"stopping": False, "deadline": None}
+    # Compteurs du préchargement : restent dans les fichiers du maître (comptés une fois) ; ses jauges
+    # (modèle servi, pool) sont recopiées dans chaque worker et retirées pour le maître lui-même
+    gauges = metrics.gauge_values()
+    metrics.mark_process_dead(os.getpid())
+
+    def stop(signum, frame):
+        if state["stopping"]:
+            return
+        state["stopping"] = True
+        state["deadline"] = time.monotonic() + SHUTDOWN_TIMEOUT
+        print(f"🛑 Signal {signum} : arrêt des {len(children)} workers...")
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(workers):
+        children.add(spawn_worker(app, sock, log_level, gauges))
+    worker_state.set_workers(children)
+    print(f"🚀 {workers} workers démarrés (maître pid {os.getpid()}) : {sorted(children)}")
+    report_at = time.monotonic() + MEMORY_REPORT_DELAY
+
+    while children:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            if state["stopping"] and time.monotonic() > state["deadline"]:
+                print(f"⚠️ Workers toujours actifs après {SHUTDOWN_TIMEOUT:.0f}s : SIGKILL {sorted(children)}")
+                for child in children:
+                    os.kill(child, signal.SIGKILL)
+                state["deadline"] = float("inf")
+            if report_at is not None and time.monotonic() > report_at:
+                memory_report(children)
+                report_at = None
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        children.discard(pid)
+        worker_state.retire(pid)
+        metrics.mark_process_dead(pid)
+        if not state["stopping"]:
+            print(f"⚠️ Worker {pid} arrêté (code {os.waitstatus_to_exitcode(status)}) : relance.")
+            time.sleep(RESTART_BACKOFF_SECONDS)
+            children.add(spawn_worker(app, sock, log_level, gauges))
+        worker_state.set_workers(children)
+    worker_state.cleanup()
+    print("🛑 Tous les workers sont arrêtés.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=int(API_WORKERS) if API_WORKERS else available_cpus())
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        print("⚠️ fork indisponible sur cette plateforme : un seul process uvicorn.")
+        uvicorn.run("api:app", host=args.host, port=args.port)
+        sys.exit(0)
+
+    # API_SHARED_DIR de l'opérateur (seuls nos fichiers y sont gérés) ou dossier temporaire propre au pod ;
+    # avant le préchargement : prometheus_client choisit son mode multiprocess à l'import de metrics
+    worker_state.enable(worker_state.shared_dir())
+    listener = bind_socket(args.host, args.port)
+    probes = answer_probes(listener)
+    try:
+        application = preload()
+    finally:
+        stop_probes(*probes)
+    freeze_heap()
+    serve(application, listener, max(1, args.workers), args.log_level)
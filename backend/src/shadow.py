@@ -0,0 +1,149 @@
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import metrics
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+DEFAULT_FRACTION = 0.1        # part des requêtes rejouées sur le candidat
+DEFAULT_MAX_PENDING = 64      # requêtes en attente au maximum (au-delà : ignorées et comptées)
+LATENCY_WINDOW = 2048         # dernières requêtes gardées pour les percentiles de latence
+TOP_DISAGREEMENTS = 10
+
+# ==========================================
+# SCORING SHADOW (hors du chemin de réponse)
+# ==========================================
+
+def _percentiles(values):
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(np.asarray(values, dtype=float), [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+class ShadowScorer:
+    """
+    Modèle candidat (ex : version en Staging) chargé à côté de la Production :
+    - une fraction des requêtes est rejouée sur le candidat, dans un thread dédié, APRÈS calcul
+      de la réponse servie (la latence client n'en dépend pas)
+    - le candidat a son propre Feature Store (ses processors peuvent différer de ceux de la Production)
+    - accord des prédictions et écarts de latence sont agrégés pour /shadow et /metrics
+      (latences comparées sur les mêmes étapes des deux côtés : features + predict + décodage,
+      sans predict_proba, moniteur de drift ni profilage)
+    """
+
+    def __init__(self, model, store, model_name, fraction=DEFAULT_FRACTION, max_pending=DEFAULT_MAX_PENDING,
+                 seed=None):
+        self.model = model
+        self.store = store
+        self.model_name = model_name
+        self.fraction = fraction
+        self.max_pending = max_pending
+        self._random = random.Random(seed)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.requests = self.rows = self.agreed = self.dropped = self.failed = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)  # (production_ms, candidate_ms) par requête
+        self.disagreements = Counter()                  # (production, candidat) -> lignes
+
+    # ---------- Chemin de requête ----------
+    def maybe_submit(self, raw_df, labels, latency_ms):
+        """
+        Tire la requête au sort et la met en file ; ne bloque jamais.
+        latency_ms : durée des étapes features + predict + décodage de la Production (pas la latence servie).
+        """
+        if self.fraction <= 0 or self._random.random() >= self.fraction:
+            return False
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                metrics.SHADOW_REQUESTS.labels(result="dropped").inc()
+                return False
+            self._pending += 1
+        self._executor.submit(self._score, raw_df, labels, latency_ms)
+        return True
+
+    # ---------- Thread shadow ----------
+    def _score(self, raw_df, labels, latency_ms):
+        try:
+            start = time.perf_counter()
+            X_input = self.store.get_batch_features(raw_df)
+            shadow_labels = [str(label) for label in self.store.decode_targets(
+                np.asarray(self.model.predict(X_input)).reshape(-1))]
+            shadow_ms = (time.perf_counter() - start) * 1000
+            self._record(labels, shadow_labels, latency_ms, shadow_ms)
+        except Exception as e:
+            print(f"⚠️ Shadow {self.model_name} : échec du scoring ({e})")
+            with self._lock:
+                self.failed += 1
+            metrics.SHADOW_REQUESTS.labels(result="failed").inc()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _record(self, labels, shadow_labels, latency_ms, shadow_ms):
+        pairs = Counter((p, s) for p, s in zip(labels, shadow_labels) if p != s)
+        disagreed = sum(pairs.values())
+        with self._lock:
+            self.requests += 1
+            self.rows += len(labels)
+            self.agreed += len(labels) - disagreed
+            self.disagreements.update(pairs)
+            self.latencies.append((latency_ms, shadow_ms))
+        metrics.SHADOW_REQUESTS.labels(result="scored").inc()
+        metrics.SHADOW_ROWS.labels(result="agree").inc(len(labels) - disagreed)
+        if disagreed:
+            metrics.SHADOW_ROWS.labels(result="disagree").inc(disagreed)
+        metrics.SHADOW_LATENCY.labels(model="production").observe(latency_ms / 1000)
+        metrics.SHADOW_LATENCY.labels(model="candidate").observe(shadow_ms / 1000)
+        metrics.SHADOW_AGREEMENT.set(self.agreed / self.rows)
+
+    # ---------- Lecture ----------
+    def snapshot(self):
+        """État publiable (worker de serve.py) : compteurs, latences récentes, désaccords."""
+        with self._lock:
+            return {
+                "candidate": self.model_name, "fraction": self.fraction,
+                "requests": self.requests, "rows": self.rows, "agreed": self.agreed, "pending": self._pending,
+                "dropped": self.dropped, "failed": self.failed,
+                "latencies": [list(pair) for pair in self.latencies],
+                "disagreements": [[p, s, n] for (p, s), n in self.disagreements.items()]
+            }
+
+    def status(self):
+        return status_from_snapshots([self.snapshot()])
+
+    def close(self, wait=False):
+        self._executor.shutdown(wait=wait)
+
+def status_from_snapshots(snapshots):
+    """
+    Statut /shadow d'un ou plusieurs workers : compteurs et désaccords additionnés,
+    percentiles de latence sur les fenêtres récentes de tous les workers.
+    """
+    first = snapshots[0]
+    status = {"candidate": first["candidate"], "fraction": first["fraction"]}
+    for key in ("requests", "rows", "pending", "dropped", "failed"):
+        status[key] = sum(s[key] for s in snapshots)
+    agreed = sum(s["agreed"] for s in snapshots)
+    status["agreement_rate"] = round(agreed / status["rows"], 4) if status["rows"] else None
+
+    latencies = [pair for s in snapshots for pair in s["latencies"]]
+    status["latency_ms"] = {
+        "production": _percentiles([p for p, _ in latencies]),
+        "candidate": _percentiles([c for _, c in latencies]),
+        "delta": _percentiles([c - p for p, c in latencies])
+    }
+    disagreements = Counter()
+    for s in snapshots:
+        for production, candidate, n in s["disagreements"]:
+            disagreements[(production, candidate)] += n
+    status["top_disagreements"] = [{"production": p, "candidate": c, "rows": n}
+                                   for (p, c), n in disagreements.most_common(TOP_DISAGREEMENTS)]
+    return status
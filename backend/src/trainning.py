@@ -15,7 +15,11 @@ from catboost import CatBoostClassifier
 from sklearn.ensemble import RandomForestClassifier
 
 from sklearn.metrics import accuracy_score, f1_score, classification_report
-from preprocessing2 import run_preprocessing_pipeline, ARTIFACTS_PATH
+from preprocessing2 import run_preprocessing_pipeline, ARTIFACTS_PATH, CATEGORICAL_COLS_TO_ENCODE, FEATURE_MODE, MOCODES_ENCODING
+import artifacts
+import data_shards
+import feature_defs
+import out_of_core
 
 # ==========================================
 # CONFIGURATION
@@ -25,6 +29,11 @@ REGISTERED_MODEL_NAME = "Crime_Prediction_Model"
 DATA_VERSION = "v1"  # Ta version de donnée demandée
 DATA_PATH = "../../data/crime_v1.csv" # Chemin vers ta donnée v1
 
+# "memory" : matrices denses en RAM (défaut) ; "external" : shards sur disque, entraînement hors mémoire
+# (XGBoost, LightGBM, CatBoost) pour les historiques qui ne tiennent pas dans le conteneur Jenkins
+TRAINING_MODES = ("memory", "external")
+TRAINING_MODE = os.getenv("TRAINING_MODE", "memory")
+
 DAGSHUB_REPO_OWNER = os.getenv("DAGSHUB_USERNAME", "YomnaJL")
 DAGSHUB_REPO_NAME = os.getenv("DAGSHUB_REPO_NAME", "MLOPS_Project")
 
@@ -102,9 +111,10 @@ def get_best_run_config():
     print(f"🕵️ Algorithme détecté pour re-training : {algo_type.upper()}")
     return algo_type, params
 
-def instantiate_model(algo_type, params, y_train):
+def instantiate_model(algo_type, params, y_train, categorical=None):
     """
     Nettoie les paramètres MLflow et instancie le bon modèle.
+    categorical : features catégorielles natives (FEATURE_MODE=native), déclarées au modèle.
     """
     clean_params = {}
     for k, v in params.items():
@@ -127,12 +137,18 @@ def instantiate_model(algo_type, params, y_train):
         num_class = len(np.unique(y_train))
         clean_params['objective'] = 'multi:softprob'
         clean_params['num_class'] = num_class
+        if categorical:
+            clean_params['enable_categorical'] = True
+            clean_params['tree_method'] = 'hist'
         return XGBClassifier(**clean_params, n_jobs=-1, random_state=42)
     
     elif algo_type == "catboost":
+        if categorical:
+            clean_params['cat_features'] = list(categorical)
         return CatBoostClassifier(**clean_params, verbose=0, random_state=42)
     
     elif algo_type == "lightgbm":
+        # Catégories natives détectées via le dtype category (ou déclarées par out_of_core)
         return LGBMClassifier(**clean_params, n_jobs=-1, random_state=42, verbose=-1)
     
     elif algo_type == "randomforest":
@@ -147,17 +163,28 @@ def train_and_register():
     # 1. RÉCUPÉRATION DE LA CONFIG DU MEILLEUR MODÈLE
     algo_type, best_params = get_best_run_config()
 
+    if TRAINING_MODE not in TRAINING_MODES:
+        raise ValueError(f"TRAINING_MODE inconnu : {TRAINING_MODE} (attendu : {', '.join(TRAINING_MODES)})")
+    external = TRAINING_MODE == "external"
+
     # 2. RUN PREPROCESSING (Mode Train pour régénérer les processeurs frais)
     print(f"⚙️ Exécution du preprocessing sur la donnée {DATA_VERSION}...")
-    run_preprocessing_pipeline(data_path=DATA_PATH, mode="train")
+    run_preprocessing_pipeline(data_path=DATA_PATH, mode="train", output="shards" if external else "pickle")
 
-    # Chargement des données pré-traitées
-    data_file = os.path.join(ARTIFACTS_PATH, "preprocessed_data.pkl")
-    with open(data_file, "rb") as f:
-        data = pickle.load(f)
-    
-    X_train, y_train = data["X_train_scaled"], data["y_train"]
-    X_test, y_test = data["X_test_scaled"], data["y_test"]
+    if external:
+        # Seuls les labels (int32) sont chargés : les features restent dans les shards
+        train_split = data_shards.ShardedSplit(data_shards.SHARDS_PATH, "train")
+        y_train, categorical = train_split.labels(), list(train_split.categorical)
+    else:
+        # Chargement des données pré-traitées
+        data_file = os.path.join(ARTIFACTS_PATH, "preprocessed_data.pkl")
+        with open(data_file, "rb") as f:
+            data = pickle.load(f)
+
+        X_train, y_train = data["X_train_scaled"], data["y_train"]
+        X_test, y_test = data["X_test_scaled"], data["y_test"]
+        # Mode natif : DataFrames aux colonnes catégorielles en dtype category ; Mocodes en multi-hot : matrices CSR
+        categorical = CATEGORICAL_COLS_TO_ENCODE if data.get("feature_mode") == "native" else None
 
     # 3. ENTRAÎNEMENT DANS MLFLOW
     with mlflow.start_run(run_name=f"Retrain_{algo_type}_{DATA_VERSION}") as run:
@@ -166,14 +193,21 @@ def train_and_register():
         mlflow.set_tag("model_status", "retrained")
         mlflow.log_param("dataset_version", DATA_VERSION)
         mlflow.log_param("algo_family", algo_type)
+        mlflow.log_param("training_mode", TRAINING_MODE)
+        mlflow.log_param("feature_mode", FEATURE_MODE)
+        mlflow.log_param("mocodes_encoding", MOCODES_ENCODING)
 
         # Instanciation et Fit
-        model = instantiate_model(algo_type, best_params, y_train)
+        model = instantiate_model(algo_type, best_params, y_train, categorical=categorical)
         print(f"🚀 Ré-entraînement du modèle {algo_type} en cours...")
-        model.fit(X_train, y_train)
-        
+        if external:
+            model = out_of_core.fit(algo_type, model, data_shards.SHARDS_PATH)
+            y_test, y_pred = out_of_core.predict(model, data_shards.SHARDS_PATH, "test")
+        else:
+            model.fit(X_train, y_train)
+            y_pred = model.predict(X_test)
+
         # Évaluation
-        y_pred = model.predict(X_test)
         f1 = f1_score(y_test, y_pred, average='weighted')
         acc = accuracy_score(y_test, y_pred)
         
@@ -184,7 +218,9 @@ def train_and_register():
         mlflow.log_metrics({"f1_weighted": f1, "accuracy": acc})
 
         # 4. LOG DES PROCESSORS (Les artefacts du preprocessing)
-        # On log tout le dossier 'processors' pour qu'il soit lié à CE modèle précis
+        # On log tout le dossier 'processors' pour qu'il soit lié à CE modèle précis,
+        # avec un manifeste (rôle, taille, SHA-256) : l'API et le monitoring n'en téléchargent que leur part
+        artifacts.write_manifest(ARTIFACTS_PATH)
         mlflow.log_artifacts(ARTIFACTS_PATH, artifact_path="processors")
         print(f"📁 Processors sauvegardés comme artefacts.")
 
@@ -193,7 +229,9 @@ def train_and_register():
                 sk_model=model, 
                 artifact_path="model", 
                 registered_model_name=REGISTERED_MODEL_NAME,
-                pyfunc_predict_fn="predict" # Force predict par défaut
+                pyfunc_predict_fn="predict", # Force predict par défaut
+                # Le wrapper LightGBM hors mémoire (out_of_core.BoosterClassifier) voyage avec le modèle
+                code_paths=[out_of_core.__file__, data_shards.__file__, feature_defs.__file__] if external else None
             )
         # 6. PROMOTION EN PRODUCTION
         # On définit un seuil minimal pour la promotion automatique
@@ -201,7 +239,16 @@ def train_and_register():
         client = MlflowClient()
         new_version = model_info.registered_model_version
 
-        if f1 >= MIN_F1_THRESHOLD:
+        # "Staging" : le candidat est d'abord rejoué en shadow par l'API (SHADOW_MODEL_STAGE=Staging)
+        # avant toute bascule du trafic ; "Production" (défaut) : promotion directe
+        PROMOTION_STAGE = os.getenv("PROMOTION_STAGE", "Production")
+
+        if f1 >= MIN_F1_THRESHOLD and PROMOTION_STAGE == "Staging":
+            client.transition_model_version_stage(
+                name=REGISTERED_MODEL_NAME, version=new_version, stage="Staging"
+            )
+            print(f"👥 Seuil F1 dépassé ({f1:.4f}). v{new_version} en 'Staging' : évaluation shadow avant Production.")
+        elif f1 >= MIN_F1_THRESHOLD:
             print(f"✅ Seuil F1 dépassé ({f1:.4f}). Promotion en 'Production' de la v{new_version}...")
             
             # Archivage des anciennes versions en production
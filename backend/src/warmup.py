@@ -0,0 +1,155 @@
+import glob
+import json
+import os
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+DEFAULT_BATCH_SIZES = (10, 100, 500)
+DEFAULT_RECORDS = 200       # payloads enregistrés au plus
+SYNTHETIC_RECORDS = 50      # payloads synthétiques au moins (complétés jusqu'à DEFAULT_RECORDS)
+MIN_ROUNDS = 3
+MAX_ROUNDS = 30
+STABLE_ROUNDS = 2          # tours consécutifs sans variation notable avant de déclarer la latence stable
+TOLERANCE = 0.2            # variation relative tolérée d'un tour à l'autre...
+ABS_TOLERANCE_MS = 0.5     # ... ou absolue (latences sub-milliseconde bruitées)
+REPEATS = 3                # appels par chemin et par tour (médiane)
+BUDGET_SECONDS = 60.0      # au-delà, le pod est déclaré prêt même sans latence stable
+SAMPLE_FILENAME = "crime_sample_150.csv"
+LOG_TAIL_BYTES = 1 << 20
+
+# Premières requêtes après un chargement : imports paresseux des librairies de boosting, création
+# du pool de threads OpenMP, premiers chemins pandas, caches de validation sklearn...
+# Le warmup rejoue des payloads (enregistrés + synthétiques) sur le chemin unitaire et sur des lots
+# de plusieurs tailles jusqu'à latence stable, avant que /readyz ne passe à 200.
+
+# ==========================================
+# PAYLOADS
+# ==========================================
+
+def _records_from_frame(df, fields):
+    df = df[[c for c in fields if c in df.columns]]
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+def _log_tail(path, limit):
+    """Dernières entrées complètes d'un journal d'inférence JSONL (lecture de la fin du fichier uniquement)."""
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - LOG_TAIL_BYTES))
+        lines = f.read().split(b"\n")
+    lines = lines[1:-1] if size > LOG_TAIL_BYTES else lines[:-1]
+    records = []
+    for line in lines[-limit:]:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        records.append(record.get("input", record))
+    return records
+
+def recorded_records(fields, path=None, log_dir=None, limit=DEFAULT_RECORDS):
+    """
+    Payloads enregistrés : `path` (CSV ou NDJSON) s'il existe, sinon la fin du journal d'inférence
+    le plus récent de `log_dir`. Retourne (records, source) ; ([], None) si aucun.
+    """
+    if path and os.path.exists(path):
+        if path.endswith(".csv"):
+            return _records_from_frame(pd.read_csv(path, nrows=limit), fields), path
+        return _log_tail(path, limit), path
+    if log_dir:
+        logs = sorted(glob.glob(os.path.join(log_dir, "inference-*.jsonl")))
+        if logs:
+            records = [{k: r.get(k) for k in fields if k in r} for r in _log_tail(logs[-1], limit)]
+            return records, logs[-1]
+    return [], None
+
+def synthetic_records(n, seed=0):
+    """Requêtes plausibles (schéma de CrimeInput) : couvrent aussi les valeurs inconnues et les champs absents."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        day = pd.Timestamp("2020-01-01") + pd.Timedelta(days=rng.randrange(5 * 365))
+        records.append({
+            "DATE OCC": day.strftime("%m/%d/%Y %I:%M:%S %p"),
+            "TIME OCC": rng.randrange(24) * 100 + rng.randrange(60),
+            "AREA": rng.randint(1, 21),
+            "Rpt Dist No": rng.randint(100, 2199),
+            "Part 1-2": rng.choice([1, 2]),
+            "Crm Cd": rng.choice([330, 510, 624, 740, 310, 230]),
+            "Mocodes": " ".join(f"{rng.randrange(3000):04d}" for _ in range(rng.randrange(4))) or None,
+            "Vict Age": float(rng.randrange(0, 90)),
+            "Vict Sex": rng.choice(["M", "F", "X", None]),
+            "Vict Descent": rng.choice(["H", "W", "B", "O", "A", "X", None]),
+            "Premis Cd": float(rng.choice([101, 102, 108, 501, 502, 128])),
+            "Premis Desc": rng.choice(["STREET", "SINGLE FAMILY DWELLING", "PARKING LOT", f"WARMUP {i}"]),
+            "Weapon Used Cd": rng.choice([None, 400.0, 500.0]),
+            "Weapon Desc": rng.choice([None, "STRONG-ARM (HANDS, FIST, FEET OR BODILY FORCE)"]),
+            "Status": rng.choice(["IC", "AO", "AA"]),
+            "LOCATION": f"{rng.randrange(100, 20000)} WARMUP ST",
+            "LAT": round(33.7 + rng.random() * 0.6, 4),
+            "LON": round(-118.7 + rng.random() * 0.5, 4)
+        })
+    return records
+
+# ==========================================
+# BOUCLE DE WARMUP
+# ==========================================
+
+def _timings_ms(fn, payload, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(payload)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def _is_stable(current, previous, tolerance, abs_tolerance_ms):
+    return all(abs(current[k] - previous[k]) <= max(tolerance * previous[k], abs_tolerance_ms) for k in current)
+
+def run_warmup(score_single, score_batch, records, batch_sizes=DEFAULT_BATCH_SIZES, min_rounds=MIN_ROUNDS,
+               max_rounds=MAX_ROUNDS, stable_rounds=STABLE_ROUNDS, tolerance=TOLERANCE,
+               abs_tolerance_ms=ABS_TOLERANCE_MS, repeats=REPEATS, budget_seconds=BUDGET_SECONDS):
+    """
+    Rejoue `records` par tours : `score_single(record)` puis `score_batch(records)` pour chaque taille de lot
+    (médiane de `repeats` appels). Latence stable = `stable_rounds` tours consécutifs sans variation au-delà
+    de la tolérance, après au moins `min_rounds` tours. S'arrête aussi à `max_rounds` ou `budget_seconds`.
+    Retourne le rapport par chemin : latence (ms) du tout premier appel, médianes du premier et du dernier tour ;
+    plus le nombre de tours, la stabilité et la durée.
+    """
+    if not records:
+        raise ValueError("Aucun payload pour le warmup.")
+    batches = {f"batch_{n}": [records[i % len(records)] for i in range(n)] for n in batch_sizes}
+    start = time.perf_counter()
+    history = []
+    cold = None
+    stable = 0
+    while len(history) < max_rounds:
+        timings = {"single": _timings_ms(score_single, records[len(history) % len(records)], repeats)}
+        for key, batch in batches.items():
+            timings[key] = _timings_ms(score_batch, batch, repeats)
+        if cold is None:
+            cold = {k: t[0] for k, t in timings.items()}
+        current = {k: float(np.median(t)) for k, t in timings.items()}
+        if history and _is_stable(current, history[-1], tolerance, abs_tolerance_ms):
+            stable += 1
+        else:
+            stable = 0
+        history.append(current)
+        if len(history) >= min_rounds and stable >= stable_rounds:
+            break
+        if time.perf_counter() - start > budget_seconds:
+            break
+
+    return {
+        "steady": len(history) >= min_rounds and stable >= stable_rounds,
+        "rounds": len(history),
+        "seconds": round(time.perf_counter() - start, 3),
+        "cold_ms": {k: round(v, 3) for k, v in cold.items()},
+        "first_ms": {k: round(v, 3) for k, v in history[0].items()},
+        "steady_ms": {k: round(v, 3) for k, v in history[-1].items()}
+    }
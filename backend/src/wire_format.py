@@ -0,0 +1,141 @@
+import typing
+
+import numpy as np
+import pandas as pd
+
+try:
+    import msgpack
+except ImportError:  # Dépendance optionnelle : sans elle, seul JSON est servi
+    msgpack = None
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+# Les colonnes numériques binaires sont des buffers little-endian de ce type
+NUMPY_DTYPES = {int: np.dtype("<i8"), float: np.dtype("<f8")}
+
+# ==========================================
+# SCHÉMA
+# ==========================================
+
+def field_kinds(model_cls):
+    """
+    {alias: int | float | str} à partir d'un modèle Pydantic (Optional[int] -> int).
+    L'ordre des champs du modèle est l'ordre fixe du format binaire.
+    """
+    kinds = {}
+    for field in model_cls.model_fields.values():
+        annotation = field.annotation
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        kinds[field.alias] = args[0] if args else annotation
+    return kinds
+
+def wants_msgpack(accept_header):
+    return bool(accept_header) and MSGPACK_MEDIA_TYPE in accept_header
+
+def is_msgpack(content_type):
+    return bool(content_type) and content_type.split(";")[0].strip() == MSGPACK_MEDIA_TYPE
+
+# ==========================================
+# DÉCODAGE (Requête -> colonnes NumPy)
+# ==========================================
+
+def to_column(values, kind):
+    """
+    Convertit une colonne en tableau typé.
+    - bytes : buffer binaire little-endian (int64 / float64), lu sans copie avec np.frombuffer
+    - liste : valeurs JSON/msgpack ; les entiers avec valeurs manquantes deviennent "Int64" (nullable)
+      pour que "1" reste "1" (et non "1.0") lors de l'encodage des catégories.
+    """
+    if isinstance(values, (bytes, bytearray, memoryview)):
+        if kind not in NUMPY_DTYPES:
+            raise ValueError("Seules les colonnes numériques peuvent être envoyées en binaire.")
+        return np.frombuffer(values, dtype=NUMPY_DTYPES[kind])
+
+    if kind is float:
+        return np.asarray(values, dtype=np.float64)  # None -> NaN
+    if kind is int:
+        if None in values:
+            return pd.array(values, dtype="Int64")
+        return np.asarray(values, dtype=np.int64)
+    return np.asarray(values, dtype=object)
+
+def columns_to_frame(columns, kinds):
+    """{alias: valeurs} -> DataFrame typé (les colonnes inconnues sont ignorées)."""
+    data = {alias: to_column(columns[alias], kind) for alias, kind in kinds.items() if alias in columns}
+    lengths = {len(col) for col in data.values()}
+    if len(lengths) > 1:
+        raise ValueError("Toutes les colonnes doivent avoir la même longueur.")
+    return pd.DataFrame(data)
+
+def decode_msgpack_columns(body, kinds):
+    """
+    Corps binaire : un tableau msgpack de len(kinds) entrées, dans l'ordre fixe des champs.
+    Chaque entrée est nil (colonne absente), une liste de valeurs, ou un buffer binaire.
+    """
+    if msgpack is None:
+        raise RuntimeError("msgpack n'est pas installé.")
+    entries = msgpack.unpackb(body, raw=False)
+    if not isinstance(entries, list) or len(entries) != len(kinds):
+        raise ValueError(f"Le corps msgpack doit contenir exactement {len(kinds)} colonnes.")
+    columns = {alias: values for alias, values in zip(kinds, entries) if values is not None}
+    return columns_to_frame(columns, kinds)
+
+# ==========================================
+# ENCODAGE (Client & Réponse)
+# ==========================================
+
+def encode_msgpack_columns(df, kinds):
+    """Côté client : DataFrame brut -> corps msgpack (numériques sans valeurs manquantes en binaire)."""
+    entries = []
+    for alias, kind in kinds.items():
+        if alias not in df.columns:
+            entries.append(None)
+            continue
+        col = df[alias]
+        if kind in NUMPY_DTYPES and not col.isna().any():
+            entries.append(col.to_numpy(dtype=NUMPY_DTYPES[kind]).tobytes())
+        else:
+            entries.append(col.astype(object).where(col.notna(), None).tolist())
+    return msgpack.packb(entries, use_bin_type=True)
+
+def _pack_predictions(labels, confidences):
+    classes, codes = np.unique(np.asarray(labels, dtype=object).astype(str), return_inverse=True)
+    return {
+        "classes": classes.tolist(),
+        "codes": codes.astype("<u2").tobytes(),
+        "confidences": np.asarray(confidences, dtype="<f8").tobytes()
+    }
+
+def _unpack_predictions(packed):
+    classes = np.asarray(packed["classes"], dtype=object)
+    codes = np.frombuffer(packed["codes"], dtype="<u2")
+    confidences = np.frombuffer(packed["confidences"], dtype="<f8")
+    return classes[codes] if len(classes) else np.array([], dtype=object), confidences
+
+def encode_msgpack_predictions(labels, confidences, model_info, by_model=None):
+    """
+    Réponse compacte : labels encodés en dictionnaire (classes + codes uint16)
+    et confiances en float64 binaire.
+    by_model : {version: (labels, confiances)}, même encodage par version (?models=).
+    """
+    payload = dict(_pack_predictions(labels, confidences), model_info=model_info)
+    if by_model is not None:
+        payload["by_model"] = {name: _pack_predictions(*result) for name, result in by_model.items()}
+    return msgpack.packb(payload, use_bin_type=True)
+
+def decode_msgpack_predictions(body):
+    """Côté client : inverse de encode_msgpack_predictions -> (labels, confiances, model_info)."""
+    payload = msgpack.unpackb(body, raw=False)
+    return (*_unpack_predictions(payload), payload["model_info"])
+
+def decode_msgpack_by_model(body):
+    """Côté client : détail par version d'une réponse ?models= -> {version: (labels, confiances)}."""
+    payload = msgpack.unpackb(body, raw=False)
+    return {name: _unpack_predictions(packed) for name, packed in payload.get("by_model", {}).items()}
+
+def encode_msgpack(obj):
+    return msgpack.packb(obj, use_bin_type=True)
@@ -0,0 +1,140 @@
+import fnmatch
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Dossier partagé par le maître de serve.py et ses workers forkés : chaque worker y publie son état de
+# chargement et ses vues /drift et /shadow, et prometheus_client ses métriques (sous-dossier PROMETHEUS_SUBDIR) ;
+# /metrics, /readyz, /drift et /shadow, servis par n'importe quel worker, couvrent alors tout le pod.
+# Défini par serve.py avant le préchargement ; absent (uvicorn api:app, tests) : un seul process, rien n'est partagé.
+SHARED_DIR_ENV = "API_SHARED_DIR"
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"   # mode multiprocess de prometheus_client (voir metrics)
+PROMETHEUS_SUBDIR = "prometheus"
+WORKERS_FILENAME = "workers.json"
+# Fichiers écrits ici : les seuls supprimés dans un API_SHARED_DIR fourni par l'opérateur (avec PROMETHEUS_SUBDIR)
+OWN_FILE_PATTERNS = (WORKERS_FILENAME, "status_*.json", "drift_*.json", "shadow_*.json", "*.json.*.tmp")
+VIEWS = ("drift", "shadow")         # états publiés par worker pour /drift et /shadow
+PUBLISH_INTERVAL_SECONDS = float(os.getenv("WORKER_STATE_INTERVAL_SECONDS", "1.0"))
+
+_created = False   # dossier créé par enable (mkdtemp) : supprimé en entier par cleanup
+
+def shared_dir():
+    return os.environ.get(SHARED_DIR_ENV)
+
+def enabled():
+    return bool(shared_dir())
+
+def enable(directory=None):
+    """
+    Maître : dossier transmis aux workers par l'environnement. Sans `directory`, un dossier temporaire
+    propre au process ; sinon (API_SHARED_DIR de l'opérateur) seuls nos fichiers d'un démarrage précédent
+    sont retirés, jamais le reste du dossier. À appeler avant le premier import de metrics.
+    """
+    global _created
+    _created = directory is None
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix="crime_api_workers_")
+    else:
+        os.makedirs(directory, exist_ok=True)
+        _remove_own_files(directory)
+    os.makedirs(os.path.join(directory, PROMETHEUS_SUBDIR))
+    os.environ[SHARED_DIR_ENV] = directory
+    os.environ[MULTIPROC_DIR_ENV] = os.path.join(directory, PROMETHEUS_SUBDIR)
+    return directory
+
+def cleanup():
+    """Maître, à l'arrêt : dossier temporaire supprimé, ou nos seuls fichiers dans celui de l'opérateur."""
+    directory = shared_dir()
+    if not directory:
+        return
+    if _created:
+        shutil.rmtree(directory, ignore_errors=True)
+    else:
+        _remove_own_files(directory)
+
+def _remove_own_files(directory):
+    shutil.rmtree(os.path.join(directory, PROMETHEUS_SUBDIR), ignore_errors=True)
+    for name in os.listdir(directory):
+        if any(fnmatch.fnmatchcase(name, pattern) for pattern in OWN_FILE_PATTERNS):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+def _path(name):
+    return os.path.join(shared_dir(), name)
+
+def write_json(name, obj):
+    """Écriture atomique (fichier temporaire + rename) : un lecteur ne voit jamais un fichier à moitié écrit."""
+    path = _path(name)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+def read_json(name):
+    try:
+        with open(_path(name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# ==========================================
+# MAÎTRE (serve.py)
+# ==========================================
+
+def set_workers(pids):
+    """Workers vivants du pod, tenus à jour par le maître à chaque fork / arrêt."""
+    write_json(WORKERS_FILENAME, sorted(pids))
+
+def retire(pid):
+    """Worker arrêté : son état de chargement et ses vues (/drift, /shadow) disparaissent."""
+    for name in [f"status_{pid}.json"] + [f"{view}_{pid}.json" for view in VIEWS]:
+        try:
+            os.remove(_path(name))
+        except OSError:
+            pass
+
+# ==========================================
+# WORKERS
+# ==========================================
+
+def live_workers():
+    return read_json(WORKERS_FILENAME) or []
+
+def publish_status(status, pid=None):
+    write_json(f"status_{pid or os.getpid()}.json", status)
+
+def publish_view(view, state, pid=None):
+    write_json(f"{view}_{pid or os.getpid()}.json", state)
+
+def worker_views(view):
+    """{pid: état publié} des workers vivants pour une vue de VIEWS (workers sans état publié omis)."""
+    views = {pid: read_json(f"{view}_{pid}.json") for pid in live_workers()}
+    return {pid: state for pid, state in views.items() if state is not None}
+
+def worker_statuses():
+    """{pid: état de chargement publié} des workers vivants (None : worker pas encore démarré)."""
+    return {pid: read_json(f"status_{pid}.json") for pid in live_workers()}
+
+def start_publisher(publish, interval=PUBLISH_INTERVAL_SECONDS):
+    """
+    Thread du worker : `publish()` (états du worker, ex : vues /drift et /shadow) tout de suite puis toutes
+    les `interval` secondes (jamais avant un fork). Retourne l'Event qui l'arrête ; None hors serve.py.
+    """
+    if not enabled():
+        return None
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            publish()
+
+    publish()
+    threading.Thread(target=loop, name="worker-state-publisher", daemon=True).start()
+    return stop
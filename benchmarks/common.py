@@ -0,0 +1,168 @@
+import json
+import os
+import pickle
+import platform
+import resource
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# SETUP DES CHEMINS
+# ==========================================
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(BENCH_DIR, '..'))
+BACKEND_SRC = os.path.join(REPO_ROOT, 'backend', 'src')
+BASELINES_DIR = os.path.join(BENCH_DIR, 'baselines')
+SAMPLE_CSV = os.path.join(REPO_ROOT, 'crime_sample_150.csv')
+
+if BACKEND_SRC not in sys.path:
+    sys.path.insert(0, BACKEND_SRC)
+
+# Colonnes brutes envoyées à l'API (cf. CrimeInput)
+RAW_FIELDS = [
+    "DATE OCC", "TIME OCC", "AREA", "Rpt Dist No", "Part 1-2", "Crm Cd", "Mocodes",
+    "Vict Age", "Vict Sex", "Vict Descent", "Premis Cd", "Premis Desc",
+    "Weapon Used Cd", "Weapon Desc", "Status", "LOCATION", "LAT", "LON"
+]
+
+# ==========================================
+# DONNÉES & ARTEFACTS LOCAUX (sans DagsHub)
+# ==========================================
+
+def load_sample_records(path=SAMPLE_CSV):
+    """Lignes du CSV d'exemple au format JSON de /predict (NaN -> None)."""
+    df = pd.read_csv(path)[RAW_FIELDS]
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+def train_local_artifacts(workdir, data_path=SAMPLE_CSV, n_estimators=50, feature_mode=None, mocodes_encoding=None):
+    """
+    Processors générés par preprocessing2 (mode train) + RandomForest à graine fixe :
+    un modèle reproductible quand aucun modèle local n'est fourni.
+    """
+    import preprocessing2
+    from sklearn.ensemble import RandomForestClassifier
+
+    original_cwd = os.getcwd()
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            preprocessing2.run_preprocessing_pipeline(data_path=data_path, mode="train", feature_mode=feature_mode,
+                                                      mocodes_encoding=mocodes_encoding)
+    finally:
+        os.chdir(original_cwd)
+
+    processors_dir = os.path.join(workdir, preprocessing2.ARTIFACTS_PATH)
+    with open(os.path.join(processors_dir, "preprocessed_data.pkl"), "rb") as f:
+        data = pickle.load(f)
+    model = RandomForestClassifier(n_estimators=n_estimators, random_state=42)
+    model.fit(data["X_train_scaled"], data["y_train"])
+    return model, processors_dir
+
+def load_local_model(model_path):
+    """Modèle MLflow (dossier contenant MLmodel) ou pickle scikit-learn."""
+    if os.path.isdir(model_path) and os.path.exists(os.path.join(model_path, "MLmodel")):
+        import mlflow.pyfunc
+        return mlflow.pyfunc.load_model(model_path)
+    with open(model_path, "rb") as f:
+        return pickle.load(f)
+
+def load_feature_store(processors_dir):
+    from feature_store import CrimeFeatureStore
+
+    store = CrimeFeatureStore(processors_path=processors_dir)
+    store.load_artifacts()
+    return store
+
+# ==========================================
+# MESURES
+# ==========================================
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus (Linux : ru_maxrss en Ko)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def latency_summary(seconds):
+    """Percentiles de latence en millisecondes."""
+    values = np.asarray(seconds, dtype=float) * 1000
+    if not values.size:
+        return {"count": 0}
+    return {
+        "count": int(values.size),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3)
+    }
+
+def _calibration_workload(rng):
+    """Charge de référence fixe, du même type que le code mesuré : NumPy, pandas (groupby, chaînes) et Python pur."""
+    values = rng.normal(size=200_000)
+    np.sort(values)
+    frame = pd.DataFrame({"key": rng.integers(0, 100, 50_000), "value": values[:50_000]})
+    frame.groupby("key")["value"].agg(["mean", "max"])
+    frame["key"].astype(str).str.zfill(4)
+    counts = {}
+    for i in range(100_000):
+        counts[i % 97] = counts.get(i % 97, 0) + 1
+
+def calibrate(rounds=7):
+    """
+    Vitesse de la machine : meilleur temps (s) de la charge de référence.
+    Les baselines l'enregistrent ; une comparaison sur une autre machine (agent Jenkins) met les
+    temps à l'échelle du rapport des calibrations au lieu de comparer des valeurs absolues.
+    """
+    rng = np.random.default_rng(0)
+    _calibration_workload(rng)  # échauffement (imports, caches)
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        _calibration_workload(rng)
+        timings.append(time.perf_counter() - start)
+    return round(min(timings), 6)
+
+def machine_scale(current_calibration, baseline_calibration):
+    """Facteur de vitesse de cette machine par rapport à celle de la baseline (> 1 : plus lente)."""
+    if not current_calibration or not baseline_calibration:
+        return 1.0
+    return current_calibration / baseline_calibration
+
+def environment_info():
+    return {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()}
+
+# ==========================================
+# BASELINES
+# ==========================================
+
+def read_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def write_baseline(path, report):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def check_regression(name, current, baseline, tolerance, higher_is_better=False, scale=1.0):
+    """
+    Message de régression si `current` s'écarte de plus de `tolerance` (relatif) de la baseline.
+    scale (machine_scale) : une durée est attendue `scale` fois plus longue, un débit `scale` fois plus bas.
+    """
+    if baseline is None or current is None or baseline == 0:
+        return None
+    baseline = baseline / scale if higher_is_better else baseline * scale
+    ratio = current / baseline
+    if higher_is_better and ratio < 1 - tolerance:
+        return f"{name}: {current:.4g} < baseline {baseline:.4g} (-{(1 - ratio) * 100:.0f}%)"
+    if not higher_is_better and ratio > 1 + tolerance:
+        return f"{name}: {current:.4g} > baseline {baseline:.4g} (+{(ratio - 1) * 100:.0f}%)"
+    return None
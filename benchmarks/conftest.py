@@ -0,0 +1,215 @@
+"""
+Micro-benchmarks (pytest) : temps et pic mémoire par fonction, comparés à baselines/micro.json.
+
+    pytest benchmarks/ -q                                  # tailles par défaut : 150, 10 000 lignes
+    pytest benchmarks/ -q --bench-rows 150,100000,1000000  # jusqu'au million
+    pytest benchmarks/ -q --bench-update                   # régénère la baseline
+    pytest benchmarks/ -q --bench-json micro-report.json   # rapport JSON (résultats + écarts)
+
+Une régression fait échouer le benchmark. La baseline vient d'une autre machine : les temps sont mis à
+l'échelle par la calibration (common.calibrate, clé "calibration_s" de la baseline), la mémoire est
+comparée en absolu. --bench-report-only rapporte les écarts sans échouer (mesure exploratoire).
+"""
+import gc
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import pytest
+
+import common
+import synthetic
+
+DEFAULT_ROWS = "150,10000"
+DEFAULT_BASELINE = os.path.join(common.BASELINES_DIR, "micro.json")
+MIN_ROUNDS = 3
+MAX_ROUNDS = 20
+TARGET_SECONDS = 0.5  # budget de mesure par benchmark (hors tracemalloc)
+CONFIRM_RUNS = 2      # régression suspectée : remesurée avec la calibration (meilleur temps gardé) avant d'échouer
+
+RESULTS = {}
+REGRESSIONS = {}
+CALIBRATION = {}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("bench", "micro-benchmarks")
+    group.addoption("--bench-rows", default=DEFAULT_ROWS, help="Tailles de données, séparées par des virgules.")
+    group.addoption("--bench-baseline", default=DEFAULT_BASELINE, help="Fichier JSON de baseline.")
+    group.addoption("--bench-tolerance", type=float, default=0.5, help="Écart relatif signalé (temps et mémoire).")
+    group.addoption("--bench-update", action="store_true", help="Écrit les résultats dans la baseline.")
+    group.addoption("--bench-report-only", action="store_true", help="Rapporte les régressions sans échouer.")
+    group.addoption("--bench-json", help="Écrit les résultats et les écarts à la baseline dans ce fichier JSON.")
+
+
+def calibration_s():
+    """Calibration de la machine, mesurée une fois par session (au premier benchmark)."""
+    if "seconds" not in CALIBRATION:
+        CALIBRATION["seconds"] = common.calibrate()
+    return CALIBRATION["seconds"]
+
+
+def pytest_generate_tests(metafunc):
+    if "n_rows" in metafunc.fixturenames:
+        sizes = [int(n) for n in metafunc.config.getoption("--bench-rows").split(",")]
+        metafunc.parametrize("n_rows", sizes, ids=[f"{n}rows" for n in sizes])
+
+
+# ==========================================
+# DONNÉES
+# ==========================================
+_FRAMES = {}
+
+
+@pytest.fixture
+def raw_frame(n_rows):
+    """Données brutes synthétiques, générées une fois par taille (copier avant de muter)."""
+    if n_rows not in _FRAMES:
+        _FRAMES[n_rows] = synthetic.generate_raw_crimes(n_rows, seed=n_rows)
+    return _FRAMES[n_rows]
+
+
+@pytest.fixture(scope="session")
+def processors_dir():
+    workdir = tempfile.mkdtemp(prefix="bench_processors_")
+    _, processors = common.train_local_artifacts(workdir, n_estimators=1)
+    return processors
+
+
+@pytest.fixture(scope="session")
+def feature_store(processors_dir):
+    return common.load_feature_store(processors_dir)
+
+
+@pytest.fixture(scope="session")
+def native_feature_store():
+    """Feature Store sur des processors du mode natif (catégories pour les arbres, sans scaler)."""
+    workdir = tempfile.mkdtemp(prefix="bench_native_processors_")
+    _, processors = common.train_local_artifacts(workdir, n_estimators=1, feature_mode="native")
+    return common.load_feature_store(processors)
+
+
+@pytest.fixture(scope="session")
+def multi_hot_feature_store():
+    """Feature Store sur des processors avec Mocodes en multi-hot (vocabulaire des codes, sortie CSR)."""
+    workdir = tempfile.mkdtemp(prefix="bench_multihot_processors_")
+    _, processors = common.train_local_artifacts(workdir, n_estimators=1, mocodes_encoding="multihot")
+    return common.load_feature_store(processors)
+
+
+# ==========================================
+# MESURE
+# ==========================================
+
+def measure(func, setup=None):
+    """
+    Temps : plusieurs rounds (min / médiane), `setup` (ex: copie du DataFrame) hors chrono.
+    Mémoire : un round supplémentaire sous tracemalloc (pic des allocations Python/NumPy).
+    """
+    def call():
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        return time.perf_counter() - start
+
+    timings = [call()]
+    # Gros volumes (un round > budget) : un seul round suffit
+    while timings[0] < TARGET_SECONDS and len(timings) < MAX_ROUNDS \
+            and (len(timings) < MIN_ROUNDS or sum(timings) < TARGET_SECONDS):
+        timings.append(call())
+
+    args = setup() if setup else ()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "rounds": len(timings),
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "peak_mb": round(peak / 2**20, 3)
+    }
+
+
+@pytest.fixture
+def bench(request):
+    """bench(func, setup=None) : mesure, enregistre et compare à la baseline du benchmark courant."""
+    config = request.config
+    name = request.node.name
+
+    def run(func, setup=None):
+        calibration = calibration_s()
+        result = measure(func, setup)
+        RESULTS[name] = result
+        if config.getoption("--bench-update"):
+            return result
+
+        baseline = common.read_baseline(config.getoption("--bench-baseline")) or {}
+        reference = baseline.get(name)
+        tolerance = config.getoption("--bench-tolerance")
+        if reference:
+            scales = [common.machine_scale(calibration, baseline.get("calibration_s"))]
+
+            def check():
+                scale = max(scales)
+                problems = [
+                    common.check_regression("min_s", result["min_s"], reference["min_s"], tolerance, scale=scale),
+                    common.check_regression("peak_mb", result["peak_mb"], reference["peak_mb"], tolerance),
+                ]
+                return [p for p in problems if p]
+
+            problems = check()
+            # Un vrai ralentissement persiste ; un pic de bruit de l'agent (fréquent sous la milliseconde) ou
+            # un agent ralenti depuis la calibration de début de session non : la calibration est remesurée aussi
+            for _ in range(CONFIRM_RUNS):
+                if not problems:
+                    break
+                scales.append(common.machine_scale(common.calibrate(), baseline.get("calibration_s")))
+                retry = measure(func, setup)
+                result.update(min_s=min(result["min_s"], retry["min_s"]), peak_mb=min(result["peak_mb"], retry["peak_mb"]),
+                              rounds=result["rounds"] + retry["rounds"])
+                problems = check()
+            if problems:
+                REGRESSIONS[name] = problems
+                if not config.getoption("--bench-report-only"):
+                    pytest.fail(f"Régression {name} : " + " ; ".join(problems))
+        return result
+
+    return run
+
+
+def pytest_sessionfinish(session):
+    if not RESULTS:
+        return
+    config = session.config
+    if config.getoption("--bench-json"):
+        common.write_baseline(config.getoption("--bench-json"), {
+            "environment": common.environment_info(), "calibration_s": CALIBRATION.get("seconds"),
+            "results": RESULTS, "regressions": REGRESSIONS
+        })
+    if config.getoption("--bench-update"):
+        path = config.getoption("--bench-baseline")
+        baseline = common.read_baseline(path) or {}
+        baseline.update({name: {k: round(v, 6) if isinstance(v, float) else v for k, v in result.items()}
+                         for name, result in RESULTS.items()})
+        baseline["calibration_s"] = CALIBRATION.get("seconds")
+        common.write_baseline(path, baseline)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not RESULTS:
+        return
+    terminalreporter.section("micro-benchmarks")
+    terminalreporter.write_line(f"{'benchmark':<55} {'min (ms)':>12} {'median (ms)':>12} {'peak (Mo)':>10} {'rounds':>7}")
+    for name, r in sorted(RESULTS.items()):
+        terminalreporter.write_line(
+            f"{name:<55} {r['min_s'] * 1000:>12.3f} {r['median_s'] * 1000:>12.3f} {r['peak_mb']:>10.2f} {r['rounds']:>7}"
+        )
+    for name, problems in sorted(REGRESSIONS.items()):
+        terminalreporter.write_line(f"⚠️ écart à la baseline {name} : " + " ; ".join(problems))
@@ -0,0 +1,336 @@
+"""
+Benchmark de charge de l'API, en process (httpx + ASGITransport, sans réseau ni DagsHub).
+
+    python benchmarks/load_test.py                          # compare à baselines/api_load.json
+    python benchmarks/load_test.py --concurrency 1,8,32 --mix single=0.6,batch=0.3,summary=0.1
+    python benchmarks/load_test.py --model model.pkl --processors processors/ --update-baseline
+    python benchmarks/load_test.py --workers 1,2,4 --concurrency 16 --report-only   # serve.py, en HTTP
+
+Sans --model, un RandomForest à graine fixe est entraîné sur crime_sample_150.csv (reproductible).
+La baseline vient d'une autre machine : latences et débit sont comparés après mise à l'échelle par
+la calibration (common.calibrate, enregistrée dans la baseline), la mémoire en absolu.
+Code de sortie 1 sur réponse en erreur ou sur régression (clé "regressions" du JSON) ;
+--report-only rapporte les régressions sans échouer (mesure locale exploratoire).
+--workers : mise à l'échelle avec les cœurs, l'API servie par serve.py (N workers forkés) et chargée
+en HTTP local ; un serveur par valeur de N, débit rapporté relativement à N=1 (clé "scaling").
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+
+import common
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+DEFAULT_BASELINE = os.path.join(common.BASELINES_DIR, "api_load.json")
+DEFAULT_MIX = "single=0.7,batch=0.2,summary=0.1"
+WARMUP_REQUESTS = 20
+# Latences comparées sans concurrence (temps de service) ; au-delà elles mesurent surtout la file d'attente
+# (concurrence / débit, déjà couverte par le débit) et varient trop d'un run à l'autre pour bloquer
+LATENCY_CONCURRENCY = "concurrency_1"
+
+# Type de requête -> route
+ENDPOINTS = {
+    "single": "/predict",
+    "batch": "/predict/batch",
+    "summary": "/predict/summary",
+}
+
+def parse_mix(spec):
+    """"single=0.7,batch=0.3" -> {"single": 0.7, "batch": 0.3} (poids normalisés)."""
+    mix = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in ENDPOINTS:
+            raise ValueError(f"Type de requête inconnu : {kind} (attendu : {', '.join(ENDPOINTS)})")
+        mix[kind] = float(weight or 1)
+    total = sum(mix.values())
+    return {kind: weight / total for kind, weight in mix.items()}
+
+# ==========================================
+# CHARGE (requêtes concurrentes)
+# ==========================================
+
+def build_requests(records, mix, n_requests, batch_size, seed):
+    """Plan de requêtes tiré à l'avance (même graine -> même séquence de corps)."""
+    rng = np.random.default_rng(seed)
+    kinds = rng.choice(list(mix), size=n_requests, p=list(mix.values()))
+    plan = []
+    for kind in kinds:
+        if kind == "single":
+            plan.append((kind, records[rng.integers(len(records))], 1))
+            continue
+        rows = [records[i] for i in rng.integers(len(records), size=batch_size)]
+        columns = {field: [row[field] for row in rows] for field in common.RAW_FIELDS}
+        plan.append((kind, {"columns": columns}, batch_size))
+    return plan
+
+async def _drive(client, plan, concurrency):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    rows = 0
+    pending = iter(plan)
+
+    async def worker():
+        nonlocal rows
+        for kind, body, n_rows in pending:
+            start = time.perf_counter()
+            response = await client.post(ENDPOINTS[kind], json=body)
+            latencies[kind].append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors[kind] += 1
+            rows += n_rows
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, rows, time.perf_counter() - start
+
+async def run_load(app, plan, concurrency, base_url=None):
+    """
+    Exécute le plan avec `concurrency` clients simultanés et retourne les statistiques.
+    app : API en process (ASGI) ; sinon base_url : serveur HTTP (serve.py).
+    """
+    import httpx
+
+    transport = httpx.ASGITransport(app=app) if app is not None else None
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url or "http://benchmark", timeout=None,
+                                 limits=limits) as client:
+        await _drive(client, plan[:WARMUP_REQUESTS], 1)
+        latencies, errors, rows, wall = await _drive(client, plan, concurrency)
+
+    return {
+        "requests": len(plan),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(plan) / wall, 2),
+        "rows_per_second": round(rows / wall, 1),
+        "endpoints": {
+            kind: dict(common.latency_summary(latencies[kind]), errors=errors[kind])
+            for kind in sorted(latencies)
+        }
+    }
+
+# ==========================================
+# BASELINE
+# ==========================================
+
+def response_errors(report):
+    """Réponses HTTP en erreur : un échec fonctionnel, indépendant de la machine."""
+    return [f"{name}/{kind}: {stats['errors']} réponses en erreur"
+            for name, result in report["results"].items()
+            for kind, stats in result["endpoints"].items() if stats["errors"]]
+
+def compare_to_baseline(report, baseline, tolerance):
+    """
+    Écarts à la baseline : débit de chaque niveau et latences p50/p95 sans concurrence, à l'échelle de la
+    machine (rapport des calibrations) ; pic mémoire en absolu (indépendant de la vitesse du CPU).
+    """
+    problems = []
+    scale = common.machine_scale(report.get("calibration_s"), (baseline or {}).get("calibration_s"))
+    for name, result in report["results"].items():
+        reference = (baseline or {}).get("results", {}).get(name)
+        if not reference:
+            continue
+        checks = [common.check_regression(f"{name}/throughput_rps", result["throughput_rps"],
+                                          reference["throughput_rps"], tolerance, higher_is_better=True, scale=scale)]
+        for kind, stats in (result["endpoints"].items() if name == LATENCY_CONCURRENCY else ()):
+            ref = reference["endpoints"].get(kind, {})
+            for key in ("p50_ms", "p95_ms"):
+                checks.append(common.check_regression(f"{name}/{kind}/{key}", stats.get(key), ref.get(key),
+                                                      tolerance, scale=scale))
+        problems.extend(c for c in checks if c)
+    if baseline:
+        memory = common.check_regression("peak_rss_mb", report["peak_rss_mb"], baseline.get("peak_rss_mb"), tolerance)
+        if memory:
+            problems.append(memory)
+    return problems
+
+# ==========================================
+# MAIN
+# ==========================================
+
+def prepare_app(model_path=None, processors_dir=None, workdir=None):
+    """Injecte un modèle local dans l'API (le lifespan DagsHub n'est jamais lancé par ASGITransport)."""
+    import api
+    import readiness
+
+    if model_path:
+        model = common.load_local_model(model_path)
+        model_name = os.path.basename(os.path.normpath(model_path))
+    else:
+        model, processors_dir = common.train_local_artifacts(workdir or tempfile.mkdtemp(prefix="bench_"))
+        model_name = "Benchmark_RandomForest_v0"
+    api.register_components(model, model_name, common.load_feature_store(processors_dir))
+    api.ml_components["status"].enter(readiness.READY)
+    return api.app
+
+# ==========================================
+# MISE À L'ÉCHELLE (serve.py, N workers)
+# ==========================================
+SERVER_READY_TIMEOUT = 180
+
+def serve_app(port, workers, model_path=None, processors_dir=None):
+    """Process serveur : API préchargée avec le modèle local, puis `workers` workers forkés par serve.py."""
+    import serve
+    import worker_state
+
+    worker_state.enable(worker_state.shared_dir())   # avant l'import de metrics (prometheus_client multiprocess)
+    app = prepare_app(model_path, processors_dir)
+    sock = serve.bind_socket("127.0.0.1", port)
+    serve.freeze_heap()
+    serve.serve(app, sock, workers, log_level="warning")
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(workers, model_path=None, processors_dir=None):
+    """Lance serve_app dans un process séparé ; retourne (process, url) une fois /readyz à 200 (tous les workers)."""
+    import httpx
+
+    port = _free_port()
+    command = [sys.executable, os.path.abspath(__file__), "--serve", str(workers), "--port", str(port)]
+    if model_path:
+        command += ["--model", model_path, "--processors", processors_dir]
+    server = subprocess.Popen(command)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + SERVER_READY_TIMEOUT
+    while time.monotonic() < deadline and server.poll() is None:
+        try:
+            if httpx.get(f"{url}/readyz", timeout=2).status_code == 200:
+                return server, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    stop_server(server)
+    raise RuntimeError(f"Serveur à {workers} workers pas prêt après {SERVER_READY_TIMEOUT}s")
+
+def stop_server(server):
+    if server.poll() is None:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+def scaling_summary(results, worker_counts, concurrency_levels):
+    """Débit de chaque N relativement à N=1 (ou au plus petit N mesuré), par niveau de concurrence."""
+    summary = {}
+    base = min(worker_counts)
+    for concurrency in concurrency_levels:
+        reference = results[f"workers_{base}/concurrency_{concurrency}"]["throughput_rps"]
+        summary[f"concurrency_{concurrency}"] = {
+            f"workers_{n}": round(results[f"workers_{n}/concurrency_{concurrency}"]["throughput_rps"] / reference, 2)
+            for n in worker_counts
+        }
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de charge de l'API Crime.")
+    parser.add_argument("--model", help="Modèle local (dossier MLflow ou pickle). Défaut : RandomForest entraîné sur l'échantillon.")
+    parser.add_argument("--processors", help="Dossier des processors (obligatoire avec --model).")
+    parser.add_argument("--data", default=common.SAMPLE_CSV, help="CSV source des payloads.")
+    parser.add_argument("--concurrency", default="1,8", help="Niveaux de concurrence, séparés par des virgules.")
+    parser.add_argument("--requests", type=int, default=300, help="Requêtes par niveau de concurrence.")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Répartition des types de requêtes.")
+    parser.add_argument("--batch-size", type=int, default=100, help="Lignes par requête batch/summary.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Écart relatif signalé comme régression.")
+    parser.add_argument("--report-only", action="store_true",
+                        help="Rapporte les régressions sans code de sortie 1 (seules les réponses en erreur échouent).")
+    parser.add_argument("--update-baseline", action="store_true", help="Écrit le rapport comme nouvelle baseline.")
+    parser.add_argument("--output", help="Écrit aussi le rapport JSON dans ce fichier.")
+    parser.add_argument("--workers", help="Nombres de workers serve.py à comparer (ex : 1,2,4), charge en HTTP.")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)   # process serveur lancé par --workers
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.model and not args.processors:
+        parser.error("--processors est obligatoire avec --model")
+    if args.serve:
+        serve_app(args.port, args.serve, args.model, args.processors)
+        return 0
+
+    records = common.load_sample_records(args.data)
+    mix = parse_mix(args.mix)
+    concurrency_levels = [int(c) for c in args.concurrency.split(",")]
+    worker_counts = [int(n) for n in args.workers.split(",")] if args.workers else None
+
+    report = {
+        "environment": common.environment_info(),
+        "calibration_s": common.calibrate(),
+        "config": {"mix": mix, "requests": args.requests, "batch_size": args.batch_size, "seed": args.seed},
+        "results": {}
+    }
+
+    def measure(name, app=None, base_url=None):
+        for concurrency in concurrency_levels:
+            plan = build_requests(records, mix, args.requests, args.batch_size, args.seed)
+            result = asyncio.run(run_load(app, plan, concurrency, base_url=base_url))
+            report["results"][f"{name}concurrency_{concurrency}"] = result
+            print(f"⏱️ {name}concurrency={concurrency}: {result['throughput_rps']} req/s, {result['rows_per_second']} lignes/s")
+            for kind, stats in result["endpoints"].items():
+                print(f"   {kind:<8} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms errors={stats['errors']}")
+
+    if worker_counts:
+        # Pic RSS du rapport : celui du client de charge (le serveur est un autre process)
+        report["config"]["workers"] = worker_counts
+        for workers in worker_counts:
+            server, url = start_server(workers, args.model, args.processors)
+            try:
+                measure(f"workers_{workers}/", base_url=url)
+            finally:
+                stop_server(server)
+        report["scaling"] = scaling_summary(report["results"], worker_counts, concurrency_levels)
+        print(f"📈 Débit relatif à {min(worker_counts)} worker(s) ({report['environment']['cpus']} CPU) : {report['scaling']}")
+    else:
+        measure("", app=prepare_app(args.model, args.processors))
+    # Calibration avant ET après la charge (meilleure des deux) : moins sensible à un pic de bruit de l'agent
+    report["calibration_s"] = min(report["calibration_s"], common.calibrate())
+    report["peak_rss_mb"] = round(common.peak_rss_mb(), 1)
+    print(f"💾 Pic mémoire (RSS) : {report['peak_rss_mb']} Mo")
+
+    errors = response_errors(report)
+    for error in errors:
+        print(f"❌ {error}")
+    if args.update_baseline:
+        common.write_baseline(args.baseline, report)
+        print(f"✅ Baseline mise à jour : {args.baseline}")
+        if args.output:
+            common.write_baseline(args.output, report)
+        return 1 if errors else 0
+
+    baseline = common.read_baseline(args.baseline)
+    if baseline is None:
+        print(f"⚠️ Pas de baseline ({args.baseline}) : lancer avec --update-baseline.")
+    elif not baseline.get("calibration_s"):
+        print("⚠️ Baseline sans calibration : comparaison en absolu (la régénérer avec --update-baseline).")
+    else:
+        scale = common.machine_scale(report["calibration_s"], baseline["calibration_s"])
+        print(f"⚖️ Calibration {report['calibration_s'] * 1000:.1f} ms (baseline {baseline['calibration_s'] * 1000:.1f} ms) : "
+              f"temps attendus x{scale:.2f}.")
+    regressions = compare_to_baseline(report, baseline, args.tolerance)
+    report["regressions"] = regressions
+    if args.output:
+        common.write_baseline(args.output, report)
+    for regression in regressions:
+        print(f"⚠️ {regression}")
+    if not regressions:
+        print("✅ Aucune régression.")
+    return 1 if errors or (regressions and not args.report_only) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Benchmark des moteurs du preprocessing (pandas vs Polars lazy) sur le dataset complet.
+
+    python benchmarks/preprocessing_engines.py                       # data/crime_v1.csv (ou DATA_PATH)
+    python benchmarks/preprocessing_engines.py --rows 2000000         # sans dataset : CSV synthétique
+    python benchmarks/preprocessing_engines.py --data crime.csv --output engines.json
+
+Mesure, par moteur : la partie qui change (chargement -> features -> encodage) et le pipeline complet
+(mode train). Code de sortie 1 si les processors écrits par les deux moteurs ne sont pas identiques.
+"""
+import argparse
+import filecmp
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import common
+
+import feature_defs
+import preprocessing2
+import preprocessing_polars
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+FULL_DATASET = os.path.join(common.REPO_ROOT, "data", "crime_v1.csv")
+DEFAULT_ROWS = 1_000_000
+
+def default_data_path():
+    for path in (os.getenv("DATA_PATH"), FULL_DATASET):
+        if path and os.path.exists(path):
+            return path
+    return None
+
+def synthetic_csv(rows, directory):
+    import synthetic
+
+    path = os.path.join(directory, f"crime_synthetic_{rows}.csv")
+    synthetic.generate_raw_crimes(rows, seed=0).to_csv(path, index=False)
+    return path
+
+# ==========================================
+# MESURES
+# ==========================================
+
+def _front_half(engine, data_path):
+    """Chargement -> features -> encodage (mode train), comme dans run_preprocessing_pipeline."""
+    if engine == "polars":
+        return preprocessing_polars.build_training_frame(data_path, preprocessing2.DEFAULT_SELECTED_FEATURES,
+                                                         preprocessing2.clean_column_names, fit=True)
+    df = preprocessing2.load_and_clean_initial(data_path)
+    df.isna().mean()
+    X = feature_defs.compile_plan(preprocessing2.DEFAULT_SELECTED_FEATURES, feature_defs.fit_params(df)).run_batch(df)
+    df, _ = preprocessing2.process_target(df)
+    return preprocessing2.encode_features(X)
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def run_pipeline(engine, data_path, workdir):
+    original_cwd = os.getcwd()
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    try:
+        seconds = _timed(preprocessing2.run_preprocessing_pipeline, data_path, "train", engine)
+    finally:
+        os.chdir(original_cwd)
+    return seconds, os.path.join(workdir, preprocessing2.ARTIFACTS_PATH)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark des moteurs du preprocessing.")
+    parser.add_argument("--data", default=default_data_path(), help="CSV brut (défaut : DATA_PATH ou data/crime_v1.csv).")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Lignes du CSV synthétique sans --data.")
+    parser.add_argument("--output", help="Écrit aussi le rapport JSON dans ce fichier.")
+    args = parser.parse_args(argv)
+
+    if not preprocessing_polars.available():
+        print("❌ polars absent : pip install polars")
+        return 1
+
+    with tempfile.TemporaryDirectory() as workdir, warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        data_path = args.data or synthetic_csv(args.rows, workdir)
+        print(f"📂 Données : {data_path} ({os.path.getsize(data_path) / 1e6:.0f} Mo)")
+
+        report = {"environment": common.environment_info(), "data": data_path, "engines": {}}
+        outputs = {}
+        for engine in preprocessing2.ENGINES:
+            front = _timed(_front_half, engine, data_path)
+            total, outputs[engine] = run_pipeline(engine, data_path, os.path.join(workdir, engine))
+            report["engines"][engine] = {"load_features_encode_s": round(front, 3), "pipeline_s": round(total, 3)}
+
+        names = sorted(os.listdir(outputs["pandas"]))
+        _, mismatch, errors = filecmp.cmpfiles(outputs["pandas"], outputs["polars"], names, shallow=False)
+        report["identical"] = not mismatch and not errors and names == sorted(os.listdir(outputs["polars"]))
+
+    pandas_s, polars_s = (report["engines"][e]["load_features_encode_s"] for e in ("pandas", "polars"))
+    print(f"{'moteur':<8} {'chargement->encodage (s)':>26} {'pipeline complet (s)':>22}")
+    for engine, result in report["engines"].items():
+        print(f"{engine:<8} {result['load_features_encode_s']:>26.2f} {result['pipeline_s']:>22.2f}")
+    print(f"⚡ Polars : x{pandas_s / polars_s:.1f} sur chargement -> encodage ({report['environment']['cpus']} CPU)")
+
+    if args.output:
+        common.write_baseline(args.output, report)
+    if not report["identical"]:
+        print(f"❌ Processors différents entre les moteurs : {mismatch + errors}")
+        return 1
+    print("✅ Processors identiques (pandas / polars).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+Générateur de données LAPD synthétiques, de 150 lignes à plusieurs millions.
+
+Les lignes sont ré-échantillonnées depuis crime_sample_150.csv (mêmes colonnes brutes, mêmes
+distributions de catégories), puis les champs à forte variabilité sont redessinés :
+dates sur 2020-2024, heures, âges (avec valeurs invalides / manquantes), coordonnées bruitées,
+et une fraction de catégories jamais vues à l'entraînement (chemin "inconnu" des encodeurs).
+"""
+import numpy as np
+import pandas as pd
+
+import common
+
+DATE_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+# Colonnes catégorielles pour lesquelles on injecte des valeurs inconnues
+UNSEEN_COLUMNS = ["Mocodes", "LOCATION", "Premis Desc"]
+
+
+def _date_pool():
+    days = pd.date_range("2020-01-01", "2024-12-31", freq="D")
+    return np.asarray(days.strftime(DATE_FORMAT), dtype=object)
+
+
+def generate_raw_crimes(n_rows, seed=0, unseen_fraction=0.05, missing_fraction=0.05, base_path=common.SAMPLE_CSV):
+    """DataFrame brut (format CSV LAPD) de `n_rows` lignes, entièrement vectorisé et reproductible."""
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(base_path, dtype={"Mocodes": str})
+    df = base.iloc[rng.integers(len(base), size=n_rows)].reset_index(drop=True)
+
+    dates = _date_pool()
+    df["DATE OCC"] = dates[rng.integers(len(dates), size=n_rows)]
+    df["Date Rptd"] = df["DATE OCC"]
+    df["TIME OCC"] = rng.integers(0, 24, size=n_rows) * 100 + rng.integers(0, 60, size=n_rows)
+    df["DR_NO"] = np.arange(n_rows, dtype=np.int64) + 200000000
+
+    age = rng.integers(-2, 100, size=n_rows).astype(float)
+    age[rng.random(n_rows) < missing_fraction] = np.nan
+    df["Vict Age"] = age
+
+    valid_coords = df["LAT"] != 0
+    df.loc[valid_coords, "LAT"] += rng.normal(0, 0.01, size=int(valid_coords.sum()))
+    df.loc[valid_coords, "LON"] += rng.normal(0, 0.01, size=int(valid_coords.sum()))
+
+    for col in UNSEEN_COLUMNS:
+        unseen = rng.random(n_rows) < unseen_fraction
+        ids = rng.integers(0, max(n_rows // 10, 1), size=int(unseen.sum()))
+        df.loc[unseen, col] = pd.Series(ids, dtype=str).radd(f"SYNTH_{col}_").values
+
+    for col in ("Vict Sex", "Vict Descent", "Weapon Used Cd"):
+        df.loc[rng.random(n_rows) < missing_fraction, col] = np.nan
+    return df
+
+
+def to_api_records(df):
+    """Lignes brutes -> dicts au format JSON de /predict (NaN -> None)."""
+    raw = df[common.RAW_FIELDS]
+    return raw.astype(object).where(raw.notna(), None).to_dict("records")
@@ -0,0 +1,101 @@
+import os
+import shutil
+import warnings
+
+import pytest
+
+import compact_processors
+import feature_defs
+import preprocessing2
+import synthetic
+from feature_store import CrimeFeatureStore
+
+pytestmark = pytest.mark.filterwarnings("ignore")
+
+
+def _cleaned(raw_df):
+    df = preprocessing2.clean_column_names(raw_df.copy())
+    return df.rename(columns={"part_1_2": "crm_risk"})
+
+
+# ==========================================
+# PREPROCESSING (entraînement)
+# ==========================================
+
+def test_categorize_crime(bench, raw_frame):
+    descriptions = raw_frame["Crm Cd Desc"]
+    bench(lambda: descriptions.apply(preprocessing2.categorize_crime))
+
+
+def test_feature_engineering_temporal(bench, raw_frame):
+    bench(preprocessing2.feature_engineering_temporal, setup=lambda: (_cleaned(raw_frame),))
+
+
+def test_handle_missing_values_and_text(bench, raw_frame):
+    engineered = preprocessing2.feature_engineering_temporal(_cleaned(raw_frame))
+    bench(preprocessing2.handle_missing_values_and_text, setup=lambda: (engineered.copy(),))
+
+
+@pytest.fixture
+def prepared_frame(raw_frame):
+    df = preprocessing2.feature_engineering_temporal(_cleaned(raw_frame))
+    return preprocessing2.handle_missing_values_and_text(df)
+
+
+def test_encode_features_fit(bench, prepared_frame):
+    bench(preprocessing2.encode_features, setup=lambda: (prepared_frame.copy(),))
+
+
+def test_encode_features_transform(bench, prepared_frame):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        _, encoders = preprocessing2.encode_features(prepared_frame.copy())
+    bench(preprocessing2.encode_features, setup=lambda: (prepared_frame.copy(), encoders))
+
+
+def test_feature_plan_batch(bench, raw_frame):
+    plan = feature_defs.compile_plan()
+    bench(plan.run_batch, setup=lambda: (raw_frame,))
+
+
+# ==========================================
+# FEATURE STORE (inférence)
+# ==========================================
+
+def test_get_online_features(bench, feature_store):
+    record = synthetic.to_api_records(synthetic.generate_raw_crimes(1, seed=1))[0]
+    bench(feature_store.get_online_features, setup=lambda: (dict(record),))
+
+
+def test_get_batch_features(bench, feature_store, raw_frame):
+    bench(feature_store.get_batch_features, setup=lambda: (raw_frame,))
+
+
+@pytest.mark.parametrize("feature_mode", preprocessing2.FEATURE_MODES)
+def test_scale_features(bench, request, raw_frame, feature_mode):
+    """Étape "scale" par requête : RobustScaler (scaled) vs dtype category sans scaling (native)."""
+    store = request.getfixturevalue("feature_store" if feature_mode == "scaled" else "native_feature_store")
+    features = store.build_feature_frame(raw_frame)
+    bench(store.scale_features, setup=lambda: (features,))
+
+
+@pytest.mark.parametrize("mocodes_encoding", preprocessing2.MOCODES_ENCODINGS)
+def test_featurize_mocodes(bench, request, raw_frame, mocodes_encoding):
+    """Encodage + matrice du modèle : Mocodes en une classe par liste (label) vs codes en multi-hot creux."""
+    store = request.getfixturevalue("feature_store" if mocodes_encoding == "label" else "multi_hot_feature_store")
+    bench(store.get_batch_features, setup=lambda: (raw_frame,))
+
+
+def test_store_categorize_crime(bench, feature_store, raw_frame):
+    descriptions = raw_frame["Crm Cd Desc"]
+    bench(lambda: descriptions.apply(feature_store.categorize_crime))
+
+
+@pytest.mark.parametrize("fmt", ["compact", "pickle"])
+def test_load_artifacts(bench, processors_dir, tmp_path, fmt):
+    directory = processors_dir
+    if fmt == "pickle":
+        directory = str(tmp_path / "pickle")
+        shutil.copytree(processors_dir, directory)
+        os.remove(os.path.join(directory, compact_processors.HEADER_FILENAME))
+    bench(lambda: CrimeFeatureStore(processors_path=directory).load_artifacts())
@@ -7,6 +7,9 @@ import json
 import os
 from datetime import datetime, time
 
+import ingestion
+import summaries
+
 # ==========================================
 # Page Configuration
 # ==========================================
@@ -30,39 +33,53 @@ INV_STATUS_MAP = {v: k for k, v in STATUS_MAP.items()}
 # Si la variable n'existe pas (lorsqu'on exécute en local), utilise une valeur par défaut.
 API_BASE_URL = os.getenv("API_URL", "http://127.0.0.1:5000")
 API_PREDICT_URL = f"{API_BASE_URL}/predict"
+API_SUMMARY_URL = f"{API_BASE_URL}/predict/summary"
+# Nombre de lignes envoyées par requête /predict/summary
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "1000"))
 
 # ==========================================
-# Fonction de Prédiction avec Mise en Cache
+# Lecture du CSV et Prédiction avec Mise en Cache
 # ==========================================
-# Cette fonction gère l'appel à l'API pour un DataFrame nettoyé.
-@st.cache_data
-def get_predictions_from_api(df_cleaned):
-    list_of_dicts = df_cleaned.to_dict('records')
+# Le cache est indexé par l'empreinte du fichier (file_hash) : les arguments préfixés
+# par "_" ne sont pas hachés par Streamlit, le fichier n'est donc jamais re-haché.
+# Le CSV est lu en flux (ingestion.iter_upload) : chaque bloc de BATCH_CHUNK_SIZE lignes est nettoyé puis
+# scoré UNE fois par /predict/summary (include_predictions) ; les résumés partiels sont fusionnés
+# (summaries.merge_summaries) pour le tableau de bord, les prédictions servent au tableau ligne par ligne.
+# Une erreur de connexion est levée (jamais mise en cache) ; un bloc refusé par l'API est compté en échec.
+@st.cache_data(show_spinner=False)
+def score_upload(file_hash, _upload):
+    originals = []
+    partials = []
     predictions = []
     confidences = []
-    
+    last_error = None
+
     progress_bar = st.progress(0, text="Prédiction en cours...")
-    
-    for i, payload in enumerate(list_of_dicts):
-        try:
-            # --- CORRECTION ICI ---
-            # Utiliser la variable API_PREDICT_URL définie ci-dessus
-            response = requests.post(API_PREDICT_URL, data=json.dumps(payload), headers={"Content-Type": "application/json"})
-            if response.status_code == 200:
-                result = response.json()
-                predictions.append(result['prediction'])
-                confidences.append(result.get('confidence'))
-            else:
-                predictions.append(f"Erreur API ({response.status_code})")
-                confidences.append(None)
-        except Exception:
-            predictions.append("Erreur de Connexion")
-            confidences.append(None)
-        
-        progress_bar.progress((i + 1) / len(list_of_dicts), text=f"Prédiction en cours... {i+1}/{len(list_of_dicts)}")
-        
+
+    for df_chunk, df_clean in ingestion.iter_upload(_upload, BATCH_CHUNK_SIZE):
+        originals.append(df_chunk)
+        response = requests.post(API_SUMMARY_URL, json=ingestion.to_columnar_payload(df_clean),
+                                 params={"include_predictions": "true"})
+        if response.status_code == 200:
+            partial = response.json()
+            predictions.extend(partial.pop('predictions'))
+            confidences.extend(partial.pop('confidences'))
+            partials.append(partial)
+        else:
+            last_error = response
+            predictions.extend([f"Erreur API ({response.status_code})"] * len(df_clean))
+            confidences.extend([None] * len(df_clean))
+
+        progress_bar.progress(min(_upload.tell() / max(_upload.size, 1), 1.0),
+                              text=f"Prédiction en cours... {len(predictions)} lignes")
+
     progress_bar.empty()
-    return predictions, confidences
+    if last_error is not None and not partials:
+        last_error.raise_for_status()
+    summary = summaries.merge_summaries(partials)
+    summary['success_count'], summary['total'] = summary['total'], len(predictions)
+    df_original = pd.concat(originals, ignore_index=True) if originals else pd.DataFrame()
+    return summary, df_original, predictions, confidences
 
 # ==========================================
 # Interface Principale
@@ -161,73 +178,86 @@ elif input_method == "Téléverser un fichier CSV (prédictions en masse)":
 
     if uploaded_file is not None:
         try:
-            df_original = pd.read_csv(uploaded_file, encoding='utf-8-sig')
-            if df_original.columns[0].startswith('Unnamed'): df_original = df_original.iloc[:, 1:]
-            
+            # En-tête validé avant toute lecture des données
+            missing_mandatory, missing_optional = ingestion.validate_schema(ingestion.read_header(uploaded_file))
+            file_hash = ingestion.content_hash(uploaded_file)
+
             st.header(f"Analyse du fichier : `{uploaded_file.name}`")
-            st.metric(label="Nombre de lignes à traiter", value=len(df_original))
-            
-            required_columns = {
-                "DATE OCC": str, "TIME OCC": int, "AREA": int, "Part 1-2": int, "Crm Cd": int,
-                "Vict Age": float, "Vict Sex": str, "Vict Descent": str, "Premis Cd": float,
-                "Premis Desc": str, "Weapon Used Cd": float, "Weapon Desc": str, "Status": str,
-                "LOCATION": str, "LAT": float, "LON": float, "Rpt Dist No": int, "Mocodes": str
-            }
-            df_cleaned = pd.DataFrame()
-            for col, expected_type in required_columns.items():
-                if col in df_original.columns:
-                    series = df_original[col]
-                    if pd.api.types.is_numeric_dtype(expected_type):
-                        series = pd.to_numeric(series, errors='coerce').fillna(0)
-                    else:
-                        series = series.fillna('')
-                    df_cleaned[col] = series.astype(expected_type)
+
+            if missing_mandatory:
+                st.error(f"Colonnes obligatoires manquantes : {', '.join(missing_mandatory)}", icon="🚨")
+            if missing_optional:
+                st.warning(f"Colonnes absentes (valeurs par défaut côté API) : {', '.join(missing_optional)}", icon="⚠️")
             
-            if st.button("🚀 Lancer les Prédictions sur le Fichier", type="primary"):
-                predictions, confidences = get_predictions_from_api(df_cleaned)
-
-                if predictions:
-                    df_results = df_original.copy()
-                    df_results['PREDICTION_CODE'] = predictions
-                    df_results['PREDICTION_LABEL'] = pd.Series(predictions).map(INV_STATUS_MAP).fillna(pd.Series(predictions))
-                    df_results['CONFIDENCE'] = confidences
-                    
+            if not missing_mandatory and st.button("🚀 Lancer les Prédictions sur le Fichier", type="primary"):
+                # Mémorisé dans la session : les widgets des onglets déclenchent des reruns
+                st.session_state["launched_file_hash"] = file_hash
+
+            if not missing_mandatory and st.session_state.get("launched_file_hash") == file_hash:
+                summary = None
+                with st.spinner("Prédiction et agrégation côté API..."):
+                    try:
+                        summary, df_original, predictions, confidences = score_upload(file_hash, uploaded_file)
+                    except requests.exceptions.HTTPError as e:
+                        st.error(f"Erreur de l'API (Code: {e.response.status_code})")
+                    except requests.exceptions.ConnectionError:
+                        st.error("🔌 Erreur de Connexion", icon="🚨")
+
+                if summary:
+                    st.metric(label="Nombre de lignes traitées", value=summary['total'])
                     tab1, tab2, tab3 = st.tabs(["📊 Tableau de Bord", "📍 Carte des Crimes", "📄 Données Complètes"])
 
                     with tab1:
                         st.subheader("Synthèse des Prédictions")
                         col1, col2 = st.columns(2)
                         with col1:
-                            success_count = len([p for p in predictions if 'Erreur' not in str(p)])
-                            st.metric("Prédictions Réussies", f"{success_count}/{len(df_original)}")
-                            avg_confidence = pd.Series([c for c in confidences if c is not None]).mean()
-                            if pd.notna(avg_confidence): st.metric("Confiance Moyenne", f"{avg_confidence:.2%}")
+                            st.metric("Prédictions Réussies", f"{summary['success_count']}/{summary['total']}")
+                            avg_confidence = summary['confidence'].get('mean')
+                            if avg_confidence is not None: st.metric("Confiance Moyenne", f"{avg_confidence:.2%}")
+                            st.subheader("Distribution de la Confiance")
+                            edges = summary['confidence']['edges']
+                            st.bar_chart(pd.Series(
+                                summary['confidence']['counts'],
+                                index=[f"{low:.0%}-{high:.0%}" for low, high in zip(edges[:-1], edges[1:])]
+                            ))
                         with col2:
                             st.subheader("Top 5 des Catégories Prédites")
-                            top_5_crimes = df_results['PREDICTION_LABEL'].value_counts().nlargest(5)
+                            top_5_crimes = pd.Series(summary['top_classes'])
+                            top_5_crimes.index = [INV_STATUS_MAP.get(label, label) for label in top_5_crimes.index]
                             st.bar_chart(top_5_crimes)
+                        if summary['by_area']:
+                            st.subheader("Détail par Zone (AREA)")
+                            st.dataframe(pd.DataFrame(summary['by_area']).drop(columns='classes'), hide_index=True)
 
                     with tab2:
                         st.subheader("Carte des Incidents Prédits")
-                        if 'LAT' in df_results.columns and 'LON' in df_results.columns:
-                            df_map = df_results.rename(columns={'LAT': 'lat', 'LON': 'lon'})
-                            st.map(df_map.dropna(subset=['lat', 'lon']), zoom=10)
+                        if summary['geo_grid']:
+                            # Une bulle par cellule de la grille, taille proportionnelle au nombre d'incidents
+                            df_map = pd.DataFrame(summary['geo_grid']).drop(columns='classes')
+                            df_map['size'] = 50 + 450 * df_map['count'] / df_map['count'].max()
+                            st.map(df_map, latitude='lat', longitude='lon', size='size', zoom=10)
                         else:
                             st.warning("Colonnes 'LAT' et 'LON' manquantes pour afficher la carte.")
 
                     with tab3:
                         st.subheader("Résultats Détaillés")
-                        st.dataframe(df_results)
-                        @st.cache_data
-                        def convert_df(df):
-                            return df.to_csv(index=False).encode('utf-8')
-                        csv_results = convert_df(df_results)
-                        st.download_button(
-                            label="📥 Télécharger les résultats en CSV",
-                            data=csv_results,
-                            file_name=f'predictions_{uploaded_file.name}',
-                            mime='text/csv',
-                        )
+                        # Prédictions de la même passe que le tableau de bord : affichées à la demande
+                        if st.checkbox("Afficher les prédictions ligne par ligne"):
+                            df_results = df_original.copy()
+                            df_results['PREDICTION_CODE'] = predictions
+                            df_results['PREDICTION_LABEL'] = pd.Series(predictions).map(INV_STATUS_MAP).fillna(pd.Series(predictions))
+                            df_results['CONFIDENCE'] = confidences
+                            st.dataframe(df_results)
+                            @st.cache_data
+                            def convert_df(df):
+                                return df.to_csv(index=False).encode('utf-8')
+                            csv_results = convert_df(df_results)
+                            st.download_button(
+                                label="📥 Télécharger les résultats en CSV",
+                                data=csv_results,
+                                file_name=f'predictions_{uploaded_file.name}',
+                                mime='text/csv',
+                            )
         except Exception as e:
             st.error(f"Une erreur est survenue lors du traitement du fichier : {e}", icon="🚨")
 
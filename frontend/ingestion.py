@@ -0,0 +1,169 @@
+# frontend/ingestion.py
+
+import hashlib
+import io
+import os
+
+import pandas as pd
+
+# ==========================================
+# Schéma déclaré du fichier CSV
+# ==========================================
+# Types attendus par l'API pour chaque colonne brute
+REQUIRED_COLUMNS = {
+    "DATE OCC": str, "TIME OCC": int, "AREA": int, "Part 1-2": int, "Crm Cd": int,
+    "Vict Age": float, "Vict Sex": str, "Vict Descent": str, "Premis Cd": float,
+    "Premis Desc": str, "Weapon Used Cd": float, "Weapon Desc": str, "Status": str,
+    "LOCATION": str, "LAT": float, "LON": float, "Rpt Dist No": int, "Mocodes": str
+}
+# Sans ces colonnes, l'API ne peut pas construire les features temporelles
+MANDATORY_COLUMNS = ["DATE OCC", "TIME OCC", "AREA"]
+
+TEXT_COLUMNS = [col for col, t in REQUIRED_COLUMNS.items() if t is str]
+NUMERIC_COLUMNS = [col for col, t in REQUIRED_COLUMNS.items() if t is not str]
+
+# Dtypes de lecture : le texte reste du texte (ex: Mocodes "0344" garde son zéro),
+# les entiers sont lus en "Int64" (nullable) pour tolérer les valeurs manquantes.
+READ_DTYPES = {
+    col: (str if t is str else "Int64" if t is int else "float64")
+    for col, t in REQUIRED_COLUMNS.items()
+}
+# Repli si une colonne numérique contient du texte : coercition en bloc dans clean_columns
+TEXT_DTYPES = {col: str for col in TEXT_COLUMNS}
+
+# Lecture par blocs de lignes : le parseur ne matérialise jamais le fichier entier d'un coup
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "50000"))
+HASH_BLOCK_BYTES = 1 << 20
+
+
+def _open(source):
+    """Octets ou fichier (UploadedFile Streamlit, fichier spoolé) -> flux binaire repositionné au début."""
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+
+def content_hash(source):
+    """Empreinte du contenu du fichier (lu par blocs) : clé de cache stable entre les reruns Streamlit."""
+    stream = _open(source)
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(HASH_BLOCK_BYTES), b""):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def read_header(source):
+    """Colonnes du CSV, sans lire les données ([] si le fichier est vide)."""
+    try:
+        columns = pd.read_csv(_open(source), encoding="utf-8-sig", nrows=0).columns
+    except pd.errors.EmptyDataError:
+        columns = pd.Index([])
+    finally:
+        _open(source)
+    if len(columns) and columns[0].startswith("Unnamed"):
+        columns = columns[1:]
+    return list(columns)
+
+
+def iter_csv_chunks(source, dtypes=READ_DTYPES, chunk_rows=None, skip_chunks=0):
+    """Blocs de chunk_rows lignes du CSV, lus avec les dtypes déclarés (les skip_chunks premiers sont sautés)."""
+    try:
+        reader = pd.read_csv(_open(source), encoding="utf-8-sig", dtype=dtypes,
+                             chunksize=chunk_rows or INGEST_CHUNK_ROWS)
+    except pd.errors.EmptyDataError:
+        return
+    for i, chunk in enumerate(reader):
+        if i < skip_chunks:
+            continue
+        if chunk.columns[0].startswith("Unnamed"):
+            chunk = chunk.iloc[:, 1:]
+        yield chunk
+
+
+def iter_parsed_chunks(source, chunk_rows=None):
+    """
+    Lecture du CSV par blocs avec les dtypes déclarés, en flux.
+    Si une colonne numérique contient du texte, la lecture reprend au bloc fautif sans dtype
+    numérique (les blocs déjà rendus ne sont pas relus) et la coercition est faite dans clean_columns.
+    """
+    done = 0
+    try:
+        for chunk in iter_csv_chunks(source, READ_DTYPES, chunk_rows):
+            yield chunk
+            done += 1
+    except (ValueError, TypeError):
+        yield from iter_csv_chunks(source, TEXT_DTYPES, chunk_rows, skip_chunks=done)
+
+
+def parse_upload(source, chunk_rows=None):
+    """Fichier entier parsé (concaténation des blocs de iter_parsed_chunks)."""
+    chunks = list(iter_parsed_chunks(source, chunk_rows))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=read_header(source))
+
+
+def validate_schema(columns):
+    """Retourne (colonnes obligatoires manquantes, colonnes optionnelles manquantes) ; columns : en-tête ou DataFrame."""
+    columns = set(columns.columns if isinstance(columns, pd.DataFrame) else columns)
+    missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+    mandatory = [col for col in missing if col in MANDATORY_COLUMNS]
+    optional = [col for col in missing if col not in MANDATORY_COLUMNS]
+    return mandatory, optional
+
+
+def clean_columns(df):
+    """Nettoyage vectorisé : un bloc numérique et un bloc texte, sans boucle par colonne."""
+    numeric = [col for col in NUMERIC_COLUMNS if col in df.columns]
+    text = [col for col in TEXT_COLUMNS if col in df.columns]
+
+    numeric_block = df[numeric]
+    not_numeric = [col for col in numeric if not pd.api.types.is_numeric_dtype(numeric_block[col])]
+    if not_numeric:
+        numeric_block = numeric_block.assign(
+            **{col: pd.to_numeric(numeric_block[col], errors="coerce") for col in not_numeric}
+        )
+    numeric_block = numeric_block.fillna(0).astype({col: REQUIRED_COLUMNS[col] for col in numeric})
+    text_block = df[text].fillna("").astype(str)
+
+    ordered = [col for col in REQUIRED_COLUMNS if col in df.columns]
+    return pd.concat([numeric_block, text_block], axis=1)[ordered]
+
+
+def iter_upload(source, chunk_rows=None):
+    """
+    Ingestion en flux : (bloc original, bloc nettoyé) par bloc de chunk_rows lignes.
+    Le schéma est à valider d'abord sur l'en-tête (read_header + validate_schema).
+    """
+    for chunk in iter_parsed_chunks(source, chunk_rows):
+        yield chunk, clean_columns(chunk)
+
+
+def load_upload(source, chunk_rows=None):
+    """
+    Pipeline complet en mémoire : en-tête validé d'abord, puis parsing -> nettoyage bloc par bloc.
+    source : octets ou fichier ouvert (l'UploadedFile Streamlit, sans copie via getvalue()).
+    """
+    mandatory, optional = validate_schema(read_header(source))
+    if mandatory:
+        return parse_upload(source, chunk_rows), None, mandatory, optional
+    originals, cleaned = [], []
+    for chunk, clean in iter_upload(source, chunk_rows):
+        originals.append(chunk)
+        cleaned.append(clean)
+    if not originals:
+        header = read_header(source)
+        empty = pd.DataFrame(columns=header)
+        return empty, clean_columns(empty), mandatory, optional
+    return pd.concat(originals, ignore_index=True), pd.concat(cleaned, ignore_index=True), mandatory, optional
+
+
+def to_columnar_payload(df_cleaned):
+    """Corps de requête /predict/batch : une liste par colonne (pas de liste de dicts)."""
+    return {"columns": {col: df_cleaned[col].tolist() for col in df_cleaned.columns}}
+
+
+def iter_payload_chunks(df_cleaned, chunk_size):
+    """Découpe le lot en morceaux de chunk_size lignes pour afficher la progression."""
+    for start in range(0, len(df_cleaned), chunk_size):
+        yield start, to_columnar_payload(df_cleaned.iloc[start:start + chunk_size])
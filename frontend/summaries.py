@@ -0,0 +1,80 @@
+# frontend/summaries.py
+
+from collections import Counter
+
+# ==========================================
+# Fusion des résumés partiels (/predict/summary par bloc)
+# ==========================================
+# Même nombre de classes affichées que l'API (aggregation.DEFAULT_TOP_K)
+TOP_K = 5
+
+
+def _top_class(classes):
+    return classes.most_common(1)[0][0] if classes else None
+
+
+def merge_summaries(partials, top_k=TOP_K):
+    """
+    Résumé du fichier entier à partir des résumés de ses blocs : effectifs additionnés,
+    confiance moyenne pondérée par le nombre de lignes, classe majoritaire recalculée
+    par zone et par cellule à partir des effectifs par classe ("classes").
+    """
+    total = 0
+    distribution = Counter()
+    edges, histogram = None, None
+    confidence_sum, confidence_rows = 0.0, 0
+    areas, cells = {}, {}
+
+    for partial in partials:
+        total += partial["total"]
+        distribution.update(partial["class_distribution"])
+
+        confidence = partial["confidence"]
+        rows = sum(confidence["counts"])
+        if histogram is None:
+            edges, histogram = confidence["edges"], [0] * len(confidence["counts"])
+        histogram = [a + b for a, b in zip(histogram, confidence["counts"])]
+        if confidence["mean"] is not None:
+            confidence_sum += confidence["mean"] * rows
+            confidence_rows += rows
+
+        for area in partial["by_area"]:
+            merged = areas.setdefault(area["area"], {"count": 0, "classes": Counter(), "confidence_sum": 0.0,
+                                                     "confidence_rows": 0})
+            merged["count"] += area["count"]
+            merged["classes"].update(area["classes"])
+            if area["mean_confidence"] is not None:
+                merged["confidence_sum"] += area["mean_confidence"] * area["count"]
+                merged["confidence_rows"] += area["count"]
+
+        for cell in partial["geo_grid"]:
+            merged = cells.setdefault((cell["lat"], cell["lon"]), {"count": 0, "classes": Counter()})
+            merged["count"] += cell["count"]
+            merged["classes"].update(cell["classes"])
+
+    ranked = dict(distribution.most_common())
+    return {
+        "total": total,
+        "class_distribution": ranked,
+        "top_classes": dict(list(ranked.items())[:top_k]),
+        "confidence": {
+            "mean": confidence_sum / confidence_rows if confidence_rows else None,
+            "edges": edges or [],
+            "counts": histogram or []
+        },
+        "by_area": [
+            {
+                "area": area,
+                "count": merged["count"],
+                "top_class": _top_class(merged["classes"]),
+                "mean_confidence": merged["confidence_sum"] / merged["confidence_rows"] if merged["confidence_rows"] else None,
+                "classes": dict(merged["classes"])
+            }
+            for area, merged in sorted(areas.items(), key=lambda item: -item[1]["count"])
+        ],
+        "geo_grid": [
+            {"lat": lat, "lon": lon, "count": merged["count"], "top_class": _top_class(merged["classes"]),
+             "classes": dict(merged["classes"])}
+            for (lat, lon), merged in sorted(cells.items(), key=lambda item: -item[1]["count"])
+        ]
+    }
@@ -1,9 +1,18 @@
 import pandas as pd
+import numpy as np
 import sys
 import os
+import json
+import time
 import pickle
+import argparse
 import warnings
-import shutil
+import resource
+import tempfile
+import functools
+import multiprocessing
+import importlib.metadata
+from concurrent.futures import ProcessPoolExecutor
 import mlflow
 from mlflow.tracking import MlflowClient
 from dotenv import load_dotenv
@@ -14,6 +23,15 @@ from dotenv import load_dotenv
 
 from evidently.report import Report
 from evidently.metric_preset import DataDriftPreset, DataQualityPreset
+from evidently.metrics import ColumnSummaryMetric, DataDriftTable, DatasetDriftMetric, DatasetMissingValuesMetric
+from evidently.metrics.data_drift.data_drift_table import DataDriftTableResults
+from evidently.metrics.data_drift.dataset_drift_metric import DatasetDriftMetricResults
+from evidently.calculation_engine.python_engine import PythonEngine
+from evidently.calculations.data_drift import get_dataset_drift, get_one_column_drift
+from evidently.core import ColumnType
+from evidently.options.data_drift import DataDriftOptions
+from evidently.pipeline.column_mapping import ColumnMapping
+from evidently.utils.data_operations import process_columns, recognize_column_type_
 from evidently.test_suite import TestSuite
 from evidently.tests import (
     TestNumberOfColumnsWithMissingValues,
@@ -21,12 +39,40 @@ from evidently.tests import (
 )
 
 
+# Modules partagés avec l'API (profil de référence, Feature Store)
+BACKEND_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "src")
+if BACKEND_SRC not in sys.path:
+    sys.path.insert(0, BACKEND_SRC)
+
+import artifacts
+import data_shards
+import drift_profile
+import log_drift
+from preprocessing2 import clean_column_names
+
+
 # ==========================================================
 # 0. GLOBAL CONFIG
 # ==========================================================
 warnings.filterwarnings("ignore")
 load_dotenv()
 
+# "evidently" : rapport complet (référence et courant reconstruits en entier)
+# "profile"   : échantillon courant vs reference_profile.json (mémoire indépendante du train)
+# "logs"      : trafic de production (journal d'inférence) par fenêtres de temps, lu incrémentalement
+DRIFT_CHECK_MODE = os.getenv("DRIFT_CHECK_MODE", "evidently")
+PROFILE_SAMPLE_SIZE = int(os.getenv("DRIFT_SAMPLE_SIZE", "20000"))
+
+# Mode "scalable" : échantillon stratifié (Cochran) + tests de drift par colonne en parallèle
+SAMPLE_CONFIDENCE = float(os.getenv("DRIFT_SAMPLE_CONFIDENCE", "0.99"))
+SAMPLE_MARGIN = float(os.getenv("DRIFT_SAMPLE_MARGIN", "0.01"))
+DRIFT_WORKERS = int(os.getenv("DRIFT_WORKERS", str(os.cpu_count() or 1)))
+
+# Mode "logs" : répertoire INFERENCE_LOG_DIR de l'API (volume partagé / synchronisé)
+INFERENCE_LOG_DIR = os.getenv("INFERENCE_LOG_DIR", "inference_logs")
+LOG_WINDOW_SECONDS = int(os.getenv("DRIFT_LOG_WINDOW_SECONDS", str(log_drift.DEFAULT_WINDOW_SECONDS)))
+LOG_MIN_ROWS = int(os.getenv("DRIFT_LOG_MIN_ROWS", str(log_drift.DEFAULT_MIN_ROWS)))
+
 # ==========================================================
 # 1. MLFLOW / DAGSHUB CONFIG
 # ==========================================================
@@ -41,6 +87,11 @@ MONITORING_TMP_DIR = "/tmp/monitoring_artifacts"
 REPORT_HTML = os.path.join(MONITORING_DIR, "monitoring_drift_report.html")
 TEST_HTML = os.path.join(MONITORING_DIR, "test_results.html")
 TRIGGER_FILE = os.path.join(MONITORING_DIR, "drift_detected")
+PROFILE_REPORT_JSON = os.path.join(MONITORING_DIR, "profile_drift_report.json")
+SCALABLE_REPORT_JSON = os.path.join(MONITORING_DIR, "scalable_drift_report.json")
+COMPARISON_JSON = os.path.join(MONITORING_DIR, "drift_eval_comparison.json")
+LOG_DRIFT_REPORT_JSON = os.path.join(MONITORING_DIR, "log_drift_report.json")
+LOG_DRIFT_STATE = os.path.join(MONITORING_DIR, log_drift.STATE_FILENAME)
 
 # ==========================================================
 # 3. MLFLOW AUTH (CI/CD SAFE)
@@ -65,7 +116,11 @@ def setup_mlflow():
 # ==========================================================
 # 4. DOWNLOAD ARTEFACTS FROM REGISTRY
 # ==========================================================
-def download_reference_from_mlflow():
+def download_reference_from_mlflow(roles=("serving", "data")):
+    """
+    Processors du modèle en Production : seuls les fichiers des `roles` du manifeste sont téléchargés
+    ("serving" suffit aux modes profile et logs ; "data" = preprocessed_data.pkl).
+    """
     client = MlflowClient()
 
     print(f"🔍 Recherche du modèle '{REGISTERED_MODEL_NAME}'")
@@ -89,21 +144,28 @@ def download_reference_from_mlflow():
     run_id = versions[0].run_id
     print(f"📥 Téléchargement des artefacts depuis run {run_id}")
 
-    if os.path.exists(MONITORING_TMP_DIR):
-        shutil.rmtree(MONITORING_TMP_DIR)
-
-    mlflow.artifacts.download_artifacts(
-        run_id=run_id,
-        artifact_path="processors",
-        dst_path=MONITORING_TMP_DIR
-    )
-
-    path = os.path.join(MONITORING_TMP_DIR, "processors")
+    path = artifacts.fetch_artifacts(run_id, MONITORING_TMP_DIR, roles=roles)
     return path if os.path.exists(path) else MONITORING_TMP_DIR
 
 # ==========================================================
 # 5. LOAD DATA
 # ==========================================================
+def ensure_reference_data(processors_path, current_csv=None, sample_size=PROFILE_SAMPLE_SIZE):
+    """
+    preprocessed_data.pkl (Evidently, mode scalable) n'existe pas pour
+    un modèle entraîné hors mémoire (TRAINING_DATA=external : shards non loggués dans MLflow).
+    Repli sur le profil de référence si des données courantes sont fournies, sinon arrêt explicite.
+    """
+    if os.path.exists(os.path.join(processors_path, "preprocessed_data.pkl")):
+        return
+    print("⚠️ preprocessed_data.pkl absent du run : modèle entraîné hors mémoire (sortie shards)")
+    if current_csv and run_profile_analysis(processors_path, current_csv, sample_size):
+        print("   Analyse faite par profil de référence (--current-csv) à la place d'Evidently.")
+        sys.exit(0)
+    print("❌ Aucune donnée de référence pour Evidently : relancer avec --mode profile --current-csv <csv> "
+          "ou --mode logs")
+    sys.exit(1)
+
 def load_data(processors_path):
     data_path = os.path.join(processors_path, "preprocessed_data.pkl")
     config_path = os.path.join(processors_path, "features_config.pkl")
@@ -131,17 +193,43 @@ def load_data(processors_path):
 # ==========================================================
 # 6. EVIDENTLY MONITORING
 # ==========================================================
-def run_evidently_analysis(reference, current):
-    os.makedirs(MONITORING_DIR, exist_ok=True)
+class SharedResultsEngine(PythonEngine):
+    """
+    Moteur Evidently qui réutilise les résultats déjà présents dans `shared` (métriques égales par valeur) :
+    la TestSuite relit les métriques du Report, le mode scalable y dépose ses calculs parallèles.
+    """
 
-    print("📊 Analyse Evidently en cours...")
+    def __init__(self, shared):
+        super().__init__()
+        self.shared = shared
+
+    def execute_metrics(self, context, data):
+        metrics = self.metrics
+        self.metrics = [metric for metric in metrics if metric not in self.shared]
+        try:
+            super().execute_metrics(context, data)
+        finally:
+            self.metrics = metrics
+        for metric in metrics:
+            if metric in self.shared:
+                context.metric_results[metric] = self.shared[metric]
+        self.shared.update(context.metric_results)
+
+def run_evidently_suites(reference, current, shared=None):
+    """
+    Report (DataDriftPreset + DataQualityPreset) puis TestSuite, sur une même passe de statistiques :
+    les tests réutilisent les métriques du Report (DataDriftTable, valeurs manquantes).
+    Sorties identiques pour les modes evidently et scalable : REPORT_HTML, TEST_HTML, décision.
+    """
+    os.makedirs(MONITORING_DIR, exist_ok=True)
+    engine = functools.partial(SharedResultsEngine, {} if shared is None else shared)
 
     # ---------- Report ----------
     report = Report(metrics=[
         DataDriftPreset(),
         DataQualityPreset()
     ])
-    report.run(reference_data=reference, current_data=current)
+    report.run(reference_data=reference, current_data=current, engine=engine)
     report.save_html(REPORT_HTML)
 
     print(f"✅ Rapport enregistré : {REPORT_HTML}")
@@ -151,15 +239,22 @@ def run_evidently_analysis(reference, current):
         TestShareOfDriftedColumns(lt=0.3),
         TestNumberOfColumnsWithMissingValues(eq=0)
     ])
-    tests.run(reference_data=reference, current_data=current)
+    tests.run(reference_data=reference, current_data=current, engine=engine)
     tests.save_html(TEST_HTML)
 
     print(f"✅ Tests enregistrés : {TEST_HTML}")
 
     # ---------- Decision ----------
     results = tests.as_dict()
+    write_decision(not results["summary"]["all_passed"])
+    return results
+
+def run_evidently_analysis(reference, current):
+    print("📊 Analyse Evidently en cours...")
+    return run_evidently_suites(reference, current)
 
-    if not results["summary"]["all_passed"]:
+def write_decision(drift_detected):
+    if drift_detected:
         print("🚨 DRIFT DÉTECTÉ")
         with open(TRIGGER_FILE, "w") as f:
             f.write("drift=true")
@@ -168,14 +263,329 @@ def run_evidently_analysis(reference, current):
         if os.path.exists(TRIGGER_FILE):
             os.remove(TRIGGER_FILE)
 
+# ==========================================================
+# 6b. PROFIL DE RÉFÉRENCE (mode "profile")
+# ==========================================================
+def load_current_sample(processors_path, current_csv=None, sample_size=PROFILE_SAMPLE_SIZE, seed=42,
+                        shards_dir=data_shards.SHARDS_PATH):
+    """
+    Échantillon courant en features non scalées (l'espace du profil) :
+    - current_csv : données brutes de production, passées dans le Feature Store
+    - sinon : split test des shards du preprocessing (lignes tirées dans les memmaps, jamais le split
+      entier en mémoire), dé-scalé avec robust_scaler.pkl s'il existe (mode scaled)
+    Retourne (features, colonnes brutes nettoyées ou None).
+    """
+    if current_csv:
+        from feature_store import CrimeFeatureStore
+
+        raw = pd.read_csv(current_csv)
+        if sample_size and len(raw) > sample_size:
+            raw = raw.sample(n=sample_size, random_state=seed)
+        store = CrimeFeatureStore(processors_path=processors_path)
+        store.load_artifacts()
+        features = store.build_feature_frame(raw)
+        raw_clean = clean_column_names(raw.copy()).rename(columns={"part_1_2": "crm_risk"})
+        return features, raw_clean
+
+    split = data_shards.ShardedSplit(shards_dir, "test")
+    X_test = split.sample(sample_size, seed=seed).astype(np.float64)
+    scaler_path = os.path.join(processors_path, "robust_scaler.pkl")
+    if os.path.exists(scaler_path):
+        with open(scaler_path, "rb") as f:
+            X_test = pickle.load(f).inverse_transform(X_test)
+    return pd.DataFrame(X_test, columns=split.features), None
+
+def run_profile_analysis(processors_path, current_csv=None, sample_size=PROFILE_SAMPLE_SIZE,
+                         shards_dir=data_shards.SHARDS_PATH):
+    """Drift par comparaison au profil compact (PSI/KS, quantiles, valeurs manquantes), sans Evidently."""
+    profile = drift_profile.load_profile(processors_path)
+    if profile is None:
+        return False
+
+    os.makedirs(MONITORING_DIR, exist_ok=True)
+    print("📊 Analyse par profil de référence...")
+    start = time.perf_counter()
+    features, raw_clean = load_current_sample(processors_path, current_csv, sample_size, shards_dir=shards_dir)
+    report = drift_profile.compare_sample(profile, features, raw_clean)
+    report["duration_seconds"] = round(time.perf_counter() - start, 4)
+
+    with open(PROFILE_REPORT_JSON, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Rapport enregistré : {PROFILE_REPORT_JSON} ({report['rows']} lignes, {report['duration_seconds']}s)")
+    print(f"   Features en drift : {report['drifted_features'] or 'aucune'} (part = {report['drift_share']})")
+
+    write_decision(report["drift_detected"] or bool(report["missing_rate_alerts"]))
+    return True
+
+# ==========================================================
+# 6c. TRAFIC DE PRODUCTION (mode "logs")
+# ==========================================================
+def run_logs_analysis(processors_path, log_dir=INFERENCE_LOG_DIR, window_seconds=LOG_WINDOW_SECONDS,
+                      min_rows=LOG_MIN_ROWS, force=False):
+    """
+    Drift par fenêtre sur les requêtes réellement servies : seuls les segments de journal nouveaux
+    sont featurisés (Feature Store, mode batch) ; les fenêtres ouvertes persistent dans LOG_DRIFT_STATE.
+    Le trigger n'est mis à jour que si au moins une fenêtre a été close pendant ce passage.
+    """
+    from feature_store import CrimeFeatureStore
+
+    profile = drift_profile.load_profile(processors_path)
+    if profile is None:
+        return False
+
+    os.makedirs(MONITORING_DIR, exist_ok=True)
+    print(f"📊 Analyse du trafic de production ({log_dir}, fenêtres de {window_seconds}s)...")
+    store = CrimeFeatureStore(processors_path=processors_path)
+    store.load_artifacts()
+    report = log_drift.run_log_windows(profile, store, log_dir, LOG_DRIFT_STATE, force=force,
+                                       window_seconds=window_seconds, min_rows=min_rows)
+
+    with open(LOG_DRIFT_REPORT_JSON, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Rapport enregistré : {LOG_DRIFT_REPORT_JSON} ({report['new_rows']} nouvelles lignes, "
+          f"{len(report['closed_windows'])} fenêtre(s) close(s), {report['duration_seconds']}s)")
+    for window in report["closed_windows"]:
+        label = time.strftime("%Y-%m-%d %H:%M", time.gmtime(window["window_start"]))
+        if window["scored"]:
+            print(f"   {label} : {window['rows']} lignes, part en drift = {window['drift_share']}")
+        else:
+            print(f"   {label} : {window['rows']} lignes (< {min_rows}, non scorée)")
+
+    if report["closed_windows"]:
+        write_decision(report["drift_detected"])
+    return True
+
+# ==========================================================
+# 6d. MODE SCALABLE (échantillon stratifié + colonnes en parallèle)
+# ==========================================================
+def _column_stats_worker(task):
+    """
+    Process worker, pour un paquet de colonnes : drift par colonne (calcul de DataDriftTable) et
+    ColumnSummaryMetric (DataQualityPreset). Retourne ({colonne: drift}, {métrique: résultat}).
+    """
+    reference, current, drift_context = task
+    drift = {col: get_one_column_drift(current_data=current, reference_data=reference, column_name=col,
+                                       column_type=drift_context["types"][col], **drift_context["kwargs"])
+             for col in reference.columns if col in drift_context["types"]}
+    report = Report(metrics=[ColumnSummaryMetric(column_name=col) for col in reference.columns])
+    report.run(reference_data=reference, current_data=current)
+    summaries = {metric: metric.get_result() for metric in report._first_level_metrics}
+    return drift, summaries
+
+def _drift_columns(dataset_columns):
+    """Colonnes testées par DataDriftTable, dans l'ordre d'Evidently (cible, prédiction, features)."""
+    utility = dataset_columns.utility_columns
+    columns = [utility.target] if utility.target else []
+    if isinstance(utility.prediction, str):
+        columns.append(utility.prediction)
+    return columns + list(dataset_columns.num_feature_names or []) + list(dataset_columns.cat_feature_names or []) \
+        + list(dataset_columns.text_feature_names or [])
+
+def parallel_column_stats(reference, current, workers=DRIFT_WORKERS):
+    """
+    Statistiques par colonne des deux presets, réparties en `workers` paquets de colonnes (un process
+    par paquet), puis DataDriftTable / DatasetDriftMetric reconstitués à partir du drift par colonne.
+    Retourne {métrique Evidently: résultat}, à réutiliser par run_evidently_suites.
+    """
+    dataset_columns = process_columns(reference, ColumnMapping())
+    columns = _drift_columns(dataset_columns)
+    both = pd.concat([reference, current])
+    types = {col: recognize_column_type_(dataset=both, column_name=col, columns=dataset_columns) for col in columns}
+    numeric = [col for col, kind in types.items() if kind == ColumnType.Numerical]
+    drift_context = {"types": types, "kwargs": {
+        "options": DataDriftOptions(), "dataset_columns": dataset_columns, "agg_data": True,
+        "num_correlations": (current[numeric].corr(), reference[numeric].corr()),
+        "is_contains_nans": (current.isna().any(), reference.isna().any())
+    }}
+
+    all_columns = list(reference.columns)
+    groups = [g.tolist() for g in np.array_split(np.array(all_columns, dtype=object), min(workers, len(all_columns))) if len(g)]
+    tasks = [(reference[group], current[group], drift_context) for group in groups]
+    if len(tasks) == 1:
+        partials = [_column_stats_worker(tasks[0])]
+    else:
+        # fork si disponible : les workers héritent d'Evidently déjà importé (spawn le réimporte dans chacun)
+        context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+        with ProcessPoolExecutor(max_workers=len(tasks), mp_context=context) as pool:
+            partials = list(pool.map(_column_stats_worker, tasks))
+
+    drift, shared = {}, {}
+    for partial_drift, summaries in partials:
+        drift.update(partial_drift)
+        shared.update(summaries)
+    drift = {col: drift[col] for col in columns}
+
+    table = DataDriftTable()
+    table_drift = get_dataset_drift(drift, DataDriftOptions().drift_share)
+    shared[table] = DataDriftTableResults(
+        number_of_columns=len(columns), number_of_drifted_columns=table_drift.number_of_drifted_columns,
+        share_of_drifted_columns=table_drift.dataset_drift_score, dataset_drift=table_drift.dataset_drift,
+        drift_by_columns=drift, dataset_columns=dataset_columns)
+    dataset = DatasetDriftMetric()
+    dataset_drift = get_dataset_drift(drift, dataset.drift_share)
+    shared[dataset] = DatasetDriftMetricResults(
+        drift_share=dataset.drift_share, number_of_columns=len(columns),
+        number_of_drifted_columns=dataset_drift.number_of_drifted_columns,
+        share_of_drifted_columns=dataset_drift.dataset_drift_score, dataset_drift=dataset_drift.dataset_drift)
+    return shared
+
+def run_scalable_analysis(reference, current, confidence=SAMPLE_CONFIDENCE, margin=SAMPLE_MARGIN,
+                          workers=DRIFT_WORKERS, seed=42):
+    """
+    Mêmes sorties que run_evidently_analysis (rapport HTML, tests, décision), calculées sur :
+    - des échantillons stratifiés par classe cible, de taille de Cochran (indépendante du volume)
+    - une passe de statistiques par colonne, en parallèle, partagée par le Report et la TestSuite
+    - les valeurs manquantes des données courantes complètes (une seule ligne doit faire échouer le test)
+    """
+    os.makedirs(MONITORING_DIR, exist_ok=True)
+    print("📊 Analyse Evidently (échantillonnée, parallèle)...")
+
+    ref_sample = drift_profile.stratified_sample(
+        reference, drift_profile.cochran_sample_size(len(reference), confidence, margin), seed=seed)
+    cur_sample = drift_profile.stratified_sample(
+        current, drift_profile.cochran_sample_size(len(current), confidence, margin), seed=seed)
+
+    shared = parallel_column_stats(ref_sample, cur_sample, workers=workers)
+    missing_report = Report(metrics=[DatasetMissingValuesMetric()])
+    missing_report.run(reference_data=ref_sample, current_data=current)
+    missing_metric = missing_report._first_level_metrics[0]
+    shared[missing_metric] = missing_metric.get_result()
+
+    tests = run_evidently_suites(ref_sample, cur_sample, shared)
+
+    table = shared[DataDriftTable()]
+    missing_by_column = shared[missing_metric].current.number_of_missing_values_by_column
+    summary = {
+        "reference_rows": len(reference), "current_rows": len(current),
+        "reference_sample": len(ref_sample), "current_sample": len(cur_sample),
+        "confidence": confidence, "margin": margin, "workers": workers,
+        "share_of_drifted_columns": round(table.share_of_drifted_columns, 4),
+        "drifted_columns": [col for col, r in table.drift_by_columns.items() if r.drift_detected],
+        "columns_with_missing_values": [col for col, n in missing_by_column.items() if n],
+        "by_column": {col: {"stattest": r.stattest_name, "drift_score": float(r.drift_score),
+                            "drift_detected": bool(r.drift_detected)}
+                      for col, r in table.drift_by_columns.items()},
+        "tests_passed": tests["summary"]["all_passed"]
+    }
+    with open(SCALABLE_REPORT_JSON, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"✅ Rapport enregistré : {SCALABLE_REPORT_JSON} "
+          f"({len(ref_sample)}/{len(reference)} réf., {len(cur_sample)}/{len(current)} courant)")
+    return summary
+
+APPROACHES = {"full": run_evidently_analysis, "scalable": run_scalable_analysis}
+
+def _rss_mb(who):
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+def _measured_run(approach, data_path, kwargs):
+    """
+    Exécuté dans un process neuf (spawn) : charge les données puis lance une seule approche.
+    ru_maxrss y est donc propre à cette approche (pas de tracemalloc : il ralentit Evidently).
+    """
+    with open(data_path, "rb") as f:
+        reference, current = pickle.load(f)
+    rss_before = _rss_mb(resource.RUSAGE_SELF)
+    # Evidently lance déjà un sous-process à l'import (lscpu) : seul un pic au-delà compte pour les workers
+    children_before = _rss_mb(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    APPROACHES[approach](reference, current, **kwargs)
+    wall = time.perf_counter() - start
+    children_peak = _rss_mb(resource.RUSAGE_CHILDREN)
+    return {
+        "wall_seconds": round(wall, 3),
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": _rss_mb(resource.RUSAGE_SELF),
+        "workers_peak_rss_mb": children_peak if children_peak > children_before else None
+    }
+
+def measure(approach, data_path, **kwargs):
+    """Temps mur et pics RSS d'une approche, mesurés dans un process dédié."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_measured_run, approach, data_path, kwargs).result()
+
+def compare_approaches(reference, current, source=None, **kwargs):
+    """
+    Mesure l'approche actuelle (Report + TestSuite complets) puis le mode scalable, sur les mêmes données,
+    chacune dans son propre process (temps hors import et chargement des données).
+    `source` : origine des données, enregistrée avec l'environnement et la configuration du mode scalable.
+    """
+    with tempfile.TemporaryDirectory(prefix="drift_compare_") as workdir:
+        data_path = os.path.join(workdir, "data.pkl")
+        with open(data_path, "wb") as f:
+            pickle.dump((reference, current), f, protocol=pickle.HIGHEST_PROTOCOL)
+        comparison = {
+            "rows": {"reference": len(reference), "current": len(current)},
+            "data": source,
+            "environment": {"python": sys.version.split()[0], "cpus": os.cpu_count(),
+                            "evidently": importlib.metadata.version("evidently")},
+            "config": kwargs,
+            "full": measure("full", data_path),
+            "scalable": measure("scalable", data_path, **kwargs)
+        }
+    comparison["speedup"] = round(comparison["full"]["wall_seconds"] / max(comparison["scalable"]["wall_seconds"], 1e-9), 2)
+    with open(COMPARISON_JSON, "w") as f:
+        json.dump(comparison, f, indent=2)
+    print(f"⏱️ Complet : {comparison['full']} | Scalable : {comparison['scalable']} | x{comparison['speedup']}")
+    return comparison
+
 # ==========================================================
 # 7. MAIN
 # ==========================================================
 if __name__ == "__main__":
-    setup_mlflow()
-
-    processors_path = download_reference_from_mlflow()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["evidently", "profile", "scalable", "logs"], default=DRIFT_CHECK_MODE)
+    parser.add_argument("--current-csv", default=None, help="Données brutes de production (mode profile)")
+    parser.add_argument("--shards-dir", default=data_shards.SHARDS_PATH,
+                        help="Mode profile sans --current-csv : shards du preprocessing (split test)")
+    parser.add_argument("--log-dir", default=INFERENCE_LOG_DIR, help="Mode logs : journal d'inférence de l'API")
+    parser.add_argument("--window-seconds", type=int, default=LOG_WINDOW_SECONDS, help="Mode logs : taille des fenêtres")
+    parser.add_argument("--close-all", action="store_true", help="Mode logs : score aussi les fenêtres encore ouvertes")
+    parser.add_argument("--sample-size", type=int, default=PROFILE_SAMPLE_SIZE)
+    parser.add_argument("--confidence", type=float, default=SAMPLE_CONFIDENCE, help="Mode scalable : confiance de Cochran")
+    parser.add_argument("--margin", type=float, default=SAMPLE_MARGIN, help="Mode scalable : marge d'erreur")
+    parser.add_argument("--workers", type=int, default=DRIFT_WORKERS, help="Mode scalable : process parallèles")
+    parser.add_argument("--compare", action="store_true", help="Mesure temps/mémoire : complet vs scalable")
+    parser.add_argument("--processors-dir", default=None,
+                        help="Processors locaux (sortie de preprocessing2) au lieu du modèle du registre MLflow")
+    args = parser.parse_args()
+
+    needs_data = args.mode in ("evidently", "scalable") or args.compare
+    if args.mode == "profile" and not args.current_csv and \
+            not os.path.exists(os.path.join(args.shards_dir, data_shards.INDEX_FILENAME)):
+        print("❌ Mode profile : --current-csv requis (ou shards du preprocessing dans --shards-dir)")
+        sys.exit(1)
+    if args.processors_dir:
+        processors_path = args.processors_dir
+    else:
+        setup_mlflow()
+        processors_path = download_reference_from_mlflow(("serving", "data") if needs_data else ("serving",))
+    if needs_data:
+        ensure_reference_data(processors_path, args.current_csv, args.sample_size)
+
+    if args.mode == "profile":
+        if run_profile_analysis(processors_path, args.current_csv, args.sample_size, args.shards_dir):
+            sys.exit(0)
+        print("⚠️ reference_profile.json absent (modèle antérieur) : fallback Evidently")
+
+    if args.mode == "logs":
+        if run_logs_analysis(processors_path, args.log_dir, args.window_seconds, force=args.close_all):
+            sys.exit(0)
+        print("⚠️ reference_profile.json absent (modèle antérieur) : fallback Evidently")
+
+    if not needs_data:
+        # Fallback Evidently : il faut aussi les données pré-traitées (fichiers "serving" déjà présents, non retéléchargés)
+        if not args.processors_dir:
+            processors_path = download_reference_from_mlflow()
+        ensure_reference_data(processors_path, args.current_csv, args.sample_size)
 
     reference_df, current_df = load_data(processors_path)
 
-    run_evidently_analysis(reference_df, current_df)
+    scalable_args = {"confidence": args.confidence, "margin": args.margin, "workers": args.workers}
+    if args.compare:
+        source = os.path.join(processors_path, "preprocessed_data.pkl") if args.processors_dir else "registre MLflow"
+        compare_approaches(reference_df, current_df, source=source, **scalable_args)
+    elif args.mode == "scalable":
+        run_scalable_analysis(reference_df, current_df, **scalable_args)
+    else:
+        run_evidently_analysis(reference_df, current_df)
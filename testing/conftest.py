@@ -0,0 +1,94 @@
+import os
+import sys
+import pickle
+import warnings
+
+import pandas as pd
+import pytest
+
+# ==========================================
+# SETUP DES CHEMINS
+# ==========================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+repo_root = os.path.abspath(os.path.join(current_dir, '..'))
+backend_src_path = os.path.join(repo_root, 'backend', 'src')
+frontend_path = os.path.join(repo_root, 'frontend')
+
+for path in (backend_src_path, frontend_path):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+SAMPLE_CSV = os.path.join(repo_root, 'crime_sample_150.csv')
+
+# Colonnes brutes envoyées à l'API (cf. CrimeInput)
+RAW_FIELDS = [
+    "DATE OCC", "TIME OCC", "AREA", "Rpt Dist No", "Part 1-2", "Crm Cd", "Mocodes",
+    "Vict Age", "Vict Sex", "Vict Descent", "Premis Cd", "Premis Desc",
+    "Weapon Used Cd", "Weapon Desc", "Status", "LOCATION", "LAT", "LON"
+]
+
+# ==========================================
+# FIXTURES PARTAGÉES
+# ==========================================
+
+@pytest.fixture(scope="session")
+def sample_records():
+    """Les lignes du fichier d'exemple, au format JSON de /predict (NaN -> None)."""
+    df = pd.read_csv(SAMPLE_CSV)[RAW_FIELDS]
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict('records')
+
+def to_columns(records):
+    """Liste de dicts -> corps colonne de /predict/batch (NaN -> None)."""
+    df = pd.DataFrame(records)
+    return df.astype(object).where(df.notna(), None).to_dict('list')
+
+@pytest.fixture(scope="session")
+def processors_dir(tmp_path_factory):
+    """Processors générés par preprocessing2 sur crime_sample_150.csv (mode train)."""
+    import preprocessing2
+
+    workdir = tmp_path_factory.mktemp("pipeline")
+    original_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            preprocessing2.run_preprocessing_pipeline(data_path=SAMPLE_CSV, mode="train")
+    finally:
+        os.chdir(original_cwd)
+    return str(workdir / preprocessing2.ARTIFACTS_PATH)
+
+@pytest.fixture(scope="session")
+def trained_model(processors_dir):
+    """Petit RandomForest entraîné sur les données pré-traitées (pas de DagsHub)."""
+    from sklearn.ensemble import RandomForestClassifier
+
+    with open(os.path.join(processors_dir, "preprocessed_data.pkl"), "rb") as f:
+        data = pickle.load(f)
+    model = RandomForestClassifier(n_estimators=10, random_state=42)
+    model.fit(data["X_train_scaled"], data["y_train"])
+    return model
+
+@pytest.fixture
+def feature_store(processors_dir):
+    from feature_store import CrimeFeatureStore
+
+    store = CrimeFeatureStore(processors_path=processors_dir)
+    store.load_artifacts()
+    return store
+
+@pytest.fixture
+def api_client(feature_store, trained_model):
+    """Client FastAPI avec un modèle local injecté (le lifespan MLflow n'est pas lancé)."""
+    from fastapi.testclient import TestClient
+    import api
+    import readiness
+
+    saved = dict(api.ml_components)
+    api.register_components(trained_model, "Local_Test_Model_v1", feature_store)
+    api.ml_components["status"] = readiness.LoadStatus()
+    api.ml_components["status"].enter(readiness.READY)
+    yield TestClient(api.app)
+    api.ml_components.clear()
+    api.ml_components.update(saved)
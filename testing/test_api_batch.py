@@ -0,0 +1,108 @@
+from conftest import to_columns
+
+
+def test_predict_batch_matches_single_predict(api_client, sample_records):
+    records = sample_records[:20]
+    columns = to_columns(records)
+
+    response = api_client.post("/predict/batch", json={"columns": columns})
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["predictions"]) == len(records)
+
+    for i in (0, 7, 19):
+        single = api_client.post("/predict", json=records[i]).json()
+        assert single["prediction"] == body["predictions"][i]
+        assert abs(single["confidence"] - body["confidences"][i]) < 1e-9
+
+def test_predict_batch_rejects_bad_schema(api_client):
+    response = api_client.post("/predict/batch", json={"columns": {"AREA": [1, 2]}})
+    assert response.status_code == 422
+
+    response = api_client.post("/predict/batch", json={"columns": {
+        "DATE OCC": ["01/01/2023 12:00:00 PM"], "TIME OCC": [1200, 1300], "AREA": [1]
+    }})
+    assert response.status_code == 422
+
+def test_predict_summary_aggregates(api_client, sample_records):
+    columns = to_columns(sample_records)
+    response = api_client.post("/predict/summary", json={"columns": columns}, params={"include_predictions": True})
+    assert response.status_code == 200
+    summary = response.json()
+
+    assert summary["total"] == len(sample_records)
+    assert sum(summary["class_distribution"].values()) == len(sample_records)
+    assert sum(summary["confidence"]["counts"]) == len(sample_records)
+    assert sum(a["count"] for a in summary["by_area"]) == len(sample_records)
+    # Grille géographique : moins de cellules que de points, aucun point perdu (hors 0,0)
+    assert 0 < len(summary["geo_grid"]) <= len(sample_records)
+    assert sum(c["count"] for c in summary["geo_grid"]) == sum(1 for r in sample_records if r["LAT"] and r["LON"])
+    assert len(summary["predictions"]) == len(sample_records)
+
+    compact = api_client.post("/predict/summary", json={"columns": columns}, params={"grid_size": 0.1}).json()
+    assert "predictions" not in compact
+    assert len(compact["geo_grid"]) <= len(summary["geo_grid"])
+
+def test_chunked_summaries_merge_to_the_full_summary(api_client, sample_records):
+    import summaries
+
+    full = api_client.post("/predict/summary", json={"columns": to_columns(sample_records)}).json()
+    partials = [api_client.post("/predict/summary", json={"columns": to_columns(sample_records[i:i + 40])}).json()
+                for i in range(0, len(sample_records), 40)]
+    merged = summaries.merge_summaries(partials)
+
+    assert merged["total"] == full["total"] and merged["class_distribution"] == full["class_distribution"]
+    assert merged["confidence"]["counts"] == full["confidence"]["counts"]
+    assert abs(merged["confidence"]["mean"] - full["confidence"]["mean"]) < 1e-9
+    for key, group in (("area", "by_area"), ("lat", "geo_grid")):
+        expected = {(g[key], g.get("lon")): (g["count"], g["classes"]) for g in full[group]}
+        assert {(g[key], g.get("lon")): (g["count"], g["classes"]) for g in merged[group]} == expected
+    by_area = {a["area"]: a for a in full["by_area"]}
+    for area in merged["by_area"]:
+        assert abs(area["mean_confidence"] - by_area[area["area"]]["mean_confidence"]) < 1e-9
+        assert area["classes"][area["top_class"]] == max(area["classes"].values())
+
+def test_predict_batch_msgpack_roundtrip(api_client, sample_records):
+    import pandas as pd
+    import api
+    import wire_format
+
+    records = sample_records[:30]
+    json_body = api_client.post("/predict/batch", json={"columns": to_columns(records)}).json()
+
+    body = wire_format.encode_msgpack_columns(pd.DataFrame(records), api.FIELD_KINDS)
+    response = api_client.post(
+        "/predict/batch", content=body,
+        headers={"Content-Type": wire_format.MSGPACK_MEDIA_TYPE, "Accept": wire_format.MSGPACK_MEDIA_TYPE}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == wire_format.MSGPACK_MEDIA_TYPE
+
+    labels, confidences, model_info = wire_format.decode_msgpack_predictions(response.content)
+    assert list(labels) == json_body["predictions"]
+    assert list(confidences) == json_body["confidences"]
+    assert model_info == json_body["model_info"]
+
+def test_predict_batch_msgpack_bad_body(api_client):
+    import msgpack
+    import wire_format
+
+    response = api_client.post("/predict/batch", content=msgpack.packb([[1, 2]]),
+                               headers={"Content-Type": wire_format.MSGPACK_MEDIA_TYPE})
+    assert response.status_code == 422
+
+def test_single_predict_uses_the_row_executor(api_client, sample_records, monkeypatch):
+    import api
+
+    plan = api.ml_components["store"].plan
+    calls, updates = [], []
+    run_row, run_batch = plan.run_row, plan.run_batch
+    monkeypatch.setattr(plan, "run_row", lambda record: calls.append("row") or run_row(record))
+    monkeypatch.setattr(plan, "run_batch", lambda frame: calls.append("batch") or run_batch(frame))
+    monitor = type("Monitor", (), {"update": lambda self, features: updates.append(features)})()
+    monkeypatch.setitem(api.ml_components, "drift", monitor)
+
+    assert api_client.post("/predict", json=sample_records[0]).status_code == 200
+    assert calls == ["row"]
+    # Le moniteur de drift reçoit la ligne de features non scalées, comme pour un lot
+    assert len(updates) == 1 and list(updates[0].columns) == api.ml_components["store"].required_features
@@ -0,0 +1,35 @@
+import json
+
+import api
+from conftest import to_columns
+
+
+def test_predict_stream_micro_batches(api_client, sample_records, monkeypatch):
+    monkeypatch.setattr(api, "STREAM_BATCH_SIZE", 16)
+    records = sample_records[:40]
+    body = "\n".join(json.dumps(r) for r in records) + "\n"
+
+    response = api_client.post("/predict/stream", content=body.encode(),
+                               headers={"Content-Type": api.NDJSON_MEDIA_TYPE})
+    assert response.status_code == 200
+    lines = [json.loads(l) for l in response.text.splitlines()]
+
+    assert [l["line"] for l in lines] == list(range(1, len(records) + 1))
+    batch = api_client.post("/predict/batch", json={"columns": to_columns(records)}).json()
+    assert [l["prediction"] for l in lines] == batch["predictions"]
+
+def test_predict_stream_reports_bad_lines(api_client, sample_records):
+    body = "\n".join([
+        json.dumps(dict(sample_records[0], id="a")),
+        "{pas du json",
+        json.dumps({"AREA": 1}),
+        json.dumps(dict(sample_records[1], **{"TIME OCC": "abc"})),
+        json.dumps(sample_records[2]),
+    ])
+    response = api_client.post("/predict/stream", content=body.encode())
+    lines = [json.loads(l) for l in response.text.splitlines()]
+    by_line = {l["line"]: l for l in lines}
+
+    assert by_line[1]["id"] == "a" and "prediction" in by_line[1]
+    assert "error" in by_line[2] and "error" in by_line[3] and "error" in by_line[4]
+    assert "prediction" in by_line[5]
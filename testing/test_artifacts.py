@@ -0,0 +1,60 @@
+import multiprocessing
+import os
+import shutil
+
+import pytest
+
+import mlflow
+
+import artifacts
+
+
+def test_serving_fetch_skips_training_data_and_resumes(processors_dir, tmp_path):
+    source = str(tmp_path / "processors")
+    shutil.copytree(processors_dir, source)
+    manifest = artifacts.write_manifest(source)
+    assert manifest["files"]["preprocessed_data.pkl"]["role"] == "data"
+    assert manifest["files"]["robust_scaler.pkl"]["role"] == "serving"
+
+    previous_uri = mlflow.get_tracking_uri()
+    mlflow.set_tracking_uri(f"file:{tmp_path / 'mlruns'}")
+    try:
+        with mlflow.start_run() as run:
+            mlflow.log_artifacts(source, artifact_path="processors")
+
+        downloads = []
+        def counting_download(run_id, artifact_path, dst_path):
+            downloads.append(os.path.basename(artifact_path))
+            return artifacts._mlflow_download(run_id, artifact_path, dst_path)
+
+        dst = str(tmp_path / "serving")
+        local = artifacts.fetch_artifacts(run.info.run_id, dst, download=counting_download)
+        serving = {n for n, e in manifest["files"].items() if e["role"] == "serving"}
+        assert set(os.listdir(local)) == serving | {artifacts.MANIFEST_FILENAME}
+        assert "preprocessed_data.pkl" not in downloads
+
+        # Reprise : seul le fichier tronqué est retéléchargé
+        with open(os.path.join(local, "robust_scaler.pkl"), "r+b") as f:
+            f.truncate(10)
+        downloads.clear()
+        artifacts.fetch_artifacts(run.info.run_id, dst, download=counting_download)
+        assert downloads == [artifacts.MANIFEST_FILENAME, "robust_scaler.pkl"]
+    finally:
+        mlflow.set_tracking_uri(previous_uri)
+
+def _locked_write(dst, marker):
+    with artifacts.download_lock(dst):
+        with open(marker, "w") as f:
+            f.write(str(os.getpid()))
+
+@pytest.mark.skipif(artifacts.fcntl is None, reason="verrou fcntl indisponible")
+def test_download_lock_serialises_processes(tmp_path):
+    dst, marker = str(tmp_path / "serving"), str(tmp_path / "marker")
+    worker = multiprocessing.get_context("fork").Process(target=_locked_write, args=(dst, marker))
+    with artifacts.download_lock(dst):
+        worker.start()
+        worker.join(0.5)
+        # Second "worker" bloqué tant que le premier télécharge
+        assert worker.is_alive() and not os.path.exists(marker)
+    worker.join(10)
+    assert worker.exitcode == 0 and os.path.exists(marker)
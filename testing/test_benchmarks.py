@@ -0,0 +1,46 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+from conftest import repo_root
+
+sys.path.insert(0, os.path.join(repo_root, 'benchmarks'))
+import load_test  # noqa: E402
+
+
+def test_parse_mix_normalizes_weights():
+    assert load_test.parse_mix("single=3,batch=1") == {"single": 0.75, "batch": 0.25}
+    with pytest.raises(ValueError):
+        load_test.parse_mix("unknown=1")
+
+def test_load_harness_smoke(api_client, sample_records):
+    import api
+
+    mix = load_test.parse_mix("single=0.5,batch=0.3,summary=0.2")
+    plan = load_test.build_requests(sample_records, mix, n_requests=30, batch_size=10, seed=0)
+    result = asyncio.run(load_test.run_load(api.app, plan, concurrency=4))
+
+    assert result["requests"] == 30
+    assert all(stats["errors"] == 0 for stats in result["endpoints"].values())
+    assert sum(stats["count"] for stats in result["endpoints"].values()) == 30
+
+    report = {"results": {"concurrency_4": result}, "peak_rss_mb": 100.0}
+    slower = {"results": {"concurrency_4": dict(result, throughput_rps=result["throughput_rps"] * 10)},
+              "peak_rss_mb": 100.0}
+    assert load_test.compare_to_baseline(report, report, tolerance=0.5) == []
+    assert load_test.compare_to_baseline(report, slower, tolerance=0.5)
+    assert load_test.response_errors(report) == []
+
+def test_baseline_comparison_scales_with_machine_speed():
+    result = {"throughput_rps": 35.0, "endpoints": {"single": {"p50_ms": 20.0, "p95_ms": 30.0}}}
+    baseline = {"calibration_s": 0.1, "peak_rss_mb": 100.0, "results": {"concurrency_1": dict(
+        result, throughput_rps=80.0, endpoints={"single": {"p50_ms": 10.0, "p95_ms": 15.0}})}}
+
+    # Agent deux fois plus lent (calibration) : deux fois plus lent partout, pas une régression
+    slower_agent = {"calibration_s": 0.2, "peak_rss_mb": 100.0, "results": {"concurrency_1": result}}
+    assert load_test.compare_to_baseline(slower_agent, baseline, tolerance=0.5) == []
+    # Même machine : les mêmes chiffres sont des régressions (débit et latences 2x moins bons)
+    same_machine = dict(slower_agent, calibration_s=0.1)
+    assert len(load_test.compare_to_baseline(same_machine, baseline, tolerance=0.5)) == 3
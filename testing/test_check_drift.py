@@ -0,0 +1,135 @@
+import functools
+import importlib
+import importlib.util
+import os
+import pickle
+import shutil
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import SAMPLE_CSV, repo_root
+
+MONITORING_DIR = os.path.join(repo_root, 'monitoring')
+EVIDENTLY_MODULES = ("evidently", "evidently.report", "evidently.metric_preset", "evidently.metrics",
+                     "evidently.metrics.data_drift.data_drift_table", "evidently.metrics.data_drift.dataset_drift_metric",
+                     "evidently.calculation_engine.python_engine", "evidently.calculations.data_drift",
+                     "evidently.core", "evidently.options.data_drift", "evidently.pipeline.column_mapping",
+                     "evidently.utils.data_operations", "evidently.test_suite", "evidently.tests")
+EVIDENTLY_NAMES = ("Report", "DataDriftPreset", "DataQualityPreset", "ColumnSummaryMetric", "DataDriftTable",
+                   "DatasetDriftMetric", "DatasetMissingValuesMetric", "DataDriftTableResults",
+                   "DatasetDriftMetricResults", "get_dataset_drift", "get_one_column_drift", "ColumnType",
+                   "DataDriftOptions", "ColumnMapping", "process_columns", "recognize_column_type_", "TestSuite",
+                   "TestNumberOfColumnsWithMissingValues", "TestShareOfDriftedColumns")
+# Evidently épinglé (requirements-monitoring.txt) : sans lui, les tests qui l'exécutent sont ignorés
+HAS_EVIDENTLY = importlib.util.find_spec("evidently") is not None
+
+
+@pytest.fixture
+def check_drift(monkeypatch, tmp_path):
+    """monitoring/check_drift.py importé dans un dossier temporaire (Evidently factice s'il n'est pas installé)."""
+    monkeypatch.syspath_prepend(MONITORING_DIR)
+    if not HAS_EVIDENTLY:
+        fake = types.SimpleNamespace(PythonEngine=object, **{name: None for name in EVIDENTLY_NAMES})
+        for name in EVIDENTLY_MODULES:
+            monkeypatch.setitem(sys.modules, name, fake)
+    monkeypatch.delitem(sys.modules, "check_drift", raising=False)
+    monkeypatch.chdir(tmp_path)
+    module = importlib.import_module("check_drift")
+    yield module
+    sys.modules.pop("check_drift", None)
+
+def drift_frames(n_rows=4000, seed=0):
+    rng = np.random.default_rng(seed)
+    def frame():
+        df = pd.DataFrame({f"f{i}": rng.normal(size=n_rows) for i in range(4)})
+        df["target"] = rng.integers(0, 3, n_rows)
+        return df
+    reference, current = frame(), frame()
+    current["f0"] += 1.0
+    return reference, current
+
+@pytest.mark.skipif(not HAS_EVIDENTLY, reason="evidently non installé")
+def test_scalable_analysis_writes_the_full_outputs(check_drift):
+    """Mode scalable : rapport HTML, tests et décision du mode complet, calculés sur les échantillons."""
+    reference, current = drift_frames()
+
+    # 2 workers : colonnes réparties sur deux process, statistiques fusionnées
+    summary = check_drift.run_scalable_analysis(reference, current, margin=0.05, workers=2)
+    assert set(summary["by_column"]) == {"target", "f0", "f1", "f2", "f3"}
+    assert summary["drifted_columns"] == ["f0"]
+    assert summary["reference_sample"] < len(reference) and summary["current_sample"] < len(current)
+    assert os.path.exists(check_drift.REPORT_HTML) and os.path.exists(check_drift.TEST_HTML)
+    assert summary["tests_passed"] and not os.path.exists(check_drift.TRIGGER_FILE)   # 1/5 colonnes < 0.3
+
+    # Une seule valeur manquante, hors échantillon : vue sur les données courantes complètes
+    current.loc[current.index[-1], "f1"] = np.nan
+    summary = check_drift.run_scalable_analysis(reference, current, margin=0.05, workers=1)
+    assert summary["columns_with_missing_values"] == ["f1"]
+    assert not summary["tests_passed"] and os.path.exists(check_drift.TRIGGER_FILE)
+
+@pytest.mark.skipif(not HAS_EVIDENTLY, reason="evidently non installé")
+def test_shared_column_stats_match_evidently(check_drift):
+    """Statistiques calculées par paquets de colonnes = celles des presets exécutés par Evidently."""
+    reference, current = drift_frames(n_rows=1000)
+    current.loc[3, "f2"] = np.nan
+
+    def outputs(engine=None):
+        report = check_drift.Report(metrics=[check_drift.DataDriftPreset(), check_drift.DataQualityPreset()])
+        report.run(reference_data=reference, current_data=current, engine=engine)
+        tests = check_drift.TestSuite(tests=[check_drift.TestShareOfDriftedColumns(lt=0.3),
+                                             check_drift.TestNumberOfColumnsWithMissingValues(eq=0)])
+        tests.run(reference_data=reference, current_data=current, engine=engine)
+        metrics = sorted((m["metric"], str(m["result"])) for m in report.as_dict()["metrics"])
+        return metrics, [(t["status"], t["description"]) for t in tests.as_dict()["tests"]]
+
+    shared = check_drift.parallel_column_stats(reference, current, workers=2)
+    assert outputs(functools.partial(check_drift.SharedResultsEngine, shared)) == outputs()
+
+@pytest.mark.skipif(not HAS_EVIDENTLY, reason="evidently non installé")
+def test_compare_approaches_with_pinned_evidently(check_drift):
+    reference, current = drift_frames(n_rows=500)
+
+    comparison = check_drift.compare_approaches(reference, current, margin=0.05, workers=1)
+    for approach in ("full", "scalable"):
+        result = comparison[approach]
+        assert result["wall_seconds"] > 0 and result["peak_rss_mb"] >= result["rss_before_mb"]
+    assert os.path.exists(check_drift.COMPARISON_JSON) and os.path.exists(check_drift.SCALABLE_REPORT_JSON)
+
+def test_profile_sample_reads_the_test_shards(check_drift, processors_dir, tmp_path):
+    """Sans --current-csv : lignes du split test lues dans les memmaps des shards, dé-scalées."""
+    import data_shards
+
+    with open(os.path.join(processors_dir, "preprocessed_data.pkl"), "rb") as f:
+        X_test = pickle.load(f)["X_test_scaled"]
+    with open(os.path.join(processors_dir, "robust_scaler.pkl"), "rb") as f:
+        scaler = pickle.load(f)
+    shards_dir = str(tmp_path / "shards")
+    writer = data_shards.ShardWriter(shards_dir, [f"f{i}" for i in range(X_test.shape[1])], rows_per_shard=7)
+    writer.append("test", X_test, np.zeros(len(X_test)))
+    writer.close()
+
+    features, raw = check_drift.load_current_sample(processors_dir, sample_size=None, shards_dir=shards_dir)
+    assert raw is None and list(features.columns) == [f"f{i}" for i in range(X_test.shape[1])]
+    np.testing.assert_allclose(features.to_numpy(), scaler.inverse_transform(X_test), atol=1e-3)
+
+    sample, _ = check_drift.load_current_sample(processors_dir, sample_size=10, shards_dir=shards_dir)
+    assert len(sample) == 10 and sample.merge(features).shape[0] == 10
+
+def test_missing_reference_data_falls_back_to_the_profile(check_drift, processors_dir, tmp_path):
+    """Modèle entraîné hors mémoire : pas de preprocessed_data.pkl, profil + --current-csv ou arrêt explicite."""
+    processors = shutil.copytree(processors_dir, tmp_path / "processors",
+                                 ignore=shutil.ignore_patterns("preprocessed_data.pkl"))
+    with pytest.raises(SystemExit) as exit_info:
+        check_drift.ensure_reference_data(str(processors))
+    assert exit_info.value.code == 1
+
+    with pytest.raises(SystemExit) as exit_info:
+        check_drift.ensure_reference_data(str(processors), current_csv=SAMPLE_CSV)
+    assert exit_info.value.code == 0
+    assert os.path.exists(check_drift.PROFILE_REPORT_JSON)
+
+    check_drift.ensure_reference_data(processors_dir)   # données présentes : rien à faire
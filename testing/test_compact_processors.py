@@ -0,0 +1,43 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import compact_processors
+from feature_store import CrimeFeatureStore
+
+
+def test_compact_processors_match_pickles(processors_dir, feature_store, sample_records, tmp_path):
+    assert os.path.exists(os.path.join(processors_dir, compact_processors.HEADER_FILENAME))
+    assert isinstance(feature_store.artifacts["scaler"], compact_processors.CompactRobustScaler)
+
+    legacy_dir = str(tmp_path / "legacy")
+    shutil.copytree(processors_dir, legacy_dir)
+    os.remove(os.path.join(legacy_dir, compact_processors.HEADER_FILENAME))
+    legacy = CrimeFeatureStore(processors_path=legacy_dir)
+    legacy.load_artifacts()
+    assert not isinstance(legacy.artifacts["scaler"], compact_processors.CompactRobustScaler)
+
+    raw = pd.DataFrame(sample_records)
+    np.testing.assert_array_equal(feature_store.get_batch_features(raw), legacy.get_batch_features(raw))
+    codes = np.arange(len(legacy.artifacts["target_encoder"].classes_))
+    assert list(feature_store.decode_targets(codes)) == list(legacy.decode_targets(codes))
+
+    location = feature_store.artifacts["feature_encoders"]["location"]
+    assert isinstance(location.buffer, np.memmap)
+    assert location[0] == legacy.artifacts["feature_encoders"]["location"].classes_[0]
+
+
+def test_vocabulary_index_is_precomputed_and_rebuilt_for_old_processors(processors_dir, monkeypatch):
+    artifacts = compact_processors.load_processors(processors_dir)
+    location = artifacts["feature_encoders"]["location"]
+    assert isinstance(location.sorted_bytes, np.memmap)
+
+    # Processors écrits avant le .sorted.npy : index reconstruit par blocs, mêmes codes
+    monkeypatch.setattr(compact_processors, "SORT_BLOCK_ROWS", 7)
+    rebuilt = compact_processors.Vocabulary(location.buffer, location.offsets)
+    np.testing.assert_array_equal(rebuilt.sorted_bytes, location.sorted_bytes)
+    values = list(location.classes_[::3]) + ["inconnue"]
+    np.testing.assert_array_equal(rebuilt.lookup(values), location.lookup(values))
+    assert location.lookup(values)[-1] == -1
@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import drift_profile
+from conftest import to_columns
+
+
+def _frame(rng, n, age_shift=0.0):
+    return pd.DataFrame({
+        "vict_age": rng.normal(35 + age_shift, 10, size=n),
+        "area": rng.integers(1, 22, size=n),
+    })
+
+def test_profile_is_compact_and_scores_drift():
+    rng = np.random.default_rng(0)
+    profile = drift_profile.build_profile(_frame(rng, 50000), categorical_features=["area"])
+    assert len(profile["features"]["vict_age"]["counts"]) == drift_profile.DEFAULT_NUMERIC_BINS
+    assert sum(profile["features"]["area"]["counts"]) == 50000
+
+    monitor = drift_profile.DriftMonitor(profile, window_seconds=3600, min_rows=100)
+    for _ in range(5):
+        monitor.update(_frame(rng, 200))
+    stable = monitor.evaluate(reset=True)
+    assert not stable["drift_detected"]
+    assert stable["features"]["vict_age"]["psi"] < 0.05
+
+    monitor.update(_frame(rng, 1000, age_shift=15))
+    shifted = monitor.evaluate()
+    assert "vict_age" in shifted["drifted_features"]
+    assert shifted["features"]["vict_age"]["ks"] > 0.3
+    assert shifted["rows"] == 1000
+
+def test_training_writes_reference_profile(processors_dir, feature_store):
+    assert os.path.exists(os.path.join(processors_dir, drift_profile.PROFILE_FILENAME))
+    profile = feature_store.artifacts["reference_profile"]
+    assert set(profile["features"]) == set(feature_store.required_features)
+    assert profile["features"]["location"]["kind"] == "categorical"
+
+def test_drift_endpoint_accumulates_served_features(api_client, sample_records):
+    import api
+
+    monitor = api.ml_components["drift"]
+    monitor.min_rows = 1
+    api_client.post("/predict/batch", json={"columns": to_columns(sample_records)})
+    api_client.post("/predict", json=sample_records[0])
+
+    status = api_client.get("/drift?evaluate=true").json()
+    assert status["enabled"]
+    assert status["window"]["rows"] == len(sample_records) + 1
+    assert set(status["last_evaluation"]["features"]) == set(monitor.profile["features"])
+    assert f"crime_api_drift_window_rows {len(sample_records) + 1}" in api_client.get("/metrics").text
+
+def test_drift_endpoint_aggregates_workers(api_client, sample_records, monkeypatch, tmp_path):
+    import api
+    import worker_state
+
+    monkeypatch.setenv(worker_state.SHARED_DIR_ENV, str(tmp_path / "workers"))
+    monkeypatch.setenv(worker_state.MULTIPROC_DIR_ENV, "")
+    worker_state.enable(str(tmp_path / "workers"))
+    sibling = os.getpid() + 1
+    worker_state.set_workers([os.getpid(), sibling])
+    monitor = api.ml_components["drift"]
+    monitor.min_rows = 1
+    api_client.post("/predict/batch", json={"columns": to_columns(sample_records)})
+    worker_state.publish_view("drift", monitor.snapshot(), pid=sibling)   # même trafic servi par le voisin
+
+    status = api_client.get("/drift").json()
+    assert status["window"]["rows"] == 2 * len(sample_records)
+    assert status["last_evaluation"]["rows"] == 2 * len(sample_records)
+    assert set(status["workers"]) == {str(os.getpid()), str(sibling)}
+
+def test_compare_sample_against_profile(feature_store, sample_records):
+    import preprocessing2
+
+    profile = feature_store.artifacts["reference_profile"]
+    assert "p50" in profile["features"]["vict_age"]["quantiles"]
+    assert "weapon_used_cd" in profile["missing_rates"]
+
+    raw = pd.DataFrame(sample_records)
+    features = feature_store.build_feature_frame(raw)
+    raw_clean = preprocessing2.clean_column_names(raw.copy()).rename(columns={"part_1_2": "crm_risk"})
+    report = drift_profile.compare_sample(profile, features, raw_clean)
+
+    assert report["rows"] == len(sample_records)
+    assert set(report["features"]) == set(profile["features"])
+    assert abs(report["quantile_shift"]["vict_age"]["p50"]) < 10
+    assert not report["missing_rate_alerts"]
+
+    raw_clean["weapon_used_cd"] = np.nan
+    report = drift_profile.compare_sample(profile, features, raw_clean)
+    assert report["missing_rate_alerts"] == ["weapon_used_cd"]
+
+def test_cochran_sample_size_and_stratification():
+    assert 16500 < drift_profile.cochran_sample_size(10_000_000, confidence=0.99, margin=0.01) < 16600
+    assert drift_profile.cochran_sample_size(1000, confidence=0.99, margin=0.01) < 1000
+
+    df = pd.DataFrame({"target": [0] * 9000 + [1] * 1000, "x": np.arange(10000)})
+    sample = drift_profile.stratified_sample(df, 1000)
+    assert len(sample) == 1000
+    assert sample["target"].value_counts().to_dict() == {0: 900, 1: 100}
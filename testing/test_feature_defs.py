@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+import feature_defs
+import preprocessing2
+from conftest import SAMPLE_CSV
+
+
+def _edge_records(sample_records):
+    """Lignes de l'échantillon + valeurs manquantes, hors bornes ou inattendues."""
+    base = sample_records[0]
+    return sample_records + [
+        dict(base, **{"Vict Sex": "H", "Vict Descent": "-", "Vict Age": -3, "Status": None, "Mocodes": None}),
+        dict(base, **{"DATE OCC": "pas une date", "TIME OCC": None, "Vict Sex": None, "Vict Age": None}),
+        dict(base, **{"Part 1-2": None, "LOCATION": None, "Premis Cd": "abc", "TIME OCC": 2400, "Vict Age": 130}),
+    ]
+
+def test_row_and_batch_executors_agree(sample_records):
+    records = _edge_records(sample_records)
+    plan = feature_defs.compile_plan(params={"vict_age_fill": 33.5})
+    batch = plan.run_batch(pd.DataFrame(records))
+    rows = pd.DataFrame([plan.run_row(r) for r in records], columns=plan.targets)
+
+    for col in plan.categorical:
+        assert list(feature_defs.category_strings(batch[col])) == [feature_defs.category_string(v) for v in rows[col]]
+    numeric = [c for c in plan.targets if c not in plan.categorical]
+    np.testing.assert_allclose(batch[numeric].astype(float), rows[numeric].astype(float))
+    assert batch["vict_age"].iloc[-3:].tolist() == [33.5, 33.5, 33.5]
+    assert batch["year"].iloc[-2] == 1900 and batch["hour_bin"].iloc[-1] == "nan"
+
+def test_training_and_serving_compute_the_same_features(processors_dir, feature_store):
+    """Colonnes nettoyées du pipeline offline vs noms bruts de l'API : mêmes features, mêmes paramètres."""
+    raw = pd.read_csv(SAMPLE_CSV)
+    offline = preprocessing2.clean_column_names(raw.copy()).rename(columns={"part_1_2": "crm_risk"})
+    params = feature_defs.fit_params(offline)
+
+    assert feature_store.plan.params == params and params["vict_age_fill"] != feature_defs.DEFAULT_PARAMS["vict_age_fill"]
+    pd.testing.assert_frame_equal(feature_defs.compile_plan(params=params).run_batch(offline),
+                                  feature_store.plan.run_batch(raw))
+
+def test_plan_only_computes_what_targets_need(feature_store):
+    plan = feature_defs.compile_plan(["hour_bin", "vict_sex_x"])
+    assert [step.name for step in plan.steps] == ["hour", "hour_bin", "sex", "vict_sex_x"]
+    assert plan.sources == ["TIME OCC", "Vict Sex"]
+    assert list(plan.run_batch(pd.DataFrame({"TIME OCC": [130, 1915]})).columns) == ["hour_bin", "vict_sex_x"]
+
+    # Le Feature Store ne lit que les entrées du modèle (Premis Desc, Weapon Desc, LAT... sont ignorées)
+    assert set(feature_store.plan.sources) == set(feature_defs.SOURCES)
+    assert feature_store.categorical_cols == preprocessing2.CATEGORICAL_COLS_TO_ENCODE
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+
+def test_batch_features_match_online_features(feature_store, sample_records):
+    """Le chemin vectorisé doit produire exactement la même matrice que le chemin ligne par ligne."""
+    online = np.vstack([feature_store.get_online_features(r) for r in sample_records])
+    batch = feature_store.get_batch_features(pd.DataFrame(sample_records))
+
+    assert batch.shape == (len(sample_records), len(feature_store.required_features))
+    np.testing.assert_allclose(batch, online)
+
+def test_batch_features_unknown_categories(feature_store, sample_records):
+    record = dict(sample_records[0], LOCATION="ADRESSE INCONNUE", Status="??")
+    X = feature_store.get_batch_features(pd.DataFrame([record]))
+    assert np.isfinite(X).all()
+
+def test_decode_targets(feature_store):
+    labels = feature_store.decode_targets(np.array([0, 1]))
+    assert list(labels) == [feature_store.decode_target(0), feature_store.decode_target(1)]
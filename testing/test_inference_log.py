@@ -0,0 +1,70 @@
+import glob
+import json
+import os
+
+import pandas as pd
+
+import inference_log
+import metrics
+from conftest import to_columns
+
+
+def test_served_predictions_are_logged(api_client, sample_records, tmp_path):
+    import api
+
+    logger = inference_log.InferenceLogger(str(tmp_path), api.FIELD_KINDS, formats=("jsonl", "parquet"),
+                                           flush_seconds=0.05).start()
+    api.ml_components["inference_log"] = logger
+    try:
+        api_client.post("/predict", json=sample_records[0])
+        batch = api_client.post("/predict/batch", json={"columns": to_columns(sample_records[:20])}).json()
+    finally:
+        api.ml_components["inference_log"] = None
+        logger.close()
+
+    lines = [json.loads(line) for path in glob.glob(os.path.join(tmp_path, "*.jsonl")) for line in open(path)]
+    assert len(lines) == 21
+    by_endpoint = {line["endpoint"] for line in lines}
+    assert by_endpoint == {"single", "batch"}
+
+    batch_lines = sorted((l for l in lines if l["endpoint"] == "batch"), key=lambda l: l["row"])
+    assert [l["prediction"] for l in batch_lines] == batch["predictions"]
+    assert batch_lines[0]["input"]["AREA"] == sample_records[0]["AREA"]
+    assert set(batch_lines[0]["features"]) == set(api.ml_components["store"].required_features)
+    assert batch_lines[0]["version"] == "1" and batch_lines[0]["latency_ms"] > 0
+
+    parquet = pd.concat(pd.read_parquet(p) for p in glob.glob(os.path.join(tmp_path, "*.parquet")))
+    assert len(parquet) == 21
+    assert {"input.LOCATION", "feature.vict_age", "prediction"} <= set(parquet.columns)
+
+def _logged_rows(result, fmt):
+    value = metrics.REGISTRY.get_sample_value("crime_api_inference_log_rows_total", {"result": result, "format": fmt})
+    return value or 0
+
+def test_full_buffer_drops_and_counts(tmp_path):
+    metrics.INFERENCE_LOG_ROWS.clear()
+    logger = inference_log.InferenceLogger(str(tmp_path), {"AREA": int}, max_rows=5)  # writer not started
+    frame = pd.DataFrame({"AREA": range(3)})
+
+    assert logger.log("batch", "m", "1", 1.0, frame, None, ["a"] * 3, [0.5] * 3)
+    assert not logger.log("batch", "m", "1", 1.0, frame, None, ["a"] * 3, [0.5] * 3)
+    assert _logged_rows("dropped", "jsonl") == 3
+
+def test_parquet_schema_survives_an_empty_first_batch(tmp_path):
+    metrics.INFERENCE_LOG_ROWS.clear()
+    logger = inference_log.InferenceLogger(str(tmp_path), {"AREA": int, "Mocodes": str},
+                                           formats=("jsonl", "parquet"), flush_seconds=0.05)
+    empty = pd.DataFrame({"AREA": [1], "Mocodes": [None]})
+    filled = pd.DataFrame({"AREA": [2, 3], "Mocodes": ["0416", "1822 0344"]})
+
+    # Écritures directes (sans thread) : un lot par appel, comme deux flush successifs
+    logger._write([inference_log.LogEntry(logger, "batch", "m", "1", 1.0, empty, None, ["a"], [0.5])])
+    logger._write([inference_log.LogEntry(logger, "batch", "m", "1", 1.0, filled, None, ["b"] * 2, [0.5] * 2)])
+    for writer in logger._writers.values():
+        writer.close()
+
+    parquet = pd.read_parquet(glob.glob(os.path.join(tmp_path, "*.parquet"))[0])
+    assert parquet["input.Mocodes"].tolist() == [None, "0416", "1822 0344"]
+    for fmt in ("jsonl", "parquet"):
+        assert _logged_rows("written", fmt) == 3
+        assert _logged_rows("failed", fmt) == 0
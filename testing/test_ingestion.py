@@ -0,0 +1,66 @@
+import io
+
+import pandas as pd
+
+import ingestion
+from conftest import SAMPLE_CSV
+
+
+def test_load_upload_declared_dtypes():
+    raw = open(SAMPLE_CSV, "rb").read()
+    df_original, df_cleaned, missing_mandatory, missing_optional = ingestion.load_upload(raw)
+
+    assert missing_mandatory == [] and missing_optional == []
+    assert len(df_cleaned) == len(df_original) == 140
+    assert df_cleaned["TIME OCC"].dtype == "int64"
+    # Mocodes reste du texte (zéros en tête conservés), les NaN deviennent ""
+    assert df_cleaned["Mocodes"].iloc[1] == "1822 1402 0344"
+    assert df_cleaned["Mocodes"].iloc[0] == ""
+
+def test_load_upload_coerces_bad_numbers():
+    raw = open(SAMPLE_CSV, "rb").read().replace(b",2130,", b",abc,", 1)
+    _, df_cleaned, _, _ = ingestion.load_upload(raw)
+    assert df_cleaned["TIME OCC"].iloc[0] == 0
+
+def test_chunked_read_matches_single_pass():
+    raw = open(SAMPLE_CSV, "rb").read()
+    _, expected, _, _ = ingestion.load_upload(raw, chunk_rows=len(raw))
+    # Fichier ouvert (comme l'UploadedFile Streamlit), texte dans un bloc tardif -> relecture en repli
+    lines = raw.split(b"\n")
+    fields = lines[100].split(b",")
+    fields[3] = b"abc"   # TIME OCC
+    lines[100] = b",".join(fields)
+    stream = io.BytesIO(b"\n".join(lines))
+    assert ingestion.content_hash(stream) == ingestion.content_hash(stream.getvalue()) and stream.tell() == 0
+    df_original, df_cleaned, _, _ = ingestion.load_upload(stream, chunk_rows=32)
+    assert len(df_original) == len(df_cleaned) == 140
+    assert df_cleaned.drop(index=99).equals(expected.drop(index=99))
+
+def test_missing_mandatory_columns():
+    _, df_cleaned, missing_mandatory, _ = ingestion.load_upload(b"AREA,LAT\n1,34.0\n")
+    assert df_cleaned is None
+    assert set(missing_mandatory) == {"DATE OCC", "TIME OCC"}
+
+def test_columnar_payload_chunks():
+    raw = open(SAMPLE_CSV, "rb").read()
+    _, df_cleaned, _, _ = ingestion.load_upload(raw)
+    chunks = list(ingestion.iter_payload_chunks(df_cleaned, 64))
+    assert [start for start, _ in chunks] == [0, 64, 128]
+    assert len(chunks[-1][1]["columns"]["AREA"]) == 140 - 128
+
+def test_empty_or_header_only_upload():
+    assert ingestion.read_header(b"") == []
+    _, df_cleaned, missing_mandatory, _ = ingestion.load_upload(b"")
+    assert df_cleaned is None and set(missing_mandatory) == set(ingestion.MANDATORY_COLUMNS)
+
+    header = open(SAMPLE_CSV, "rb").read().split(b"\n")[0] + b"\n"
+    df_original, df_cleaned, missing_mandatory, _ = ingestion.load_upload(header)
+    assert missing_mandatory == [] and len(df_original) == len(df_cleaned) == 0
+
+def test_iter_upload_streams_chunks():
+    raw = open(SAMPLE_CSV, "rb").read()
+    _, expected, _, _ = ingestion.load_upload(raw)
+    chunks = list(ingestion.iter_upload(io.BytesIO(raw), chunk_rows=50))
+    assert [len(clean) for _, clean in chunks] == [50, 50, 40]
+    streamed = pd.concat([clean for _, clean in chunks], ignore_index=True)
+    assert streamed.equals(expected)
@@ -0,0 +1,65 @@
+import json
+import os
+
+import log_drift
+
+
+def _write_log(path, records, ts, partial=False):
+    with open(path, "a") as f:
+        for record in records:
+            f.write(json.dumps({"ts": ts, "endpoint": "batch", "input": record}) + "\n")
+        if partial:
+            f.write(json.dumps({"ts": ts, "input": records[0]})[:20])  # ligne en cours d'écriture
+
+def test_windows_are_incremental_and_scored(feature_store, sample_records, tmp_path):
+    profile = feature_store.artifacts["reference_profile"]
+    log_dir, state_path = tmp_path / "logs", str(tmp_path / log_drift.STATE_FILENAME)
+    log_dir.mkdir()
+    log_path = str(log_dir / "inference-1.jsonl")
+    settings = {"window_seconds": 3600, "lateness_seconds": 60, "min_rows": 50}
+
+    _write_log(log_path, sample_records, ts=3600 * 10 + 5, partial=True)
+    first = log_drift.run_log_windows(profile, feature_store, str(log_dir), state_path, **settings)
+    assert first["new_rows"] == len(sample_records)
+    assert first["closed_windows"] == []
+    assert first["open_windows"] == [{"window_start": 36000, "rows": len(sample_records)}]
+
+    # Second passage : seules les lignes nouvelles sont lues, la fenêtre précédente se ferme
+    with open(log_path) as f:
+        complete = f.read().rsplit("\n", 1)[0] + "\n"
+    with open(log_path, "w") as f:
+        f.write(complete)
+    _write_log(log_path, sample_records[:10], ts=3600 * 12)
+    second = log_drift.run_log_windows(profile, feature_store, str(log_dir), state_path, **settings)
+    assert second["new_rows"] == 10
+    [window] = second["closed_windows"]
+    assert window["scored"] and window["rows"] == len(sample_records)
+    assert set(window["features"]) == set(profile["features"])
+    assert "weapon_used_cd" in window["missing_rates"]
+
+    state = log_drift.load_state(state_path)
+    assert state["offsets"]["inference-1.jsonl"] == os.path.getsize(log_path)
+    assert len(state["history"]) == 1
+
+    # Lignes arrivées après la clôture de leur fenêtre : comptées, ignorées
+    _write_log(log_path, sample_records[:3], ts=3600 * 10)
+    late = log_drift.run_log_windows(profile, feature_store, str(log_dir), state_path, force=True, **settings)
+    assert late["late_rows"] == 3
+    assert [w["rows"] for w in late["closed_windows"]] == [10]
+    assert not late["closed_windows"][0]["scored"]
+
+def test_unreadable_lines_are_skipped_and_counted(feature_store, sample_records, tmp_path):
+    profile = feature_store.artifacts["reference_profile"]
+    log_dir, state_path = tmp_path / "logs", str(tmp_path / log_drift.STATE_FILENAME)
+    log_dir.mkdir()
+    log_path = str(log_dir / "inference-1.jsonl")
+    _write_log(log_path, sample_records[:5], ts=3600)
+    with open(log_path, "a") as f:
+        f.write('{"ts": 3600, "input": \n')     # JSON tronqué
+        f.write('42\n{"ts": "abc", "input": {}}\n')   # pas un objet, ts illisible
+    _write_log(log_path, sample_records[5:8], ts=3600)
+
+    report = log_drift.run_log_windows(profile, feature_store, str(log_dir), state_path, min_rows=1)
+    assert report["new_rows"] == 8 and report["bad_lines"] == 3
+    assert report["open_windows"] == [{"window_start": 3600, "rows": 8}]
+    assert log_drift.load_state(state_path)["offsets"]["inference-1.jsonl"] == os.path.getsize(log_path)
@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import metrics
+
+MULTIPROCESS_SCRIPT = textwrap.dedent("""
+    import os, sys
+    sys.path.insert(0, {src!r})
+    import worker_state
+    worker_state.enable({shared!r})   # avant metrics : mode multiprocess de prometheus_client
+    import metrics
+
+    requests = metrics.REQUESTS.labels(endpoint="/", method="GET", status=200)
+    requests.inc()                              # préchargement du maître : compté une fois
+    metrics.MODEL_POOL_LOADED.set(2)            # jauge du maître, recopiée dans chaque worker
+    gauges = metrics.gauge_values()
+    metrics.mark_process_dead(os.getpid())
+    pids = []
+    for count in (2, 3, 5):
+        pid = os.fork()
+        if pid == 0:
+            metrics.inherit_gauges(gauges)
+            requests.inc(count)
+            metrics.STAGE_LATENCY.labels(stage="predict").observe(0.01)
+            os._exit(0)
+        os.waitpid(pid, 0)
+        pids.append(pid)
+    metrics.mark_process_dead(pids[-1])         # worker arrêté : jauge retirée, compteurs gardés
+    print(" ".join(str(pid) for pid in pids))
+    print(metrics.render())
+""")
+
+def test_model_info_keeps_only_the_served_model():
+    metrics.set_model_info("m", "1")
+    metrics.set_model_info("m", "2")
+    assert metrics.REGISTRY.get_sample_value("crime_api_model_info", {"model": "m", "version": "2"}) == 1
+    assert metrics.REGISTRY.get_sample_value("crime_api_model_info", {"model": "m", "version": "1"}) is None
+
+def test_metrics_endpoint_reports_stages(api_client, sample_records):
+    for metric in (metrics.REQUESTS, metrics.STAGE_LATENCY, metrics.BATCH_SIZE, metrics.CACHE_LOOKUPS):
+        metric.clear()
+    api_client.post("/predict", json=sample_records[0])
+    api_client.post("/predict", json={"AREA": 1})  # 422
+
+    response = api_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+
+    for stage in ("validation", "features.engineer", "features.encode", "features.scale",
+                  "predict", "predict_proba", "decode_target"):
+        assert f'crime_api_stage_duration_seconds_count{{stage="{stage}"}} 1.0' in text
+    assert 'crime_api_requests_total{endpoint="/predict",method="POST",status="200"} 1.0' in text
+    assert 'crime_api_requests_total{endpoint="/predict",method="POST",status="422"} 1.0' in text
+    assert 'crime_api_batch_size_count{endpoint="single"} 1.0' in text
+    assert 'crime_api_cache_lookups_total{cache="encoder.location",result=' in text
+    assert 'crime_api_model_info{model="Local_Test_Model_v1",version="1"} 1.0' in text
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork")
+def test_multiprocess_render_sums_workers(tmp_path):
+    script = tmp_path / "workers.py"
+    script.write_text(MULTIPROCESS_SCRIPT.format(src=os.path.dirname(metrics.__file__), shared=str(tmp_path / "shared")))
+    env = {k: v for k, v in os.environ.items() if k != "PROMETHEUS_MULTIPROC_DIR"}
+    output = subprocess.run([sys.executable, str(script)], env=env, capture_output=True, text=True, check=True).stdout
+    pids, text = output.split("\n", 1)
+    first, second, stopped = pids.split()
+
+    assert 'crime_api_requests_total{endpoint="/",method="GET",status="200"} 11.0' in text
+    assert 'crime_api_stage_duration_seconds_count{stage="predict"} 3.0' in text
+    assert f'crime_api_model_pool_loaded{{pid="{first}"}} 2.0' in text
+    assert f'crime_api_model_pool_loaded{{pid="{second}"}} 2.0' in text
+    assert f'pid="{stopped}"' not in text
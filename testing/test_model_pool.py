@@ -0,0 +1,105 @@
+import shutil
+from types import SimpleNamespace
+
+import pytest
+
+import model_pool
+import wire_format
+from conftest import to_columns
+
+
+def test_lru_pool_shares_feature_stores(processors_dir, trained_model, feature_store, tmp_path):
+    other_processors = str(tmp_path / "processors_v3")
+    shutil.copytree(processors_dir, other_processors)
+    loads = []
+
+    def loader(name):
+        loads.append(name)
+        return trained_model, other_processors
+
+    pool = model_pool.ModelPool(resolver=lambda ref: f"Crime_v{ref}", loader=loader, max_loaded=2)
+    pool.set_primary("Crime_v1", trained_model, feature_store)
+
+    v2 = pool.get("2")
+    assert v2.store is feature_store  # mêmes processors (copie) -> même Feature Store
+    assert pool.get("Crime_v2") is v2 and loads == ["Crime_v2"]
+
+    pool.get("3")  # au-delà de max_loaded : v2 (non épinglé) est déchargé, jamais la Production
+    status = pool.status()
+    assert [m["name"] for m in status["models"]] == ["Crime_v3", "Crime_v1"]
+    assert status["feature_stores"] == 1
+    assert pool.get("Production").name == "Crime_v1"
+
+def test_batch_scores_several_models(api_client, trained_model, feature_store, sample_records, monkeypatch):
+    import api
+
+    def unknown_ref(ref):
+        raise LookupError(f"Modèle inconnu : {ref}")
+
+    monkeypatch.setattr(api.ml_components["pool"], "resolver", unknown_ref)  # pas d'appel au vrai Registry
+    api.ml_components["pool"].add("Local_Test_Model_v2", trained_model, feature_store, refs=("Staging",))
+    body = {"columns": to_columns(sample_records[:15])}
+    response = api_client.post("/predict/batch?models=Production,Staging", json=body).json()
+
+    assert set(response["by_model"]) == {"Local_Test_Model_v1", "Local_Test_Model_v2"}
+    assert response["model_info"] == "Local_Test_Model_v1"
+    assert response["predictions"] == response["by_model"]["Local_Test_Model_v2"]["predictions"]
+    assert "by_model" not in api_client.post("/predict/batch", json=body).json()
+    assert api_client.post("/predict/batch?models=unknown", json=body).status_code == 404
+
+    # Même négociation msgpack que les autres réponses en masse
+    packed = api_client.post("/predict/batch?models=Production,Staging", json=body,
+                             headers={"Accept": wire_format.MSGPACK_MEDIA_TYPE})
+    assert packed.headers["content-type"] == wire_format.MSGPACK_MEDIA_TYPE
+    labels, confidences, model_info = wire_format.decode_msgpack_predictions(packed.content)
+    assert model_info == "Local_Test_Model_v1" and list(labels) == response["predictions"]
+    by_model = wire_format.decode_msgpack_by_model(packed.content)
+    assert list(by_model["Local_Test_Model_v2"][0]) == response["by_model"]["Local_Test_Model_v2"]["predictions"]
+
+def test_pool_caches_refs_by_kind(trained_model, feature_store, monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(model_pool, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    calls = []
+    versions = {"7": "Crime_v7", "Staging": "Crime_v7"}
+
+    def resolver(ref):
+        calls.append(ref)
+        if ref not in versions:
+            raise LookupError(f"Modèle inconnu : {ref}")
+        return versions[ref]
+
+    pool = model_pool.ModelPool(resolver=resolver, loader=lambda name: (trained_model, feature_store.processors_path),
+                                alias_ttl=60, unknown_ttl=30)
+    for _ in range(2):
+        pool.get("7")
+        pool.get("Staging")
+        with pytest.raises(LookupError):
+            pool.get("champion")
+    assert calls == ["7", "Staging", "champion"]  # inconnue en cache négatif, comme les résolutions
+
+    clock[0] = 61  # stages/alias et inconnues expirent, pas les numéros
+    versions["Staging"] = "Crime_v8"
+    assert pool.get("Staging").name == "Crime_v8"
+    assert pool.get("7").name == "Crime_v7"
+    with pytest.raises(LookupError):
+        pool.get("champion")
+    assert calls == ["7", "Staging", "champion", "Staging", "champion"]
+
+def test_pool_budget_in_estimated_bytes(trained_model, feature_store):
+    sizes = {"Crime_v2": 60, "Crime_v3": 50}
+    pool = model_pool.ModelPool(resolver=lambda ref: f"Crime_v{ref}",
+                                loader=lambda name: (trained_model, feature_store.processors_path),
+                                max_loaded=5, max_bytes=100, sizer=lambda name, model, path: sizes[name])
+    pool.set_primary("Crime_v1", trained_model, feature_store, size_bytes=40)
+
+    pool.get("2")
+    pool.get("3")  # 40 + 60 + 50 > 100 : v2 (LRU, non épinglé) est déchargé, même sous max_loaded
+    status = pool.status()
+    assert [m["name"] for m in status["models"]] == ["Crime_v3", "Crime_v1"]
+    assert status["loaded_bytes"] == 90 and status["max_bytes"] == 100
+
+def test_directory_bytes(tmp_path):
+    (tmp_path / "a.bin").write_bytes(b"x" * 10)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "b.bin").write_bytes(b"x" * 5)
+    assert model_pool.directory_bytes(str(tmp_path), str(tmp_path / "missing")) == 15
@@ -0,0 +1,83 @@
+import os
+import pickle
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+import compact_processors
+import feature_defs
+import preprocessing2
+from conftest import SAMPLE_CSV
+
+CAPS = {"max_categories": 20, "min_count": 2}
+
+
+@pytest.fixture(scope="module")
+def multi_hot_dir(tmp_path_factory):
+    """Pipeline avec Mocodes en multi-hot (vocabulaire des codes plafonné bas pour l'échantillon)."""
+    workdir = tmp_path_factory.mktemp("multihot")
+    original_cwd, caps = os.getcwd(), dict(preprocessing2.MOCODE_CAPS)
+    os.chdir(workdir)
+    preprocessing2.MOCODE_CAPS.update(CAPS)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            preprocessing2.run_preprocessing_pipeline(data_path=SAMPLE_CSV, mode="train", mocodes_encoding="multihot")
+    finally:
+        os.chdir(original_cwd)
+        preprocessing2.MOCODE_CAPS.update(caps)
+    return str(workdir / preprocessing2.ARTIFACTS_PATH)
+
+@pytest.fixture
+def multi_hot_store(multi_hot_dir):
+    from feature_store import CrimeFeatureStore
+
+    store = CrimeFeatureStore(processors_path=multi_hot_dir)
+    store.load_artifacts()
+    return store
+
+def test_code_vocabulary_replaces_the_list_vocabulary(multi_hot_dir, processors_dir):
+    with open(os.path.join(multi_hot_dir, "feature_label_encoders.pkl"), "rb") as f:
+        codes = pickle.load(f)["mocodes"]
+    with open(os.path.join(processors_dir, "feature_label_encoders.pkl"), "rb") as f:
+        lists = pickle.load(f)["mocodes"]
+    assert feature_defs.OTHER_CATEGORY in codes.classes_ and len(codes.classes_) <= CAPS["max_categories"] + 1
+    assert all(" " not in code for code in codes.classes_) and len(codes.classes_) < len(lists.classes_)
+
+    with open(os.path.join(multi_hot_dir, "preprocessed_data.pkl"), "rb") as f:
+        X_train = pickle.load(f)["X_train_scaled"]
+    assert sparse.isspmatrix_csr(X_train)
+    assert X_train.shape[1] == len(feature_defs.MODEL_FEATURES) - 1 + len(codes.classes_)
+    assert set(np.unique(X_train[:, -len(codes.classes_):].data)) <= {1.0}
+
+def test_store_emits_the_training_columns(multi_hot_store, multi_hot_dir, sample_records):
+    raw = pd.DataFrame(sample_records)
+    raw.loc[0, "Mocodes"] = "9999 9999"
+    X = multi_hot_store.get_batch_features(raw)
+    assert sparse.isspmatrix_csr(X)
+
+    vocabulary = multi_hot_store.artifacts["feature_encoders"]["mocodes"]
+    other = int(vocabulary.lookup([feature_defs.OTHER_CATEGORY])[0])
+    block = X[:, X.shape[1] - len(vocabulary):]
+    assert block[0].indices.tolist() == [other]   # code inconnu répété : une seule colonne "autres"
+    online = multi_hot_store.get_online_features(raw.iloc[0].to_dict())
+    assert sparse.isspmatrix_csr(online) and (online != X[:1]).nnz == 0
+
+    # Mêmes colonnes qu'à l'entraînement : le RandomForest du pickle score les sorties du Feature Store
+    from sklearn.ensemble import RandomForestClassifier
+    with open(os.path.join(multi_hot_dir, "preprocessed_data.pkl"), "rb") as f:
+        data = pickle.load(f)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(data["X_train_scaled"], data["y_train"])
+    assert model.predict(X).shape == (len(raw),)
+
+def test_multi_hot_requires_scaled_dense_output():
+    with pytest.raises(ValueError, match="multihot"):
+        preprocessing2.run_preprocessing_pipeline(data_path=SAMPLE_CSV, feature_mode="native", mocodes_encoding="multihot")
+
+def test_compact_header_flags_multi_hot(multi_hot_dir):
+    artifacts = compact_processors.load_processors(multi_hot_dir)
+    assert artifacts["multi_hot"] == feature_defs.CODE_LIST_FEATURES
+    assert "mocodes" not in artifacts["scaler"].feature_names
@@ -0,0 +1,91 @@
+import os
+import pickle
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_shards
+import drift_profile
+import out_of_core
+import preprocessing2
+from conftest import SAMPLE_CSV
+
+
+@pytest.fixture(scope="module")
+def shards_dir(tmp_path_factory):
+    """
+    Même pipeline que processors_dir, sortie 'shards' : CSV lu en petits blocs (doublons répartis
+    sur plusieurs blocs) et plusieurs shards par split.
+    """
+    workdir = tmp_path_factory.mktemp("shards")
+    raw = pd.read_csv(SAMPLE_CSV)
+    raw.pipe(lambda df: pd.concat([df, df.head(30)])).to_csv(workdir / "crime_with_duplicates.csv", index=False)
+    original_cwd, rows, chunk_rows = os.getcwd(), data_shards.SHARD_ROWS, preprocessing2.CSV_CHUNK_ROWS
+    os.chdir(workdir)
+    data_shards.SHARD_ROWS, preprocessing2.CSV_CHUNK_ROWS = 40, 37
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            preprocessing2.run_preprocessing_pipeline(data_path="crime_with_duplicates.csv", mode="train", output="shards")
+    finally:
+        os.chdir(original_cwd)
+        data_shards.SHARD_ROWS, preprocessing2.CSV_CHUNK_ROWS = rows, chunk_rows
+    return str(workdir)
+
+def _sorted_rows(X, y):
+    rows = np.column_stack([X, y])
+    return rows[np.lexsort(rows.T[::-1])]
+
+def test_shards_hold_the_pickled_data(shards_dir, processors_dir):
+    """Lecture par blocs : mêmes lignes (dédoublonnées), mêmes splits et mêmes processors que le pickle."""
+    artifacts = os.path.join(shards_dir, preprocessing2.ARTIFACTS_PATH)
+    assert not os.path.exists(os.path.join(artifacts, "preprocessed_data.pkl"))
+    with open(os.path.join(processors_dir, "preprocessed_data.pkl"), "rb") as f:
+        data = pickle.load(f)
+
+    for split in ("train", "test"):
+        shards = data_shards.ShardedSplit(os.path.join(shards_dir, data_shards.SHARDS_PATH), split)
+        assert len(shards) == -(-len(data[f"y_{split}"]) // 40)
+        assert shards.features == preprocessing2.DEFAULT_SELECTED_FEATURES
+        X = np.concatenate([X for X, _ in shards.chunks()])
+        np.testing.assert_allclose(_sorted_rows(X, shards.labels()),
+                                   _sorted_rows(data[f"X_{split}_scaled"].astype(np.float32), data[f"y_{split}"]),
+                                   rtol=1e-5, atol=1e-6)
+
+    def load(directory, name):
+        with open(os.path.join(directory, name), "rb") as f:
+            return pickle.load(f)
+
+    for name in ("feature_label_encoders.pkl", "target_label_encoder.pkl"):
+        expected, actual = load(processors_dir, name), load(artifacts, name)
+        for col, encoder in (expected.items() if isinstance(expected, dict) else [(None, expected)]):
+            fitted = actual[col] if col else actual
+            assert fitted.classes_.tolist() == encoder.classes_.tolist()
+    expected, actual = load(processors_dir, "robust_scaler.pkl"), load(artifacts, "robust_scaler.pkl")
+    np.testing.assert_allclose(actual.center_, expected.center_)
+    np.testing.assert_allclose(actual.scale_, expected.scale_)
+    assert load(artifacts, "features_config.pkl")["feature_params"]["vict_age_fill"] == \
+        pytest.approx(load(processors_dir, "features_config.pkl")["feature_params"]["vict_age_fill"])
+    assert drift_profile.load_profile(artifacts) == drift_profile.load_profile(processors_dir)
+
+@pytest.mark.parametrize("algo_type", out_of_core.SUPPORTED_ALGOS)
+def test_out_of_core_models_keep_the_sklearn_interface(shards_dir, algo_type):
+    directory = os.path.join(shards_dir, data_shards.SHARDS_PATH)
+    split = data_shards.ShardedSplit(directory, "train")
+    if algo_type == "xgboost":
+        model = pytest.importorskip("xgboost").XGBClassifier(n_estimators=5, objective="multi:softprob",
+                                                             num_class=len(split.classes))
+    elif algo_type == "lightgbm":
+        model = pytest.importorskip("lightgbm").LGBMClassifier(n_estimators=5, min_child_samples=2, verbose=-1)
+    else:
+        model = pytest.importorskip("catboost").CatBoostClassifier(iterations=5, verbose=0, allow_writing_files=False)
+
+    model = out_of_core.fit(algo_type, model, directory)
+    y_true, y_pred = out_of_core.predict(model, directory, "test")
+
+    assert len(y_pred) == len(y_true) and set(y_pred) <= set(split.classes)
+    proba = model.predict_proba(np.asarray(split.features_of(0)))
+    assert proba.shape == (split.shards[0]["rows"], len(split.classes))
+    np.testing.assert_allclose(proba.sum(axis=1), 1.0, rtol=1e-5)
@@ -0,0 +1,60 @@
+import filecmp
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import preprocessing2
+from conftest import SAMPLE_CSV
+
+pytest.importorskip("polars")
+
+
+@pytest.fixture
+def messy_csv(tmp_path):
+    """Échantillon + doublons, index sans en-tête, valeurs manquantes au format texte, date invalide."""
+    df = pd.read_csv(SAMPLE_CSV)
+    extra = df.iloc[:3].copy()
+    extra.loc[extra.index[0], "Vict Sex"] = "N/A"
+    extra.loc[extra.index[1], "DATE OCC"] = "31/31/2020 99:00:00 PM"
+    extra.loc[extra.index[2], ["Status", "Mocodes"]] = ["NULL", None]
+    df = pd.concat([df, df.iloc[:5], extra], ignore_index=True)
+    path = tmp_path / "crime.csv"
+    df.to_csv(path)   # index écrit : colonne "Unnamed: 0"
+    return str(path)
+
+def _run(workdir, data_path, mode, engine, feature_mode="scaled", mocodes_encoding="label"):
+    os.makedirs(workdir, exist_ok=True)
+    original_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            preprocessing2.run_preprocessing_pipeline(data_path=data_path, mode=mode, engine=engine,
+                                                      feature_mode=feature_mode, mocodes_encoding=mocodes_encoding)
+    finally:
+        os.chdir(original_cwd)
+    return os.path.join(workdir, preprocessing2.ARTIFACTS_PATH)
+
+@pytest.mark.parametrize("feature_mode, mocodes_encoding",
+                         [(mode, "label") for mode in preprocessing2.FEATURE_MODES] + [("scaled", "multihot")])
+def test_polars_engine_writes_identical_artifacts(tmp_path, messy_csv, feature_mode, mocodes_encoding):
+    """Vocabulaires plafonnés identiques (égalités de fréquence départagées par valeur), multi-hot compris."""
+    outputs = {engine: _run(str(tmp_path / engine), messy_csv, "train", engine, feature_mode, mocodes_encoding)
+               for engine in preprocessing2.ENGINES}
+
+    names = sorted(os.listdir(outputs["pandas"]))
+    assert names == sorted(os.listdir(outputs["polars"])) and "preprocessed_data.pkl" in names
+    _, mismatch, errors = filecmp.cmpfiles(outputs["pandas"], outputs["polars"], names, shallow=False)
+    assert mismatch == [] and errors == []
+
+def test_polars_engine_transform_mode_reuses_processors(tmp_path, messy_csv):
+    processors = _run(str(tmp_path / "run"), messy_csv, "train", "pandas")
+    trained = pd.read_pickle(os.path.join(processors, "preprocessed_data.pkl"))
+
+    _run(str(tmp_path / "run"), messy_csv, "transform", "polars")
+    transformed = pd.read_pickle(os.path.join(processors, "preprocessed_data.pkl"))
+    for key in trained:
+        np.testing.assert_array_equal(trained[key], transformed[key])
@@ -0,0 +1,53 @@
+import threading
+import time
+
+import api
+import profiler
+
+
+def _busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_sampling_profiler_collapsed_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,))
+    worker.start()
+    try:
+        sampler = profiler.SamplingProfiler(interval=0.001, thread_ids=[worker.ident]).start()
+        time.sleep(0.1)
+        counts = sampler.stop()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert sampler.samples > 0
+    assert any("_busy_loop (test_profiler.py" in stack for stack in counts)
+    line = profiler.format_collapsed(counts).splitlines()[0]
+    assert line.rsplit(" ", 1)[1].isdigit()
+
+def test_server_timing_header(api_client, sample_records):
+    response = api_client.post("/predict", json=sample_records[0])
+    assert response.status_code == 200
+    entries = {e.split(";")[0] for e in response.headers["server-timing"].split(", ")}
+    assert {"validation", "features", "model", "app"} <= entries
+
+def test_admin_profile_requires_token(api_client, monkeypatch):
+    monkeypatch.setattr(api, "ADMIN_TOKEN", None)
+    assert api_client.get("/admin/profile?seconds=0.05").status_code == 404
+
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    assert api_client.get("/admin/profile?seconds=0.05").status_code == 403
+    response = api_client.get("/admin/profile?seconds=0.05", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert int(response.headers["x-profile-samples"]) > 0
+
+def test_every_nth_request_is_profiled(api_client, sample_records, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_EVERY_N", 1)
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    profiler.REQUEST_PROFILE.clear()
+    api_client.post("/predict", json=sample_records[0])
+
+    response = api_client.get("/admin/profile/requests?reset=true", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert not profiler.REQUEST_PROFILE
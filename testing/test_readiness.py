@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+
+import readiness
+from conftest import to_columns
+
+
+def test_probes_answer_while_the_model_loads_in_background(api_client, sample_records, monkeypatch):
+    import api
+
+    started, release = threading.Event(), threading.Event()
+
+    def slow_load():
+        api.ml_components["status"].enter(readiness.DOWNLOADING)
+        started.set()
+        release.wait(10)
+        api.ml_components["status"].enter(readiness.WARMING)
+        return True
+
+    monkeypatch.setattr(api, "load_components", slow_load)
+    api.ml_components["status"] = readiness.LoadStatus()
+    with api_client as client:
+        assert started.wait(10)
+        assert client.get("/livez").json() == {"status": "alive", "state": readiness.DOWNLOADING}
+        not_ready = client.get("/readyz")
+        assert not_ready.status_code == 503 and not_ready.headers["Retry-After"] == "10"
+        assert not_ready.json()["state"] == readiness.DOWNLOADING
+        rejected = client.post("/predict/batch", json={"columns": to_columns(sample_records[:3])})
+        assert rejected.status_code == 503 and "Retry-After" in rejected.headers
+
+        release.set()
+        for _ in range(100):
+            if client.get("/readyz").status_code == 200:
+                break
+            time.sleep(0.05)
+        ready = client.get("/readyz").json()
+        assert ready["state"] == readiness.READY and ready["model"] == "Local_Test_Model_v1"
+        assert set(ready["stages"]) == {readiness.STARTING, readiness.DOWNLOADING, readiness.WARMING}
+        assert ready["warmup"]["steady_ms"]["single"] > 0
+        assert client.post("/predict/batch", json={"columns": to_columns(sample_records[:3])}).status_code == 200
+
+def test_background_loader_retries_then_gives_up(monkeypatch):
+    import api
+
+    calls = []
+
+    def failing_load():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError("registry down")
+        api.ml_components["status"].fail("Aucun modèle chargé depuis le Registry")
+        return False
+
+    monkeypatch.setattr(api, "load_components", failing_load)
+    monkeypatch.setattr(api, "MODEL_LOAD_ATTEMPTS", 3)
+    monkeypatch.setattr(api, "MODEL_LOAD_BACKOFF_SECONDS", 0)
+    monkeypatch.setitem(api.ml_components, "status", readiness.LoadStatus())
+    api.load_in_background()
+
+    snapshot = api.ml_components["status"].snapshot()
+    assert len(calls) == 3 and snapshot["attempts"] == 3
+    assert snapshot["state"] == readiness.FAILED and "Registry" in snapshot["error"]
+
+def test_master_preload_retries_before_forking(monkeypatch):
+    import api
+    import serve
+
+    calls = []
+
+    def flaky_load():
+        calls.append(1)
+        if len(calls) < 2:
+            raise ConnectionError("registry down")
+        api.ml_components["status"].enter(readiness.WARMING)
+        return True
+
+    monkeypatch.setattr(api, "load_components", flaky_load)
+    monkeypatch.setattr(api, "MODEL_LOAD_BACKOFF_SECONDS", 0)
+    monkeypatch.setitem(api.ml_components, "status", readiness.LoadStatus())
+    serve.preload()
+    # Chargé dans le maître : les workers forkés ne téléchargent rien (load_in_background passe au warmup)
+    assert len(calls) == 2 and api.ml_components["status"].state == readiness.WARMING
+
+def test_readyz_waits_for_every_worker(api_client, monkeypatch, tmp_path):
+    import worker_state
+
+    monkeypatch.setenv(worker_state.SHARED_DIR_ENV, str(tmp_path / "workers"))   # retirés après le test
+    monkeypatch.setenv(worker_state.MULTIPROC_DIR_ENV, "")
+    worker_state.enable(str(tmp_path / "workers"))
+    sibling = os.getpid() + 1
+    worker_state.set_workers([os.getpid(), sibling])
+
+    with api_client as client:
+        # Ce worker est prêt, son voisin n'a encore rien publié : le pod ne l'est pas
+        not_ready = client.get("/readyz")
+        assert not_ready.status_code == 503
+        assert not_ready.json()["workers"][str(sibling)] == {"state": readiness.STARTING, "ready": False}
+
+        worker_state.publish_status({"state": readiness.DOWNLOADING, "ready": False}, pid=sibling)
+        assert client.get("/readyz").json()["workers"][str(sibling)]["state"] == readiness.DOWNLOADING
+
+        worker_state.publish_status({"state": readiness.READY, "ready": True}, pid=sibling)
+        ready = client.get("/readyz")
+        assert ready.status_code == 200 and set(ready.json()["workers"]) == {str(os.getpid()), str(sibling)}
+
+        # Worker arrêté puis relancé : le remplaçant doit publier son état avant que le pod redevienne prêt
+        worker_state.retire(sibling)
+        worker_state.set_workers([os.getpid(), sibling + 1])
+        assert client.get("/readyz").status_code == 503
+
+def test_operator_shared_dir_keeps_foreign_files(tmp_path, monkeypatch):
+    import worker_state
+
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    (shared / "operator.txt").write_text("keep")
+    (shared / "status_1.json").write_text("{}")   # restes d'un démarrage précédent
+    (shared / worker_state.PROMETHEUS_SUBDIR).mkdir()
+    (shared / worker_state.PROMETHEUS_SUBDIR / "counter_1.db").write_bytes(b"")
+    monkeypatch.setenv(worker_state.SHARED_DIR_ENV, str(shared))
+    monkeypatch.setenv(worker_state.MULTIPROC_DIR_ENV, "")
+    worker_state.enable(str(shared))
+    assert sorted(os.listdir(shared)) == ["operator.txt", worker_state.PROMETHEUS_SUBDIR]
+    assert os.listdir(shared / worker_state.PROMETHEUS_SUBDIR) == []
+    worker_state.set_workers([1])
+    worker_state.cleanup()
+    assert sorted(os.listdir(shared)) == ["operator.txt"]
+
+    created = worker_state.enable()   # sans API_SHARED_DIR : dossier temporaire supprimé en entier
+    worker_state.cleanup()
+    assert not os.path.exists(created)
@@ -0,0 +1,112 @@
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+import urllib.request
+
+import pytest
+
+import serve
+
+pytestmark = pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"), reason="fork + /proc (Linux)")
+
+APP = textwrap.dedent("""
+    import os, sys, time
+    sys.path.insert(0, {src!r})
+    import numpy as np
+    from fastapi import FastAPI
+    from fastapi.responses import PlainTextResponse
+    import worker_state
+    worker_state.enable()   # avant metrics : mode multiprocess de prometheus_client
+    import metrics
+    import serve
+
+    TABLE = np.arange(8 * 2**20 // 8, dtype=np.float64)   # 8 Mo préchargés dans le maître
+
+    app = FastAPI()
+    app.add_middleware(metrics.PrometheusMiddleware)
+
+    @app.get("/")
+    def root():
+        return {{"pid": os.getpid(), "checksum": float(TABLE[-1])}}
+
+    @app.get("/metrics")
+    def scrape():
+        return PlainTextResponse(metrics.render())
+
+    sock = serve.bind_socket("127.0.0.1", {port})
+    probes = serve.answer_probes(sock)
+    time.sleep(2)   # préchargement simulé
+    serve.stop_probes(*probes)
+    serve.freeze_heap()
+    serve.serve(app, sock, 2, log_level="warning")
+""")
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return {int(p) for p in f.read().split()}
+
+def _wait_for(predicate, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = predicate()
+        if result:
+            return result
+        time.sleep(0.1)
+    raise AssertionError("timeout")
+
+def test_preforked_workers_probe_share_memory_restart_and_stop(tmp_path):
+    port = _free_port()
+    script = tmp_path / "app.py"
+    script.write_text(APP.format(src=os.path.dirname(serve.__file__), port=port))
+    master = subprocess.Popen([sys.executable, str(script)])
+    served = []
+    try:
+        def answer(path="/"):
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=2) as r:
+                    body = r.read()
+            except OSError:
+                return None
+            if b"checksum" in body:
+                served.append(body)
+            return body
+
+        def requests_total():
+            text = answer("/metrics").decode()
+            return int(re.search(r'crime_api_requests_total\{endpoint="/",method="GET",status="200"\} (\d+)', text).group(1))
+        assert b'"state": "starting"' in _wait_for(lambda: answer("/livez"))
+        assert b'"checksum":1048575.0' in _wait_for(answer)
+
+        workers = _wait_for(lambda: len(_children(master.pid)) == 2 and _children(master.pid))
+        for pid in workers:
+            usage = serve.memory_usage(pid)
+            assert usage["shared"] > 8 and usage["pss"] < usage["rss"]
+
+        # /metrics agrège les deux workers : même total quel que soit le worker qui répond
+        for _ in range(20):
+            answer("/")
+        time.sleep(0.5)
+        assert {requests_total() for _ in range(6)} == {len(served)}
+
+        victim = min(workers)
+        os.kill(victim, signal.SIGKILL)
+        _wait_for(lambda: len(_children(master.pid)) == 2 and victim not in _children(master.pid))
+        assert len(_children(master.pid) & workers) == 1
+        time.sleep(0.5)
+        assert requests_total() == len(served)   # compteurs du worker tué conservés : pas de baisse
+
+        master.send_signal(signal.SIGTERM)
+        assert master.wait(timeout=30) == 0
+    finally:
+        if master.poll() is None:
+            master.kill()
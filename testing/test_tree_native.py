@@ -0,0 +1,80 @@
+import json
+import os
+import pickle
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import compact_processors
+import feature_defs
+import preprocessing2
+from conftest import SAMPLE_CSV
+
+CAPS = {"max_categories": 5, "min_count": 2}
+
+
+@pytest.fixture(scope="module")
+def native_dir(tmp_path_factory):
+    """Pipeline en mode natif (vocabulaires plafonnés bas pour l'échantillon de 150 lignes)."""
+    workdir = tmp_path_factory.mktemp("native")
+    original_cwd, caps = os.getcwd(), dict(preprocessing2.CATEGORY_CAPS)
+    os.chdir(workdir)
+    preprocessing2.CATEGORY_CAPS.update(CAPS)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            preprocessing2.run_preprocessing_pipeline(data_path=SAMPLE_CSV, mode="train", feature_mode="native")
+    finally:
+        os.chdir(original_cwd)
+        preprocessing2.CATEGORY_CAPS.update(caps)
+    return str(workdir / preprocessing2.ARTIFACTS_PATH)
+
+@pytest.fixture
+def native_store(native_dir):
+    from feature_store import CrimeFeatureStore
+
+    store = CrimeFeatureStore(processors_path=native_dir)
+    store.load_artifacts()
+    return store
+
+def test_native_mode_caps_vocabularies_and_skips_scaling(native_dir):
+    names = os.listdir(native_dir)
+    assert "robust_scaler.pkl" not in names and compact_processors.SCALER_FILENAME not in names
+    with open(os.path.join(native_dir, compact_processors.HEADER_FILENAME)) as f:
+        assert json.load(f)["feature_mode"] == "native"
+
+    with open(os.path.join(native_dir, "feature_label_encoders.pkl"), "rb") as f:
+        encoders = pickle.load(f)
+    for le in encoders.values():
+        assert feature_defs.OTHER_CATEGORY in le.classes_ and len(le.classes_) <= CAPS["max_categories"] + 1
+
+    with open(os.path.join(native_dir, "preprocessed_data.pkl"), "rb") as f:
+        X_train = pickle.load(f)["X_train_scaled"]
+    for col in preprocessing2.CATEGORICAL_COLS_TO_ENCODE:
+        assert list(X_train[col].cat.categories) == list(range(len(encoders[col].classes_)))
+    assert X_train["vict_age"].between(0, 100).all()   # valeurs brutes, non scalées
+
+def test_native_store_matches_training_representation(native_store, sample_records):
+    raw = pd.DataFrame(sample_records)
+    raw.loc[0, "LOCATION"] = "ADRESSE JAMAIS VUE"
+    X = native_store.get_batch_features(raw)
+
+    location = native_store.artifacts["feature_encoders"]["location"]
+    other = int(location.lookup([feature_defs.OTHER_CATEGORY])[0])
+    assert X["location"].iloc[0] == other and X["location"].dtype == "category"
+    online = native_store.get_online_features(raw.iloc[0].to_dict())
+    pd.testing.assert_frame_equal(online, X.iloc[:1], check_dtype=False)
+    assert [str(online[c].dtype) for c in online.columns] == [str(X[c].dtype) for c in X.columns]
+
+def test_native_lightgbm_scores_store_features(native_dir, native_store, sample_records):
+    lgb = pytest.importorskip("lightgbm")
+    with open(os.path.join(native_dir, "preprocessed_data.pkl"), "rb") as f:
+        data = pickle.load(f)
+    model = lgb.LGBMClassifier(n_estimators=5, min_child_samples=2, verbose=-1)
+    model.fit(data["X_train_scaled"], data["y_train"])
+    assert model.booster_.dump_model()["pandas_categorical"]   # catégories natives, pas des codes numériques
+
+    proba = model.predict_proba(native_store.get_batch_features(pd.DataFrame(sample_records)))
+    np.testing.assert_allclose(proba.sum(axis=1), 1.0, rtol=1e-6)
@@ -0,0 +1,75 @@
+import json
+import os
+import time
+
+import readiness
+import warmup
+from conftest import repo_root
+
+
+def test_run_warmup_stops_at_steady_latency_or_max_rounds():
+    delays = iter([0.03, 0.02] + [0.001] * 100)
+    report = warmup.run_warmup(lambda record: time.sleep(next(delays)), lambda batch: None,
+                               warmup.synthetic_records(5), batch_sizes=(10,), repeats=1, abs_tolerance_ms=5)
+    assert report["steady"] and report["rounds"] == 5
+    assert report["cold_ms"]["single"] > 25 and report["steady_ms"]["single"] < 5
+    assert set(report["steady_ms"]) == {"single", "batch_10"}
+
+    flip = iter([0.001, 0.02] * 50)
+    report = warmup.run_warmup(lambda record: time.sleep(next(flip)), lambda batch: None,
+                               warmup.synthetic_records(5), batch_sizes=(), repeats=1, max_rounds=5,
+                               abs_tolerance_ms=5)
+    assert not report["steady"] and report["rounds"] == 5
+
+def test_recorded_records_from_inference_log_tail(tmp_path):
+    log = tmp_path / "inference-20260101-000000-1-0000.jsonl"
+    lines = [json.dumps({"ts": i, "input": {"AREA": i, "TIME OCC": 1200, "extra": 1}}) for i in range(5)]
+    log.write_text("\n".join(lines) + '\n{"ts": 5, "inp')   # dernière ligne en cours d'écriture
+
+    records, source = warmup.recorded_records(["AREA", "TIME OCC"], path=None, log_dir=str(tmp_path), limit=3)
+    assert source == str(log)
+    assert records == [{"AREA": i, "TIME OCC": 1200} for i in (2, 3, 4)]
+
+def test_warm_up_reports_and_leaves_request_metrics_untouched(api_client, monkeypatch):
+    import api
+
+    monkeypatch.setattr(api, "WARMUP_DATA", f"{repo_root}/crime_sample_150.csv")
+    monkeypatch.setattr(api, "WARMUP_BATCH_SIZES", [10, 50])
+    api.ml_components["status"] = readiness.LoadStatus()
+    api.ml_components["status"].enter(readiness.WARMING)
+    stages = [line for line in api.metrics.render().splitlines() if "stage_duration" in line]
+
+    api.warm_up()
+
+    assert api.ml_components["status"].ready
+    assert [line for line in api.metrics.render().splitlines() if "stage_duration" in line] == stages
+    report = api_client.get("/readyz").json()["warmup"]
+    assert report["recorded"] > 0 and report["synthetic"] >= warmup.SYNTHETIC_RECORDS
+    assert set(report["steady_ms"]) == {"single", "batch_10", "batch_50"}
+    assert 'crime_api_warmup_latency_seconds{path="single",phase="cold"}' in api_client.get("/metrics").text
+
+def test_pod_readiness_waits_for_every_worker_warm_up(api_client, monkeypatch, tmp_path):
+    import api
+    import worker_state
+
+    monkeypatch.setattr(api, "WARMUP_BATCH_SIZES", [10])
+    monkeypatch.setenv(worker_state.SHARED_DIR_ENV, str(tmp_path / "workers"))
+    monkeypatch.setenv(worker_state.MULTIPROC_DIR_ENV, "")
+    worker_state.enable(str(tmp_path / "workers"))
+    sibling = os.getpid() + 1
+    worker_state.set_workers([os.getpid(), sibling])
+    worker_state.publish_status({"state": readiness.READY, "ready": True, "warmup": {"steady": True}}, pid=sibling)
+
+    api.ml_components["status"] = readiness.LoadStatus()
+    api.ml_components["status"].on_change = api.publish_readiness
+    api.ml_components["status"].enter(readiness.WARMING)
+    # Modèle chargé mais pas encore chauffé : le pod n'est pas prêt, même si le voisin l'est
+    warming = api_client.get("/readyz")
+    assert warming.status_code == 503 and warming.json()["workers"][str(os.getpid())]["state"] == readiness.WARMING
+
+    api.warm_up()
+
+    published = worker_state.worker_statuses()[os.getpid()]
+    assert published["ready"] and set(published["warmup"]["steady_ms"]) == {"single", "batch_10"}
+    ready = api_client.get("/readyz")
+    assert ready.status_code == 200 and ready.json()["workers"][str(sibling)]["warmup"] == {"steady": True}